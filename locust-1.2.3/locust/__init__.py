@@ -4,6 +4,7 @@ from .user.sequential_taskset import SequentialTaskSet
 from .user import wait_time
 from .user.task import task, tag, TaskSet
 from .user.users import HttpUser, User
+from .user.async_user import AsyncTaskSet, AsyncUser
 from .user.wait_time import between, constant, constant_pacing
 from .shape import LoadTestShape
 
@@ -20,6 +21,8 @@ __all__ = (
     "TaskSet",
     "HttpUser",
     "User",
+    "AsyncTaskSet",
+    "AsyncUser",
     "between",
     "constant",
     "constant_pacing",
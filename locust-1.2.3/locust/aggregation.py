@@ -0,0 +1,249 @@
+from array import array
+
+from .histogram import ResponseTimeHistogram, bucket_index, get_bucket_values
+from .stats import StatsEntry, StatsError, unpack_per_sec, unpack_phase_times
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class StatsAggregator(object):
+    """
+    Batches the stats reports that workers send to the master and merges each batch into a
+    RequestStats instance in one go.
+    批量处理worker发送给master的统计报告，并一次性将每一批合并到RequestStats实例中。
+
+    Instead of one StatsEntry.unserialize() and extend() per entry per report, every (name, method)
+    in a batch is merged into a single delta StatsEntry, which is then used to extend the master's
+    entry once. When NumPy is available the deltas are computed with array operations over all the
+    reports in the batch, keyed by interned (name, method) ids. Without NumPy the reports are
+    merged in Python, which still saves the repeated extend() calls on the master's entries.
+    每个批次中的每个(name, method)都被合并成一个增量StatsEntry，然后只扩展一次master的条目。
+    如果安装了NumPy，增量将通过数组运算计算。
+    """
+
+    def __init__(self, stats, use_numpy=None):
+        """
+        :param stats: RequestStats instance that the reports are merged into
+        :param use_numpy: Whether to use NumPy for the merges. Defaults to True if NumPy is installed
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed")
+        self.stats = stats
+        self.use_numpy = use_numpy
+        self.pending = []
+        self.ids = {}
+        self.keys = []
+
+    def intern(self, name, method):
+        """
+        Return the id of a (name, method) pair, assigning a new id the first time it's seen
+        返回(name, method)的id，第一次出现时分配一个新的id
+        """
+        key = (name, method)
+        id = self.ids.get(key)
+        if id is None:
+            id = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return id
+
+    def add(self, data):
+        """
+        Queue a worker report for the next flush()
+        """
+        self.pending.append(data)
+
+    def flush(self):
+        """
+        Merge all queued reports into the stats and return the number of reports that were merged
+        将所有排队的报告合并到统计数据中，并返回合并的报告数
+        """
+        reports, self.pending = self.pending, []
+        if not reports:
+            return 0
+
+        rows = []
+        total_rows = []
+        for data in reports:
+            if data.get("stats_version", 1) >= 2:
+                rows.extend(data["stats"])
+                total_rows.append(data["stats_total"])
+            else:
+                rows.extend(StatsEntry.unserialize(stats_data).pack() for stats_data in data["stats"])
+                total_rows.append(StatsEntry.unserialize(data["stats_total"]).pack())
+
+            for error_key, error in data["errors"].items():
+                if error_key not in self.stats.errors:
+                    self.stats.errors[error_key] = StatsError.from_dict(error)
+                else:
+                    self.stats.errors[error_key].occurrences += error["occurrences"]
+
+        for delta in self.merge_rows(rows):
+            self.stats.get(delta.name, delta.method).extend(delta)
+
+        for delta in self.merge_rows(total_rows):
+            self.stats.total.extend(delta)
+
+        return len(reports)
+
+    def merge_rows(self, rows):
+        """
+        Merge packed StatsEntry rows (see StatsEntry.pack) and return one delta StatsEntry per (name, method)
+        合并打包的StatsEntry行，并为每个(name, method)返回一个增量StatsEntry
+        """
+        if not rows:
+            return []
+        if not self.use_numpy:
+            deltas = {}
+            for row in rows:
+                entry = StatsEntry.unpack(row)
+                key = (entry.name, entry.method)
+                if key in deltas:
+                    deltas[key].extend(entry)
+                else:
+                    deltas[key] = entry
+            return list(deltas.values())
+        return self._merge_rows_numpy(rows)
+
+    def _merge_rows_numpy(self, rows):
+        ids = numpy.fromiter((self.intern(row[0], row[1]) for row in rows), dtype=numpy.intp, count=len(rows))
+        unique_ids, inverse = numpy.unique(ids, return_inverse=True)
+        count = len(unique_ids)
+
+        def column(index):
+            return numpy.array([numpy.nan if row[index] is None else row[index] for row in rows], dtype=numpy.float64)
+
+        def reduce(ufunc, index):
+            result = numpy.full(count, numpy.nan)
+            ufunc.at(result, inverse, column(index))
+            return result
+
+        def total(index):
+            return numpy.bincount(inverse, weights=column(index), minlength=count)
+
+        last_request_timestamp = reduce(numpy.fmax, 2)
+        start_time = reduce(numpy.fmin, 3)
+        num_requests = total(4)
+        num_none_requests = total(5)
+        num_failures = total(6)
+        total_response_time = total(7)
+        max_response_time = reduce(numpy.fmax, 8)
+        min_response_time = reduce(numpy.fmin, 9)
+        total_content_length = total(10)
+
+        deltas = []
+        for i, id in enumerate(unique_ids):
+            name, method = self.keys[id]
+            delta = StatsEntry(None, name, method)
+            delta.last_request_timestamp = _float_or_none(last_request_timestamp[i])
+            delta.start_time = _float_or_none(start_time[i])
+            delta.num_requests = int(num_requests[i])
+            delta.num_none_requests = int(num_none_requests[i])
+            delta.num_failures = int(num_failures[i])
+            delta.total_response_time = float(total_response_time[i])
+            delta.max_response_time = _float_or_none(max_response_time[i]) or 0
+            delta.min_response_time = _float_or_none(min_response_time[i])
+            delta.total_content_length = int(total_content_length[i])
+            deltas.append(delta)
+
+        self._merge_response_times(rows, inverse, deltas)
+        for index, attribute in [(12, "num_reqs_per_sec"), (13, "num_fail_per_sec")]:
+            for i, second, count in _group_sum(*_flatten_per_sec(rows, inverse, index)):
+                getattr(deltas[i], attribute)[second] = count
+        # HTTP phase timings are optional and small, so they're merged in Python
+        for row, i in zip(rows, inverse):
+            if len(row) > 14:
+                deltas[i]._merge_phase_times(unpack_phase_times(row[14]))
+        return deltas
+
+    def _merge_response_times(self, rows, inverse, deltas):
+        row_indices, keys, counts = _flatten_pairs(rows, inverse, 11)
+        precision = self.stats.histogram_precision
+        if precision is None:
+            for i, key, count in _group_sum(row_indices, keys, counts):
+                deltas[i].response_times[key] = count
+            return
+
+        # map each distinct response time to its histogram bucket once, then sum the
+        # counts of all rows into one bucket array per delta
+        # 每个不同的响应时间只映射一次到直方图桶，然后将所有行的计数求和到每个增量的桶数组中
+        last_index = len(get_bucket_values(precision)) - 1
+        unique_keys, key_inverse = numpy.unique(keys, return_inverse=True)
+        buckets = numpy.array([bucket_index(key, precision, last_index) for key in unique_keys], dtype=numpy.intp)
+        matrix = numpy.zeros((len(deltas), last_index + 1), dtype=numpy.int64)
+        numpy.add.at(matrix, (row_indices, buckets[key_inverse]), counts)
+        for i, delta in enumerate(deltas):
+            histogram = ResponseTimeHistogram(precision)
+            histogram.counts = array("q", matrix[i].tobytes())
+            histogram.total_count = int(matrix[i].sum())
+            delta.response_times = histogram
+
+
+def _float_or_none(value):
+    if numpy.isnan(value):
+        return None
+    return float(value)
+
+
+def _flatten_pairs(rows, inverse, index):
+    """
+    Flatten the [key, count, key, count, ...] lists at *index* of every row into three arrays
+    (delta index, key, count)
+    """
+    row_indices = []
+    keys = []
+    counts = []
+    for row, i in zip(rows, inverse):
+        pairs = row[index]
+        row_indices.extend([i] * (len(pairs) // 2))
+        keys.extend(pairs[::2])
+        counts.extend(pairs[1::2])
+    return (
+        numpy.array(row_indices, dtype=numpy.int64),
+        numpy.array(keys, dtype=numpy.float64),
+        numpy.array(counts, dtype=numpy.int64),
+    )
+
+
+def _flatten_per_sec(rows, inverse, index):
+    """
+    Flatten the pack_per_sec() lists at *index* of every row into three arrays (delta index, second, count)
+    """
+    row_indices = []
+    seconds = []
+    counts = []
+    for row, i in zip(rows, inverse):
+        packed = row[index]
+        if not packed:
+            continue
+        row_indices.extend([i] * (len(packed) - 1))
+        seconds.extend(range(packed[0], packed[0] + len(packed) - 1))
+        counts.extend(packed[1:])
+    return (
+        numpy.array(row_indices, dtype=numpy.int64),
+        numpy.array(seconds, dtype=numpy.float64),
+        numpy.array(counts, dtype=numpy.int64),
+    )
+
+
+def _group_sum(row_indices, keys, counts):
+    """
+    Sum the counts of equal (delta index, key) pairs and yield (delta index, key, count) for non-zero sums
+    对相同的(增量索引, 键)求和，并生成和不为零的(增量索引, 键, 计数)
+    """
+    if not len(keys):
+        return
+    # response times and seconds are integral, so (delta index, key) pairs can be combined into one integer
+    offset = keys.min()
+    keys = (keys - offset).astype(numpy.int64)
+    stride = int(keys.max()) + 1
+    unique, group_inverse = numpy.unique(row_indices * stride + keys, return_inverse=True)
+    sums = numpy.bincount(group_inverse, weights=counts)
+    for combined, total in zip(unique.tolist(), sums.tolist()):
+        if total:
+            i, key = divmod(combined, stride)
+            yield i, int(key + offset), int(total)
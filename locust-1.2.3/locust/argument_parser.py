@@ -6,6 +6,7 @@ import textwrap
 import configargparse
 
 import locust
+from .arrival import DISTRIBUTIONS
 
 version = locust.__version__
 
@@ -297,6 +298,46 @@ def setup_parser_arguments(parser):
         help="How many workers master should expect to connect before starting the test (only when --headless used).",
         env_var="LOCUST_EXPECT_WORKERS",
     )
+    master_group.add_argument(
+        "--master-aggregation-interval",
+        type=float,
+        default=0,
+        help="Merge the stats reports from workers in batches, once every this many seconds (e.g. 0.5), "
+             "instead of one at a time. Uses NumPy if it's installed. Only used when running with --master.",
+        env_var="LOCUST_MASTER_AGGREGATION_INTERVAL",
+    )
+    master_group.add_argument(
+        "--cpu-rebalance-interval",
+        type=float,
+        default=0,
+        help="Move users from busy workers to idle ones, based on the CPU usage the workers report, "
+             "every this many seconds. Only used when running with --master. Disabled by default.",
+        env_var="LOCUST_CPU_REBALANCE_INTERVAL",
+    )
+    master_group.add_argument(
+        "--max-report-rate",
+        type=float,
+        default=50,
+        help="Adapt the interval at which workers send their stats reports to the number of workers, so that the "
+             "master receives at most this many reports per second (fewer if they take long to ingest). "
+             "0 disables it, and workers report every 3 seconds. Only used when running with --master. Defaults to 50.",
+        env_var="LOCUST_MAX_REPORT_RATE",
+    )
+    master_group.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="Fork this many worker processes (-1 for one per CPU core), connected over IPC to this process, "
+             "which runs as their master. Can't be combined with --master or --worker. Not available on Windows.",
+        env_var="LOCUST_PROCESSES",
+    )
+    master_group.add_argument(
+        "--cpu-affinity",
+        action="store_true",
+        default=False,
+        help="Pin each of the worker processes started with --processes to its own CPU core",
+        env_var="LOCUST_CPU_AFFINITY",
+    )
     master_group.add_argument(
         "--expect-slaves",
         action="store_true",
@@ -349,6 +390,50 @@ def setup_parser_arguments(parser):
         env_var="LOCUST_MASTER_NODE_PORT",
         metavar="MASTER_NODE_PORT",
     )
+    worker_group.add_argument(
+        "--worker-capacity",
+        type=float,
+        default=1,
+        help="Relative capacity of this worker (e.g. its number of CPU cores). The master distributes users "
+             "in proportion to the capacities of the workers. Only used when running with --worker. Defaults to 1.",
+        env_var="LOCUST_WORKER_CAPACITY",
+    )
+    # 在master与worker之间运行Locust Relay节点的选项
+    relay_group = parser.add_argument_group(
+        "Relay options",
+        "Options for running a Locust Relay node, which sits between a group of Workers and the Master in very large "
+        "clusters, and merges the Workers' stats reports and heartbeats into one report for the Master. "
+        "The Relay connects to the Master given with --master-host and --master-port.",
+    )
+    relay_group.add_argument(
+        "--relay",
+        action="store_true",
+        help="Set locust to run in distributed mode with this process as a relay between workers and the master",
+        env_var="LOCUST_MODE_RELAY",
+    )
+    relay_group.add_argument(
+        "--relay-bind-host",
+        default="*",
+        help="Interfaces (hostname, ip) that locust relay should bind to. Only used when running with --relay. "
+             "Defaults to * (all available interfaces).",
+        env_var="LOCUST_RELAY_BIND_HOST",
+    )
+    relay_group.add_argument(
+        "--relay-bind-port",
+        type=int,
+        default=5558,
+        help="Port that locust relay should bind to, and its workers connect to with --master-port. "
+             "Only used when running with --relay. Defaults to 5558.",
+        env_var="LOCUST_RELAY_BIND_PORT",
+    )
+    relay_group.add_argument(
+        "--relay-report-interval",
+        type=float,
+        default=1,
+        help="How often (in seconds) the relay sends the merged report of its workers to the master. "
+             "Only used when running with --relay. Defaults to 1.",
+        env_var="LOCUST_RELAY_REPORT_INTERVAL",
+    )
     # 标签选项,可以使用@tag装饰器对Locust任务进行标记。这些选项允许指定在测试期间包含或排除哪些任务。
     tag_group = parser.add_argument_group(
         "Tag options",
@@ -395,6 +480,77 @@ def setup_parser_arguments(parser):
              "You must also specify the '--csv' argument to enable this.",
         env_var="LOCUST_CSV_FULL_HISTORY",
     )
+    stats_group.add_argument(
+        "--csv-incremental",  # Name repeated in 'parse_options'
+        action="store_true",
+        default=False,
+        # 只为有变化的条目追加历史行，并在关闭时一次性写入_stats.csv和_failures.csv，而不是每秒重写。需要'--csv'参数。
+        help="Only append history rows for entries that have changed, and write _stats.csv and _failures.csv "
+             "once at shutdown instead of rewriting them every second. Requires '--csv'.",
+        env_var="LOCUST_CSV_INCREMENTAL",
+    )
+    stats_group.add_argument(
+        "--csv-history-format",
+        choices=["csv", "ndjson.gz"],
+        default="csv",
+        # 统计历史文件的格式: csv，或gzip压缩的换行分隔JSON
+        help="Format of the stats history file: csv (default), or gzip compressed newline delimited JSON (ndjson.gz)",
+        env_var="LOCUST_CSV_HISTORY_FORMAT",
+    )
+    stats_group.add_argument(
+        "--sample-log",
+        metavar="PREFIX",
+        default=None,
+        # 将每个请求的原始样本记录到内存映射的二进制文件PREFIX_00000.samples, PREFIX_00001.samples...中
+        help="Record every request as a raw sample in memory mapped binary files PREFIX_00000.samples, "
+             "PREFIX_00001.samples... (read them with locust.samples.SampleReader). "
+             "In distributed mode each worker writes its own files, with its client id appended to the prefix",
+        env_var="LOCUST_SAMPLE_LOG",
+    )
+    stats_group.add_argument(
+        "--sample-log-segment-size",
+        type=int,
+        default=64,
+        # 每个样本文件的大小(MB)
+        help="Size in MB of each sample log file. Defaults to 64",
+        env_var="LOCUST_SAMPLE_LOG_SEGMENT_SIZE",
+    )
+    stats_group.add_argument(
+        "--sample-log-max-segments",
+        type=int,
+        default=None,
+        # 保留的样本文件的最大数量，更旧的文件将被删除
+        help="Maximum number of sample log files to keep, older files are deleted",
+        env_var="LOCUST_SAMPLE_LOG_MAX_SEGMENTS",
+    )
+    stats_group.add_argument(
+        "--request-batch-size",
+        type=int,
+        default=0,
+        # 将请求事件缓冲起来，每N个请求(或每--request-batch-interval毫秒)批量分发到统计和监听器
+        help="Buffer request events and dispatch them to the stats and event listeners in batches of this many "
+             "requests (or every --request-batch-interval ms), which lowers the per request overhead. "
+             "Disabled by default",
+        env_var="LOCUST_REQUEST_BATCH_SIZE",
+    )
+    stats_group.add_argument(
+        "--request-batch-interval",
+        type=int,
+        default=100,
+        # 批量分发请求事件的最长间隔(毫秒)
+        help="Maximum time in ms that request events are buffered for when --request-batch-size is set. "
+        "Defaults to 100",
+        env_var="LOCUST_REQUEST_BATCH_INTERVAL",
+    )
+    stats_group.add_argument(
+        "--http-phase-timings",
+        action="store_true",
+        default=False,
+        # 对每个HTTP请求的DNS、连接、TLS、首字节时间和下载阶段计时，并在统计数据、CSV和web UI中显示
+        help="Time the DNS lookup, connect, TLS handshake, time to first byte and download phases of HTTP requests "
+             "made by HttpUser/FastHttpUser, and show the median of each phase in the stats CSV and web UI",
+        env_var="LOCUST_HTTP_PHASE_TIMINGS",
+    )
     stats_group.add_argument(
         "--print-stats",
         action="store_true",
@@ -417,6 +573,52 @@ def setup_parser_arguments(parser):
              "Should be set on both master and workers when running in distributed mode",
         env_var="LOCUST_RESET_STATS",
     )
+    stats_group.add_argument(
+        "--histogram-precision",
+        type=int,
+        default=None,
+        help="Store response times in array backed histograms with this many significant digits (e.g. 2 or 3), "
+             "which makes percentile calculations and stats aggregation cheaper. "
+             "Should be set on both master and workers when running in distributed mode",
+        env_var="LOCUST_HISTOGRAM_PRECISION",
+    )
+    stats_group.add_argument(
+        "--templatize-names",
+        action="store_true",
+        default=False,
+        # 将请求名称折叠成模板(去掉查询字符串，将数字/UUID路径段替换为{id}/{uuid})
+        help="Collapse request names into templates: strip query strings and replace numeric, UUID and hex "
+             "path segments with {id}, {uuid} and {hash}",
+        env_var="LOCUST_TEMPLATIZE_NAMES",
+    )
+    stats_group.add_argument(
+        "--name-template-rule",
+        action="append",
+        default=[],
+        metavar="PATTERN=>REPLACEMENT",
+        # 在其他模板规则之前应用于请求名称的正则替换规则，可以多次指定
+        help="Regex substitution applied to request names before the built in templating, "
+             "e.g. '/user/\\w+/=>/user/{name}/'. Can be specified multiple times. Implies --templatize-names",
+        env_var="LOCUST_NAME_TEMPLATE_RULE",
+    )
+    stats_group.add_argument(
+        "--max-stats-entries",
+        type=int,
+        default=None,
+        # 统计条目的最大数量，超过后新名称的请求将计入"Other"条目
+        help="Maximum number of stats entries. Once reached, requests for new names are counted in an 'Other' entry",
+        env_var="LOCUST_MAX_STATS_ENTRIES",
+    )
+    stats_group.add_argument(
+        "--history-per-endpoint",
+        action="store_true",
+        default=False,
+        dest="history_per_entry",
+        # 为每个统计条目(而不仅仅是总计)保存当前统计数据的历史时间序列，可通过web UI的/stats/history获取
+        help="Keep a (downsampled) history of the current stats for every endpoint, and not just for the total. "
+        "The history is served as JSON at /stats/history in the web UI",
+        env_var="LOCUST_HISTORY_PER_ENDPOINT",
+    )
     # 日志记录选项
     log_group = parser.add_argument_group("Logging options")
     log_group.add_argument(
@@ -467,6 +669,41 @@ def setup_parser_arguments(parser):
         help="Step duration in Step Load mode, e.g. (300s, 20m, 3h, 1h30m, etc.). Only used together with --step-load",
         env_var="LOCUST_STEP_TIME",
     )
+    # 开放模型选项
+    arrival_group = parser.add_argument_group(
+        "Open model options",
+        "Run an open model test, where tasks are started at a target arrival rate no matter how long the previous "
+        "ones took. The number of users (-u) is the maximum number of users used to run them.",
+    )
+    arrival_group.add_argument(
+        "--arrival-rate",
+        type=float,
+        default=None,
+        # 每秒启动的任务数。设置后测试将作为开放模型测试运行
+        help="Number of tasks to start per second. Enables the open model.",
+        env_var="LOCUST_ARRIVAL_RATE",
+    )
+    arrival_group.add_argument(
+        "--arrival-distribution",
+        choices=DISTRIBUTIONS,
+        default="constant",
+        help="How arrivals are spread out in time: evenly (constant) or as a Poisson process. Defaults to constant.",
+        env_var="LOCUST_ARRIVAL_DISTRIBUTION",
+    )
+    arrival_group.add_argument(
+        "--arrival-ramp-time",
+        type=float,
+        default=0,
+        help="Ramp the arrival rate linearly over this many seconds when it's changed (including from 0 at the start)",
+        env_var="LOCUST_ARRIVAL_RAMP_TIME",
+    )
+    arrival_group.add_argument(
+        "--arrival-max-queue-time",
+        type=float,
+        default=1.0,
+        help="Drop arrivals that have waited this many seconds for a free user. Defaults to 1.",
+        env_var="LOCUST_ARRIVAL_MAX_QUEUE_TIME",
+    )
     # 其他选项
     other_group = parser.add_argument_group("Other options")
     # 打印User类的任务执行比率表
@@ -507,6 +744,63 @@ def setup_parser_arguments(parser):
              "This parameter only needs to be specified for the master process when running Locust distributed.",
         env_var="LOCUST_STOP_TIMEOUT",
     )
+    other_group.add_argument(
+        "--rate-limit",
+        action="append",
+        default=[],
+        metavar="NAME=RATE[:BURST]",
+        # 设置一个命名的速率限制(每秒令牌数)，用户通过environment.rate_limiters.acquire(NAME)获取令牌。可以多次指定
+        help="Set a named rate limit (tokens per second, for the whole cluster when running distributed) that users "
+             "acquire tokens from with environment.rate_limiters.acquire(NAME). Can be specified multiple times.",
+        env_var="LOCUST_RATE_LIMIT",
+    )
+    other_group.add_argument(
+        "--max-loop-lag",
+        type=float,
+        default=None,
+        metavar="MS",
+        # 当事件循环的平均延迟超过该毫秒数时暂停生成用户
+        help="Pause spawning users while the event loop is running more than this many ms late. "
+             "Disabled by default.",
+        env_var="LOCUST_MAX_LOOP_LAG",
+    )
+    other_group.add_argument(
+        "--json-decoder",
+        choices=["auto", "json", "orjson", "ujson"],
+        default="auto",
+        # 解码响应JSON所用的解码器。auto为已安装的最快的解码器
+        help="Decoder used by the responses' json() method. Defaults to auto, the fastest one installed "
+             "(orjson, ujson or json).",
+        env_var="LOCUST_JSON_DECODER",
+    )
+    other_group.add_argument(
+        "--dns-ttl",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        # 缓存DNS查询结果的秒数。默认不缓存
+        help="Cache the DNS lookups of the load generating clients for this many seconds. Disabled by default.",
+        env_var="LOCUST_DNS_TTL",
+    )
+    other_group.add_argument(
+        "--dns-negative-ttl",
+        type=float,
+        default=5,
+        metavar="SECONDS",
+        # 缓存失败的DNS查询的秒数(设置了--dns-ttl时)
+        help="Cache failed DNS lookups for this many seconds when --dns-ttl is set. Defaults to 5.",
+        env_var="LOCUST_DNS_NEGATIVE_TTL",
+    )
+    other_group.add_argument(
+        "--dns-override",
+        action="append",
+        default=[],
+        metavar="HOST=ADDRESS",
+        # 将主机解析为指定地址而不进行DNS查询，类似/etc/hosts。可以多次指定
+        help="Resolve HOST to ADDRESS without a DNS lookup, like an /etc/hosts entry. Can be specified multiple "
+             "times, or as a list in the config file.",
+        env_var="LOCUST_DNS_OVERRIDE",
+    )
 
     user_classes_group = parser.add_argument_group("User classes")
     user_classes_group.add_argument(
@@ -537,4 +831,6 @@ def parse_options(args=None):
     parsed_opts = parser.parse_args(args=args)
     if parsed_opts.stats_history_enabled and (parsed_opts.csv_prefix is None):
         parser.error("'--csv-full-history' requires '--csv'.")
+    if parsed_opts.csv_incremental and (parsed_opts.csv_prefix is None):
+        parser.error("'--csv-incremental' requires '--csv'.")
     return parsed_opts
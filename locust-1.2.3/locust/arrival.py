@@ -0,0 +1,273 @@
+import logging
+import random
+import traceback
+from collections import deque
+from timeit import default_timer
+
+import gevent
+from gevent import GreenletExit
+from gevent.pool import Group
+
+from .exception import InterruptTaskSet, RescheduleTask, RescheduleTaskImmediately, StopUser
+from .log import greenlet_exception_logger
+from .user.task import DefaultTaskSet, LOCUST_STATE_RUNNING
+
+logger = logging.getLogger(__name__)
+greenlet_exception_handler = greenlet_exception_logger(logger)
+
+DISTRIBUTIONS = ("constant", "poisson")
+"""
+How arrivals are spread out in time: evenly (constant) or as a Poisson process (exponentially distributed gaps)
+到达在时间上的分布方式: 均匀(constant)或泊松过程(poisson)
+"""
+
+MAX_QUEUE_TIME = 1.0  # arrivals that have waited this many seconds for a free user are dropped
+LATE_START_THRESHOLD = 0.05  # arrivals that start this many seconds after their scheduled time are late
+RATE_CHECK_INTERVAL = 0.1  # how often the scheduler checks the arrival rate, while it's waiting for the next arrival
+
+
+class _UserPool(object):
+    """
+    The users of one user class, and the arrivals waiting for one of them to be free
+    一个用户类的用户，以及等待空闲用户的到达
+    """
+
+    def __init__(self, user_class, size):
+        self.user_class = user_class
+        self.size = size
+        self.users = []
+        self.idle = []
+        self.queue = deque()
+
+
+class ArrivalRateScheduler(object):
+    """
+    Runs an open model load test: task executions are started at a target arrival rate, no matter how long
+    the previous ones took, instead of by a fixed number of users that each loop through their tasks. When the
+    system under test slows down, the number of concurrent task executions grows (up to pool_size), rather
+    than the throughput dropping.
+    运行开放模型负载测试: 按目标到达率启动任务执行，而不管之前的执行花了多长时间。被测系统变慢时，
+    并发的任务执行数会增加(最多到pool_size)，而不是吞吐量下降。
+
+    Each arrival picks a user class (by weight) and runs a single task of an idle user of that class. Users
+    are created as needed, up to the class's share of pool_size, and reused, so on_start runs once per user.
+    When all of them are busy the arrival waits in a queue, and arrivals that have waited max_queue_time
+    seconds are dropped. The queueing delay of every arrival, and the number of late and dropped arrivals,
+    are logged in stats.arrivals (an :class:`ArrivalStats <locust.stats.ArrivalStats>`).
+    每次到达按权重选择一个用户类，并由该类的空闲用户执行一个任务。所有用户都忙时到达会排队，排队超过max_queue_time秒的到达会被丢弃。
+    """
+
+    def __init__(
+        self,
+        environment,
+        user_classes,
+        pool_size,
+        arrival_rate=0,
+        distribution="constant",
+        ramp_time=0,
+        max_queue_time=MAX_QUEUE_TIME,
+        late_threshold=LATE_START_THRESHOLD,
+    ):
+        """
+        :param environment: Environment instance
+        :param user_classes: User classes whose tasks are executed
+        :param pool_size: Maximum number of users (and therefore of concurrent task executions)
+        :param arrival_rate: Number of task executions to start per second
+        :param distribution: One of DISTRIBUTIONS
+        :param ramp_time: Number of seconds over which the arrival rate changes linearly when it's set
+                          (including from 0 when the scheduler starts)
+        :param max_queue_time: Arrivals that have waited this many seconds for a free user are dropped
+        :param late_threshold: Arrivals that start more than this many seconds late are counted as late
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError("Unknown arrival distribution %r, expected one of %s" % (distribution, DISTRIBUTIONS))
+        if not user_classes:
+            raise ValueError("No user classes to run")
+        self.environment = environment
+        self.stats = environment.stats.arrivals
+        self.distribution = distribution
+        self.ramp_time = ramp_time
+        self.max_queue_time = max_queue_time
+        self.late_threshold = late_threshold
+        for user_class in user_classes:
+            if environment.host is not None:
+                user_class.host = environment.host
+        self.pools = [_UserPool(user_class, 0) for user_class in user_classes]
+        self.weights = [user_class.weight for user_class in user_classes]
+        self.user_greenlets = Group()
+        self.greenlet = None
+        self._ramp_from = 0
+        self._ramp_start = default_timer()
+        self.arrival_rate = 0
+        self.set_pool_size(pool_size)
+        self.set_arrival_rate(arrival_rate)
+
+    @property
+    def user_count(self):
+        return sum(len(pool.users) for pool in self.pools)
+
+    def set_pool_size(self, pool_size):
+        """
+        Change the maximum number of users, split between the user classes by weight (each class gets at
+        least one). Idle users above the new limit are stopped right away, busy ones when they're done.
+        """
+        weight_sum = float(sum(self.weights))
+        for pool, weight in zip(self.pools, self.weights):
+            pool.size = max(1, int(round(pool_size * weight / weight_sum)))
+            while len(pool.users) > pool.size and pool.idle:
+                self._retire(pool, pool.idle.pop())
+
+    def set_arrival_rate(self, arrival_rate):
+        """
+        Change the target arrival rate (per second). With a ramp_time, the rate changes linearly from the
+        current rate to the new one over that many seconds.
+        """
+        self._ramp_from = self.current_rate()
+        self._ramp_start = default_timer()
+        self.arrival_rate = arrival_rate
+
+    def current_rate(self, now=None):
+        if not self.ramp_time:
+            return self.arrival_rate
+        progress = ((now or default_timer()) - self._ramp_start) / self.ramp_time
+        if progress >= 1:
+            return self.arrival_rate
+        return self._ramp_from + (self.arrival_rate - self._ramp_from) * progress
+
+    def start(self):
+        self._ramp_start = default_timer()
+        self.greenlet = gevent.spawn(self._schedule)
+        self.greenlet.link_exception(greenlet_exception_handler)
+
+    def stop(self, timeout=None):
+        """
+        Stop issuing arrivals, wait up to *timeout* seconds for the running tasks to finish (if set) and then
+        kill them, and stop every user
+        """
+        if self.greenlet is not None:
+            self.greenlet.kill(block=True)
+            self.greenlet = None
+        for pool in self.pools:
+            pool.queue.clear()
+        if timeout:
+            self.user_greenlets.join(timeout=timeout)
+        self.user_greenlets.kill(block=True)
+        for pool in self.pools:
+            # the idle users, and any whose greenlet was killed before it got to run
+            for user in list(pool.users):
+                self._retire(pool, user)
+            pool.idle = []
+
+    def _schedule(self):
+        # Arrivals are due when the integral of the arrival rate since the last one reaches a threshold, which
+        # is 1 for constant arrivals, and exponentially distributed for a Poisson process. Since the rate may
+        # change (when ramping), the integral is accumulated in steps of at most RATE_CHECK_INTERVAL.
+        # 当自上次到达以来到达率的积分达到阈值时，下一次到达就到期了(constant为1，poisson服从指数分布)。
+        last = default_timer()
+        credit = 0.0
+        threshold = self._next_threshold()
+        while True:
+            rate = self.current_rate(last)
+            if rate <= 0:
+                gevent.sleep(RATE_CHECK_INTERVAL)
+                last = default_timer()
+                continue
+            gap = (threshold - credit) / rate
+            if gap > RATE_CHECK_INTERVAL:
+                credit += rate * RATE_CHECK_INTERVAL
+                last += RATE_CHECK_INTERVAL
+                self._sleep_until(last)
+                continue
+            next_arrival = last + gap
+            # if we've fallen behind, the overdue arrivals are issued right away (and their queueing delay
+            # shows how far behind we are) rather than skipped
+            # 如果落后了，过期的到达会立即发出(其排队延迟显示落后了多少)，而不是跳过
+            self._sleep_until(next_arrival)
+            self.arrive(next_arrival)
+            last = next_arrival
+            credit = 0.0
+            threshold = self._next_threshold()
+
+    def _next_threshold(self):
+        return random.expovariate(1.0) if self.distribution == "poisson" else 1.0
+
+    def _sleep_until(self, timestamp):
+        delay = timestamp - default_timer()
+        gevent.sleep(delay if delay > 0 else 0)
+
+    def arrive(self, scheduled_time):
+        """
+        Start (or queue) one task execution that was scheduled to start at *scheduled_time* (a default_timer() value)
+        """
+        self.stats.log_scheduled()
+        pool = random.choices(self.pools, self.weights)[0] if len(self.pools) > 1 else self.pools[0]
+        self._drop_expired(pool, default_timer())
+        if pool.idle:
+            user = pool.idle.pop()
+        elif len(pool.users) < pool.size:
+            user = self._create_user(pool)
+        else:
+            pool.queue.append(scheduled_time)
+            return
+        self.user_greenlets.spawn(self._run, pool, user, scheduled_time).link_exception(greenlet_exception_handler)
+
+    def _drop_expired(self, pool, now):
+        while pool.queue and now - pool.queue[0] > self.max_queue_time:
+            pool.queue.popleft()
+            self.stats.log_dropped()
+
+    def _create_user(self, pool):
+        user = pool.user_class(self.environment)
+        user._state = LOCUST_STATE_RUNNING
+        user._taskset_instance = DefaultTaskSet(user)
+        user._arrival_started = False
+        pool.users.append(user)
+        return user
+
+    def _retire(self, pool, user):
+        pool.users.remove(user)
+        if user._arrival_started:
+            try:
+                user.on_stop()
+            except Exception:
+                logger.error("Exception in on_stop of %s\n%s", user, traceback.format_exc())
+
+    def _run(self, pool, user, scheduled_time):
+        try:
+            if not user._arrival_started:
+                user._arrival_started = True
+                user.on_start()
+            while scheduled_time is not None:
+                self._execute(user, scheduled_time)
+                now = default_timer()
+                self._drop_expired(pool, now)
+                scheduled_time = pool.queue.popleft() if pool.queue and len(pool.users) <= pool.size else None
+        except (StopUser, GreenletExit):
+            self._retire(pool, user)
+            return
+        except Exception:
+            # an error that isn't caught (catch_exceptions is off) ends the user, so it must leave the pool
+            # 未被捕获的错误(catch_exceptions关闭)会结束该用户，因此必须将其移出用户池
+            self._retire(pool, user)
+            raise
+        if len(pool.users) > pool.size:
+            self._retire(pool, user)
+        else:
+            pool.idle.append(user)
+
+    def _execute(self, user, scheduled_time):
+        queue_delay = default_timer() - scheduled_time
+        self.stats.log_started(queue_delay * 1000, queue_delay > self.late_threshold)
+        taskset = user._taskset_instance
+        try:
+            taskset.execute_task(taskset.get_next_task())
+        except (RescheduleTask, RescheduleTaskImmediately, InterruptTaskSet):
+            pass
+        except (StopUser, GreenletExit):
+            raise
+        except Exception as e:
+            self.environment.events.user_error.fire(user_instance=taskset, exception=e, tb=e.__traceback__)
+            if self.environment.catch_exceptions:
+                logger.error("%s\n%s", e, traceback.format_exc())
+            else:
+                raise
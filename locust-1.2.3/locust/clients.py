@@ -1,5 +1,6 @@
 import re
 import time
+from timeit import default_timer
 
 import requests
 from requests import Request, Response
@@ -9,10 +10,19 @@ from requests.exceptions import InvalidSchema, InvalidURL, MissingSchema, Reques
 from urllib.parse import urlparse, urlunparse
 
 from .exception import CatchResponseError, ResponseError
+from .util import json_decoder
+from .util.phase_timer import PhaseTimer, current_timer, install as install_phase_timings, phase_times_kwargs
 
 absolute_http_url_regexp = re.compile(r"^https?://", re.I)
 
 
+def _on_response_headers(response, *args, **kwargs):
+    # response hooks run when the headers have been received, before the body is downloaded
+    timer = current_timer()
+    if timer is not None:
+        timer.headers_received()
+
+
 class LocustResponse(Response):
     # 抛出异常描述400~500，500~600时分别不同描述
     def raise_for_status(self):
@@ -20,6 +30,20 @@ class LocustResponse(Response):
             raise self.error
         Response.raise_for_status(self)
 
+    def json(self, **kwargs):
+        """
+        Returns the decoded JSON body of the response. It's decoded (with the decoder selected with
+        :func:`use_decoder() <locust.util.json_decoder.use_decoder>`) on the first call only, later calls
+        return the same object, so changes made to it are seen by them. Keyword arguments are passed on to
+        json.loads(), bypassing the cache.
+        返回解码后的JSON响应体。只在第一次调用时解码，之后的调用返回同一个对象。
+        """
+        if kwargs:
+            return Response.json(self, **kwargs)
+        if "_json" not in self.__dict__:
+            self._json = json_decoder.loads(self.content, self.encoding)
+        return self._json
+
 
 class HttpSession(requests.Session):
     """
@@ -50,12 +74,16 @@ class HttpSession(requests.Session):
                            and then mark it as successful even if the response code was not (i.e 500 or 404).
     """
 
-    def __init__(self, base_url, request_success, request_failure, *args, **kwargs):
+    def __init__(self, base_url, request_success, request_failure, *args, phase_timings=False, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.base_url = base_url
         self.request_success = request_success
         self.request_failure = request_failure
+        self.phase_timings = phase_timings
+        if phase_timings:
+            install_phase_timings()
+            self.hooks["response"].append(_on_response_headers)
 
         # Check for basic authentication
         # 检查基本身份验证
@@ -130,11 +158,19 @@ class HttpSession(requests.Session):
         # 设置pre_request钩子来将元数据附加到请求对象
         request_meta["method"] = method
         request_meta["start_time"] = time.monotonic()
-        # 发送请求安全模式
-        response = self._send_request_safe_mode(method, url, **kwargs)
+        phase_timer = PhaseTimer() if self.phase_timings else None
+        if phase_timer is not None:
+            with phase_timer:
+                response = self._send_request_safe_mode(method, url, **kwargs)
+        else:
+            # 发送请求安全模式
+            response = self._send_request_safe_mode(method, url, **kwargs)
 
         # record the consumed time记录消耗的时间
         request_meta["response_time"] = (time.monotonic() - request_meta["start_time"]) * 1000
+        if phase_timer is not None:
+            # unless streaming, the body has been downloaded by now
+            request_meta["phase_times"] = phase_timer.finish(None if kwargs.get("stream") else default_timer())
 
         request_meta["name"] = name or (response.history and response.history[0] or response).request.path_url
 
@@ -168,6 +204,7 @@ class HttpSession(requests.Session):
                     response_time=request_meta["response_time"],
                     response_length=request_meta["content_size"],
                     exception=e,
+                    **phase_times_kwargs(request_meta),
                 )
             else:
                 self.request_success.fire(
@@ -175,6 +212,7 @@ class HttpSession(requests.Session):
                     name=request_meta["name"],
                     response_time=request_meta["response_time"],
                     response_length=request_meta["content_size"],
+                    **phase_times_kwargs(request_meta),
                 )
             if name:
                 response.url = orig_url
@@ -188,7 +226,12 @@ class HttpSession(requests.Session):
         请求1.x中已删除安全模式。
         """
         try:
-            return super().request(method, url, **kwargs)
+            response = super().request(method, url, **kwargs)
+            # requests creates plain Responses, which get LocustResponse's cached json() this way
+            # requests创建的是普通Response，这样可以使用LocustResponse缓存的json()
+            if type(response) is Response:
+                response.__class__ = LocustResponse
+            return response
         except (MissingSchema, InvalidSchema, InvalidURL):
             raise
         except RequestException as e:
@@ -257,6 +300,7 @@ class ResponseContextManager(LocustResponse):
             name=self.locust_request_meta["name"],
             response_time=self.locust_request_meta["response_time"],
             response_length=self.locust_request_meta["content_size"],
+            **phase_times_kwargs(self.locust_request_meta),
         )
 
     def _report_failure(self, exc):  # report failure
@@ -266,6 +310,7 @@ class ResponseContextManager(LocustResponse):
             response_time=self.locust_request_meta["response_time"],
             response_length=self.locust_request_meta["content_size"],
             exception=exc,
+            **phase_times_kwargs(self.locust_request_meta),
         )
 
     def success(self):
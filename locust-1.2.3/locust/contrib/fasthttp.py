@@ -1,24 +1,27 @@
 import re
 import socket
-import json
 import json as unshadowed_json  # some methods take a named parameter called json有些方法采用名为json的命名参数
 from base64 import b64encode
+from string import Template
 from urllib.parse import urlparse, urlunparse
 from ssl import SSLError
 from timeit import default_timer
 
 from http.cookiejar import CookieJar
+from weakref import WeakKeyDictionary
 
 import gevent
 from gevent.timeout import Timeout
 from geventhttpclient._parser import HTTPParseError
-from geventhttpclient.useragent import UserAgent, CompatRequest, CompatResponse, ConnectionError
+from geventhttpclient.useragent import UserAgent, CompatRequest, CompatResponse, ConnectionError, HTTPClientPool
 from geventhttpclient.response import HTTPConnectionClosed
 
 from locust.user import User
 from locust.exception import LocustError, CatchResponseError, ResponseError
 from locust.env import Environment
+from locust.util import json_decoder
 from locust.util.deprecation import DeprecatedFastHttpLocustClass as FastHttpLocust
+from locust.util.phase_timer import PhaseTimer, install as install_phase_timings, phase_times_kwargs
 
 # Monkey patch geventhttpclient.useragent.CompatRequest so that Cookiejar works with Python >= 3.3
 # More info: https://github.com/requests/requests/pull/871
@@ -45,6 +48,11 @@ FAILURE_EXCEPTIONS = (
 )
 
 
+# environment -> {client settings: SharedClientPool} of the users that have connection_pool_size set
+# 环境 -> {客户端设置: SharedClientPool}，用于设置了connection_pool_size的用户
+_shared_client_pools = WeakKeyDictionary()
+
+
 def _construct_basic_auth_str(username, password):
     """
     Construct Authorization header value to be used in HTTP Basic Auth
@@ -94,6 +102,15 @@ class FastHttpUser(User):
     insecure: bool = True
     """Parameter passed to FastHttpSession. Default True, meaning no SSL verification."""
 
+    connection_pool_size: int = None
+    """
+    If set, the users (of classes with the same settings) in a process share a pool of at most this many
+    connections per host, instead of each user opening its own, while every user keeps its own cookies.
+    Requests wait for a free connection when they are all in use. The pool's hits, misses and waits are
+    shown in the stats.
+    如果设置，同一进程中的用户共享每个主机最多这么多个连接的连接池，而不是每个用户各自建立连接，每个用户仍有自己的cookie。
+    """
+
     abstract = True
     """Dont register this as a User class that can be run by itself"""
 
@@ -114,8 +131,25 @@ class FastHttpUser(User):
             max_redirects=self.max_redirects,
             max_retries=self.max_retries,
             insecure=self.insecure,
+            client_pool=self._shared_client_pool() if self.connection_pool_size else None,
         )
 
+    def _shared_client_pool(self):
+        pools = _shared_client_pools.setdefault(self.environment, {})
+        key = (self.connection_pool_size, self.network_timeout, self.connection_timeout, self.insecure)
+        if key not in pools:
+            pools[key] = SharedClientPool(
+                self.environment,
+                self.connection_pool_size,
+                network_timeout=self.network_timeout,
+                connection_timeout=self.connection_timeout,
+                ssl_context_factory=insecure_ssl_context_factory
+                if self.insecure
+                else gevent.ssl.create_default_context,
+                insecure=self.insecure,
+            )
+        return pools[key]
+
 
 def insecure_ssl_context_factory():
     context = gevent.ssl.create_default_context()
@@ -127,7 +161,11 @@ def insecure_ssl_context_factory():
 class FastHttpSession(object):
     auth_header = None
 
-    def __init__(self, environment: Environment, base_url: str, insecure=True, **kwargs):
+    def __init__(self, environment: Environment, base_url: str, insecure=True, client_pool=None, **kwargs):
+        """
+        :param client_pool: (optional) :class:`SharedClientPool` to take connections from, instead of the
+            session opening its own
+        """
         self.environment = environment
         self.base_url = base_url
         self.cookiejar = CookieJar()
@@ -141,6 +179,12 @@ class FastHttpSession(object):
             insecure=insecure,
             **kwargs,
         )
+        if environment.http_phase_timings:
+            install_phase_timings()
+        if client_pool is not None:
+            # the cookies stay in the session's own cookiejar, only the connections are shared
+            # cookie仍保存在会话自己的cookiejar中，只共享连接
+            self.client.clientpool = client_pool
 
         # Check for basic authentication
         parsed_url = urlparse(self.base_url)
@@ -219,16 +263,10 @@ class FastHttpSession(object):
             Another side effect of setting stream to True is that the time for downloading the response
             content will not be accounted for in the request time that is reported by Locust.
         """
+        start_time = default_timer()
         # prepend url with hostname unless it's already an absolute URL
         url = self._build_url(path)
 
-        # store meta data that is used when reporting the request to locust's statistics
-        request_meta = {}
-        # set up pre_request hook for attaching meta data to the request object
-        request_meta["method"] = method
-        request_meta["start_time"] = default_timer()
-        request_meta["name"] = name or path
-
         headers = headers or {}
         if auth:
             headers["Authorization"] = _construct_basic_auth_str(auth[0], auth[1])
@@ -244,12 +282,63 @@ class FastHttpSession(object):
             if "Accept" not in headers and "accept" not in headers:
                 headers["Accept"] = "application/json"
 
+        return self._send(
+            method, url, name or path, data, headers, catch_response, stream, allow_redirects, start_time, **kwargs
+        )
+
+    def prepare(self, method: str, path: str, name: str = None, headers: dict = None, body_template=None):
+        """
+        Prepare a request that is sent many times with only some parts changed, such as a POST of an order
+        form. The URL, headers and the static parts of the body are built and encoded once, and only the
+        variables are filled in every time the request is sent. Returns a
+        :py:class:`PreparedRequest <locust.contrib.fasthttp.PreparedRequest>`.
+        准备一个多次发送、只有部分内容不同的请求。URL、请求头和请求体的静态部分只构建和编码一次，每次发送时只填入变量。
+
+        :param path: Path (or full URL) of the request. May contain ``$variables``, like the body template.
+        :param name: (optional) Name of the request in the statistics. Defaults to *path*, with the
+            variables in it unfilled, so all the requests are grouped together.
+        :param headers: (optional) Dictionary of HTTP Headers to send with the request. The Accept-Encoding
+            and Authorization headers are added like they are by :py:meth:`request`.
+        :param body_template: (optional) String or bytes with the body of the request, in which ``$name`` or
+            ``${name}`` is replaced with the value of the variable *name* when the request is sent, and
+            ``$$`` with a ``$``. The values are inserted as they are, without any quoting, so a JSON
+            string value should be in quotes in the template: ``{"sku": "$sku", "quantity": $quantity}``.
+            If the template starts with { or [, the Content-Type and Accept headers default to
+            application/json. The names of the keyword arguments of :py:meth:`PreparedRequest.send()
+            <locust.contrib.fasthttp.PreparedRequest.send>` (name, catch_response, stream and
+            allow_redirects) can't be used as variables, in the path or the body.
+
+        Example::
+
+            self.order = self.client.prepare(
+                "POST", "/orders/$cart_id", body_template='{"sku": "$sku", "quantity": $quantity}'
+            )
+            ...
+            self.order.send(cart_id=self.cart_id, sku="A-1001", quantity=2)
+        """
+        return PreparedRequest(self, method, path, name=name, headers=headers, body_template=body_template)
+
+    def _send(self, method, url, name, data, headers, catch_response, stream, allow_redirects, start_time, **kwargs):
+        # store meta data that is used when reporting the request to locust's statistics
+        request_meta = {}
+        request_meta["method"] = method
+        request_meta["start_time"] = start_time
+        request_meta["name"] = name
+
         if not allow_redirects:
             old_redirect_response_codes = self.client.redirect_resonse_codes
             self.client.redirect_resonse_codes = []
 
-        # send request, and catch any exceptions
-        response = self._send_request_safe_mode(method, url, payload=data, headers=headers, **kwargs)
+        phase_timer = PhaseTimer() if self.environment.http_phase_timings else None
+        if phase_timer is not None:
+            with phase_timer:
+                # send request, and catch any exceptions
+                response = self._send_request_safe_mode(method, url, payload=data, headers=headers, **kwargs)
+            if response.headers is not None:
+                phase_timer.headers_received()
+        else:
+            # send request, and catch any exceptions
+            response = self._send_request_safe_mode(method, url, payload=data, headers=headers, **kwargs)
 
         if not allow_redirects:
             self.client.redirect_resonse_codes = old_redirect_response_codes
@@ -275,7 +364,10 @@ class FastHttpSession(object):
         # Record the consumed time
         # Note: This is intentionally placed after we record the content_size above, since
         # we'll then trigger fetching of the body (unless stream=True)
-        request_meta["response_time"] = int((default_timer() - request_meta["start_time"]) * 1000)
+        end_time = default_timer()
+        request_meta["response_time"] = int((end_time - request_meta["start_time"]) * 1000)
+        if phase_timer is not None:
+            request_meta["phase_times"] = phase_timer.finish(None if stream else end_time)
 
         if catch_response:
             response.locust_request_meta = request_meta
@@ -290,6 +382,7 @@ class FastHttpSession(object):
                     response_time=request_meta["response_time"],
                     response_length=request_meta["content_size"],
                     exception=e,
+                    **phase_times_kwargs(request_meta),
                 )
             else:
                 self.environment.events.request_success.fire(
@@ -297,6 +390,7 @@ class FastHttpSession(object):
                     name=request_meta["name"],
                     response_time=request_meta["response_time"],
                     response_length=request_meta["content_size"],
+                    **phase_times_kwargs(request_meta),
                 )
             return response
 
@@ -328,6 +422,119 @@ class FastHttpSession(object):
         return self.request("PUT", path, data=data, **kwargs)
 
 
+class _Template(object):
+    """
+    A string.Template style template (with $name and ${name} placeholders), split into the encoded static
+    fragments and the names of the variables between them, so that filling it in is only a join
+    拆分为已编码的静态片段和其间变量名的string.Template风格模板，填充时只需拼接
+    """
+
+    def __init__(self, template):
+        if isinstance(template, bytes):
+            template = template.decode("utf-8")
+        self.template = template
+        self.fragments = []
+        self.names = []
+        position = 0
+        literal = []
+        for match in Template.pattern.finditer(template):
+            literal.append(template[position : match.start()])
+            position = match.end()
+            if match.group("escaped") is not None:
+                literal.append("$")
+            elif match.group("invalid") is not None:
+                raise ValueError("Invalid placeholder in template %r at position %i" % (template, match.start()))
+            else:
+                self.fragments.append("".join(literal).encode("utf-8"))
+                self.names.append(match.group("named") or match.group("braced"))
+                literal = []
+        literal.append(template[position:])
+        self.fragments.append("".join(literal).encode("utf-8"))
+        self.static = not self.names
+
+    def fill(self, values):
+        if self.static:
+            return self.fragments[0]
+        parts = [self.fragments[0]]
+        for name, fragment in zip(self.names, self.fragments[1:]):
+            try:
+                value = values[name]
+            except KeyError:
+                raise KeyError("No value given for the template variable %r" % name) from None
+            if isinstance(value, bytes):
+                parts.append(value)
+            else:
+                parts.append(str(value).encode("utf-8"))
+            parts.append(fragment)
+        return b"".join(parts)
+
+
+class PreparedRequest(object):
+    """
+    A request that has been prepared with :py:meth:`FastHttpSession.prepare()
+    <locust.contrib.fasthttp.FastHttpSession.prepare>`, and can be sent many times with different values for
+    the variables of its path and body template
+    用FastHttpSession.prepare()准备好的请求，可以用不同的路径和请求体变量值多次发送
+    """
+
+    # keyword arguments of send(), which can't be used as template variables
+    # send()的关键字参数，不能用作模板变量
+    reserved_names = ("self", "name", "catch_response", "stream", "allow_redirects")
+
+    def __init__(self, session, method, path, name=None, headers=None, body_template=None):
+        self.session = session
+        self.method = method
+        self.path = path
+        self.name = name or path
+        self._url = _Template(session._build_url(path))
+        self._body = _Template(body_template) if body_template is not None else None
+        for template in (self._url, self._body):
+            reserved = template is not None and set(template.names).intersection(self.reserved_names)
+            if reserved:
+                raise ValueError(
+                    "The template variable names %s are reserved for the arguments of send(), in template %r"
+                    % (", ".join(sorted(reserved)), template.template)
+                )
+
+        headers = dict(headers or {})
+        lower_names = set(header.lower() for header in headers)
+        if "authorization" not in lower_names and session.auth_header:
+            headers["Authorization"] = session.auth_header
+        if "accept-encoding" not in lower_names:
+            headers["Accept-Encoding"] = "gzip, deflate"
+        if self._body is not None and self._body.template.lstrip()[:1] in ("{", "["):
+            if "content-type" not in lower_names:
+                headers["Content-Type"] = "application/json"
+            if "accept" not in lower_names:
+                headers["Accept"] = "application/json"
+        self.headers = headers
+
+    def send(self, name=None, catch_response=False, stream=False, allow_redirects=True, **values):
+        """
+        Send the request, with *values* filled in for the variables of the path and body template. Returns a
+        :py:class:`FastResponse <locust.contrib.fasthttp.FastResponse>`, or a
+        :py:class:`ResponseContextManager <locust.contrib.fasthttp.ResponseContextManager>` when
+        *catch_response* is set, like :py:meth:`FastHttpSession.request()
+        <locust.contrib.fasthttp.FastHttpSession.request>`.
+        """
+        start_time = default_timer()
+        url = self._url.fill(values).decode("utf-8")
+        data = self._body.fill(values) if self._body is not None else None
+        return self.session._send(
+            self.method,
+            url,
+            name or self.name,
+            data,
+            self.headers,
+            catch_response,
+            stream,
+            allow_redirects,
+            start_time,
+        )
+
+    __call__ = send
+
+
 class FastResponse(CompatResponse):
     headers = None
     """Dict like object containing the response headers"""
@@ -353,9 +560,15 @@ class FastResponse(CompatResponse):
 
     def json(self) -> dict:
         """
-        Parses the response as json and returns a dict
+        Parses the response as json and returns a dict. It's decoded (with the decoder selected with
+        :func:`use_decoder() <locust.util.json_decoder.use_decoder>`) on the first call only, later calls
+        return the same object.
         """
-        return json.loads(self.text)
+        if "_json" not in self.__dict__:
+            if self.encoding is None and self.headers is not None:
+                self.encoding = self.headers.get("content-type", "").partition("charset=")[2] or None
+            self._json = json_decoder.loads(self.content, self.encoding)
+        return self._json
 
     def raise_for_status(self):
         """Raise any connection errors that occurred during the request"""
@@ -408,6 +621,54 @@ class LocustUserAgent(UserAgent):
         return self.response_type(resp, request=request, sent_request=resp._sent_request)
 
 
+class SharedClientPool(HTTPClientPool):
+    """
+    A geventhttpclient client pool that is shared by many users, with one client per host that has a pool of
+    at most *size* connections. Logs whether each request reuses an idle connection, opens a new one, or has
+    to wait for one, to the :class:`ConnectionPoolStats <locust.stats.ConnectionPoolStats>` of the stats.
+    多个用户共享的geventhttpclient客户端池，每个主机一个客户端，最多size个连接。记录每个请求是复用空闲连接、新建连接还是需要等待。
+    """
+
+    def __init__(self, environment, size, **kwargs):
+        super().__init__(concurrency=size, **kwargs)
+        self.environment = environment
+        self.size = size
+
+    def get_client(self, url):
+        client = super().get_client(url)
+        pool = client._connection_pool
+        if not getattr(pool, "tracked", False):
+            self._track(pool)
+        return client
+
+    def _track(self, pool):
+        get_socket = pool.get_socket
+        create_socket = pool._create_socket
+        creating = set()  # the greenlets that get_socket() opened a new connection for
+
+        def tracked_create_socket():
+            creating.add(gevent.getcurrent())
+            return create_socket()
+
+        def tracked_get_socket():
+            # every connection is in use (or being opened) when the semaphore is locked
+            # 信号量被锁定时，所有连接都在使用中(或正在建立)
+            waited = pool._semaphore.locked()
+            start = default_timer()
+            try:
+                return get_socket()
+            finally:
+                current = gevent.getcurrent()
+                hit = current not in creating
+                creating.discard(current)
+                wait_time = (default_timer() - start) * 1000 if waited else None
+                self.environment.stats.connection_pool.log(hit, wait_time)
+
+        pool._create_socket = tracked_create_socket
+        pool.get_socket = tracked_get_socket
+        pool.tracked = True
+
+
 class ResponseContextManager(FastResponse):
     """
     A Response class that also acts as a context manager that provides the ability to manually
@@ -461,6 +722,7 @@ class ResponseContextManager(FastResponse):
             name=self.locust_request_meta["name"],
             response_time=self.locust_request_meta["response_time"],
             response_length=self.locust_request_meta["content_size"],
+            **phase_times_kwargs(self.locust_request_meta),
         )
 
     def _report_failure(self, exc):
@@ -470,6 +732,7 @@ class ResponseContextManager(FastResponse):
             response_time=self.locust_request_meta["response_time"],
             response_length=self.locust_request_meta["content_size"],
             exception=exc,
+            **phase_times_kwargs(self.locust_request_meta),
         )
 
     def success(self):
@@ -0,0 +1,137 @@
+import socket
+from timeit import default_timer
+
+import gevent
+from gevent.event import AsyncResult
+
+DNS_TTL = 60.0  # how long (in seconds) successful lookups are cached by default
+DNS_NEGATIVE_TTL = 5.0  # how long (in seconds) failed lookups are cached by default
+
+
+def parse_dns_override(value):
+    """
+    Parse a --dns-override value, HOST=ADDRESS, into (host, address)
+    """
+    host, sep, address = value.partition("=")
+    host, address = host.strip(), address.strip()
+    if not sep or not host or not address:
+        raise ValueError("Invalid DNS override %r, expected HOST=ADDRESS" % value)
+    return host, address
+
+
+class CachingResolver(object):
+    """
+    A gevent resolver that caches the results of getaddrinfo() for *ttl* seconds, and its failures for
+    *negative_ttl* seconds, so that load tests that open many connections (because of retries, connection
+    resets or many users) don't wait for a DNS lookup every time, and don't put load on the DNS servers.
+    Concurrent lookups of the same name are made only once. Hosts in *overrides* resolve to the given
+    addresses without any lookup, like in an /etc/hosts file.
+    一个gevent解析器，缓存getaddrinfo()的结果ttl秒、失败结果negative_ttl秒，使打开大量连接的负载测试不必每次都等待DNS查询，
+    也不会给DNS服务器带来压力。同一名称的并发查询只执行一次。overrides中的主机不经查询直接解析为指定地址，类似/etc/hosts文件。
+
+    Once installed (see :meth:`install`) it's used for every lookup in the process, by both HttpUser and
+    FastHttpUser. The other resolver methods are passed on to the resolver it was installed over. Hits,
+    misses and lookup times are logged to the :class:`DNSStats <locust.stats.DNSStats>` of the stats.
+    安装后(见install())进程中的所有查询都使用它。其他解析器方法会传给原来的解析器。命中、未命中和查询时间记录在DNSStats中。
+    """
+
+    def __init__(self, stats, ttl=DNS_TTL, negative_ttl=DNS_NEGATIVE_TTL, overrides=None, resolver=None):
+        """
+        :param stats: :class:`DNSStats <locust.stats.DNSStats>` to log the lookups to
+        :param overrides: Dict of host names and the addresses they resolve to
+        :param resolver: The resolver that lookups which aren't cached are passed on to. Defaults to the
+                         gevent hub's resolver.
+        """
+        self.stats = stats
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.overrides = dict(overrides or {})
+        self.resolver = resolver if resolver is not None else gevent.get_hub().resolver
+        self._cache = {}
+        self._pending = {}
+        self._replaced = None
+
+    def install(self):
+        """
+        Make this the resolver of the gevent hub, so that it's used for every lookup in the process
+        将其设为gevent hub的解析器，使进程中的所有查询都使用它
+        """
+        hub = gevent.get_hub()
+        if hub.resolver is not self:
+            self._replaced = hub.resolver
+            hub.resolver = self
+
+    def uninstall(self):
+        """
+        Restore the resolver that was replaced by :meth:`install`
+        """
+        hub = gevent.get_hub()
+        if hub.resolver is self:
+            hub.resolver = self._replaced
+
+    def clear(self):
+        """
+        Forget all cached lookups
+        """
+        self._cache = {}
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        if isinstance(host, bytes):
+            host = host.decode("idna")
+        if host in self.overrides:
+            self.stats.log_override()
+            # a numeric host is resolved without any lookup
+            return self.resolver.getaddrinfo(
+                self.overrides[host], port, family, type, proto, flags | socket.AI_NUMERICHOST
+            )
+        key = (host, port, family, type, proto, flags)
+        now = default_timer()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            self.stats.log_hit(isinstance(cached[1], Exception))
+            return self._result(cached[1])
+        pending = self._pending.get(key)
+        if pending is not None:
+            # another greenlet is looking the name up already, so wait for its result
+            # 其他greenlet已经在查询该名称，等待它的结果
+            self.stats.log_hit(False)
+            result = pending.get()
+            if result is None:
+                # the lookup was interrupted, so try again
+                return self.getaddrinfo(host, port, family, type, proto, flags)
+            return self._result(result)
+
+        pending = self._pending[key] = AsyncResult()
+        try:
+            try:
+                result = self.resolver.getaddrinfo(host, port, family, type, proto, flags)
+            except socket.gaierror as e:
+                result = e
+                ttl = self.negative_ttl
+            else:
+                ttl = self.ttl
+            self.stats.log_miss((default_timer() - now) * 1000, isinstance(result, Exception))
+            if ttl > 0:
+                self._cache[key] = (default_timer() + ttl, result)
+            pending.set(result)
+        except BaseException:
+            # errors that aren't about the name (e.g. a timeout) aren't cached, and the waiters try again
+            # 与名称无关的错误(例如超时)不缓存，等待者会重试
+            pending.set(None)
+            raise
+        finally:
+            del self._pending[key]
+        return self._result(result)
+
+    @staticmethod
+    def _result(result):
+        if isinstance(result, socket.gaierror):
+            # a new exception each time, so that the cached one doesn't collect tracebacks
+            raise socket.gaierror(*result.args)
+        return result
+
+    def __getattr__(self, name):
+        # gethostbyname() etc. and close() aren't cached, but passed on to the wrapped resolver
+        if name == "resolver":
+            raise AttributeError(name)
+        return getattr(self.resolver, name)
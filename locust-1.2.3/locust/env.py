@@ -1,11 +1,22 @@
-from .event import Events
+from .dns import CachingResolver, DNS_NEGATIVE_TTL
+from .event import Events, RequestEventBatcher
 from .exception import RunnerAlreadyExistsError
+from .ratelimit import RateLimiters
 from .stats import RequestStats
-from .runners import Runner, LocalRunner, MasterRunner, WorkerRunner
+from .runners import (
+    Runner,
+    LocalRunner,
+    MasterRunner,
+    WorkerRunner,
+    RelayRunner,
+    RELAY_REPORT_INTERVAL,
+    MAX_REPORT_RATE,
+)
 from .web import WebUI
 from .user import User
 from .user.task import filter_tasks_by_tags
 from .shape import LoadTestShape
+from .util import phase_timer
 from typing import List
 
 
@@ -67,6 +78,82 @@ class Environment:
     如果设置，它将是蝗虫进程的退出代码
     """
 
+    histogram_precision: int = None
+    """
+    If set, response times are stored in array backed histograms with this many significant digits
+    如果设置，响应时间将存储在具有该有效数字位数的数组直方图中
+    """
+
+    name_templater = None
+    """
+    Optional callable that collapses request names into templates (see RequestStats)
+    可选的可调用对象，将请求名称折叠成模板
+    """
+
+    max_stats_entries: int = None
+    """
+    If set, requests for new names are counted in an "Other" entry once this many stats entries exist
+    如果设置，当统计条目数达到该值后，新名称的请求将被计入"Other"条目
+    """
+
+    history_per_entry = False
+    """
+    If set, a time series of the current stats is kept for every stats entry, and not just for the total
+    如果设置，将为每个统计条目(而不仅仅是总计)保存当前统计数据的时间序列
+    """
+
+    http_phase_timings = False
+    """
+    If set, HttpUser and FastHttpUser time the DNS, connect, TLS, time to first byte and download phases of
+    every request, and the stats, CSV files and web UI show them per entry
+    如果设置，HttpUser和FastHttpUser将对每个请求的DNS、连接、TLS、首字节时间和下载阶段计时
+    """
+
+    arrival_rate: float = None
+    """
+    If set, tests are run as open model tests, where tasks are started at this rate (per second) no matter
+    how long the previous ones took, and the user count is the maximum number of users that are used
+    如果设置，测试将作为开放模型测试运行，任务以该速率(每秒)启动，用户数为最多使用的用户数
+    """
+
+    arrival_distribution = "constant"
+    """How the arrivals of open model tests are spread out in time ("constant" or "poisson")"""
+
+    arrival_ramp_time = 0
+    """Number of seconds over which the arrival rate of open model tests changes linearly when it's set"""
+
+    arrival_max_queue_time = 1.0
+    """Arrivals of open model tests that have waited this many seconds for a free user are dropped"""
+
+    dns_resolver: CachingResolver = None
+    """
+    If set, the :class:`CachingResolver <locust.dns.CachingResolver>` that is installed for all the DNS lookups
+    of the process when a runner is created
+    如果设置，创建运行器时为进程的所有DNS查询安装的CachingResolver
+    """
+
+    max_loop_lag: float = None
+    """
+    If set, spawning users is paused while the event loop is running more than this many ms late on average
+    (see :class:`LoopLagMonitor <locust.looplag.LoopLagMonitor>`), so that a process isn't given more users
+    than it can keep up with
+    如果设置，当事件循环的平均延迟超过该毫秒数时暂停生成用户，以免进程负担超出其处理能力的用户
+    """
+
+    rate_limiters: RateLimiters = None
+    """
+    Named rate limits that users can acquire tokens from, and that are enforced across the whole cluster when
+    running distributed (see :class:`RateLimiters <locust.ratelimit.RateLimiters>`)
+    用户可以从中获取令牌的命名速率限制，分布式运行时在整个集群范围内生效
+    """
+
+    request_batcher: RequestEventBatcher = None
+    """
+    If set, request_success/request_failure events are buffered and dispatched in batches by this
+    :class:`RequestEventBatcher <locust.event.RequestEventBatcher>`
+    如果设置，request_success/request_failure事件将被缓冲并由它批量分发
+    """
+
     parsed_options = None
     """Optional reference to the parsed command line options (used to pre-populate fields in Web UI)
     对已解析的命令行选项的可选引用(用于在Web UI中预填充字段)"""
@@ -83,6 +170,21 @@ class Environment:
         reset_stats=False,
         stop_timeout=None,
         catch_exceptions=True,
+        histogram_precision=None,
+        name_templater=None,
+        max_stats_entries=None,
+        history_per_entry=False,
+        request_batch_size=0,
+        request_batch_interval=0.1,
+        http_phase_timings=False,
+        arrival_rate=None,
+        arrival_distribution="constant",
+        arrival_ramp_time=0,
+        arrival_max_queue_time=1.0,
+        max_loop_lag=None,
+        dns_ttl=None,
+        dns_negative_ttl=DNS_NEGATIVE_TTL,
+        dns_overrides=None,
         parsed_options=None,
     ):
         if events:
@@ -90,11 +192,34 @@ class Environment:
         else:
             self.events = Events()
 
+        if request_batch_size > 1:
+            self.request_batcher = RequestEventBatcher(self.events, request_batch_size, request_batch_interval)
+
         self.user_classes = user_classes
         self.shape_class = shape_class
         self.tags = tags
         self.exclude_tags = exclude_tags
-        self.stats = RequestStats()
+        self.histogram_precision = histogram_precision
+        self.name_templater = name_templater
+        self.max_stats_entries = max_stats_entries
+        self.history_per_entry = history_per_entry
+        self.http_phase_timings = http_phase_timings
+        if http_phase_timings:
+            phase_timer.install()
+        self.rate_limiters = RateLimiters()
+        self.arrival_rate = arrival_rate
+        self.arrival_distribution = arrival_distribution
+        self.arrival_ramp_time = arrival_ramp_time
+        self.arrival_max_queue_time = arrival_max_queue_time
+        self.max_loop_lag = max_loop_lag
+        self.stats = self._create_stats()
+        if dns_ttl is not None or dns_overrides:
+            self.dns_resolver = CachingResolver(
+                self.stats.dns,
+                ttl=dns_ttl if dns_ttl is not None else 0,
+                negative_ttl=dns_negative_ttl if dns_ttl is not None else 0,
+                overrides=dns_overrides,
+            )
         self.host = host
         self.reset_stats = reset_stats
         self.stop_timeout = stop_timeout
@@ -103,6 +228,15 @@ class Environment:
 
         self._filter_tasks_by_tags()
 
+    def _create_stats(self, use_response_times_cache=True):
+        return RequestStats(
+            use_response_times_cache=use_response_times_cache,
+            histogram_precision=self.histogram_precision,
+            name_templater=self.name_templater,
+            max_entries=self.max_stats_entries,
+            history_per_entry=self.history_per_entry,
+        )
+
     def _create_runner(self, runner_class, *args, **kwargs):
         if self.runner is not None:
             raise RunnerAlreadyExistsError("Environment.runner already exists (%s)" % self.runner)
@@ -116,7 +250,14 @@ class Environment:
         """
         return self._create_runner(LocalRunner)
 
-    def create_master_runner(self, master_bind_host="*", master_bind_port=5557):
+    def create_master_runner(
+        self,
+        master_bind_host="*",
+        master_bind_port=5557,
+        aggregation_interval=0,
+        cpu_rebalance_interval=0,
+        max_report_rate=MAX_REPORT_RATE,
+    ):
         """
         Create a :class:`MasterRunner <locust.runners.MasterRunner>` instance for this Environment
 
@@ -124,27 +265,67 @@ class Environment:
                                  Defaults to "*" which means all interfaces.
                                  主机应该用于传入辅助连接的接口/主机。默认为“*”，表示所有接口。
         :param master_bind_port: Port that the master should listen for incoming worker connections on
+        :param aggregation_interval: If set, worker reports are merged into the stats in batches, once every
+                                     this many seconds
+        :param cpu_rebalance_interval: If set, users are moved from busy workers to idle ones (based on the
+                                       CPU usage they report) every this many seconds
+        :param max_report_rate: If set, the workers' report interval is adapted so that the master receives at
+                                most this many reports per second
         """
         return self._create_runner(
             MasterRunner,
             master_bind_host=master_bind_host,
             master_bind_port=master_bind_port,
+            aggregation_interval=aggregation_interval,
+            cpu_rebalance_interval=cpu_rebalance_interval,
+            max_report_rate=max_report_rate,
         )
 
-    def create_worker_runner(self, master_host, master_port):
+    def create_worker_runner(self, master_host, master_port, capacity=1.0):
         """
         Create a :class:`WorkerRunner <locust.runners.WorkerRunner>` instance for this Environment
 
         :param master_host: Host/IP of a running master node
         :param master_port: Port on master node to connect to
+        :param capacity: Relative capacity of the worker, that the master distributes users in proportion to
         """
         # Create a new RequestStats with use_response_times_cache set to False to save some memory
         # and CPU cycles, since the response_times_cache is not needed for Worker nodes
-        self.stats = RequestStats(use_response_times_cache=False)
+        self.stats = self._create_stats(use_response_times_cache=False)
         return self._create_runner(
             WorkerRunner,
             master_host=master_host,
             master_port=master_port,
+            capacity=capacity,
+        )
+
+    def create_relay_runner(
+        self,
+        master_host,
+        master_port,
+        relay_bind_host="*",
+        relay_bind_port=5558,
+        report_interval=RELAY_REPORT_INTERVAL,
+    ):
+        """
+        Create a :class:`RelayRunner <locust.runners.RelayRunner>` instance for this Environment
+
+        :param master_host: Host/IP of a running master node
+        :param master_port: Port on master node to connect to
+        :param relay_bind_host: Interface/host that the relay should use for incoming worker connections.
+                                Defaults to "*" which means all interfaces.
+        :param relay_bind_port: Port that the relay should listen for incoming worker connections on
+        :param report_interval: How often (in seconds) the merged report of the workers is sent to the master
+        """
+        # the response_times_cache is only needed on the master, like on the workers
+        self.stats = self._create_stats(use_response_times_cache=False)
+        return self._create_runner(
+            RelayRunner,
+            master_host=master_host,
+            master_port=master_port,
+            relay_bind_host=relay_bind_host,
+            relay_bind_port=relay_bind_port,
+            report_interval=report_interval,
         )
 
     def create_web_ui(
@@ -1,4 +1,7 @@
 import logging
+
+import gevent
+
 from . import log
 import traceback
 from .exception import StopUser, RescheduleTask, RescheduleTaskImmediately, InterruptTaskSet
@@ -52,6 +55,98 @@ class EventHook:
                 log.unhandled_greenlet_exception = True
 
 
+class BatchedRequestEventHook(EventHook):
+    """
+    Stand-in for the request_success/request_failure hooks that queues each fire() call in a
+    :class:`RequestEventBatcher`, instead of running the handlers right away. The handlers are run
+    when the batcher is flushed.
+    request_success/request_failure钩子的替代品，将每次fire()调用放入RequestEventBatcher队列中，而不是立即运行处理程序。
+    """
+
+    def __init__(self, batcher, hook, failure):
+        super().__init__()
+        self._handlers = hook._handlers
+        self.batcher = batcher
+        self.failure = failure
+
+    def fire(self, *, reverse=False, request_type, name, response_time, response_length, exception=None, **kwargs):
+        self.batcher.add(request_type, name, response_time, response_length, exception, kwargs or None)
+
+    def fire_now(self, **kwargs):
+        super().fire(**kwargs)
+
+
+class RequestEventBatcher:
+    """
+    Buffers request_success/request_failure events and dispatches them in bulk, once the buffer holds
+    *max_entries* requests or every *max_delay* seconds (when the flusher() greenlet is running).
+    缓冲request_success/request_failure事件，当缓冲区中有max_entries个请求时或每隔max_delay秒批量分发它们。
+
+    On every flush, request_batch is fired once with the whole batch, and then the handlers that are
+    registered on request_success/request_failure are called for each request in it, so existing
+    listeners keep working. Since handlers no longer run in the greenlet that made the request,
+    StopUser/RescheduleTask exceptions raised by them are logged instead of propagated.
+    每次刷新时，request_batch会对整批请求触发一次，然后为批中的每个请求调用request_success/request_failure上注册的处理程序。
+    """
+
+    def __init__(self, events, max_entries=100, max_delay=0.1):
+        self.events = events
+        self.max_entries = max_entries
+        self.max_delay = max_delay
+        self.buffer = []
+        self.request_success = events.request_success = BatchedRequestEventHook(self, events.request_success, False)
+        self.request_failure = events.request_failure = BatchedRequestEventHook(self, events.request_failure, True)
+
+    def add(self, request_type, name, response_time, response_length, exception=None, extra=None):
+        """
+        Buffer a request (with the *extra* keyword arguments of the event, if any), and flush the buffer if
+        it's full
+        缓冲一个请求，缓冲区满时刷新
+        """
+        self.buffer.append((request_type, name, response_time, response_length, exception, extra))
+        if len(self.buffer) >= self.max_entries:
+            self.flush()
+
+    def flush(self):
+        """
+        Dispatch all buffered requests and return the number of requests that were dispatched
+        分发所有缓冲的请求，并返回分发的请求数
+        """
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return 0
+        self.events.request_batch.fire(requests=batch)
+        if self.request_success._handlers or self.request_failure._handlers:
+            for request_type, name, response_time, response_length, exception, extra in batch:
+                kwargs = {
+                    "request_type": request_type,
+                    "name": name,
+                    "response_time": response_time,
+                    "response_length": response_length,
+                }
+                if extra:
+                    kwargs.update(extra)
+                try:
+                    if exception is None:
+                        self.request_success.fire_now(**kwargs)
+                    else:
+                        self.request_failure.fire_now(exception=exception, **kwargs)
+                except (StopUser, RescheduleTask, RescheduleTaskImmediately, InterruptTaskSet) as e:
+                    logging.error(
+                        "%s raised by a request event handler is ignored when request events are batched",
+                        e.__class__.__name__,
+                    )
+        return len(batch)
+
+    def flusher(self):
+        """
+        Flush the buffer every max_delay seconds. Meant to be run in its own greenlet.
+        """
+        while True:
+            gevent.sleep(self.max_delay)
+            self.flush()
+
+
 class Events:
     request_success = EventHook
     """
@@ -82,6 +177,20 @@ class Events:
     :param exception: Exception instance that was thrown被抛出的异常实例
     """
 
+    request_batch = EventHook
+    """
+    Fired with a batch of requests when request events are batched (see :class:`RequestEventBatcher`).
+    The request_success and request_failure handlers are still called for each request in the batch,
+    after this event.
+    当请求事件被批量处理时，对一批请求触发一次。
+
+    Event arguments:
+
+    :param requests: List of (request_type, name, response_time, response_length, exception, extra) tuples,
+                     where exception is None for successful requests and extra holds any additional keyword
+                     arguments that the event was fired with (or None)
+    """
+
     user_error = EventHook
     """
     Fired when an exception occurs inside the execution of a User class.
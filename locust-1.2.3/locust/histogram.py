@@ -0,0 +1,210 @@
+import functools
+import math
+from array import array
+from collections.abc import Mapping
+from operator import add
+
+
+DEFAULT_SIGNIFICANT_DIGITS = 2
+"""
+Default number of significant digits kept for each response time. Below 100 seconds two digits match
+the rounding that StatsEntry used before (147 becomes 150, 3432 becomes 3400 and 58760 becomes 59000),
+but above that it was rounded to whole seconds, which two digits are coarser than (123456 becomes
+120000 and not 123000).
+每个响应时间保留的默认有效数字位数。100秒以下两位与StatsEntry以前的舍入方式一致，但以上以前舍入到整秒，两位比那更粗
+"""
+
+DEFAULT_HIGHEST_TRACKABLE_VALUE = 3600 * 1000
+"""
+Highest response time (in ms) that gets its own bucket. Larger values are counted in the last bucket.
+拥有独立桶的最大响应时间(毫秒)，更大的值计入最后一个桶
+"""
+
+
+def round_response_time(response_time, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+    """
+    Round a response time so that only *significant_digits* digits are kept, e.g. 147 => 150
+    with two significant digits. Values below 10 ** significant_digits are rounded to integers.
+    将响应时间舍入为只保留significant_digits位有效数字
+    """
+    if response_time < 10 ** significant_digits:
+        return round(response_time)
+    magnitude = int(math.log10(response_time))
+    return round(response_time, significant_digits - 1 - magnitude)
+
+
+@functools.lru_cache(maxsize=None)
+def get_bucket_values(significant_digits, highest_trackable_value=DEFAULT_HIGHEST_TRACKABLE_VALUE):
+    """
+    Return a tuple with the (lower bound) value of every bucket in the log-linear layout.
+
+    The first 10 ** significant_digits buckets hold exact integer values, and every decade above
+    that is split into 9 * 10 ** (significant_digits - 1) equally wide buckets. The layout is
+    shared by all histograms with the same parameters, so it's only computed once.
+    返回对数线性布局中每个桶的值，相同参数的直方图共享同一个布局
+    """
+    values = list(range(10 ** significant_digits))
+    magnitude = significant_digits
+    while 10 ** magnitude <= highest_trackable_value:
+        unit = 10 ** (magnitude - significant_digits + 1)
+        values.extend(i * unit for i in range(10 ** (significant_digits - 1), 10 ** significant_digits))
+        magnitude += 1
+    return tuple(values)
+
+
+def bucket_index(response_time, significant_digits, last_index):
+    """
+    Return the index of the bucket that *response_time* is counted in, for a layout with
+    *significant_digits* and *last_index* + 1 buckets
+    返回response_time所在桶的索引
+    """
+    if response_time <= 0:
+        return 0
+    rounded = int(round_response_time(response_time, significant_digits))
+    if rounded < 10 ** significant_digits:
+        return rounded
+    magnitude = len(str(rounded)) - 1
+    index = (
+        10 ** significant_digits
+        + (magnitude - significant_digits) * 9 * 10 ** (significant_digits - 1)
+        + rounded // 10 ** (magnitude - significant_digits + 1)
+        - 10 ** (significant_digits - 1)
+    )
+    return min(index, last_index)
+
+
+class ResponseTimeHistogram(Mapping):
+    """
+    Log-linear response time histogram backed by a preallocated array of counters.
+    由预分配计数器数组支持的对数线性响应时间直方图
+
+    It's a drop-in replacement for the {response_time => count} dict that StatsEntry.response_times
+    has traditionally been. Recording a sample is a constant time array increment, percentile
+    queries walk the buckets once (no sorting), and merging two histograms is a vector add.
+    它可以直接替换StatsEntry.response_times的{response_time => count}字典。
+    记录一个样本是常数时间的数组递增，百分位数查询只遍历一次桶(无需排序)，合并两个直方图是向量相加。
+
+    Iterating over the histogram (or calling keys()/items()) only yields buckets with a non-zero
+    count, in ascending order.
+    """
+
+    def __init__(
+        self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS, highest_trackable_value=DEFAULT_HIGHEST_TRACKABLE_VALUE
+    ):
+        if significant_digits < 1:
+            raise ValueError("significant_digits must be at least 1")
+        self.significant_digits = significant_digits
+        self.highest_trackable_value = highest_trackable_value
+        self.bucket_values = get_bucket_values(significant_digits, highest_trackable_value)
+        self.counts = array("q", bytes(8 * len(self.bucket_values)))
+        self.total_count = 0
+
+    def index_of(self, response_time):
+        """
+        Return the index of the bucket that *response_time* is counted in
+        返回response_time所在桶的索引
+        """
+        return bucket_index(response_time, self.significant_digits, len(self.bucket_values) - 1)
+
+    def add(self, response_time, count=1):
+        """
+        Count *response_time* and return the index of the bucket it was counted in
+        """
+        index = self.index_of(response_time)
+        self.counts[index] += count
+        self.total_count += count
+        return index
+
+    def merge(self, other):
+        """
+        Add the counts from *other* to this histogram. *other* can either be a histogram with the same
+        layout (merged with a vector add) or any {response_time => count} mapping.
+        将other的计数加到此直方图中
+        """
+        if isinstance(other, ResponseTimeHistogram) and other.bucket_values is self.bucket_values:
+            self.counts = array("q", map(add, self.counts, other.counts))
+            self.total_count += other.total_count
+        else:
+            for response_time, count in other.items():
+                self.add(response_time, count)
+
+    def subtract(self, other):
+        """
+        Return a new histogram with the counts in *other* (a histogram with the same layout) removed
+        返回一个减去other计数后的新直方图
+        """
+        result = self.__class__(self.significant_digits, self.highest_trackable_value)
+        result.counts = array("q", [a - b for a, b in zip(self.counts, other.counts)])
+        result.total_count = self.total_count - other.total_count
+        return result
+
+    def percentile(self, num_requests, percent):
+        """
+        Get the response time that *percent* (0.0 - 1.0) of *num_requests* requests finished within.
+        Same semantics as stats.calculate_response_time_percentile, but in O(buckets) without sorting.
+        得到num_requests个请求中percent比例的请求在多少响应时间内完成
+        """
+        num_of_request = int(num_requests * percent)
+        processed_count = 0
+        counts = self.counts
+        for i in range(len(counts) - 1, -1, -1):
+            if counts[i]:
+                processed_count += counts[i]
+                if num_requests - processed_count <= num_of_request:
+                    return self.bucket_values[i]
+        return 0
+
+    def median(self, total):
+        """
+        Same semantics as stats.median_from_dict
+        """
+        pos = (total - 1) / 2
+        counts = self.counts
+        for i in range(len(counts)):
+            if pos < counts[i]:
+                return self.bucket_values[i]
+            pos -= counts[i]
+
+    def to_dict(self):
+        """
+        Return a sparse {response_time => count} dict, which is what gets sent over the wire
+        返回稀疏的{response_time => count}字典，用于网络传输
+        """
+        values = self.bucket_values
+        return {values[i]: count for i, count in enumerate(self.counts) if count}
+
+    @classmethod
+    def from_dict(
+        cls,
+        data,
+        significant_digits=DEFAULT_SIGNIFICANT_DIGITS,
+        highest_trackable_value=DEFAULT_HIGHEST_TRACKABLE_VALUE,
+    ):
+        histogram = cls(significant_digits, highest_trackable_value)
+        histogram.merge(data)
+        return histogram
+
+    def __copy__(self):
+        histogram = self.__class__(self.significant_digits, self.highest_trackable_value)
+        histogram.counts = array("q", self.counts)
+        histogram.total_count = self.total_count
+        return histogram
+
+    def __getitem__(self, response_time):
+        count = self.counts[self.index_of(response_time)]
+        if not count:
+            raise KeyError(response_time)
+        return count
+
+    def __iter__(self):
+        values = self.bucket_values
+        return (values[i] for i, count in enumerate(self.counts) if count)
+
+    def __len__(self):
+        return len(self.counts) - self.counts.count(0)
+
+    def __bool__(self):
+        return self.total_count != 0
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.to_dict())
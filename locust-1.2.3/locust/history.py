@@ -0,0 +1,117 @@
+from collections import deque
+from itertools import chain
+
+
+DEFAULT_TIERS = ((1, 720), (12, 720), (120, 720))
+"""
+Resolution (in recorded points) and capacity of each tier of a TimeSeries. With the default history
+interval of 5 seconds this keeps full resolution for the last hour, one minute averages for the
+12 hours before that and ten minute averages for the 5 days before that.
+TimeSeries每一层的分辨率(以记录点数计)和容量
+"""
+
+NON_NUMERIC_KEYS = ("time", "timestamp", "samples", "min", "max")
+
+
+def downsample(points):
+    """
+    Combine a list of points into one point. Numeric values are averaged (weighted by the number of samples
+    each point represents), and their min/max values are stored in the "min" and "max" dicts of the new point.
+    将多个点合并成一个点，数值取(按样本数加权的)平均值，最小值和最大值保存在新点的"min"和"max"字典中
+    """
+    first = points[0]
+    samples = sum(point.get("samples", 1) for point in points)
+    result = {"time": first.get("time"), "timestamp": first.get("timestamp"), "samples": samples}
+    minimums = result["min"] = {}
+    maximums = result["max"] = {}
+    for key, value in first.items():
+        if key in NON_NUMERIC_KEYS or not isinstance(value, (int, float)):
+            continue
+        result[key] = sum(point[key] * point.get("samples", 1) for point in points) / samples
+        minimums[key] = min(point.get("min", {}).get(key, point[key]) for point in points)
+        maximums[key] = max(point.get("max", {}).get(key, point[key]) for point in points)
+    return result
+
+
+class TimeSeries(object):
+    """
+    Time series with a fixed memory footprint. Recent points are kept at full resolution, and as
+    they get older they're downsampled into tiers with a progressively lower resolution that keep
+    the average, min and max of every value. Points that fall out of the last tier are dropped.
+    固定内存占用的时间序列。最近的点保持完整分辨率，较旧的点被降采样到分辨率逐渐降低的层中(保留平均值、最小值和最大值)。
+    超出最后一层的点将被丢弃。
+
+    Iterating over the series yields the points from oldest to newest.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        """
+        :param tiers: List of (resolution, capacity) tuples. The resolution is the number of recorded points
+                      that each point in the tier represents, and must be a multiple of the previous tier's.
+        """
+        for (resolution, _), (next_resolution, _) in zip(tiers, tiers[1:]):
+            if next_resolution % resolution or next_resolution <= resolution:
+                raise ValueError("The resolution of each tier must be a multiple of the previous tier's")
+        self.tiers = tiers
+        self.levels = [deque() for _ in tiers]
+
+    def append(self, point):
+        self._push(0, point)
+
+    def _push(self, level, point):
+        points = self.levels[level]
+        points.append(point)
+        resolution, capacity = self.tiers[level]
+        if len(points) <= capacity:
+            return
+        if level + 1 == len(self.tiers):
+            points.popleft()
+            return
+        factor = self.tiers[level + 1][0] // resolution
+        self._push(level + 1, downsample([points.popleft() for _ in range(min(factor, len(points)))]))
+
+    def clear(self):
+        for points in self.levels:
+            points.clear()
+
+    def __iter__(self):
+        return chain(*reversed(self.levels))
+
+    def __len__(self):
+        return sum(len(points) for points in self.levels)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+
+class StatsHistory(TimeSeries):
+    """
+    Time series of the total stats (used for the charts in the HTML report), and optionally one
+    series per stats entry
+    总体统计数据的时间序列(用于HTML报告中的图表)，以及可选的每个统计条目的时间序列
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, per_entry=False):
+        """
+        :param per_entry: Whether to keep a series for every (name, method) as well
+        """
+        super().__init__(tiers)
+        self.per_entry = per_entry
+        self.entries = {}
+
+    def append(self, point, entry_points=None):
+        """
+        Append a point for the total and, if per_entry is set, the points in the {(name, method) => point}
+        dict *entry_points*
+        """
+        super().append(point)
+        if self.per_entry and entry_points:
+            for key, entry_point in entry_points.items():
+                series = self.entries.get(key)
+                if series is None:
+                    series = self.entries[key] = TimeSeries(self.tiers)
+                series.append(entry_point)
+
+    def clear(self):
+        super().clear()
+        self.entries = {}
@@ -0,0 +1,116 @@
+import logging
+from timeit import default_timer
+
+import gevent
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = 0.1  # how often (in seconds) the monitor's timer is meant to fire
+LOOP_LAG_WINDOW = 1.0  # the metrics are averaged over windows of this many seconds (the heartbeat interval)
+LOOP_LAG_WARNING_THRESHOLD = 100  # warn (once) when the average loop lag of a window exceeds this many ms
+
+
+def runnable_greenlets():
+    """
+    The number of greenlets (and other callbacks) that are ready to run and waiting for their turn in the
+    gevent hub
+    在gevent hub中已就绪、等待运行的greenlet(以及其他回调)的数量
+    """
+    loop = gevent.get_hub().loop
+    try:
+        callbacks = len(loop._callbacks)
+    except (AttributeError, TypeError):
+        callbacks = 0
+    return callbacks + getattr(loop, "pendingcnt", 0)
+
+
+class LoopLagMonitor(object):
+    """
+    Measures how busy the gevent event loop is. A timer is set to fire every LOOP_LAG_INTERVAL seconds, and
+    the time it fires late (the loop lag) shows how long greenlets that are ready to run have to wait for
+    their turn, which is added to the response times that users measure. It also samples the number of
+    runnable greenlets, and the runner adds the time spent in its stats hooks (see :meth:`track_hook`).
+    测量gevent事件循环的繁忙程度。定时器每LOOP_LAG_INTERVAL秒触发一次，它触发延迟的时间(循环延迟)表示就绪的greenlet
+    需要等待多久才能运行，这段时间会被计入用户测得的响应时间。同时还采样可运行的greenlet数量，以及统计钩子所花的时间。
+
+    The metrics of the last LOOP_LAG_WINDOW seconds are in :attr:`lag`, :attr:`max_lag`, :attr:`runnable`
+    and :attr:`stats_hook_usage`, and can be used to throttle the load (see :meth:`wait_for_lag_below`).
+    最近LOOP_LAG_WINDOW秒的指标保存在lag、max_lag、runnable和stats_hook_usage中，可用于限制负载。
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, window=LOOP_LAG_WINDOW):
+        self.interval = interval
+        self.window = window
+        self.lag = 0.0
+        """Average loop lag (in ms) of the last window"""
+        self.max_lag = 0.0
+        """Maximum loop lag (in ms) of the last window"""
+        self.peak_lag = 0.0
+        """Maximum loop lag (in ms) since the monitor was started"""
+        self.runnable = 0.0
+        """Average number of runnable greenlets in the last window"""
+        self.stats_hook_usage = 0.0
+        """Percentage of the last window spent in the stats hooks"""
+        self.hook_time = 0.0
+        self.warning_emitted = False
+
+    def track_hook(self, start):
+        """
+        Add the time since *start* (a default_timer() value) to the time spent in the stats hooks
+        """
+        self.hook_time += default_timer() - start
+
+    def run(self):
+        window_start = default_timer()
+        lags = []
+        runnable = []
+        while True:
+            expected = default_timer() + self.interval
+            gevent.sleep(self.interval)
+            now = default_timer()
+            lags.append(max(0.0, now - expected) * 1000)
+            runnable.append(runnable_greenlets())
+            if now - window_start >= self.window:
+                self._end_window(now - window_start, lags, runnable)
+                window_start = now
+                lags = []
+                runnable = []
+
+    def _end_window(self, duration, lags, runnable):
+        self.lag = sum(lags) / len(lags)
+        self.max_lag = max(lags)
+        self.peak_lag = max(self.peak_lag, self.max_lag)
+        self.runnable = sum(runnable) / len(runnable)
+        self.stats_hook_usage = 100.0 * self.hook_time / duration
+        self.hook_time = 0.0
+        if self.lag > LOOP_LAG_WARNING_THRESHOLD and not self.warning_emitted:
+            logger.warning(
+                "The event loop is running %.0f ms late on average! Response times include this delay, so they "
+                "may be inflated. Consider running fewer users per process." % self.lag
+            )
+            self.warning_emitted = True
+
+    def wait_for_lag_below(self, max_lag, timeout=None):
+        """
+        Sleep until the average loop lag of a window is below *max_lag* ms (or for at most *timeout* seconds).
+        Returns right away if it already is.
+        睡眠直到某个窗口的平均循环延迟低于max_lag毫秒(最多timeout秒)。
+        """
+        deadline = None if timeout is None else default_timer() + timeout
+        while self.lag >= max_lag:
+            if deadline is not None and default_timer() >= deadline:
+                return False
+            gevent.sleep(self.window)
+        return True
+
+    def snapshot(self):
+        """
+        The metrics of the last window, as sent to the master with the heartbeats
+        """
+        return {
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "peak_lag": self.peak_lag,
+            "runnable": self.runnable,
+            "stats_hook_usage": self.stats_hook_usage,
+        }
@@ -18,9 +18,15 @@ from .log import setup_logging, greenlet_exception_logger
 from . import stats
 from .stats import print_error_report, print_percentile_stats, print_stats, stats_printer, stats_history
 from .stats import StatsCSV, StatsCSVFileWriter
+from .dns import parse_dns_override
+from .processes import WorkerProcesses
+from .ratelimit import parse_rate_limit
+from .samples import SampleRecorder
 from .user import User
 from .user.inspectuser import get_task_ratio_dict, print_task_ratio
+from .util import json_decoder
 from .util.timespan import parse_timespan
+from .util.name_template import NameTemplater, parse_rule
 from .exception import AuthCredentialsError
 from .shape import LoadTestShape
 
@@ -128,6 +134,16 @@ def load_locustfile(path):
     #  imported.__doc__ = """云商搜索商品，直接购买，自购，提交订单，钱包支付全流程场景\n……"""
 
 
+def create_name_templater(options):
+    """
+    Create a NameTemplater from options, or return None if request names shouldn't be templated
+    从选项创建一个NameTemplater，如果不需要模板化请求名称则返回None
+    """
+    if not (options.templatize_names or options.name_template_rule):
+        return None
+    return NameTemplater(rules=[parse_rule(rule) for rule in options.name_template_rule])
+
+
 def create_environment(user_classes, options, events=None, shape_class=None):
     """
     Create an Environment instance from options
@@ -143,6 +159,21 @@ def create_environment(user_classes, options, events=None, shape_class=None):
         reset_stats=options.reset_stats,
         step_load=options.step_load,
         stop_timeout=options.stop_timeout,
+        histogram_precision=options.histogram_precision,
+        name_templater=create_name_templater(options),
+        max_stats_entries=options.max_stats_entries,
+        history_per_entry=options.history_per_entry,
+        request_batch_size=options.request_batch_size,
+        request_batch_interval=options.request_batch_interval / 1000.0,
+        http_phase_timings=options.http_phase_timings,
+        arrival_rate=options.arrival_rate,
+        arrival_distribution=options.arrival_distribution,
+        arrival_ramp_time=options.arrival_ramp_time,
+        arrival_max_queue_time=options.arrival_max_queue_time,
+        max_loop_lag=options.max_loop_lag,
+        dns_ttl=options.dns_ttl,
+        dns_negative_ttl=options.dns_negative_ttl,
+        dns_overrides=dict(parse_dns_override(value) for value in options.dns_override),
         parsed_options=options,
     )
 
@@ -228,10 +259,30 @@ def main():
             )
             # 系统打开文件限制设置不够高，无法进行负载测试，并且操作系统不允许locust自己增加它
 
+    try:
+        json_decoder.use_decoder(options.json_decoder)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    for dns_override in options.dns_override:
+        try:
+            parse_dns_override(dns_override)
+        except ValueError as e:
+            logger.error("Invalid --dns-override: %s" % e)
+            sys.exit(1)
+
     # create locust Environment
     # 创造蝗虫的环境
     environment = create_environment(user_classes, options, events=locust.events, shape_class=shape_class)
 
+    for rate_limit in options.rate_limit:
+        try:
+            environment.rate_limiters.set_limit(*parse_rate_limit(rate_limit))
+        except ValueError as e:
+            logger.error("Invalid --rate-limit: %s" % e)
+            sys.exit(1)
+
     if shape_class and (options.num_users or options.spawn_rate or options.step_load):
         logger.error(
             "The specified locustfile contains a shape class but a conflicting argument was specified: users, spawn-rate or step-load"
@@ -264,7 +315,7 @@ def main():
             # --step-time参数只能与--step-load一起使用
             logger.error("The --step-time argument can only be used together with --step-load")
             sys.exit(1)
-        if options.worker:
+        if options.worker or options.relay:
             # --step-time应该在主节点上指定，而不是在工作节点上
             logger.error("--step-time should be specified on the master node, and not on worker nodes")
             sys.exit(1)
@@ -274,22 +325,78 @@ def main():
             # 有效的步长时间格式为:20,20s, 3m, 2h, 1h20m, 3h30m10s等
             logger.error("Valid --step-time formats are: 20, 20s, 3m, 2h, 1h20m, 3h30m10s, etc.")
             sys.exit(1)
+    if options.relay and (options.master or options.worker):
+        logger.error("--relay can't be combined with --master or --worker")
+        sys.exit(1)
+    worker_processes = None
+    if options.processes:
+        if options.master or options.worker or options.relay:
+            logger.error("--processes can't be combined with --master, --worker or --relay")
+            sys.exit(1)
+        try:
+            worker_processes = WorkerProcesses(options.processes, cpu_affinity=options.cpu_affinity)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        if worker_processes.fork():
+            # the forked worker processes, the options that only apply to the master are left to it
+            # fork出的worker进程，只适用于master的选项留给master处理
+            options.worker = True
+            options.master_host = worker_processes.endpoint
+            options.run_time = None
+            options.csv_prefix = None
+            options.print_stats = False
+        else:
+            options.master = True
+            options.master_bind_host = worker_processes.endpoint
+            options.expect_workers = worker_processes.count
     # 创建master,worker或者local进程
     if options.master:
         runner = environment.create_master_runner(
             master_bind_host=options.master_bind_host,
             master_bind_port=options.master_bind_port,
+            aggregation_interval=options.master_aggregation_interval,
+            cpu_rebalance_interval=options.cpu_rebalance_interval,
+            max_report_rate=options.max_report_rate,
         )
     elif options.worker:
         try:
-            runner = environment.create_worker_runner(options.master_host, options.master_port)
+            runner = environment.create_worker_runner(
+                options.master_host, options.master_port, capacity=options.worker_capacity
+            )
         except socket.error as e:
             # 无法连接到Locust主机
             logger.error("Failed to connect to the Locust master: %s", e)
             sys.exit(-1)
+    elif options.relay:
+        try:
+            runner = environment.create_relay_runner(
+                options.master_host,
+                options.master_port,
+                relay_bind_host=options.relay_bind_host,
+                relay_bind_port=options.relay_bind_port,
+                report_interval=options.relay_report_interval,
+            )
+        except socket.error as e:
+            logger.error("Failed to connect to the Locust master: %s", e)
+            sys.exit(-1)
     else:
         runner = environment.create_local_runner()
 
+    if worker_processes is not None and worker_processes.is_worker:
+        worker_processes.watch_master(runner.quit)
+
+    if options.sample_log and not options.master and not options.relay:
+        prefix = options.sample_log
+        if options.worker:
+            prefix += "_" + runner.client_id
+        SampleRecorder(
+            environment,
+            prefix,
+            segment_size=options.sample_log_segment_size * 1024 * 1024,
+            max_segments=options.sample_log_max_segments,
+        )
+
     # main_greenlet is pointing to runners.greenlet by default, it will point the web greenlet later if in web mode
     # 主main_greenlet指向runners.greenlet。默认情况下，如果在web模式下，它将指向web Greenlet
     main_greenlet = runner.greenlet
@@ -299,7 +406,7 @@ def main():
             # --run-time参数只能与--headless一起使用
             logger.error("The --run-time argument can only be used together with --headless")
             sys.exit(1)
-        if options.worker:
+        if options.worker or options.relay:
             # --run-time应该在主节点上指定，而不是在工作节点上
             logger.error("--run-time should be specified on the master node, and not on worker nodes")
             sys.exit(1)
@@ -323,14 +430,19 @@ def main():
 
     if options.csv_prefix:
         stats_csv_writer = StatsCSVFileWriter(
-            environment, stats.PERCENTILES_TO_REPORT, options.csv_prefix, options.stats_history_enabled
+            environment,
+            stats.PERCENTILES_TO_REPORT,
+            options.csv_prefix,
+            options.stats_history_enabled,
+            incremental=options.csv_incremental,
+            history_format=options.csv_history_format,
         )
     else:
         stats_csv_writer = StatsCSV(environment, stats.PERCENTILES_TO_REPORT)
 
     # start Web UI
     # 启动Web UI
-    if not options.headless and not options.worker:
+    if not options.headless and not options.worker and not options.relay:
         # spawn web greenlet
         # 产生网络一种绿色小鸟
         protocol = "https" if options.tls_cert and options.tls_key else "http"
@@ -386,7 +498,7 @@ def main():
                     options.expect_workers,
                 )
                 time.sleep(1)
-        if not options.worker:
+        if not options.worker and not options.relay:
             # apply headless mode defaults
             # 应用无头模式默认值
             if options.num_users is None:
@@ -409,14 +521,18 @@ def main():
         spawn_run_time_limit_greenlet()
 
     stats_printer_greenlet = None
-    if not options.only_summary and (options.print_stats or (options.headless and not options.worker)):
+    if not options.only_summary and (
+        options.print_stats or (options.headless and not options.worker and not options.relay)
+    ):
         # spawn stats printing greenlet
         # 刷出统计打印绿色
         stats_printer_greenlet = gevent.spawn(stats_printer(runner.stats))
         stats_printer_greenlet.link_exception(greenlet_exception_handler)
 
+    stats_csv_writer_greenlet = None
     if options.csv_prefix:
-        gevent.spawn(stats_csv_writer.stats_writer).link_exception(greenlet_exception_handler)
+        stats_csv_writer_greenlet = gevent.spawn(stats_csv_writer.stats_writer)
+        stats_csv_writer_greenlet.link_exception(greenlet_exception_handler)
 
     gevent.spawn(stats_history, runner)
 
@@ -446,11 +562,20 @@ def main():
         logger.info("Cleaning up runner...")
         if runner is not None:
             runner.quit()
+        if worker_processes is not None:
+            worker_processes.stop()
+
+        if stats_csv_writer_greenlet is not None:
+            stats_csv_writer_greenlet.kill()
+            stats_csv_writer.close_files()
 
-        print_stats(runner.stats, current=False)
-        print_percentile_stats(runner.stats)
+        if worker_processes is None or not worker_processes.is_worker:
+            # the master of the worker processes prints the summary for all of them
+            # worker进程的master为所有进程打印汇总
+            print_stats(runner.stats, current=False)
+            print_percentile_stats(runner.stats)
 
-        print_error_report(runner.stats)
+            print_error_report(runner.stats)
 
         sys.exit(code)
 
@@ -0,0 +1,132 @@
+import logging
+import os
+import shutil
+import signal
+import tempfile
+from timeit import default_timer
+
+import gevent
+import psutil
+
+from .log import greenlet_exception_logger
+
+logger = logging.getLogger(__name__)
+greenlet_exception_handler = greenlet_exception_logger(logger)
+
+SHUTDOWN_TIMEOUT = 10  # seconds the master waits for its worker processes to exit before killing them
+PARENT_CHECK_INTERVAL = 1  # how often (in seconds) the worker processes check that the master is still running
+
+
+class WorkerProcesses(object):
+    """
+    Runs a load test on several cores of one machine (--processes): the locust process forks *count* worker
+    processes, which share the already imported locustfile with it (copy-on-write), and then carries on as
+    the master. The workers connect to the master over an ipc:// socket in a temporary directory, rather
+    than over TCP.
+    在一台机器的多个核上运行负载测试: locust进程fork出count个worker进程(与它共享已导入的locustfile，写时复制)，
+    然后自己作为master继续运行。worker通过临时目录中的ipc://套接字连接master，而不是TCP。
+
+    The master quits its workers when it quits (see :meth:`stop`), and workers quit when their master
+    process goes away.
+    master退出时会让它的worker退出，worker在master进程消失时也会退出。
+    """
+
+    def __init__(self, count, cpu_affinity=False):
+        """
+        :param count: Number of worker processes to fork (-1 for one per CPU core)
+        :param cpu_affinity: Pin each worker process to one CPU core (round robin)
+        """
+        if not hasattr(os, "fork"):
+            raise ValueError("Running multiple processes requires os.fork(), which isn't available on this platform")
+        if count == -1:
+            count = psutil.cpu_count()
+        if count < 1:
+            raise ValueError("The number of processes must be at least 1 (or -1 for one per CPU core)")
+        self.count = count
+        self.cpu_affinity = cpu_affinity
+        self.pids = []
+        self.index = None
+        self.master_pid = os.getpid()
+        self.directory = tempfile.mkdtemp(prefix="locust-")
+        self.endpoint = "ipc://" + os.path.join(self.directory, "master.ipc")
+
+    @property
+    def is_worker(self):
+        return self.index is not None
+
+    def fork(self):
+        """
+        Fork the worker processes. Returns True in the worker processes and False in the master.
+        fork出worker进程。在worker进程中返回True，在master中返回False。
+        """
+        cpus = self._cpus() if self.cpu_affinity else None
+        for index in range(self.count):
+            pid = os.fork()
+            if pid == 0:
+                self.index = index
+                self.pids = []
+                if cpus:
+                    self._set_affinity(cpus[index % len(cpus)])
+                return True
+            self.pids.append(pid)
+        logger.info("Started %i worker processes: %s", self.count, ", ".join(str(pid) for pid in self.pids))
+        return False
+
+    def watch_master(self, on_orphaned):
+        """
+        Call *on_orphaned* (e.g. runner.quit) when the master process exits without quitting the workers,
+        for example when it's killed (called in the worker processes)
+        """
+
+        def watch():
+            while os.getppid() == self.master_pid:
+                gevent.sleep(PARENT_CHECK_INTERVAL)
+            logger.error("The master process (%s) is gone, quitting", self.master_pid)
+            on_orphaned()
+
+        gevent.spawn(watch).link_exception(greenlet_exception_handler)
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Wait up to *timeout* seconds for the worker processes to exit (once the runner has sent them the quit
+        message), kill the ones that haven't, and remove the ipc socket (called in the master process)
+        等待worker进程退出(runner发送quit消息之后)，最多timeout秒，然后杀死还没退出的进程，并删除ipc套接字
+        """
+        if self.is_worker:
+            return
+        deadline = default_timer() + timeout
+        while self.pids and default_timer() < deadline:
+            self._reap()
+            if self.pids:
+                gevent.sleep(0.1)
+        for pid in self.pids:
+            logger.warning("Worker process %s didn't exit within %s seconds, killing it", pid, timeout)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self.pids = []
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _reap(self):
+        for pid in list(self.pids):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.pids.remove(pid)
+
+    def _cpus(self):
+        try:
+            return sorted(psutil.Process().cpu_affinity())
+        except AttributeError:
+            logger.warning("Setting the CPU affinity isn't supported on this platform, ignoring --cpu-affinity")
+            return None
+
+    def _set_affinity(self, cpu):
+        try:
+            psutil.Process().cpu_affinity([cpu])
+        except (psutil.Error, OSError) as e:
+            logger.warning("Failed to pin worker process %s to CPU %s: %s", os.getpid(), cpu, e)
@@ -0,0 +1,231 @@
+from timeit import default_timer
+
+from gevent.event import Event
+
+from .util.rounding import distribute
+
+LEASE_INTERVAL = 0.5  # how often (in seconds) the master leases tokens to the workers
+
+
+class RateLimiter(object):
+    """
+    A token bucket that limits how often something (e.g. requests to an endpoint) may happen, across all
+    users. Users call acquire() before doing it, which is cheap: it only takes a token from the local bucket.
+    一个令牌桶，限制所有用户执行某件事(例如请求某个接口)的频率。用户在执行前调用acquire()，它只从本地桶中取令牌。
+
+    When running locally the bucket is refilled at *rate* tokens per second. When running distributed, the
+    rate is the total for the whole cluster, and the workers' buckets are only filled by the token budgets
+    that the master leases to them (see :class:`RateLimiters`).
+    本地运行时，桶以每秒rate个令牌的速度填充。分布式运行时，rate是整个集群的总速率，worker的桶只由master租借的令牌填充。
+    """
+
+    def __init__(self, name, rate, burst=None):
+        """
+        :param name: Name of the limit
+        :param rate: Number of tokens per second
+        :param burst: Maximum number of tokens that can be saved up (defaults to LEASE_INTERVAL seconds worth,
+                      and at least 1)
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate * LEASE_INTERVAL)
+        self.leased = False
+        self.tokens = self.burst
+        self.consumed = 0
+        self.waiting = 0
+        self._last_refill = default_timer()
+        self._refilled = Event()
+
+    def acquire(self, tokens=1, block=True, timeout=None):
+        """
+        Take *tokens* tokens from the bucket. If there aren't enough, wait until there are (or return False
+        right away if *block* is False, or after *timeout* seconds).
+        从桶中取tokens个令牌。不够时等待(如果block为False则立即返回False，或者在timeout秒后返回False)。
+
+        :returns: True if the tokens were taken
+        """
+        deadline = default_timer() + timeout if timeout is not None else None
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                self.consumed += tokens
+                return True
+            if not block:
+                return False
+            wait = None if deadline is None else deadline - default_timer()
+            if wait is not None and wait <= 0:
+                return False
+            if not self.leased:
+                # the bucket refills continuously, so we know when there will be enough tokens
+                needed = (tokens - self.tokens) / self.rate if self.rate else None
+                wait = needed if wait is None or (needed is not None and needed < wait) else wait
+            self.waiting += tokens
+            try:
+                self._refilled.wait(wait)
+            finally:
+                self.waiting -= tokens
+
+    def add(self, tokens):
+        """
+        Add *tokens* tokens to the bucket (leased by the master) and wake up the users waiting for them
+        """
+        self.tokens += tokens
+        # a fresh Event for the next wait, so that everyone waiting on the old one is woken up
+        refilled, self._refilled = self._refilled, Event()
+        refilled.set()
+
+    def take_unused(self):
+        """
+        Empty the bucket, and return (unused_tokens, demand) where demand is the number of tokens that were
+        taken since the last call, plus the number of tokens that users are waiting for
+        清空桶，返回(未使用的令牌数, 需求量)
+        """
+        unused = self.tokens
+        demand = self.consumed + self.waiting
+        self.tokens = 0
+        self.consumed = 0
+        return unused, demand
+
+    def _refill(self):
+        if self.leased:
+            return
+        now = default_timer()
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+
+class RateLimiters(object):
+    """
+    The rate limits of an Environment, by name. Limits are set with set_limit() (e.g. in an init event
+    listener, so that they are set on the master as well as on the workers, or with --rate-limit) and
+    used with acquire()::
+
+        @events.init.add_listener
+        def on_init(environment, **kwargs):
+            environment.rate_limiters.set_limit("partner-api", 100)
+
+        class MyUser(HttpUser):
+            @task
+            def t(self):
+                self.environment.rate_limiters.acquire("partner-api")
+                self.client.get("/partner")
+
+    按名称保存Environment的速率限制。用set_limit()设置限制(例如在init事件监听器中，这样master和worker上都会设置)，用acquire()使用。
+
+    When running distributed, the master adds rate * LEASE_INTERVAL tokens to its own bucket for each limit
+    every LEASE_INTERVAL, and leases all of them to the workers in proportion to their demand. On receiving a
+    lease, a worker hands back the tokens it didn't use (which the master leases out again) and reports its
+    demand, so there is no network round trip per acquire(), and unused budget flows to where it's needed.
+    分布式运行时，master每LEASE_INTERVAL为每个限制向自己的桶中添加令牌，并按需求比例全部租给worker。
+    worker收到租约时归还未使用的令牌并报告需求，因此每次acquire()都不需要网络往返，未使用的预算会流向需要的地方。
+    """
+
+    def __init__(self):
+        self.limiters = {}
+        self.leased = False
+        self._master_tokens = {}
+        self._demand = {}
+
+    def __getitem__(self, name):
+        return self.limiters[name]
+
+    def __contains__(self, name):
+        return name in self.limiters
+
+    def __len__(self):
+        return len(self.limiters)
+
+    def set_limit(self, name, rate, burst=None):
+        """
+        Set the (cluster wide) rate limit *name* to *rate* per second, and return its RateLimiter
+        """
+        limiter = self.limiters.get(name)
+        if limiter is not None:
+            limiter.rate = rate
+            limiter.burst = burst if burst is not None else max(1.0, rate * LEASE_INTERVAL)
+            return limiter
+        limiter = self.limiters[name] = RateLimiter(name, rate, burst)
+        if self.leased:
+            limiter.leased = True
+            limiter.tokens = 0
+        return limiter
+
+    def acquire(self, name, tokens=1, block=True, timeout=None):
+        """
+        Take *tokens* tokens from the rate limit *name* (see :meth:`RateLimiter.acquire`)
+        """
+        return self.limiters[name].acquire(tokens, block=block, timeout=timeout)
+
+    def use_leases(self):
+        """
+        Only fill the buckets with tokens leased by the master (called on workers)
+        """
+        self.leased = True
+        for limiter in self.limiters.values():
+            limiter.leased = True
+            limiter.tokens = 0
+
+    def lease(self, client_ids):
+        """
+        Refill the master's buckets and split them between *client_ids*. Returns a {client_id: message data}
+        dict of the leases (called on the master every LEASE_INTERVAL)
+        """
+        leases = dict((client_id, {}) for client_id in client_ids)
+        if not client_ids:
+            return leases
+        for name, limiter in self.limiters.items():
+            # tokens carried over from earlier leases (returned by the workers) are capped at the burst
+            # 从之前租约结转的令牌(worker归还的)不超过burst
+            tokens = min(self._master_tokens.get(name, 0), limiter.burst) + limiter.rate * LEASE_INTERVAL
+            whole = int(tokens)
+            self._master_tokens[name] = tokens - whole
+            demand = self._demand.get(name, {})
+            # every worker gets a small share, so that workers which haven't needed tokens yet aren't starved
+            # 每个worker都会分到一小部分，这样之前不需要令牌的worker不会被饿死
+            shares = distribute(whole, [demand.get(client_id, 0) + 1 for client_id in client_ids])
+            for client_id, share in zip(client_ids, shares):
+                leases[client_id][name] = [share, limiter.rate, limiter.burst]
+        return dict(
+            (client_id, {"leases": data, "interval": LEASE_INTERVAL}) for client_id, data in leases.items()
+        )
+
+    def receive_lease(self, data):
+        """
+        Add the tokens leased by the master to the buckets, and return the report for the master with the
+        unused tokens and demand of the previous lease (called on workers)
+        """
+        report = {}
+        for name, (tokens, rate, burst) in data["leases"].items():
+            limiter = self.limiters.get(name)
+            if limiter is None or limiter.rate != rate or limiter.burst != burst:
+                # the limit was only set (or changed) on the master
+                limiter = self.set_limit(name, rate, burst)
+            report[name] = limiter.take_unused()
+            limiter.add(tokens)
+        return report
+
+    def receive_report(self, client_id, report):
+        """
+        Take back the unused tokens of a worker and note its demand (called on the master)
+        """
+        for name, (unused, demand) in report.items():
+            if name not in self.limiters:
+                continue
+            self._master_tokens[name] = self._master_tokens.get(name, 0) + unused
+            self._demand.setdefault(name, {})[client_id] = demand
+
+    def remove_client(self, client_id):
+        for demand in self._demand.values():
+            demand.pop(client_id, None)
+
+
+def parse_rate_limit(value):
+    """
+    Parse a --rate-limit value, NAME=RATE or NAME=RATE:BURST, into (name, rate, burst)
+    """
+    name, sep, limit = value.rpartition("=")
+    if not sep or not name:
+        raise ValueError("Invalid rate limit %r, expected NAME=RATE or NAME=RATE:BURST" % value)
+    rate, _, burst = limit.partition(":")
+    return name, float(rate), float(burst) if burst else None
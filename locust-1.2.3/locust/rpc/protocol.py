@@ -1,5 +1,17 @@
+import zlib
+
 import msgpack
 
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 class Message(object):
     def __init__(self, message_type, data, node_id):
@@ -17,3 +29,98 @@ class Message(object):
     def unserialize(cls, data):
         msg = cls(*msgpack.loads(data, raw=False, strict_map_key=False))
         return msg
+
+
+FRAME_MARKER = 0xC1  # never used by msgpack, so a frame starting with it can't be a plain serialized Message
+COMPRESSION_THRESHOLD = 1024  # frames with at least this many bytes of messages are compressed
+
+CODEC_NONE, CODEC_ZLIB, CODEC_LZ4, CODEC_ZSTD = 0, 1, 2, 3
+
+CODECS = {CODEC_ZLIB: (lambda data: zlib.compress(data, 1), zlib.decompress)}
+"""
+The compression codecs that are available (their compress and decompress functions), by id. zlib is always
+available, lz4 and zstd if the lz4 and zstandard packages are installed.
+可用的压缩编解码器(压缩和解压函数)，按id索引。zlib始终可用，lz4和zstd在安装了lz4和zstandard包时可用。
+"""
+if lz4 is not None:
+    CODECS[CODEC_LZ4] = (lz4.compress, lz4.decompress)
+if zstandard is not None:
+    CODECS[CODEC_ZSTD] = (zstandard.ZstdCompressor(level=1).compress, zstandard.ZstdDecompressor().decompress)
+
+CODEC_PREFERENCE = (CODEC_ZSTD, CODEC_LZ4, CODEC_ZLIB)
+
+
+class Framer(object):
+    """
+    Packs messages into frames and back, reusing one msgpack Packer and Unpacker. A frame holds one or more
+    messages, and is laid out as:
+    将消息打包成帧以及反向解包，复用同一个msgpack Packer和Unpacker。一帧包含一条或多条消息，格式为:
+
+        FRAME_MARKER, codec id, bitmask of the codecs that the sender accepts, messages (compressed with the codec)
+
+    Peers announce the codecs they accept in every frame, so a codec that both sides support is negotiated
+    without any extra round trips. Frames that don't start with FRAME_MARKER are plain serialized Messages, as
+    sent by older versions of Locust.
+    对端在每一帧中声明它接受的编解码器，因此不需要额外的往返就能协商出双方都支持的编解码器。
+    不以FRAME_MARKER开头的帧是旧版本Locust发送的普通序列化消息。
+    """
+
+    def __init__(self, compression=True, threshold=COMPRESSION_THRESHOLD):
+        """
+        :param compression: Whether to accept and use compression
+        :param threshold: Minimum number of bytes of messages in a frame for it to be compressed
+        """
+        self.accepted = sum(1 << codec for codec in CODECS) if compression else 0
+        self.threshold = threshold
+        self._packer = msgpack.Packer()
+        self._unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        self._fed = 0
+
+    def pack(self, msg):
+        return self._packer.pack((msg.type, msg.data, msg.node_id))
+
+    def frame(self, packed, peer_accepted=0):
+        """
+        Make a frame of the *packed* messages, compressed with the preferred codec that the peer accepts
+        (*peer_accepted* is the bitmask from the peer's frames) if it's big enough
+        """
+        payload = b"".join(packed)
+        codec = CODEC_NONE
+        if len(payload) >= self.threshold:
+            for candidate in CODEC_PREFERENCE:
+                if self.accepted & peer_accepted & (1 << candidate):
+                    compressed = CODECS[candidate][0](payload)
+                    if len(compressed) < len(payload):
+                        codec, payload = candidate, compressed
+                    break
+        return bytes((FRAME_MARKER, codec, self.accepted)) + payload
+
+    def unframe(self, data):
+        """
+        Return (messages, accepted) for a frame, where *accepted* is the bitmask of the codecs that the sender
+        accepts, or None if it was a plain serialized Message
+        """
+        if not data or data[0] != FRAME_MARKER:
+            return [Message.unserialize(data)], None
+        codec, accepted = data[1], data[2]
+        payload = data[3:]
+        if codec != CODEC_NONE:
+            if codec not in CODECS:
+                raise ValueError("Received a frame compressed with an unsupported codec (%s)" % codec)
+            try:
+                payload = CODECS[codec][1](payload)
+            except Exception as e:
+                raise ValueError("Failed to decompress a frame: %s" % e) from e
+        self._unpacker.feed(payload)
+        self._fed += len(payload)
+        try:
+            messages = [Message(*item) for item in self._unpacker]
+            if self._unpacker.tell() != self._fed:
+                raise ValueError("Received a truncated frame")
+        except (ValueError, TypeError):
+            # don't let the remains of a broken frame spoil the next one
+            # 不要让损坏帧的残留数据影响下一帧
+            self._unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+            self._fed = 0
+            raise
+        return messages, accepted
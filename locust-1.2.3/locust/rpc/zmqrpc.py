@@ -1,73 +1,187 @@
+from collections import deque
+
+import gevent
 import zmq.green as zmq
-from .protocol import Message
+from .protocol import Framer
 from locust.util.exception_handler import retry
 from locust.exception import RPCError
 import zmq.error as zmqerr
 import msgpack.exceptions as msgerr
 
+BATCH = True  # coalesce the messages sent to a peer in the same iteration of the event loop into one frame
+COMPRESSION = True  # compress big frames, with a codec negotiated with the peer
+# messages that are sent right away (along with the ones queued before them) instead of in the background, so
+# that a failure to send them is raised to the sender, who can e.g. reset the connection
+# 立即发送(连同之前排队的消息一起)而不是在后台发送的消息，这样发送失败时会抛给发送方，由其处理(例如重置连接)
+URGENT_MESSAGES = ("heartbeat", "spawning_complete", "quit")
+
+
+def endpoint(host, port):
+    """
+    The zmq endpoint for *host* and *port*. *host* may also be a complete endpoint, such as
+    ipc:///tmp/locust/master.ipc, in which case *port* isn't used.
+    """
+    if "://" in host:
+        return host
+    return "tcp://%s:%i" % (host, port)
+
 
 class BaseSocket(object):
-    def __init__(self, sock_type):
+    def __init__(self, sock_type, batch=None, compression=None):
         context = zmq.Context()
         self.socket = context.socket(sock_type)
 
         self.socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
         self.socket.setsockopt(zmq.TCP_KEEPALIVE_IDLE, 30)
+        # node id -> identity of the relay that messages to the node are sent through
+        self.routes = {}
+        self.batch = BATCH if batch is None else batch
+        self.framer = Framer(compression=COMPRESSION if compression is None else compression)
+        # peer identity (None for the master a client is connected to) -> the codecs it accepts, for the
+        # peers that send frames (and not the plain messages of older versions)
+        # 对端标识 -> 它接受的编解码器(只记录发送帧、而不是旧版本普通消息的对端)
+        self.peer_codecs = {}
+        self._outbox = {}
+        self._flusher = None
+        self._send_error = None
+        self._received = deque()
 
-    @retry()
     def send(self, msg):
+        self._enqueue(None, msg)
+
+    def send_to_client(self, msg):
+        self._enqueue(self.routes.get(msg.node_id, msg.node_id), msg)
+
+    def _enqueue(self, route, msg):
+        if self._send_error is not None:
+            # a batch sent in the background failed
+            # 后台发送的批次失败了
+            error, self._send_error = self._send_error, None
+            raise error
+        if self.socket.closed:
+            raise RPCError("ZMQ sent failure: the socket is closed")
+        packed = self.framer.pack(msg)
+        if not self.batch:
+            self._send_frame(route, [packed])
+            return
+        self._outbox.setdefault(route, []).append(packed)
+        if msg.type in URGENT_MESSAGES:
+            self.flush()
+        elif self._flusher is None:
+            self._flusher = gevent.spawn(self._flush_in_background)
+
+    def _flush_in_background(self):
         try:
-            self.socket.send(msg.serialize(), zmq.NOBLOCK)
-        except zmqerr.ZMQError as e:
-            raise RPCError("ZMQ sent failure") from e
+            self.flush()
+        except RPCError as e:
+            # raised by the next send, since there's no one to raise it to here
+            # 由下一次发送抛出，因为这里没有可以抛给的调用方
+            self._send_error = e
+
+    def flush(self):
+        """
+        Send the messages that are waiting to be sent in a batch right away. Raises RPCError if any of
+        them couldn't be sent.
+        立即发送等待批量发送的消息，如有消息发送失败则抛出RPCError
+        """
+        if self._flusher is not None and self._flusher is not gevent.getcurrent():
+            self._flusher.kill(block=False)
+        self._flusher = None
+        outbox, self._outbox = self._outbox, {}
+        error = None
+        for route, packed in outbox.items():
+            try:
+                self._send_frame(route, packed)
+            except RPCError as e:
+                error = e
+        if error is not None:
+            raise error
 
     @retry()
-    def send_to_client(self, msg):
+    def _send_frame(self, route, packed):
         try:
-            self.socket.send_multipart([msg.node_id.encode(), msg.serialize()])
+            if route is None:
+                self.socket.send(self.framer.frame(packed, self.peer_codecs.get(None, 0)), zmq.NOBLOCK)
+            elif route in self.peer_codecs:
+                self.socket.send_multipart([route.encode(), self.framer.frame(packed, self.peer_codecs[route])])
+            else:
+                # peers that we haven't heard from, or that run an older version, get plain messages
+                # 还没收到过消息的对端或旧版本的对端，发送普通消息
+                for data in packed:
+                    self.socket.send_multipart([route.encode(), data])
         except zmqerr.ZMQError as e:
             raise RPCError("ZMQ sent failure") from e
 
-    def recv(self):
+    def _unframe(self, data):
         try:
-            data = self.socket.recv()
-            msg = Message.unserialize(data)
-        except msgerr.ExtraData as e:
+            return self.framer.unframe(data)
+        except (msgerr.ExtraData, ValueError, TypeError) as e:
             raise RPCError("ZMQ interrupted message") from e
-        except zmqerr.ZMQError as e:
-            raise RPCError("ZMQ network broken") from e
-        return msg
+
+    def recv(self):
+        while not self._received:
+            try:
+                data = self.socket.recv()
+            except zmqerr.ZMQError as e:
+                raise RPCError("ZMQ network broken") from e
+            messages, accepted = self._unframe(data)
+            if accepted is not None:
+                self.peer_codecs[None] = accepted
+            self._received.extend(messages)
+        return self._received.popleft()
 
     def recv_from_client(self):
-        try:
-            data = self.socket.recv_multipart()
-            addr = data[0].decode()
-            msg = Message.unserialize(data[1])
-        except (UnicodeDecodeError, msgerr.ExtraData) as e:
-            raise RPCError("ZMQ interrupted message") from e
-        except zmqerr.ZMQError as e:
-            raise RPCError("ZMQ network broken") from e
-        return addr, msg
+        while not self._received:
+            try:
+                data = self.socket.recv_multipart()
+                addr = data[0].decode()
+            except UnicodeDecodeError as e:
+                raise RPCError("ZMQ interrupted message") from e
+            except zmqerr.ZMQError as e:
+                raise RPCError("ZMQ network broken") from e
+            messages, accepted = self._unframe(data[1])
+            if accepted is not None:
+                self.peer_codecs[addr] = accepted
+            else:
+                self.peer_codecs.pop(addr, None)
+            for msg in messages:
+                if msg.node_id is not None and msg.node_id != addr:
+                    # a message forwarded by a relay, which is returned as coming from the node that sent it,
+                    # and the messages to that node are sent through the relay
+                    # 由relay转发的消息，按发送它的节点返回，发给该节点的消息经由relay发送
+                    self.routes[msg.node_id] = addr
+                    self._received.append((msg.node_id, msg))
+                else:
+                    if self.routes:
+                        self.routes.pop(addr, None)
+                    self._received.append((addr, msg))
+        return self._received.popleft()
 
     def close(self):
+        try:
+            self.flush()
+        except RPCError:
+            # the connection is often closed because it's broken
+            # 连接经常是因为已断开才被关闭
+            pass
         self.socket.close()
 
 
 class Server(BaseSocket):
-    def __init__(self, host, port):
-        BaseSocket.__init__(self, zmq.ROUTER)
-        if port == 0:
+    def __init__(self, host, port, batch=None, compression=None):
+        BaseSocket.__init__(self, zmq.ROUTER, batch=batch, compression=compression)
+        if port == 0 and "://" not in host:
             self.port = self.socket.bind_to_random_port("tcp://%s" % host)
         else:
             try:
-                self.socket.bind("tcp://%s:%i" % (host, port))
+                self.socket.bind(endpoint(host, port))
                 self.port = port
             except zmqerr.ZMQError as e:
                 raise RPCError("Socket bind failure: %s" % (e))
 
 
 class Client(BaseSocket):
-    def __init__(self, host, port, identity):
-        BaseSocket.__init__(self, zmq.DEALER)
+    def __init__(self, host, port, identity, batch=None, compression=None):
+        BaseSocket.__init__(self, zmq.DEALER, batch=batch, compression=compression)
         self.socket.setsockopt(zmq.IDENTITY, identity.encode())
-        self.socket.connect("tcp://%s:%i" % (host, port))
+        self.socket.connect(endpoint(host, port))
@@ -7,6 +7,7 @@ import traceback
 import warnings
 from uuid import uuid4
 from time import time
+from timeit import default_timer
 
 import gevent
 import greenlet
@@ -17,9 +18,14 @@ from . import User
 from .log import greenlet_exception_logger
 from .rpc import Message, rpc
 from .stats import RequestStats, setup_distributed_stats_event_listeners
+from .aggregation import StatsAggregator
+from .arrival import ArrivalRateScheduler
+from .looplag import LoopLagMonitor
 
 from .exception import RPCError
+from .ratelimit import LEASE_INTERVAL
 from .user.task import LOCUST_STATE_STOPPING
+from .util.rounding import distribute
 
 
 logger = logging.getLogger(__name__)
@@ -39,12 +45,86 @@ CPU_MONITOR_INTERVAL = 5.0  # CPU监视时间间隔
 HEARTBEAT_INTERVAL = 1  # 心跳间隔
 HEARTBEAT_LIVENESS = 3  # 心跳活性
 FALLBACK_INTERVAL = 5  # 回退时间间隔
+RELAY_REPORT_INTERVAL = 1.0  # how often a relay sends the merged report of its workers to the master
+MAX_REPORT_RATE = 50.0  # maximum number of worker reports per second that the master adapts the report interval to
+REPORT_INGEST_BUDGET = 0.2  # maximum share of the master's time to spend on ingesting worker reports
+MIN_REPORT_INTERVAL = 1.0  # bounds of the report interval that the master tells the workers to use
+MAX_REPORT_INTERVAL = 10.0
+REPORT_INTERVAL_UPDATE = 10.0  # how often the master checks whether the report interval needs to change
+REPORT_JITTER = 0.2  # workers vary the time between their reports by up to this fraction of the interval
+CPU_REBALANCE_TARGET = 75.0  # CPU usage that the master aims for when rebalancing users between workers
+CPU_REBALANCE_THRESHOLD = 20.0  # rebalance when the busiest and the idlest worker differ by this many percentage points
 
 
 # 一种绿色小鸟异常处理程序
 greenlet_exception_handler = greenlet_exception_logger(logger)
 
 
+class UserRegistry(object):
+    """
+    The running User instances of a runner, indexed by User class, so that spawning and stopping users
+    takes time proportional to the number of users that are spawned or stopped, and not to the number
+    of running users.
+    运行器中正在运行的User实例(按User类索引)，使生成和停止用户所需的时间只与变化的用户数成正比，而与运行的用户总数无关。
+
+    Users are removed from the registry when they're picked to be stopped (or when their greenlet dies),
+    so a user is never stopped twice.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._positions = {}
+
+    def add(self, user):
+        users = self._users.setdefault(type(user), [])
+        self._positions[user] = len(users)
+        users.append(user)
+
+    def remove(self, user):
+        """
+        Remove *user* from the registry. Returns False if it wasn't in it.
+        """
+        position = self._positions.pop(user, None)
+        if position is None:
+            return False
+        users = self._users[type(user)]
+        last = users.pop()
+        if last is not user:
+            # move the last user into the hole, instead of shifting the rest of the list
+            # 将最后一个用户移到空位中，而不是移动列表的其余部分
+            users[position] = last
+            self._positions[last] = position
+        return True
+
+    def pop_random(self, user_class, count):
+        """
+        Remove up to *count* random users of *user_class* from the registry and return them
+        从注册表中随机移除最多count个user_class的用户并返回它们
+        """
+        users = self._users.get(user_class, [])
+        popped = []
+        for _ in range(min(count, len(users))):
+            user = users[random.randrange(len(users))]
+            self.remove(user)
+            popped.append(user)
+        return popped
+
+    def count(self, user_class):
+        return len(self._users.get(user_class, ()))
+
+    def counts(self):
+        """
+        Return a {user_class: number of users} dict
+        """
+        return {user_class: len(users) for user_class, users in self._users.items() if users}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(list(self._positions))
+
+
 class Runner(object):
     """
     Orchestrates the load test by starting and stopping the users.
@@ -65,6 +145,7 @@ class Runner(object):
     def __init__(self, environment):
         self.environment = environment
         self.user_greenlets = Group()
+        self.user_registry = UserRegistry()
         self.greenlet = Group()
         self.state = STATE_INIT  # 准备好了
         self.spawning_greenlet = None  # 产生一种绿色小鸟
@@ -74,20 +155,47 @@ class Runner(object):
         self.current_cpu_usage = 0  # 当前的cpu使用率
         self.cpu_warning_emitted = False  # cpu发出警告
         self.greenlet.spawn(self.monitor_cpu).link_exception(greenlet_exception_handler)
+        # measures the event loop lag, the runnable greenlets and the time spent in the stats hooks below
+        # 测量事件循环延迟、可运行的greenlet数量以及下面统计钩子所花的时间
+        self.loop_monitor = LoopLagMonitor()
+        self.greenlet.spawn(self.loop_monitor.run).link_exception(greenlet_exception_handler)
+        if environment.dns_resolver is not None:
+            environment.dns_resolver.install()
         self.exceptions = {}
         self.target_user_count = None  # 目标用户数量
+        # if set, the test is an open model test, where tasks are started at this rate (per second) by an
+        # ArrivalRateScheduler, and the user count is the maximum number of users it may use
+        # 如果设置，则为开放模型测试，任务由ArrivalRateScheduler以该速率(每秒)启动，用户数为其最多可使用的用户数
+        self.arrival_rate = environment.arrival_rate
+        self.arrival_scheduler = None
 
         # set up event listeners for recording requests
         # 设置记录请求的事件监听器
         def on_request_success(request_type, name, response_time, response_length, **kwargs):
-            self.stats.log_request(request_type, name, response_time, response_length)
+            start = default_timer()
+            self.stats.log_request(request_type, name, response_time, response_length, kwargs.get("phase_times"))
+            self.loop_monitor.track_hook(start)
 
         def on_request_failure(request_type, name, response_time, response_length, exception, **kwargs):
-            self.stats.log_request(request_type, name, response_time, response_length)
+            start = default_timer()
+            self.stats.log_request(request_type, name, response_time, response_length, kwargs.get("phase_times"))
             self.stats.log_error(request_type, name, exception)
-
-        self.environment.events.request_success.add_listener(on_request_success)
-        self.environment.events.request_failure.add_listener(on_request_failure)
+            self.loop_monitor.track_hook(start)
+
+        def on_request_batch(requests):
+            start = default_timer()
+            self.stats.log_requests(requests)
+            self.loop_monitor.track_hook(start)
+
+        batcher = self.environment.request_batcher
+        if batcher is not None:
+            self.environment.events.request_batch.add_listener(on_request_batch)
+            # flush before reports are sent to the master, so that they include every request
+            self.environment.events.report_to_master.add_listener(lambda client_id, data: batcher.flush())
+            self.greenlet.spawn(batcher.flusher).link_exception(greenlet_exception_handler)
+        else:
+            self.environment.events.request_success.add_listener(on_request_success)
+            self.environment.events.request_failure.add_listener(on_request_failure)
         self.connection_broken = False  # 连接断了
 
         # register listener that resets stats when spawning is complete
@@ -124,6 +232,8 @@ class Runner(object):
         :returns: Number of currently running users
         当前运行用户数
         """
+        if self.arrival_scheduler is not None:
+            return len(self.user_greenlets) + self.arrival_scheduler.user_count
         return len(self.user_greenlets)
 
     def cpu_log_warning(self):
@@ -141,13 +251,13 @@ class Runner(object):
             return True
         return False
 
-    def weight_users(self, amount):
+    def weight_user_counts(self, amount):
         """
         Distributes the amount of users for each WebLocust-class according to it's weight
-        returns a list "bucket" with the weighted users
-        根据权重分发各个users类占有的并发数量bucket，amount为总并发数
+        returns a {user_class: count} dict
+        根据权重分发各个users类占有的并发数量，amount为总并发数，返回{user_class: count}字典
         """
-        bucket = []
+        counts = {}
         weight_sum = sum([user.weight for user in self.user_classes])
         residuals = {} # 残差
         for user in self.user_classes:
@@ -157,29 +267,38 @@ class Runner(object):
             # create users depending on weight
             # 根据权重创建用户
             percent = user.weight / float(weight_sum)
-            num_users = int(round(amount * percent))
-            bucket.extend([user for x in range(num_users)])
+            counts[user] = int(round(amount * percent))
             # used to keep track of the amount of rounding was done if we need
-            # to add/remove some instances from bucket
-            # 用于跟踪在我们需要从桶中添加/删除一些实例时完成的量
+            # to add/remove some users
+            # 用于跟踪在我们需要添加/删除一些用户时完成的量
             residuals[user] = amount * percent - round(amount * percent)
-        if len(bucket) < amount:
-            # We got too few User classes in the bucket, so we need to create a few extra users,
-            # and we do this by iterating over each of the User classes - starting with the one
-            # where the residual from the rounding was the largest - and creating one of each until
-            # we get the correct amount
-            # 如果我们得到用户类比要求的少,我们就需要遍历对比残差值，那个用户类的残差值最大，就添加一个该用户类，直到bucket和aomount相等,
+        total = sum(counts.values())
+        if total < amount:
+            # We got too few users, so we need to create a few extra users, and we do this by
+            # iterating over each of the User classes - starting with the one where the residual
+            # from the rounding was the largest - and creating one of each until we get the
+            # correct amount
+            # 如果我们得到用户比要求的少,我们就需要遍历对比残差值，那个用户类的残差值最大，就添加一个该用户类，
             # 直到我们得到正确的数量
-            for user in [l for l, r in sorted(residuals.items(), key=lambda x: x[1], reverse=True)][
-                : amount - len(bucket)
-            ]:
-                bucket.append(user)
-        elif len(bucket) > amount:
+            for user in [l for l, r in sorted(residuals.items(), key=lambda x: x[1], reverse=True)][: amount - total]:
+                counts[user] += 1
+        elif total > amount:
             # We've got too many users due to rounding errors so we need to remove some
-            # 如果我们得到的用户类比要求的多，我们就对比残差值，哪个用户类的残差值最小，就删除一个该用户类
-            for user in [l for l, r in sorted(residuals.items(), key=lambda x: x[1])][: len(bucket) - amount]:
-                bucket.remove(user)
+            # 如果我们得到的用户比要求的多，我们就对比残差值，哪个用户类的残差值最小，就删除一个该用户类
+            for user in [l for l, r in sorted(residuals.items(), key=lambda x: x[1])][: total - amount]:
+                counts[user] -= 1
+
+        return counts
 
+    def weight_users(self, amount):
+        """
+        Distributes the amount of users for each WebLocust-class according to it's weight
+        returns a list "bucket" with the weighted users
+        根据权重分发各个users类占有的并发数量bucket，amount为总并发数
+        """
+        bucket = []
+        for user, count in self.weight_user_counts(amount).items():
+            bucket.extend([user] * count)
         return bucket
 
     # 生成用户
@@ -189,6 +308,9 @@ class Runner(object):
         # spawn_rate：孵化速率
         # wait： task任务执行间隔
         bucket = self.weight_users(spawn_count) # 把并发数分到各个user类
+        # spawn the users in random order, popping them from the end of the bucket
+        # 以随机顺序生成用户，从bucket的末尾取出
+        random.shuffle(bucket)
         spawn_count = len(bucket)
         
         # 如果是首次启动/重启性能测试，状态为孵化中？
@@ -218,16 +340,29 @@ class Runner(object):
                     )
                     self.environment.events.spawning_complete.fire(user_count=len(self.user_greenlets))
                     return
-                # 从并发任务中随机抽取一个user_class执行
-                user_class = bucket.pop(random.randint(0, len(bucket) - 1))
+                user_class = bucket.pop()
                 # 将被执行的user_class+1
                 occurrence_count[user_class.__name__] += 1
                 new_user = user_class(self.environment)
                 new_user.start(self.user_greenlets)
+                self.user_registry.add(new_user)
+                # users that stop by themselves (e.g. by raising StopUser) must not be picked by stop_users()
+                # 自行停止的用户(例如抛出StopUser)不能被stop_users()选中
+                new_user._greenlet.link(lambda _, user=new_user: self.user_registry.remove(user))
                 if len(self.user_greenlets) % 10 == 0:
                     logger.debug("%i users spawned" % len(self.user_greenlets))
                 if bucket:
                     gevent.sleep(sleep_time)
+                    max_loop_lag = self.environment.max_loop_lag
+                    if max_loop_lag is not None and self.loop_monitor.lag >= max_loop_lag:
+                        # the process can't keep up with the users it already runs, so wait for it to catch up
+                        # 进程已跟不上现有的用户，等待它恢复
+                        logger.warning(
+                            "Event loop lag is %.0f ms (above %g ms), pausing spawning (%i users running)"
+                            % (self.loop_monitor.lag, max_loop_lag, len(self.user_greenlets))
+                        )
+                        self.loop_monitor.wait_for_lag_below(max_loop_lag)
+                        logger.info("Event loop lag is %.0f ms, resuming spawning" % self.loop_monitor.lag)
 
         # 执行压力测试
         spawn()
@@ -244,19 +379,24 @@ class Runner(object):
         if user_count == 0 or stop_rate == 0:
             return
 
-        bucket = self.weight_users(user_count)
-        user_count = len(bucket)
+        counts = self.weight_user_counts(user_count)
+        user_count = sum(counts.values())
         to_stop = []
-        for g in self.user_greenlets:
-            for l in bucket:
-                user = g.args[0]
-                if isinstance(user, l):
-                    to_stop.append(user)
-                    bucket.remove(l)
-                    break
+        for user_class, count in counts.items():
+            to_stop.extend(self.user_registry.pop_random(user_class, count))
+        # if some class has fewer users than its weighted share (e.g. because users stopped by themselves),
+        # make up the difference with users of the other classes
+        # 如果某个类的用户少于其加权份额(例如用户自行停止了)，用其他类的用户补足差额
+        for user_class in counts:
+            if len(to_stop) >= user_count:
+                break
+            to_stop.extend(self.user_registry.pop_random(user_class, user_count - len(to_stop)))
 
         if not to_stop:
             return
+        # stop the users in random order, popping them from the end of the list
+        # 以随机顺序停止用户，从列表的末尾取出
+        random.shuffle(to_stop)
 
         if stop_rate is None or stop_rate >= user_count:
             sleep_time = 0
@@ -269,7 +409,7 @@ class Runner(object):
         stop_group = Group()
 
         while True:
-            user_to_stop: User = to_stop.pop(random.randint(0, len(to_stop) - 1))
+            user_to_stop: User = to_stop.pop()
             logger.debug("Stopping %s" % user_to_stop._greenlet.name)
             if user_to_stop._greenlet is greenlet.getcurrent():
                 # User called runner.quit(), so dont block waiting for killing to finish"
@@ -329,6 +469,12 @@ class Runner(object):
             self.worker_cpu_warning_emitted = False
             self.target_user_count = user_count
 
+        if self.arrival_rate is not None:
+            self.start_arrivals(user_count, self.arrival_rate)
+            return
+        if self.arrival_scheduler is not None:
+            self._stop_arrivals()
+
         if self.state != STATE_INIT and self.state != STATE_STOPPED:
             logger.debug(
                 "Updating running test with %d users, %.2f spawn rate and wait=%r" % (user_count, spawn_rate, wait)
@@ -338,6 +484,9 @@ class Runner(object):
                 # Stop some users
                 stop_count = self.user_count - user_count
                 self.stop_users(stop_count, spawn_rate)
+                # a worker that shrinks (e.g. when the master rebalances) must report that it's done too
+                # worker缩减用户(例如master重新平衡时)后也必须报告完成
+                self.environment.events.spawning_complete.fire(user_count=self.user_count)
             elif self.user_count < user_count:
                 # Spawn some users
                 spawn_count = user_count - self.user_count
@@ -348,6 +497,40 @@ class Runner(object):
             self.spawn_rate = spawn_rate
             self.spawn_users(user_count, spawn_rate=spawn_rate, wait=wait)
 
+    def start_arrivals(self, pool_size, arrival_rate):
+        """
+        Start (or update) an open model load test, where tasks are started at *arrival_rate* per second
+        using at most *pool_size* users, instead of by a fixed number of users looping through their tasks
+        (see :class:`ArrivalRateScheduler <locust.arrival.ArrivalRateScheduler>`)
+        开始(或更新)开放模型负载测试，以每秒arrival_rate的速率启动任务，最多使用pool_size个用户
+        """
+        self.target_user_count = pool_size
+        if self.arrival_scheduler is None:
+            logger.info(
+                "Starting open model test with an arrival rate of %.2f/s and %d users" % (arrival_rate, pool_size)
+            )
+            self.arrival_scheduler = ArrivalRateScheduler(
+                self.environment,
+                self.user_classes,
+                pool_size,
+                arrival_rate,
+                distribution=self.environment.arrival_distribution,
+                ramp_time=self.environment.arrival_ramp_time,
+                max_queue_time=self.environment.arrival_max_queue_time,
+            )
+            self.arrival_scheduler.start()
+        else:
+            logger.debug(
+                "Updating open model test to an arrival rate of %.2f/s and %d users" % (arrival_rate, pool_size)
+            )
+            self.arrival_scheduler.set_pool_size(pool_size)
+            self.arrival_scheduler.set_arrival_rate(arrival_rate)
+        self.environment.events.spawning_complete.fire(user_count=pool_size)
+
+    def _stop_arrivals(self):
+        self.arrival_scheduler.stop(timeout=self.environment.stop_timeout)
+        self.arrival_scheduler = None
+
     def start_stepload(self, user_count, spawn_rate, step_user_count, step_duration):
         if user_count < step_user_count:
             logger.error(
@@ -399,8 +582,19 @@ class Runner(object):
             elif self.shape_last_state == new_state:
                 gevent.sleep(1)
             else:
-                user_count, spawn_rate = new_state
-                logger.info("Shape test updating to %d users at %.2f spawn rate" % (user_count, spawn_rate))
+                # a third element switches the test to (or updates) an open model test with that arrival rate
+                # 第三个元素将测试切换为(或更新)具有该到达率的开放模型测试
+                user_count, spawn_rate, *arrival_rate = new_state
+                if arrival_rate:
+                    self.arrival_rate = arrival_rate[0]
+                    logger.info(
+                        "Shape test updating to %d users at an arrival rate of %.2f/s" % (user_count, self.arrival_rate)
+                    )
+                else:
+                    # a 2-tuple goes back to (or stays with) a closed model test
+                    # 二元组回到(或保持)封闭模型测试
+                    self.arrival_rate = None
+                    logger.info("Shape test updating to %d users at %.2f spawn rate" % (user_count, spawn_rate))
                 self.start(user_count=user_count, spawn_rate=spawn_rate)
                 self.shape_last_state = new_state
 
@@ -414,7 +608,11 @@ class Runner(object):
         # 如果我们目前正在生成用户，我们需要先杀死生成的greenlet
         if self.spawning_greenlet and not self.spawning_greenlet.ready():
             self.spawning_greenlet.kill(block=True)
+        if self.arrival_scheduler is not None:
+            self._stop_arrivals()
         self.stop_users(self.user_count)
+        if self.environment.request_batcher is not None:
+            self.environment.request_batcher.flush()
         self.state = STATE_STOPPED
         self.cpu_log_warning()
 
@@ -484,20 +682,44 @@ class LocalRunner(Runner):
 
 
 class DistributedRunner(Runner):
+    stats_aggregator = None
+    """
+    If set, worker reports are merged into the stats in batches by this StatsAggregator
+    如果设置，worker的报告将由这个StatsAggregator批量合并到统计数据中
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # 设置分布式统计事件侦听器
-        setup_distributed_stats_event_listeners(self.environment.events, self.stats)
+        setup_distributed_stats_event_listeners(self.environment.events, self.stats, self.stats_aggregator)
 
 
 class WorkerNode(object):
-    def __init__(self, id, state=STATE_INIT, heartbeat_liveness=HEARTBEAT_LIVENESS):
+    def __init__(self, id, state=STATE_INIT, heartbeat_liveness=HEARTBEAT_LIVENESS, capacity=1.0):
         self.id = id
         self.state = state
         self.user_count = 0
         self.heartbeat = heartbeat_liveness
         self.cpu_usage = 0
         self.cpu_warning_emitted = False
+        # the relative capacity the worker advertised, and the weight users are currently distributed with
+        # (which starts out as the capacity, and is adjusted when rebalancing on CPU usage)
+        # worker声明的相对容量，以及当前分配用户所用的权重
+        self.capacity = capacity
+        self.weight = capacity
+        # the number of users the master last told the worker to run (None if unknown)
+        # master最后一次通知该worker运行的用户数
+        self.target_user_count = None
+        self.share = None
+        # the report interval the master last told the worker to use (None if it hasn't)
+        # master最后一次通知该worker使用的报告间隔
+        self.report_interval = None
+        # the event loop metrics of the worker's last heartbeat (see LoopLagMonitor.snapshot())
+        # worker最近一次心跳中的事件循环指标
+        self.loop_lag = {}
+        # the id of the relay the worker is connected through (None if it's connected directly)
+        # worker所连接的relay的id(直接连接时为None)
+        self.relay = None
 
 
 class MasterRunner(DistributedRunner):
@@ -514,12 +736,41 @@ class MasterRunner(DistributedRunner):
     从:class: ' WorkerRunners &lt;WorkerRunner&gt; '发回的统计信息将被聚合。
     """
 
-    def __init__(self, environment, master_bind_host, master_bind_port):
+    def __init__(
+        self,
+        environment,
+        master_bind_host,
+        master_bind_port,
+        aggregation_interval=0,
+        cpu_rebalance_interval=0,
+        max_report_rate=MAX_REPORT_RATE,
+    ):
         """
         :param environment: Environment instance 环境实例
         :param master_bind_host: Host/interface to use for incoming worker connections 用于传入worker连接的主机/接口
         :param master_bind_port: Port to use for incoming worker connections 用于传入worker连接的端口
+        :param aggregation_interval: If set, the worker reports that arrive within this many seconds are merged
+                                     into the stats in one batch
+                                     (see :class:`StatsAggregator <locust.aggregation.StatsAggregator>`)
+                                     如果设置，在这么多秒内到达的worker报告将被批量合并到统计数据中
+        :param cpu_rebalance_interval: If set, the CPU usage that workers report in their heartbeats is checked
+                                       this often (in seconds) while the test is running, and users are moved from
+                                       busy workers to idle ones (see rebalance_by_cpu())
+                                       如果设置，测试运行时每隔这么多秒检查worker的CPU使用率，并将用户从繁忙的worker移到空闲的worker
+        :param max_report_rate: If set, the interval at which the workers send their stats reports is adapted to
+                                the number of workers and to how long the reports take to ingest, so that the
+                                master receives at most this many reports per second (see report_interval())
+                                如果设置，worker发送统计报告的间隔会根据worker数量和报告的处理时间调整，使master每秒最多收到这么多报告
         """
+        self.aggregation_interval = aggregation_interval
+        self.cpu_rebalance_interval = cpu_rebalance_interval
+        self.max_report_rate = max_report_rate
+        # moving average of the time it takes to ingest a worker report (None until one has been received)
+        # 处理一个worker报告所需时间的移动平均值
+        self.report_ingest_time = None
+        self.rebalancing = False
+        if aggregation_interval:
+            self.stats_aggregator = StatsAggregator(environment.stats)
         super().__init__(environment)
         self.worker_cpu_warning_emitted = False
         self.master_bind_host = master_bind_host
@@ -568,10 +819,22 @@ class MasterRunner(DistributedRunner):
 
         self.greenlet.spawn(self.heartbeat_worker).link_exception(greenlet_exception_handler)
         self.greenlet.spawn(self.client_listener).link_exception(greenlet_exception_handler)
+        if self.stats_aggregator is not None:
+            self.greenlet.spawn(self.stats_aggregator_worker).link_exception(greenlet_exception_handler)
+        if cpu_rebalance_interval:
+            self.greenlet.spawn(self.cpu_rebalance_worker).link_exception(greenlet_exception_handler)
+        self.greenlet.spawn(self.rate_limit_worker).link_exception(greenlet_exception_handler)
+        if max_report_rate:
+            self.greenlet.spawn(self.report_interval_worker).link_exception(greenlet_exception_handler)
 
         # listener that gathers info on how many users the worker has spawned
         # 侦听器，该侦听器收集关于worker生成了多少用户的信息
         def on_worker_report(client_id, data):
+            if "relayed" in data:
+                for node_id, report in data["relayed"].items():
+                    if node_id in self.clients and "user_count" in report:
+                        self.clients[node_id].user_count = report["user_count"]
+                return
             if client_id not in self.clients:
                 # 不认识的工人丢弃的报告
                 logger.info("Discarded report from unrecognized worker %s", client_id)
@@ -617,16 +880,27 @@ class MasterRunner(DistributedRunner):
             return
 
         self.spawn_rate = spawn_rate
-        worker_num_users = user_count // (num_workers or 1)
-        worker_spawn_rate = float(spawn_rate) / (num_workers or 1)
-        remaining = user_count % num_workers
+        clients, worker_num_users, shares = self._spawn_jobs(user_count)
+        worker_spawn_rates = [spawn_rate * share for share in shares]
+        weights = [client.weight for client in clients]
         # 发送用户数量和孵化速率。和准备好的客户端
-        logger.info(
-            "Sending spawn jobs of %d users and %.2f spawn rate to %d ready clients"
-            % (worker_num_users, worker_spawn_rate, num_workers)
-        )
+        if len(set(weights)) == 1:
+            logger.info(
+                "Sending spawn jobs of %d users and %.2f spawn rate to %d ready clients"
+                % (user_count // num_workers, worker_spawn_rates[0], num_workers)
+            )
+        else:
+            logger.info(
+                "Sending spawn jobs of %d users and %.2f spawn rate to %d ready clients, weighted by capacity (%s)"
+                % (
+                    user_count,
+                    spawn_rate,
+                    num_workers,
+                    ", ".join("%s: %d" % (client.id, count) for client, count in zip(clients, worker_num_users)),
+                )
+            )
         # 你选择的刷出率非常高(>100/工人)，这是众所周知的，有时会导致问题。你真的需要这么快吗?
-        if worker_spawn_rate > 100:
+        if max(worker_spawn_rates) > 100:
             logger.warning(
                 "Your selected spawn rate is very high (>100/worker), and this is known to sometimes cause issues. Do you really need to ramp up that fast?"
             )
@@ -636,25 +910,87 @@ class MasterRunner(DistributedRunner):
             self.exceptions = {}
             self.environment.events.test_start.fire(environment=self.environment)
 
-        for client in self.clients.ready + self.clients.running + self.clients.spawning:
-            data = {
-                "spawn_rate": worker_spawn_rate,
-                "num_users": worker_num_users,
-                "host": self.environment.host,
-                "stop_timeout": self.environment.stop_timeout,
-            }
-
-            if remaining > 0:
-                data["num_users"] += 1
-                remaining -= 1
+        self.rebalancing = False
+        for client, num_users, share in zip(clients, worker_num_users, shares):
+            self._send_spawn_job(client, num_users, share)
 
-            self.server.send_to_client(Message("spawn", data, client.id))
+        self.state = STATE_SPAWNING
 
+    def _spawn_jobs(self, user_count):
+        """
+        Split user_count between the connected workers, in proportion to their weights (an even split by
+        default). Returns (clients, worker_num_users, shares), where shares are the fractions of the spawn
+        rate (and arrival rate) that each worker gets.
+        按worker的权重比例拆分用户数(默认平均拆分)，shares为每个worker分得的孵化速率(和到达率)比例
+        """
+        clients = self.clients.ready + self.clients.running + self.clients.spawning
+        weights = [client.weight for client in clients]
+        weight_sum = float(sum(weights)) or 1.0
+        worker_num_users = distribute(user_count, weights)
+        shares = [weight / weight_sum for weight in weights]
+        return clients, worker_num_users, shares
+
+    def _send_spawn_job(self, client, num_users, share):
+        data = {
+            "spawn_rate": float(self.spawn_rate) * share,
+            "num_users": num_users,
+            "host": self.environment.host,
+            "stop_timeout": self.environment.stop_timeout,
+        }
+        if self.arrival_rate is not None:
+            data["arrival_rate"] = self.arrival_rate * share
+            data["arrival_distribution"] = self.environment.arrival_distribution
+            data["arrival_ramp_time"] = self.environment.arrival_ramp_time
+            data["arrival_max_queue_time"] = self.environment.arrival_max_queue_time
+        if self.max_report_rate:
+            data["report_interval"] = client.report_interval = self.report_interval()
+        self.server.send_to_client(Message("spawn", data, client.id))
+        client.target_user_count = num_users
+        client.share = share
+
+    def rebalance(self):
+        """
+        Redistribute the target user count of a running test over the connected workers, e.g. when a worker
+        joins, quits or goes missing. Spawn jobs are only sent to the workers whose share changed, and since
+        workers only spawn or stop the difference to what they're already running, the total number of users
+        stays flat. Returns True if any spawn jobs were sent.
+        在运行的测试中将目标用户数重新分配给已连接的worker(例如有worker加入、退出或丢失时)。
+        只向份额发生变化的worker发送孵化任务，worker只孵化或停止差额，因此总用户数保持平稳。
+        """
+        if self.state != STATE_RUNNING and self.state != STATE_SPAWNING:
+            return False
+        clients, worker_num_users, shares = self._spawn_jobs(self.target_user_count)
+        jobs = [
+            (client, num_users, share)
+            for client, num_users, share in zip(clients, worker_num_users, shares)
+            # in an open model test, the workers' shares of the arrival rate matter too
+            # 开放模型测试中，worker分得的到达率也很重要
+            if num_users != client.target_user_count or (self.arrival_rate is not None and share != client.share)
+        ]
+        if not jobs:
+            return False
+        logger.info(
+            "Rebalancing %d users over %d workers (%s)"
+            % (
+                self.target_user_count,
+                len(clients),
+                ", ".join("%s: %d" % (client.id, num_users) for client, num_users, _ in jobs),
+            )
+        )
+        if self.state == STATE_RUNNING:
+            # spawning_complete has already been fired for this test, so it isn't fired again (which
+            # would e.g. reset the stats with --reset-stats) when the rebalanced workers are done
+            # 本次测试已经触发过spawning_complete，重新平衡完成时不再触发
+            self.rebalancing = True
+        for client, num_users, share in jobs:
+            self._send_spawn_job(client, num_users, share)
         self.state = STATE_SPAWNING
+        return True
 
     def stop(self):
         if self.state not in [STATE_INIT, STATE_STOPPED, STATE_STOPPING]:
             self.state = STATE_STOPPING
+            self.rebalancing = False
 
             if self.environment.shape_class:
                 self.shape_last_state = None
@@ -672,6 +1008,8 @@ class MasterRunner(DistributedRunner):
         for client in self.clients.all:
             self.server.send_to_client(Message("quit", None, client.id))
         gevent.sleep(0.5)  # wait for final stats report from all workers 等待所有workers的最终统计报告
+        if self.stats_aggregator is not None:
+            self.stats_aggregator.flush()
         self.greenlet.kill(block=True)
 
     def check_stopped(self):
@@ -694,13 +1032,72 @@ class MasterRunner(DistributedRunner):
                     logger.info("Worker %s failed to send heartbeat, setting state to missing." % str(client.id))
                     client.state = STATE_MISSING
                     client.user_count = 0
-                    if self.worker_count - len(self.clients.missing) <= 0:
+                    client.target_user_count = None
+                    if self.worker_count <= 0:
                         logger.info("The last worker went missing, stopping test.") # 最后一个worker失踪了，停止了测试
                         self.stop()
                         self.check_stopped()
+                    else:
+                        # hand the missing worker's share to the remaining workers
+                        # 将丢失worker的份额分给其余的worker
+                        self.rebalance()
                 else:
                     client.heartbeat -= 1
 
+    def cpu_rebalance_worker(self):
+        while True:
+            gevent.sleep(self.cpu_rebalance_interval)
+            self.rebalance_by_cpu()
+
+    def rebalance_by_cpu(self):
+        """
+        Move users from busy workers to idle ones, based on the CPU usage the workers report in their
+        heartbeats. Assuming that a worker's CPU usage grows linearly with its number of users, the number
+        of users each worker could run at CPU_REBALANCE_TARGET percent is estimated, and the users are
+        redistributed in proportion to those estimates. Nothing is done unless all workers are running
+        and the CPU usage of the busiest and the idlest worker differ by at least CPU_REBALANCE_THRESHOLD.
+        Returns True if new spawn jobs were sent.
+        根据worker在心跳中报告的CPU使用率，将用户从繁忙的worker移到空闲的worker。返回是否发送了新的孵化任务。
+        """
+        clients = list(self.clients.running)
+        if self.state != STATE_RUNNING or len(clients) < 2 or self.clients.spawning or self.clients.ready:
+            return False
+        if any(client.user_count <= 0 or client.cpu_usage <= 0 for client in clients):
+            # not enough data to estimate the capacity of every worker
+            return False
+        cpu_usages = [client.cpu_usage for client in clients]
+        if max(cpu_usages) - min(cpu_usages) < CPU_REBALANCE_THRESHOLD:
+            return False
+
+        estimates = [client.user_count * CPU_REBALANCE_TARGET / client.cpu_usage for client in clients]
+        # scale the estimates so that the weights stay comparable to the capacity of workers that join later
+        # 缩放估计值，使权重与之后加入的worker的容量保持可比
+        scale = sum(client.capacity for client in clients) / sum(estimates)
+        for client, estimate in zip(clients, estimates):
+            client.weight = estimate * scale
+        logger.info(
+            "Rebalancing users by worker CPU usage (%s)"
+            % ", ".join("%s: %d%%" % (client.id, client.cpu_usage) for client in clients)
+        )
+        return self.rebalance()
+
+    def rate_limit_worker(self):
+        # lease the tokens of the rate limits to the workers (see RateLimiters)
+        # 将速率限制的令牌租给worker
+        rate_limiters = self.environment.rate_limiters
+        while True:
+            gevent.sleep(LEASE_INTERVAL)
+            if not rate_limiters or (self.state != STATE_RUNNING and self.state != STATE_SPAWNING):
+                continue
+            client_ids = [client.id for client in self.clients.ready + self.clients.running + self.clients.spawning]
+            for client_id, data in rate_limiters.lease(client_ids).items():
+                self.server.send_to_client(Message("rate_limit", data, client_id))
+
+    def stats_aggregator_worker(self):
+        while True:
+            gevent.sleep(self.aggregation_interval)
+            self.stats_aggregator.flush()
+
     def reset_connection(self):
         logger.info("Reset connection to worker")
         try:
@@ -724,60 +1121,134 @@ class MasterRunner(DistributedRunner):
             msg.node_id = client_id
             if msg.type == "client_ready":
                 id = msg.node_id
-                self.clients[id] = WorkerNode(id, heartbeat_liveness=HEARTBEAT_LIVENESS)
+                # workers from older versions don't send any data with client_ready
+                # 旧版本的worker在client_ready中不发送任何数据
+                capacity = (msg.data or {}).get("capacity", 1.0)
+                self.clients[id] = WorkerNode(id, heartbeat_liveness=HEARTBEAT_LIVENESS, capacity=capacity)
                 logger.info(
                     "Client %r reported as ready. Currently %i clients ready to swarm."
                     % (id, len(self.clients.ready + self.clients.running + self.clients.spawning))
                 )
-                if self.state == STATE_RUNNING or self.state == STATE_SPAWNING:
-                    # balance the load distribution when new client joins
-                    # 在新客户端加入时平衡负载分配
-                    self.start(self.target_user_count, self.spawn_rate)
+                # balance the load distribution when new client joins
+                # 在新客户端加入时平衡负载分配
+                self.rebalance()
                 # emit a warning if the worker's clock seem to be out of sync with our clock 如果worker的时钟与我们的时钟不同步，则发出警告
                 # if abs(time() - msg.data["time"]) > 5.0:
                 #      warnings.warn("The worker node's clock seem to be out of sync. For the statistics to be correct the different locust servers need to have synchronized clocks.")
                 # 工作节点的时钟似乎不同步。要使统计数据正确，不同的蝗虫服务器需要有同步的时钟。
             elif msg.type == "client_stopped":
                 del self.clients[msg.node_id]
+                self.environment.rate_limiters.remove_client(msg.node_id)
                 logger.info("Removing %s client from running clients" % (msg.node_id))
             elif msg.type == "heartbeat":
-                if msg.node_id in self.clients:
-                    c = self.clients[msg.node_id]
-                    c.heartbeat = HEARTBEAT_LIVENESS
-                    c.state = msg.data["state"]
-                    c.cpu_usage = msg.data["current_cpu_usage"]
-                    if not c.cpu_warning_emitted and c.cpu_usage > 90:
-                        self.worker_cpu_warning_emitted = True  # used to fail the test in the end
-                        c.cpu_warning_emitted = True  # used to suppress logging for this node
-                        logger.warning(
-                            "Worker %s exceeded cpu threshold (will only log this once per worker)" % (msg.node_id)
-                        )
+                self.receive_heartbeat(msg.node_id, msg.data)
             elif msg.type == "stats":
+                # the merged report of a relay carries the heartbeats of the workers behind it
+                # relay合并后的报告中带有其后面的worker的心跳
+                for node_id, report in msg.data.get("relayed", {}).items():
+                    if node_id in self.clients:
+                        self.clients[node_id].relay = msg.node_id
+                    if "state" in report:
+                        self.receive_heartbeat(node_id, report)
+                ingest_start = default_timer()
                 self.environment.events.worker_report.fire(client_id=msg.node_id, data=msg.data)
+                ingest_time = default_timer() - ingest_start
+                if self.report_ingest_time is None:
+                    self.report_ingest_time = ingest_time
+                else:
+                    self.report_ingest_time = 0.8 * self.report_ingest_time + 0.2 * ingest_time
+            elif msg.type == "rate_limit_report":
+                self.environment.rate_limiters.receive_report(msg.node_id, msg.data)
             elif msg.type == "spawning":
                 self.clients[msg.node_id].state = STATE_SPAWNING
             elif msg.type == "spawning_complete":
                 self.clients[msg.node_id].state = STATE_RUNNING
                 self.clients[msg.node_id].user_count = msg.data["count"]
                 if len(self.clients.spawning) == 0:
-                    count = sum(c.user_count for c in self.clients.values())
-                    self.environment.events.spawning_complete.fire(user_count=count)
+                    if self.rebalancing:
+                        self.rebalancing = False
+                        self.state = STATE_RUNNING
+                    else:
+                        count = sum(c.user_count for c in self.clients.values())
+                        self.environment.events.spawning_complete.fire(user_count=count)
             elif msg.type == "quit":
                 if msg.node_id in self.clients:
                     del self.clients[msg.node_id]
+                    self.environment.rate_limiters.remove_client(msg.node_id)
                     logger.info(
                         "Client %r quit. Currently %i clients connected." % (msg.node_id, len(self.clients.ready))
                     )
-                    if self.worker_count - len(self.clients.missing) <= 0:
+                    if self.worker_count <= 0:
                         logger.info("The last worker quit, stopping test.")
                         self.stop()
                         if self.environment.parsed_options and self.environment.parsed_options.headless:
                             self.quit()
+                    else:
+                        self.rebalance()
             elif msg.type == "exception":
                 self.log_exception(msg.node_id, msg.data["msg"], msg.data["traceback"])
 
             self.check_stopped()
 
+    def report_interval(self):
+        """
+        The interval at which the workers should send their stats reports: as short as possible (but at least
+        MIN_REPORT_INTERVAL), without the master receiving more than max_report_rate reports per second, or
+        spending more than REPORT_INGEST_BUDGET of its time on ingesting them. The workers behind a relay
+        count as one, since the relay sends one merged report for all of them.
+        worker发送统计报告的间隔: 在master每秒收到的报告不超过max_report_rate、处理报告的时间不超过
+        REPORT_INGEST_BUDGET的前提下尽可能短。relay后面的worker只算一个，因为relay为它们发送一个合并的报告。
+        """
+        rate = self.max_report_rate
+        if self.report_ingest_time:
+            rate = min(rate, REPORT_INGEST_BUDGET / self.report_ingest_time)
+        clients = self.clients.ready + self.clients.spawning + self.clients.running
+        relays = set(client.relay for client in clients if client.relay is not None)
+        senders = len([client for client in clients if client.relay is None]) + len(relays)
+        interval = max(1, senders) / rate
+        return min(MAX_REPORT_INTERVAL, max(MIN_REPORT_INTERVAL, interval))
+
+    def report_interval_worker(self):
+        while True:
+            gevent.sleep(REPORT_INTERVAL_UPDATE)
+            self.update_report_interval()
+
+    def update_report_interval(self):
+        """
+        Tell the workers the current report interval, if it's more than 25% off from the one they were told
+        before (e.g. because the ingest time has changed). Workers are also told with every spawn job.
+        """
+        interval = self.report_interval()
+        for client in self.clients.all:
+            if client.state == STATE_MISSING:
+                continue
+            if client.report_interval is None or abs(interval - client.report_interval) > 0.25 * client.report_interval:
+                self.server.send_to_client(Message("report_interval", {"interval": interval}, client.id))
+                client.report_interval = interval
+
+    def receive_heartbeat(self, node_id, data):
+        """
+        Handle a heartbeat from a worker, sent directly or as part of a relay's report
+        处理worker的心跳(直接发送的或relay报告中的)
+        """
+        if node_id not in self.clients:
+            return
+        c = self.clients[node_id]
+        c.heartbeat = HEARTBEAT_LIVENESS
+        was_missing = c.state == STATE_MISSING
+        c.state = data["state"]
+        if was_missing and c.state in (STATE_RUNNING, STATE_SPAWNING):
+            # a worker that was missing is back (and may still be running its old users)
+            # 丢失的worker恢复了(可能仍在运行原来的用户)
+            logger.info("Worker %s is sending heartbeats again, rebalancing users." % str(c.id))
+            self.rebalance()
+        c.cpu_usage = data["current_cpu_usage"]
+        c.loop_lag = data.get("loop_lag", {})
+        if not c.cpu_warning_emitted and c.cpu_usage > 90:
+            self.worker_cpu_warning_emitted = True  # used to fail the test in the end
+            c.cpu_warning_emitted = True  # used to suppress logging for this node
+            logger.warning("Worker %s exceeded cpu threshold (will only log this once per worker)" % (node_id))
+
     @property
     def worker_count(self):
         return len(self.clients.ready) + len(self.clients.spawning) + len(self.clients.running)
@@ -792,21 +1263,29 @@ class WorkerRunner(DistributedRunner):
     take the stats generated by the running users and send back to the :class:`MasterRunner`.
     """
 
-    def __init__(self, environment, master_host, master_port):
+    def __init__(self, environment, master_host, master_port, capacity=1.0):
         """
         :param environment: Environment instance
         :param master_host: Host/IP to use for connection to the master
         :param master_port: Port to use for connecting to the master
+        :param capacity: Relative capacity of this worker, that the master distributes users in proportion to
         """
         super().__init__(environment)
+        self.capacity = capacity
+        # the rate limits are enforced across the cluster, with tokens leased by the master
+        # 速率限制在整个集群范围内生效，令牌由master租借
+        self.environment.rate_limiters.use_leases()
         self.worker_state = STATE_INIT
         self.client_id = socket.gethostname() + "_" + uuid4().hex
         self.master_host = master_host
         self.master_port = master_port
+        # the master adapts the report interval to the size of the cluster
+        # master会根据集群规模调整报告间隔
+        self.report_interval = WORKER_REPORT_INTERVAL
         self.client = rpc.Client(master_host, master_port, self.client_id)
         self.greenlet.spawn(self.heartbeat).link_exception(greenlet_exception_handler)
         self.greenlet.spawn(self.worker).link_exception(greenlet_exception_handler)
-        self.client.send(Message("client_ready", None, self.client_id))
+        self.client.send(Message("client_ready", {"capacity": self.capacity}, self.client_id))
         self.greenlet.spawn(self.stats_reporter).link_exception(greenlet_exception_handler)
 
         # register listener for when all users have spawned, and report it to the master node
@@ -824,6 +1303,8 @@ class WorkerRunner(DistributedRunner):
 
         # register listener that sends quit message to master
         def on_quitting(environment, **kw):
+            # (quit messages aren't batched, so it's sent before the process exits)
+            # (quit消息不会被批量发送，因此会在进程退出前发出)
             self.client.send(Message("quit", None, self.client_id))
 
         self.environment.events.quitting.add_listener(on_quitting)
@@ -841,7 +1322,11 @@ class WorkerRunner(DistributedRunner):
                 self.client.send(
                     Message(
                         "heartbeat",
-                        {"state": self.worker_state, "current_cpu_usage": self.current_cpu_usage},
+                        {
+                            "state": self.worker_state,
+                            "current_cpu_usage": self.current_cpu_usage,
+                            "loop_lag": self.loop_monitor.snapshot(),
+                        },
                         self.client_id,
                     )
                 )
@@ -873,6 +1358,12 @@ class WorkerRunner(DistributedRunner):
                 self.target_user_count = job["num_users"]
                 self.environment.host = job["host"]
                 self.environment.stop_timeout = job["stop_timeout"]
+                self.arrival_rate = job.get("arrival_rate")
+                if self.arrival_rate is not None:
+                    self.environment.arrival_distribution = job["arrival_distribution"]
+                    self.environment.arrival_ramp_time = job["arrival_ramp_time"]
+                    self.environment.arrival_max_queue_time = job["arrival_max_queue_time"]
+                self.report_interval = job.get("report_interval", self.report_interval)
                 if self.spawning_greenlet:
                     # kill existing spawning greenlet before we launch new one
                     self.spawning_greenlet.kill(block=True)
@@ -880,10 +1371,15 @@ class WorkerRunner(DistributedRunner):
                     lambda: self.start(user_count=job["num_users"], spawn_rate=job["spawn_rate"])
                 )
                 self.spawning_greenlet.link_exception(greenlet_exception_handler)
+            elif msg.type == "rate_limit":
+                report = self.environment.rate_limiters.receive_lease(msg.data)
+                self.client.send(Message("rate_limit_report", report, self.client_id))
+            elif msg.type == "report_interval":
+                self.report_interval = msg.data["interval"]
             elif msg.type == "stop":
                 self.stop()
                 self.client.send(Message("client_stopped", None, self.client_id))
-                self.client.send(Message("client_ready", None, self.client_id))
+                self.client.send(Message("client_ready", {"capacity": self.capacity}, self.client_id))
                 self.worker_state = STATE_INIT
             elif msg.type == "quit":
                 logger.info("Got quit message from master, shutting down...")
@@ -897,9 +1393,160 @@ class WorkerRunner(DistributedRunner):
                 self._send_stats()
             except RPCError as e:
                 logger.error("Temporary connection lost to master server: %s, will retry later." % (e))
-            gevent.sleep(WORKER_REPORT_INTERVAL)
+            # jittered, so that workers that were started together don't all report at the same time
+            # 加入抖动，使同时启动的worker不会在同一时间报告
+            gevent.sleep(self.report_interval * random.uniform(1 - REPORT_JITTER, 1 + REPORT_JITTER))
 
     def _send_stats(self):
         data = {}
         self.environment.events.report_to_master.fire(client_id=self.client_id, data=data)
         self.client.send(Message("stats", data, self.client_id))
+
+
+class RelayRunner(DistributedRunner):
+    """
+    Runner for the relays of a hierarchical cluster, which sit between groups of workers and the master so
+    that the master isn't the bottleneck of very large clusters.
+    分层集群中的relay运行器，位于各组worker与master之间，使master不会成为超大集群的瓶颈。
+
+    Workers connect to a relay just like they would to a master, and the relay forwards their messages to
+    the master unchanged, and the master's messages back to them, except for the stats reports and
+    heartbeats. Those are merged (with the same worker_report and report_to_master listeners as on the master
+    and the workers) and sent on as one stats report every report_interval seconds, so that the master only
+    has to unserialize and merge one report per relay. Custom report data therefore reaches the master only
+    if the listeners add it back to the relay's report.
+    worker连接relay就像连接master一样，relay将它们的消息原样转发给master，并将master的消息转发回去，
+    但统计报告和心跳除外: 它们被合并后每report_interval秒作为一个统计报告发给master，这样master每个relay只需合并一个报告。
+    """
+
+    def __init__(
+        self,
+        environment,
+        master_host,
+        master_port,
+        relay_bind_host,
+        relay_bind_port,
+        report_interval=RELAY_REPORT_INTERVAL,
+    ):
+        """
+        :param environment: Environment instance
+        :param master_host: Host/IP to use for connection to the master
+        :param master_port: Port to use for connecting to the master
+        :param relay_bind_host: Host/interface to use for incoming worker connections
+        :param relay_bind_port: Port to use for incoming worker connections
+        :param report_interval: How often (in seconds) the merged report is sent to the master. Must be shorter
+                                than the time after which the master considers a worker missing.
+        """
+        super().__init__(environment)
+        self.client_id = socket.gethostname() + "_relay_" + uuid4().hex
+        self.report_interval = report_interval
+        self.master_host = master_host
+        self.master_port = master_port
+        # the heartbeat and user count (when reported) of each worker since the last report
+        # 自上次报告以来每个worker的心跳和用户数
+        self.relayed = {}
+        self.user_counts = {}
+        self.worker_ids = set()
+        # the workers that the master has told to quit, and that haven't sent their final report yet
+        # master已让其退出、但还没发送最终报告的worker
+        self.quitting = set()
+        self.quit_requested = False
+        self.server = rpc.Server(relay_bind_host, relay_bind_port)
+        self.client = rpc.Client(master_host, master_port, self.client_id)
+        self.greenlet.spawn(self.worker_listener).link_exception(greenlet_exception_handler)
+        self.greenlet.spawn(self.master_listener).link_exception(greenlet_exception_handler)
+        self.greenlet.spawn(self.stats_reporter).link_exception(greenlet_exception_handler)
+
+        def on_worker_report(client_id, data):
+            self.relayed.setdefault(client_id, {})["user_count"] = data["user_count"]
+            self.user_counts[client_id] = data["user_count"]
+
+        self.environment.events.worker_report.add_listener(on_worker_report)
+
+    @property
+    def user_count(self):
+        return sum(self.user_counts.values())
+
+    def worker_listener(self):
+        while True:
+            try:
+                client_id, msg = self.server.recv_from_client()
+            except RPCError as e:
+                logger.error("RPCError found when receiving from worker: %s" % (e))
+                gevent.sleep(FALLBACK_INTERVAL)
+                continue
+            msg.node_id = client_id
+            if msg.type == "heartbeat":
+                self.relayed.setdefault(client_id, {}).update(msg.data)
+            elif msg.type == "stats":
+                self.environment.events.worker_report.fire(client_id=client_id, data=msg.data)
+            else:
+                if msg.type == "client_ready":
+                    self.worker_ids.add(client_id)
+                elif msg.type == "quit":
+                    self.worker_ids.discard(client_id)
+                    self.relayed.pop(client_id, None)
+                    self.user_counts.pop(client_id, None)
+                try:
+                    self.client.send(msg)
+                except RPCError as e:
+                    logger.error("RPCError found when forwarding to master: %s" % (e))
+            if msg.type in ("stats", "quit") and client_id in self.quitting:
+                # workers send a final report when they're told to quit
+                # worker被告知退出时会发送最终报告
+                self.quitting.discard(client_id)
+                self.worker_ids.discard(client_id)
+            if self.quit_requested and not self.worker_ids:
+                self.greenlet.spawn(self.quit)
+                return
+
+    def master_listener(self):
+        while True:
+            try:
+                msg = self.client.recv()
+            except RPCError as e:
+                logger.error("RPCError found when receiving from master: %s" % (e))
+                continue
+            self.server.send_to_client(msg)
+            if msg.type == "quit":
+                self.quitting.add(msg.node_id)
+                if not self.quit_requested:
+                    # the master quits all the workers, and the relay quits once they have sent their final
+                    # reports (or after a timeout)
+                    # master让所有worker退出，relay在它们发送最终报告之后(或超时后)退出
+                    logger.info("Got quit message from master, shutting down once the workers have quit...")
+                    self.quit_requested = True
+                    self.greenlet.add(gevent.spawn_later(FALLBACK_INTERVAL, self.quit))
+
+    def stats_reporter(self):
+        while True:
+            gevent.sleep(self.report_interval)
+            try:
+                self._send_stats()
+            except RPCError as e:
+                logger.error("Temporary connection lost to master server: %s, will retry later." % (e))
+
+    def _send_stats(self):
+        data = {}
+        self.environment.events.report_to_master.fire(client_id=self.client_id, data=data)
+        # only what the workers have sent since the last report is passed on, so that the master notices
+        # when a worker stops sending heartbeats
+        # 只转发自上次报告以来worker发送的内容，这样worker停止发送心跳时master能发现
+        data["relayed"], self.relayed = self.relayed, {}
+        self.client.send(Message("stats", data, self.client_id))
+
+    def stop(self):
+        # the relay doesn't run any users, its workers are stopped by the master
+        # relay不运行用户，它的worker由master停止
+        self.state = STATE_STOPPED
+
+    def quit(self):
+        if self.state == STATE_STOPPED:
+            return
+        try:
+            self._send_stats()  # send a final report, with any samples not yet passed on
+            self.client.flush()
+        except RPCError as e:
+            logger.error("RPCError found when sending the final report: %s" % (e))
+        self.stop()
+        self.greenlet.kill(block=True)
@@ -0,0 +1,325 @@
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MAGIC = b"LCSTSMP1"
+
+HEADER = struct.Struct("<8sQ")
+"""
+Header at the start of every segment file: magic bytes and the number of records in the segment
+每个分段文件开头的头部: 魔数和该分段中的记录数
+"""
+
+HEADER_SIZE = 64
+
+RECORD = struct.Struct("<dIfIH2x")
+"""
+Fixed width sample record: timestamp (seconds since epoch), name id, response time (ms, NaN if None),
+content length and status (STATUS_SUCCESS or STATUS_FAILURE)
+固定宽度的样本记录: 时间戳、名称id、响应时间(毫秒)、内容长度和状态
+"""
+
+STATUS_SUCCESS = 0
+STATUS_FAILURE = 1
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype(
+        [
+            ("timestamp", "<f8"),
+            ("name_id", "<u4"),
+            ("response_time", "<f4"),
+            ("content_length", "<u4"),
+            ("status", "<u2"),
+            ("padding", "V2"),
+        ]
+    )
+
+
+def segment_file_name(prefix, index):
+    return "%s_%05i.samples" % (prefix, index)
+
+
+def names_file_name(prefix):
+    return prefix + ".names"
+
+
+def matching_name_ids(names, method, name):
+    """
+    The ids in the {id: (method, name)} dict *names* that match *method* and *name* (None matches any)
+    """
+    return [id for id, (m, n) in names.items() if (method is None or m == method) and (name is None or n == name)]
+
+
+class SampleRecorder(object):
+    """
+    Records every request (as reported by the request_success and request_failure events) as a fixed
+    width binary record in a memory mapped file.
+    将每个请求(由request_success和request_failure事件报告)作为固定宽度的二进制记录写入内存映射文件。
+
+    Records are copied straight into the mapped pages, so logging a sample never does any blocking I/O
+    on the gevent loop; the OS writes the pages back in the background. When a segment file is full the
+    recorder continues in a new one, and if max_segments is set the oldest segments are deleted.
+    Request names are stored once, in the PREFIX.names file, and records refer to them by id.
+    记录直接复制到映射的页面中，因此记录样本永远不会在gevent循环上进行阻塞I/O。分段文件写满后继续写入新的分段。
+    """
+
+    def __init__(self, environment, prefix, segment_size=DEFAULT_SEGMENT_SIZE, max_segments=None):
+        """
+        :param environment: Environment whose request events are recorded
+        :param prefix: Path prefix of the files, segments are written to PREFIX_00000.samples, PREFIX_00001.samples...
+        :param segment_size: Size in bytes of each segment file
+        :param max_segments: If set, only this many segments are kept on disk
+        """
+        if segment_size < HEADER_SIZE + RECORD.size:
+            raise ValueError("segment_size is too small")
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.capacity = (segment_size - HEADER_SIZE) // RECORD.size
+        self.name_ids = {}
+        self.names_file = open(names_file_name(prefix), "w")
+        self.segment_index = -1
+        self.segments = []
+        self.file = None
+        self.mmap = None
+        self.count = 0
+        self._open_segment()
+
+        environment.events.request_success.add_listener(self.on_request_success)
+        environment.events.request_failure.add_listener(self.on_request_failure)
+        environment.events.quitting.add_listener(self.on_quitting)
+        self.environment = environment
+
+    def on_request_success(self, request_type, name, response_time, response_length, **kwargs):
+        self.record(request_type, name, response_time, response_length, STATUS_SUCCESS)
+
+    def on_request_failure(self, request_type, name, response_time, response_length, exception, **kwargs):
+        self.record(request_type, name, response_time, response_length, STATUS_FAILURE)
+
+    def on_quitting(self, environment, **kwargs):
+        self.close()
+
+    def name_id(self, method, name):
+        """
+        Return the id of (method, name), writing it to the names file the first time it's seen
+        返回(method, name)的id，第一次出现时将其写入名称文件
+        """
+        key = (method, name)
+        id = self.name_ids.get(key)
+        if id is None:
+            id = self.name_ids[key] = len(self.name_ids)
+            self.names_file.write(json.dumps([id, method, name]) + "\n")
+            self.names_file.flush()
+        return id
+
+    def record(self, method, name, response_time, content_length, status, timestamp=None):
+        if self.mmap is None:
+            return
+        if self.count == self.capacity:
+            self._open_segment()
+        RECORD.pack_into(
+            self.mmap,
+            HEADER_SIZE + self.count * RECORD.size,
+            time.time() if timestamp is None else timestamp,
+            self.name_id(method, name),
+            math.nan if response_time is None else response_time,
+            min(content_length or 0, 0xFFFFFFFF),
+            status,
+        )
+        self.count += 1
+        HEADER.pack_into(self.mmap, 0, MAGIC, self.count)
+
+    def _open_segment(self):
+        self._close_segment()
+        self.segment_index += 1
+        path = segment_file_name(self.prefix, self.segment_index)
+        self.file = open(path, "w+b")
+        self.file.truncate(self.segment_size)
+        self.mmap = mmap.mmap(self.file.fileno(), self.segment_size)
+        self.count = 0
+        HEADER.pack_into(self.mmap, 0, MAGIC, 0)
+        self.segments.append(path)
+        if self.max_segments is not None:
+            while len(self.segments) > self.max_segments:
+                os.remove(self.segments.pop(0))
+
+    def _close_segment(self):
+        if self.mmap is None:
+            return
+        self.mmap.close()
+        # drop the unused tail of the preallocated segment
+        self.file.truncate(HEADER_SIZE + self.count * RECORD.size)
+        self.file.close()
+        self.mmap = None
+        self.file = None
+
+    def close(self):
+        """
+        Close the current segment and the names file. Samples logged after this are ignored.
+        """
+        if self.names_file.closed:
+            return
+        self._close_segment()
+        self.names_file.close()
+        self.environment.events.request_success.remove_listener(self.on_request_success)
+        self.environment.events.request_failure.remove_listener(self.on_request_failure)
+
+
+class SampleReader(object):
+    """
+    Reads the files written by one or more SampleRecorders (e.g. one per worker) for offline analysis:
+    exact response time percentiles and latency heatmaps. Uses NumPy (memory mapping the segments) when
+    it's installed, and falls back to pure Python otherwise.
+    读取一个或多个SampleRecorder写入的文件，用于离线分析: 精确的响应时间百分位数和延迟热图。
+    """
+
+    def __init__(self, *prefixes):
+        """
+        :param prefixes: Path prefixes that were passed to SampleRecorder
+        """
+        self.sources = []
+        self.names = set()
+        for prefix in prefixes:
+            names = {}
+            with open(names_file_name(prefix)) as f:
+                for line in f:
+                    id, method, name = json.loads(line)
+                    names[id] = (method, name)
+            self.names.update(names.values())
+            self.sources.append((sorted(glob.glob(glob.escape(prefix) + "_" + "[0-9]" * 5 + ".samples")), names))
+
+    def chunks(self):
+        """
+        Yield (records, names) for every segment, where records is a NumPy structured array (or a list of
+        tuples without NumPy) and names maps name ids to (method, name)
+        """
+        for paths, names in self.sources:
+            for path in paths:
+                with open(path, "rb") as f:
+                    magic, count = HEADER.unpack(f.read(HEADER.size))
+                    if magic != MAGIC:
+                        raise ValueError("%s is not a sample file" % path)
+                    if not count:
+                        continue
+                    if numpy is not None:
+                        records = numpy.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+                        yield records, names
+                    else:
+                        f.seek(HEADER_SIZE)
+                        yield list(RECORD.iter_unpack(f.read(count * RECORD.size))), names
+
+    def response_times(self, method=None, name=None, start=None, end=None, failures=True):
+        """
+        Return the response times of the matching samples (requests without a response time are left out)
+        返回匹配样本的响应时间
+        """
+        selected = []
+        for records, names in self.chunks():
+            ids = matching_name_ids(names, method, name)
+            if numpy is not None:
+                mask = ~numpy.isnan(records["response_time"])
+                if method is not None or name is not None:
+                    mask &= numpy.isin(records["name_id"], ids)
+                if start is not None:
+                    mask &= records["timestamp"] >= start
+                if end is not None:
+                    mask &= records["timestamp"] < end
+                if not failures:
+                    mask &= records["status"] == STATUS_SUCCESS
+                selected.append(numpy.asarray(records["response_time"][mask], dtype=numpy.float64))
+            else:
+                ids = set(ids)
+                selected.extend(
+                    response_time
+                    for timestamp, name_id, response_time, _, status in records
+                    if name_id in ids
+                    and not math.isnan(response_time)
+                    and (start is None or timestamp >= start)
+                    and (end is None or timestamp < end)
+                    and (failures or status == STATUS_SUCCESS)
+                )
+        if numpy is not None:
+            return numpy.concatenate(selected) if selected else numpy.empty(0)
+        return selected
+
+    def percentiles(self, percentiles, **filters):
+        """
+        Return the exact response time at each of *percentiles* (0.0 - 1.0), using the nearest-rank method.
+        Accepts the same filters as response_times().
+        返回每个百分位数的精确响应时间(最近秩法)
+        """
+        response_times = self.response_times(**filters)
+        count = len(response_times)
+        if not count:
+            return [0 for _ in percentiles]
+        ranks = [min(count - 1, max(0, math.ceil(percentile * count) - 1)) for percentile in percentiles]
+        if numpy is not None:
+            partitioned = numpy.partition(response_times, sorted(set(ranks)))
+            return [float(partitioned[rank]) for rank in ranks]
+        response_times = sorted(response_times)
+        return [response_times[rank] for rank in ranks]
+
+    def heatmap(
+        self, interval=1.0, response_time_buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000), **filters
+    ):
+        """
+        Count the samples per time interval and response time bucket. Returns (start_time, counts), where
+        counts[i][j] is the number of samples in [start_time + i * interval, start_time + (i + 1) * interval)
+        with a response time <= response_time_buckets[j] (and above the previous bucket). The last column
+        counts the samples above the last bucket.
+        按时间间隔和响应时间桶统计样本数，返回(start_time, counts)
+        """
+        method = filters.pop("method", None)
+        name = filters.pop("name", None)
+        if filters:
+            raise TypeError("Unexpected filters %s" % ", ".join(filters))
+        rows = []
+        for records, names in self.chunks():
+            ids = matching_name_ids(names, method, name)
+            if numpy is not None:
+                mask = ~numpy.isnan(records["response_time"]) & numpy.isin(records["name_id"], ids)
+                rows.append((records["timestamp"][mask], records["response_time"][mask]))
+            else:
+                ids = set(ids)
+                rows.append([(r[0], r[2]) for r in records if r[1] in ids and not math.isnan(r[2])])
+
+        if numpy is not None:
+            timestamps = numpy.concatenate([t for t, _ in rows]) if rows else numpy.empty(0)
+            if not len(timestamps):
+                return None, []
+            response_times = numpy.concatenate([r for _, r in rows])
+            start_time = math.floor(timestamps.min() / interval) * interval
+            time_index = ((timestamps - start_time) // interval).astype(numpy.intp)
+            bucket_index = numpy.searchsorted(numpy.asarray(response_time_buckets), response_times, side="left")
+            counts = numpy.zeros((int(time_index.max()) + 1, len(response_time_buckets) + 1), dtype=numpy.int64)
+            numpy.add.at(counts, (time_index, bucket_index), 1)
+            return start_time, counts.tolist()
+
+        samples = [sample for chunk in rows for sample in chunk]
+        if not samples:
+            return None, []
+        start_time = math.floor(min(t for t, _ in samples) / interval) * interval
+        counts = []
+        for timestamp, response_time in samples:
+            i = int((timestamp - start_time) // interval)
+            while len(counts) <= i:
+                counts.append([0] * (len(response_time_buckets) + 1))
+            j = len(response_time_buckets)
+            for k, bucket in enumerate(response_time_buckets):
+                if response_time <= bucket:
+                    j = k
+                    break
+            counts[i][j] += 1
+        return start_time, counts
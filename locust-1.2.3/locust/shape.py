@@ -32,6 +32,10 @@ class LoadTestShape(object):
             user_count -- Total user count 用户总数
             spawn_rate -- Number of users to start/stop per second when changing number of users 改变用户数量时每秒要启动/停止的用户数量
 
+        A third element, arrival_rate, turns the test into an open model test where that many tasks are
+        started per second, and user_count is the maximum number of users used to run them.
+        第三个元素arrival_rate将测试变为开放模型测试，每秒启动该数量的任务，user_count为最多使用的用户数。
+
         If `None` is returned then the running load test will be stopped.
         如果返回' None '，则正在运行的负载测试将停止。
 
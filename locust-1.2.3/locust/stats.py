@@ -1,14 +1,17 @@
 import datetime
+import gzip
 import hashlib
+import json
 import time
-from collections import namedtuple, OrderedDict
-from copy import copy
 from itertools import chain
 import csv
 
 import gevent
 
 from .exception import StopUser
+from .histogram import ResponseTimeHistogram, bucket_index, get_bucket_values, round_response_time
+from .history import StatsHistory
+from .util.phase_timer import PHASES
 
 import logging
 
@@ -36,6 +39,12 @@ Default interval for how frequently CSV files are written if this option is conf
 CSV_STATS_INTERVAL_SEC = 1
 CSV_STATS_FLUSH_INTERVAL_SEC = 10
 
+"""
+Formats that StatsCSVFileWriter can write the stats history in
+StatsCSVFileWriter可以写入统计历史的格式
+"""
+HISTORY_FORMATS = ("csv", "ndjson.gz")
+
 
 """
 Default window size/resolution - in seconds - when calculating the current
@@ -45,7 +54,24 @@ response time percentile
 CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW = 10
 
 
-CachedResponseTimes = namedtuple("CachedResponseTimes", ["response_times", "num_requests"])  # 具名元组：（响应时间， 请求数）
+"""
+Version of the stats report format that workers send to the master. Version 1 reports (which don't
+have a "stats_version" key) contain every StatsEntry serialized as a dict, version 2 reports contain
+the entries packed into compact lists (see StatsEntry.pack)
+worker发送给master的统计报告格式的版本
+"""
+STATS_REPORT_VERSION = 2
+
+"""
+Name of the stats entry that requests are counted in once RequestStats.max_entries has been reached
+达到RequestStats.max_entries后，请求被计入的统计条目的名称
+"""
+OVERFLOW_ENTRY_NAME = "Other"
+
+"""
+Labels of the HTTP phases (see locust.util.phase_timer.PHASES) in the CSV files and web UI
+"""
+PHASE_LABELS = {"dns": "DNS", "connect": "Connect", "tls": "TLS", "ttfb": "TTFB", "download": "Download"}
 
 PERCENTILES_TO_REPORT = [0.50, 0.66, 0.75, 0.80, 0.90, 0.95, 0.98, 0.99, 0.999, 0.9999, 1.0]  # 百分位数报告
 
@@ -79,6 +105,9 @@ def calculate_response_time_percentile(response_times, num_requests, percent):
                   请求的数量(可以从response_times派生，但我们使用已经存储的值来节省一些CPU周期)
     percent: The percentile we want to calculate. Specified in range: 0.0 - 1.0 我们要计算的百分位数。指定范围内: 0.0 - 1.0
     """
+    if isinstance(response_times, ResponseTimeHistogram):
+        return response_times.percentile(num_requests, percent)
+
     num_of_request = int((num_requests * percent))
 
     processed_count = 0
@@ -90,6 +119,37 @@ def calculate_response_time_percentile(response_times, num_requests, percent):
     return 0
 
 
+def pack_per_sec(per_sec):
+    """
+    Pack a {second => count} dict into a [first_second, count, count, ...] list with one count for
+    every second from the first to the last second in the dict.
+    将{second => count}字典打包成[first_second, count, count, ...]列表
+
+    Worker entries are reset after every report, so the dicts only span a few seconds.
+    """
+    if not per_sec:
+        return []
+    first = min(per_sec)
+    return [first] + [per_sec.get(t, 0) for t in range(first, max(per_sec) + 1)]
+
+
+def unpack_per_sec(packed):
+    """
+    Inverse of pack_per_sec
+    """
+    if not packed:
+        return {}
+    first = packed[0]
+    return {first + i: count for i, count in enumerate(packed[1:]) if count}
+
+
+def unpack_phase_times(packed):
+    """
+    Inverse of the {phase: [response_time, count, ...]} packing of StatsEntry.pack()
+    """
+    return {phase: dict(zip(pairs[::2], pairs[1::2])) for phase, pairs in packed.items()}
+
+
 def diff_response_time_dicts(latest, old):
     """
     Returns the delta between two {response_times:request_count} dicts.
@@ -108,13 +168,119 @@ def diff_response_time_dicts(latest, old):
     return new
 
 
+class ResponseTimesWindow(object):
+    """
+    Ring buffer with one slot per second that holds the response times (and number of requests)
+    logged during that second. Summing the slots of the last CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW
+    seconds gives the response time distribution used for the *current* response time percentiles.
+    每秒一个槽位的环形缓冲区，保存该秒内记录的响应时间(和请求数)。
+    将最近CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW秒的槽位相加，即可得到计算*当前*响应时间百分位数所用的分布。
+
+    Each slot only holds the delta for its own second, so nothing is copied when a new second starts and
+    memory use is bounded by the window size and the number of distinct (rounded) response times.
+    每个槽位只保存自己这一秒的增量，所以进入新的一秒时无需复制任何数据，内存使用量是有界的。
+
+    When a ResponseTimeHistogram is used for the response times, the slots are keyed by bucket index,
+    otherwise by the rounded response time.
+    """
+
+    def __init__(self, window=None, histogram_precision=None):
+        if window is None:
+            window = CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW
+        self.window = window
+        self.histogram_precision = histogram_precision
+        # one extra slot so that the current second never overwrites the oldest second of the window
+        # 额外的一个槽位，使当前秒永远不会覆盖窗口中最早的一秒
+        self.size = window + 1
+        self.seconds = [None] * self.size
+        self.response_times = [None] * self.size
+        self.num_requests = [0] * self.size
+
+    def _slot(self, t):
+        i = t % self.size
+        if self.seconds[i] != t:
+            if self.seconds[i] is not None and self.seconds[i] > t:
+                # t is too old to fit in the window
+                return None
+            self.seconds[i] = t
+            self.response_times[i] = {}
+            self.num_requests[i] = 0
+        return i
+
+    def add(self, t, key, count=1):
+        """
+        Record *count* requests at second *t*. *key* is the rounded response time (or histogram bucket index)
+        and can be None for requests without a response time.
+        """
+        i = self._slot(t)
+        if i is None:
+            return
+        self.num_requests[i] += count
+        if key is not None:
+            slot = self.response_times[i]
+            slot[key] = slot.get(key, 0) + count
+
+    def merge(self, t, response_times, num_requests):
+        """
+        Record a {response_time => count} mapping (e.g. from a worker report) at second *t*
+        在第t秒记录一个{response_time => count}映射(例如来自worker的报告)
+        """
+        i = self._slot(t)
+        if i is None:
+            return
+        self.num_requests[i] += num_requests
+        slot = self.response_times[i]
+        if self.histogram_precision is None:
+            items = response_times.items()
+        elif isinstance(response_times, ResponseTimeHistogram):
+            items = ((index, count) for index, count in enumerate(response_times.counts) if count)
+        else:
+            last_index = len(get_bucket_values(self.histogram_precision)) - 1
+            items = (
+                (bucket_index(response_time, self.histogram_precision, last_index), count)
+                for response_time, count in response_times.items()
+            )
+        for key, count in items:
+            slot[key] = slot.get(key, 0) + count
+
+    def get(self, t):
+        """
+        Return a (response_times, num_requests) tuple for the window that ends at second *t*
+        返回以第t秒结束的窗口的(response_times, num_requests)元组
+        """
+        if self.histogram_precision is None:
+            response_times = {}
+        else:
+            response_times = ResponseTimeHistogram(self.histogram_precision)
+        num_requests = 0
+        for i, second in enumerate(self.seconds):
+            if second is None or not t - self.window < second <= t:
+                continue
+            num_requests += self.num_requests[i]
+            if self.histogram_precision is None:
+                for key, count in self.response_times[i].items():
+                    response_times[key] = response_times.get(key, 0) + count
+            else:
+                for index, count in self.response_times[i].items():
+                    response_times.counts[index] += count
+                    response_times.total_count += count
+        return response_times, num_requests
+
+
 class RequestStats(object):
     """
     Class that holds the request statistics.
     保存请求统计信息的。
     """
 
-    def __init__(self, use_response_times_cache=True):
+    def __init__(
+        self,
+        use_response_times_cache=True,
+        histogram_precision=None,
+        name_templater=None,
+        max_entries=None,
+        history_per_entry=False,
+    ):
         """
         :param use_response_times_cache: The value of use_response_times_cache will be set for each StatsEntry()
                                          when they are created. Settings it to False saves some memory and CPU
@@ -122,12 +288,39 @@ class RequestStats(object):
                                          is not needed.
         使用响应时间缓存:在创建每个StatsEntry()时，将为它们设置使用响应时间缓存的值。
                         将其设置为False可以节省一些内存和CPU周期，我们可以在不需要响应时间缓存的Worker节点上这样做。
+        :param histogram_precision: If set, each StatsEntry() stores its response times in an array backed
+                                    ResponseTimeHistogram with this many significant digits, instead of a dict.
+        直方图精度:如果设置，每个StatsEntry()将响应时间存储在具有该有效数字位数的ResponseTimeHistogram中，而不是字典中。
+        :param name_templater: Optional callable (e.g. a
+                               :class:`NameTemplater <locust.util.name_template.NameTemplater>`) that maps request
+                               names to the name of the entry they are counted in, used to collapse names with IDs
+                               in them into templates.
+        名称模板:可选的可调用对象，将请求名称映射到统计条目的名称，用于将包含ID的名称折叠成模板。
+        :param max_entries: If set, requests for new names are counted in a single OVERFLOW_ENTRY_NAME entry (per
+                            method) once this many entries exist.
+        最大条目数:如果设置，当条目数达到该值后，新名称的请求将被计入OVERFLOW_ENTRY_NAME条目中。
+        :param history_per_entry: Whether stats_history() should record a time series for every entry, and not
+                                  just for the total.
         """
         self.use_response_times_cache = use_response_times_cache
+        self.histogram_precision = histogram_precision
+        self.name_templater = name_templater
+        self.max_entries = max_entries
         self.entries = {}  # 条目
         self.errors = {}
-        self.total = StatsEntry(self, "Aggregated", None, use_response_times_cache=self.use_response_times_cache)
-        self.history = []
+        self.total = self._create_entry("Aggregated", None)
+        self.history = StatsHistory(per_entry=history_per_entry)
+        # the auxiliary stats, e.g. self.arrivals (see AUX_STATS)
+        # 辅助统计，例如self.arrivals
+        for name, stats_class in AUX_STATS.items():
+            setattr(self, name, stats_class())
+
+    def aux_stats(self):
+        """
+        The (name, stats) of the auxiliary stats (see AUX_STATS)
+        辅助统计的(名称, 统计)
+        """
+        return [(name, getattr(self, name)) for name in AUX_STATS]
 
     @property
     def num_requests(self):  # 请求数量
@@ -149,19 +342,57 @@ class RequestStats(object):
     def start_time(self):  # 开始的时间
         return self.total.start_time
 
-    def log_request(self, method, name, response_time, content_length):
+    def log_request(self, method, name, response_time, content_length, phase_times=None):
+        """
+        :param phase_times: Optional {phase: milliseconds} dict with the HTTP phase timings of the request
+        """
         self.total.log(response_time, content_length)
-        self.get(name, method).log(response_time, content_length)
+        entry = self.get(name, method)
+        entry.log(response_time, content_length)
+        if phase_times:
+            self.total.log_phase_times(phase_times)
+            entry.log_phase_times(phase_times)
+
+    def log_requests(self, requests):
+        """
+        Log a batch of (method, name, response_time, content_length, exception, ...) tuples, as fired
+        by the request_batch event. Requests with an exception are also logged as errors.
+        记录一批请求(由request_batch事件触发)，带有异常的请求也会被记录为错误。
+        """
+        now = time.time()
+        grouped = {}
+        errors = []
+        phase_times = []
+        for method, name, response_time, content_length, exception, *extra in requests:
+            key = (name, method)
+            if key in grouped:
+                grouped[key].append((response_time, content_length))
+            else:
+                grouped[key] = [(response_time, content_length)]
+            if exception is not None:
+                errors.append((method, name, exception))
+            if extra and extra[0] and extra[0].get("phase_times"):
+                phase_times.append((method, name, extra[0]["phase_times"]))
+
+        self.total.log_many(list(chain.from_iterable(grouped.values())), now)
+        for (name, method), logged in grouped.items():
+            self.get(name, method).log_many(logged, now)
+        for method, name, timings in phase_times:
+            self.total.log_phase_times(timings)
+            self.get(name, method).log_phase_times(timings)
+        for method, name, exception in errors:
+            self.log_error(method, name, exception)
 
     def log_error(self, method, name, error):
         self.total.log_error(error)
-        self.get(name, method).log_error(error)
+        stats_entry = self.get(name, method)
+        stats_entry.log_error(error)
 
-        # store error in errors dict在错误字典中存储错误
-        key = StatsError.create_key(method, name, error)
+        # store error in errors dict (under the templated name)在错误字典中存储错误
+        key = StatsError.create_key(method, stats_entry.name, error)
         entry = self.errors.get(key)
         if not entry:
-            entry = StatsError(method, name, error)
+            entry = StatsError(method, stats_entry.name, error)
             self.errors[key] = entry
         entry.occurred()
 
@@ -169,13 +400,38 @@ class RequestStats(object):
         """
         Retrieve a StatsEntry instance by name and method
         按名称和方法检索Stats Entry实例
+
+        If a name_templater is set the name is templated first, and if max_entries has been reached the
+        OVERFLOW_ENTRY_NAME entry is returned for names that don't have an entry yet.
         """
         entry = self.entries.get((name, method))
-        if not entry:
-            entry = StatsEntry(self, name, method, use_response_times_cache=self.use_response_times_cache)
-            self.entries[(name, method)] = entry
+        if entry:
+            return entry
+        if self.name_templater is not None:
+            name = self.name_templater(name)
+            entry = self.entries.get((name, method))
+            if entry:
+                return entry
+        if self.max_entries is not None and len(self.entries) >= self.max_entries:
+            name = OVERFLOW_ENTRY_NAME
+            entry = self.entries.get((name, method))
+            if entry:
+                return entry
+        entry = self._create_entry(name, method)
+        self.entries[(name, method)] = entry
         return entry
 
+    def _create_entry(self, name, method, use_response_times_cache=None):
+        if use_response_times_cache is None:
+            use_response_times_cache = self.use_response_times_cache
+        return StatsEntry(
+            self,
+            name,
+            method,
+            use_response_times_cache=use_response_times_cache,
+            histogram_precision=self.histogram_precision,
+        )
+
     def reset_all(self):
         """
         Go through all stats entries and reset them to zero
@@ -185,17 +441,21 @@ class RequestStats(object):
         self.errors = {}
         for r in self.entries.values():
             r.reset()
-        self.history = []
+        self.history.clear()
+        for _, aux_stats in self.aux_stats():
+            aux_stats.reset()
 
     def clear_all(self):
         """
         Remove all stats entries and errors
         删除所有的统计条目和错误
         """
-        self.total = StatsEntry(self, "Aggregated", None, use_response_times_cache=self.use_response_times_cache)
+        self.total = self._create_entry("Aggregated", None)
         self.entries = {}
         self.errors = {}
-        self.history = []
+        self.history.clear()
+        for _, aux_stats in self.aux_stats():
+            aux_stats.reset()
 
     def serialize_stats(self): # 序列化数据
         return [
@@ -204,6 +464,19 @@ class RequestStats(object):
             if not (self.entries[key].num_requests == 0 and self.entries[key].num_failures == 0)
         ]
 
+    def pack_stats(self):
+        """
+        Return the entries that have been touched since the last report packed into compact lists,
+        and reset them
+        返回自上次报告以来有变化的条目(打包成紧凑的列表)，并重置它们
+        """
+        packed = []
+        for entry in self.entries.values():
+            if entry.num_requests or entry.num_failures:
+                packed.append(entry.pack())
+                entry.reset()
+        return packed
+
     def serialize_errors(self):
         return dict([(k, e.to_dict()) for k, e in self.errors.items()])
 
@@ -261,22 +534,40 @@ class StatsEntry(object):
 
     This dict is used to calculate the median and percentile response times.
     此字典用于计算响应时间的中位数和百分位数
+
+    If histogram_precision is set, this is a :class:`ResponseTimeHistogram <locust.histogram.ResponseTimeHistogram>`
+    (which behaves like the dict) instead.
+    如果设置了histogram_precision，这里将是一个ResponseTimeHistogram(行为与字典相同)
+    """
+
+    histogram_precision = None
+    """
+    Number of significant digits of the ResponseTimeHistogram used for response_times, or None to use a dict
+    response_times使用的ResponseTimeHistogram的有效数字位数，None表示使用字典
     """
 
     use_response_times_cache = False  # 使用响应时间缓存
     """
-    If set to True, the copy of the response_time dict will be stored in response_times_cache
-    every second, and kept for 20 seconds (by default, will be CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 10).
-    We can use this dict to calculate the *current*  median response time, as well as other response
+    If set to True, the response times of each second will also be recorded in response_times_cache,
+    a sliding window of the last CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW seconds.
+    We can use it to calculate the *current*  median response time, as well as other response
     time percentiles.
-    如果设置为True，则响应时间字典的副本将每秒钟存储在响应时间缓存中，并保持20秒(默认为当前响应时间百分比窗口+ 10)。
-    我们可以使用这个字典来计算*当前*中值响应时间，以及其他响应时间百分位数。
+    如果设置为True，每一秒的响应时间也会记录在响应时间缓存中(最近CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW秒的滑动窗口)。
+    我们可以使用它来计算*当前*中值响应时间，以及其他响应时间百分位数。
     """
 
     response_times_cache = None
     """
-    If use_response_times_cache is set to True, this will be a {timestamp => CachedResponseTimes()}
-    OrderedDict that holds a copy of the response_times dict for each of the last 20 seconds.
+    If use_response_times_cache is set to True, this will be a :class:`ResponseTimesWindow` ring buffer
+    that holds the response times logged in each of the last CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW seconds.
+    """
+
+    phase_times = None
+    """
+    A {phase => {response_time => count}} dict with the distribution of the time spent in each HTTP phase
+    (see locust.util.phase_timer.PHASES), rounded like response_times. Only filled in when HTTP phase
+    timings are enabled, and connection phases are only counted for requests that opened a new connection.
+    每个HTTP阶段所花费时间的分布，仅在启用HTTP阶段计时时填充
     """
 
     total_content_length = None
@@ -294,11 +585,12 @@ class StatsEntry(object):
     last_request_timestamp = None
     """ Time of the last request for this entry """
 
-    def __init__(self, stats, name, method, use_response_times_cache=False):
+    def __init__(self, stats, name, method, use_response_times_cache=False, histogram_precision=None):
         self.stats = stats
         self.name = name
         self.method = method
         self.use_response_times_cache = use_response_times_cache
+        self.histogram_precision = histogram_precision
         self.reset()
 
     def reset(self):
@@ -307,43 +599,69 @@ class StatsEntry(object):
         self.num_none_requests = 0
         self.num_failures = 0
         self.total_response_time = 0
-        self.response_times = {}
+        self.response_times = self._create_response_times()
         self.min_response_time = None
         self.max_response_time = 0
         self.last_request_timestamp = None
         self.num_reqs_per_sec = {}
         self.num_fail_per_sec = {}
         self.total_content_length = 0
+        self.phase_times = {}
         if self.use_response_times_cache:
-            self.response_times_cache = OrderedDict()
-            self._cache_response_times(int(time.time()))
+            self.response_times_cache = ResponseTimesWindow(histogram_precision=self.histogram_precision)
 
     def log(self, response_time, content_length):
         # get the time
         current_time = time.time()
-        t = int(current_time)
-
-        if self.use_response_times_cache and self.last_request_timestamp and t > int(self.last_request_timestamp):
-            # see if we shall make a copy of the response_times dict and store in the cache
-            # 看看我们是否应该复制一个响应时间字典并存储在缓存中
-            self._cache_response_times(t - 1)
 
         self.num_requests += 1
         self._log_time_of_request(current_time)
-        self._log_response_time(response_time)
+        key = self._log_response_time(response_time)
+
+        if self.use_response_times_cache:
+            # record the request in the current second's slot of the sliding window
+            # 将请求记录到滑动窗口中当前秒的槽位
+            self.response_times_cache.add(int(current_time), key)
 
         # increase total content-length
         self.total_content_length += content_length
 
+    def log_many(self, requests, current_time=None):
+        """
+        Log a list of (response_time, content_length) pairs as if they all finished at *current_time*
+        (defaults to now). Cheaper than calling log() for each of them.
+        记录一组(response_time, content_length)，视为它们都在current_time完成，比逐个调用log()开销更小。
+        """
+        if current_time is None:
+            current_time = time.time()
+        t = int(current_time)
+        count = len(requests)
+        self.num_requests += count
+        self.num_reqs_per_sec[t] = self.num_reqs_per_sec.get(t, 0) + count
+        self.last_request_timestamp = current_time
+
+        log_response_time = self._log_response_time
+        keys = [log_response_time(response_time) for response_time, _ in requests]
+        if self.use_response_times_cache:
+            add = self.response_times_cache.add
+            for key in keys:
+                add(t, key)
+
+        self.total_content_length += sum(content_length for _, content_length in requests)
+
     def _log_time_of_request(self, current_time):
         t = int(current_time)
         self.num_reqs_per_sec[t] = self.num_reqs_per_sec.setdefault(t, 0) + 1
         self.last_request_timestamp = current_time
 
     def _log_response_time(self, response_time):
+        """
+        Returns the key (rounded response time or histogram bucket index) the response time was counted under
+        返回响应时间被计入的键(舍入后的响应时间或直方图桶索引)
+        """
         if response_time is None:
             self.num_none_requests += 1
-            return
+            return None
 
         self.total_response_time += response_time
 
@@ -353,6 +671,10 @@ class StatsEntry(object):
         self.min_response_time = min(self.min_response_time, response_time)
         self.max_response_time = max(self.max_response_time, response_time)
 
+        if self.histogram_precision is not None:
+            # the histogram does the rounding itself 直方图自己负责舍入
+            return self.response_times.add(response_time)
+
         # to avoid to much data that has to be transferred to the master node when
         # running in distributed mode, we save the response time rounded in a dict
         # so that 147 becomes 150, 3432 becomes 3400 and 58760 becomes 59000
@@ -369,6 +691,27 @@ class StatsEntry(object):
         # increase request count for the rounded key in response time dict 在响应时间字典中增加舍入键的请求计数
         self.response_times.setdefault(rounded_response_time, 0)
         self.response_times[rounded_response_time] += 1
+        return rounded_response_time
+
+    def log_phase_times(self, phase_times):
+        """
+        Log the {phase: milliseconds} timings of one request
+        记录一个请求的各阶段耗时
+        """
+        for phase, elapsed in phase_times.items():
+            times = self.phase_times.get(phase)
+            if times is None:
+                times = self.phase_times[phase] = {}
+            key = round_response_time(elapsed)
+            times[key] = times.get(key, 0) + 1
+
+    def _merge_phase_times(self, phase_times):
+        for phase, times in phase_times.items():
+            merged = self.phase_times.get(phase)
+            if merged is None:
+                merged = self.phase_times[phase] = {}
+            for key, count in times.items():
+                merged[key] = merged.get(key, 0) + count
 
     def log_error(self, error):
         self.num_failures += 1
@@ -465,11 +808,6 @@ class StatsEntry(object):
         StatsEntry instance.
         使用另一个StatsEntry的统计数据扩展当前StatsEntry的数据StatsEntry实例。
         """
-        # save the old last_request_timestamp, to see if we should store a new copy
-        # of the response times in the response times cache
-        # 保存旧的last_request_timestamp，看看是否应该在响应时间缓存中存储一个新的响应时间副本
-        old_last_request_timestamp = self.last_request_timestamp
-
         if self.last_request_timestamp is not None and other.last_request_timestamp is not None:
             self.last_request_timestamp = max(self.last_request_timestamp, other.last_request_timestamp)
         elif other.last_request_timestamp is not None:
@@ -489,29 +827,29 @@ class StatsEntry(object):
             self.min_response_time = other.min_response_time
         self.total_content_length = self.total_content_length + other.total_content_length
 
-        for key in other.response_times:
-            self.response_times[key] = self.response_times.get(key, 0) + other.response_times[key]
+        if self.histogram_precision is not None:
+            self.response_times.merge(other.response_times)
+        else:
+            for key in other.response_times:
+                self.response_times[key] = self.response_times.get(key, 0) + other.response_times[key]
         for key in other.num_reqs_per_sec:
             self.num_reqs_per_sec[key] = self.num_reqs_per_sec.get(key, 0) + other.num_reqs_per_sec[key]
         for key in other.num_fail_per_sec:
             self.num_fail_per_sec[key] = self.num_fail_per_sec.get(key, 0) + other.num_fail_per_sec[key]
+        if other.phase_times:
+            self._merge_phase_times(other.phase_times)
 
         if self.use_response_times_cache:
-            # If we've entered a new second, we'll cache the response times. Note that there
-            # might still be reports from other worker nodes - that contains requests for the same
-            # time periods - that hasn't been received/accounted for yet. This will cause the cache to
-            # lag behind a second or two, but since StatsEntry.current_response_time_percentile()
-            # (which is what the response times cache is used for) uses an approximation of the
-            # last 10 seconds anyway, it should be fine to ignore this.
-            # 如果我们输入了新的秒，我们将缓存响应时间。
-            # 注意，可能仍然有来自其他工作节点的报告——其中包含同一时间段的请求——还没有收到/解释。
-            # 这将导致缓存延迟一到两秒，但由于StatsEntry.current_response_time_percentile()(这是响应时间缓存的用途)使用的是最近10秒的近似，所以忽略这个应该没问题。
-            last_time = self.last_request_timestamp and int(self.last_request_timestamp) or None
-            if last_time and last_time > (old_last_request_timestamp and int(old_last_request_timestamp) or 0):
-                self._cache_response_times(last_time)
+            # The merged requests are all accounted to the second in which they were received. Worker
+            # reports contain a few seconds worth of requests, so the window lags behind a second or two,
+            # but since StatsEntry.current_response_time_percentile() (which is what the response times
+            # cache is used for) uses an approximation of the last 10 seconds anyway, it should be fine.
+            # 合并的请求都计入收到它们的那一秒。worker的报告包含几秒钟的请求，所以窗口会延迟一到两秒，
+            # 但由于StatsEntry.current_response_time_percentile()使用的是最近10秒的近似，所以这应该没问题。
+            self.response_times_cache.merge(int(time.time()), other.response_times, other.num_requests)
 
     def serialize(self):
-        return {
+        data = {
             "name": self.name,
             "method": self.method,
             "last_request_timestamp": self.last_request_timestamp,
@@ -523,10 +861,13 @@ class StatsEntry(object):
             "max_response_time": self.max_response_time,
             "min_response_time": self.min_response_time,
             "total_content_length": self.total_content_length,
-            "response_times": self.response_times,
+            "response_times": self._serialize_response_times(),
             "num_reqs_per_sec": self.num_reqs_per_sec,
             "num_fail_per_sec": self.num_fail_per_sec,
         }
+        if self.phase_times:
+            data["phase_times"] = self.phase_times
+        return data
 
     @classmethod
     def unserialize(cls, data):
@@ -546,6 +887,87 @@ class StatsEntry(object):
             "num_fail_per_sec",
         ]:
             setattr(obj, key, data[key])
+        obj.phase_times = data.get("phase_times", {})
+        return obj
+
+    def _create_response_times(self):
+        if self.histogram_precision is None:
+            return {}
+        return ResponseTimeHistogram(self.histogram_precision)
+
+    def _serialize_response_times(self):
+        # histograms are sent as sparse dicts, which keeps the report format the same for
+        # workers and masters that don't use the histogram
+        # 直方图以稀疏字典的形式发送，这使得不使用直方图的worker和master的报告格式保持一致
+        if self.histogram_precision is None:
+            return self.response_times
+        return self.response_times.to_dict()
+
+    def pack(self):
+        """
+        Return this StatsEntry as a compact list (used in version 2 worker reports). The response times are
+        packed as a flat [response_time, count, ...] list and the per second counts with pack_per_sec().
+        If there are HTTP phase timings they're appended as a {phase: [response_time, count, ...]} dict.
+        以紧凑列表的形式返回此StatsEntry(用于版本2的worker报告)
+        """
+        packed = [
+            self.name,
+            self.method,
+            self.last_request_timestamp,
+            self.start_time,
+            self.num_requests,
+            self.num_none_requests,
+            self.num_failures,
+            self.total_response_time,
+            self.max_response_time,
+            self.min_response_time,
+            self.total_content_length,
+            [value for item in self.response_times.items() for value in item],
+            pack_per_sec(self.num_reqs_per_sec),
+            pack_per_sec(self.num_fail_per_sec),
+        ]
+        if self.phase_times:
+            packed.append(
+                {
+                    phase: [value for item in times.items() for value in item]
+                    for phase, times in self.phase_times.items()
+                }
+            )
+        return packed
+
+    @classmethod
+    def unpack(cls, data):
+        (
+            name,
+            method,
+            last_request_timestamp,
+            start_time,
+            num_requests,
+            num_none_requests,
+            num_failures,
+            total_response_time,
+            max_response_time,
+            min_response_time,
+            total_content_length,
+            response_times,
+            num_reqs_per_sec,
+            num_fail_per_sec,
+        ) = data[:14]
+        obj = cls(None, name, method)
+        obj.last_request_timestamp = last_request_timestamp
+        obj.start_time = start_time
+        obj.num_requests = num_requests
+        obj.num_none_requests = num_none_requests
+        obj.num_failures = num_failures
+        obj.total_response_time = total_response_time
+        obj.max_response_time = max_response_time
+        obj.min_response_time = min_response_time
+        obj.total_content_length = total_content_length
+        obj.response_times = dict(zip(response_times[::2], response_times[1::2]))
+        obj.num_reqs_per_sec = unpack_per_sec(num_reqs_per_sec)
+        obj.num_fail_per_sec = unpack_per_sec(num_fail_per_sec)
+        if len(data) > 14:
+            obj.phase_times = unpack_phase_times(data[14])
         return obj
 
     def get_stripped_report(self):
@@ -596,6 +1018,17 @@ class StatsEntry(object):
         """
         return calculate_response_time_percentile(self.response_times, self.num_requests, percent)
 
+    def get_phase_time_percentile(self, phase, percent):
+        """
+        Get the time spent in an HTTP *phase* (one of locust.util.phase_timer.PHASES) that a certain
+        percentage (0.0 - 1.0) of the requests that went through that phase finished within
+        计算某个HTTP阶段在某一百分比下的耗时
+        """
+        times = self.phase_times.get(phase)
+        if not times:
+            return 0
+        return calculate_response_time_percentile(times, sum(times.values()), percent)
+
     def get_current_response_time_percentile(self, percent):
         """
         Calculate the *current* response time for a certain percentile. We use a sliding
@@ -607,36 +1040,8 @@ class StatsEntry(object):
             raise ValueError(
                 "StatsEntry.use_response_times_cache must be set to True if we should be able to calculate the _current_ response time percentile"
             )
-        # First, we want to determine which of the cached response_times dicts we should
-        # use to get response_times for approximately 10 seconds ago.
-        t = int(time.time())
-        # Since we can't be sure that the cache contains an entry for every second.
-        # We'll construct a list of timestamps which we consider acceptable keys to be used
-        # when trying to fetch the cached response_times. We construct this list in such a way
-        # that it's ordered by preference by starting to add t-10, then t-11, t-9, t-12, t-8,
-        # and so on
-        acceptable_timestamps = []
-        acceptable_timestamps.append(t - CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW)
-        for i in range(1, 9):
-            acceptable_timestamps.append(t - CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW - i)
-            acceptable_timestamps.append(t - CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + i)
-
-        cached = None
-        for ts in acceptable_timestamps:
-            if ts in self.response_times_cache:
-                cached = self.response_times_cache[ts]
-                break
-
-        if cached:
-            # If we fond an acceptable cached response times, we'll calculate a new response
-            # times dict of the last 10 seconds (approximately) by diffing it with the current
-            # total response times. Then we'll use that to calculate a response time percentile
-            # for that timeframe
-            return calculate_response_time_percentile(
-                diff_response_time_dicts(self.response_times, cached.response_times),
-                self.num_requests - cached.num_requests,
-                percent,
-            )
+        response_times, num_requests = self.response_times_cache.get(int(time.time()))
+        return calculate_response_time_percentile(response_times, num_requests, percent)
 
     def percentile(self):
         if not self.num_requests:
@@ -650,25 +1055,135 @@ class StatsEntry(object):
             + (self.num_requests,)
         )
 
-    def _cache_response_times(self, t): # 缓存的响应时间
-        self.response_times_cache[t] = CachedResponseTimes(
-            response_times=copy(self.response_times),
-            num_requests=self.num_requests,
-        )
 
-        # We'll use a cache size of CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 10 since - in the extreme case -
-        # we might still use response times (from the cache) for t-CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW-10
-        # to calculate the current response time percentile, if we're missing cached values for the subsequent
-        # 20 seconds
-        # 我们将使用CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 10 since的缓存大小，
-        # 在极端情况下我们可能仍然使用响应时间(从缓存中)t-CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW-10
-        # 计算电流响应时间百分比,如果我们缺少缓存值随后20秒
-        cache_size = CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW + 10
+class CounterStats(object):
+    """
+    Base class for the auxiliary statistics of :class:`RequestStats` (see AUX_STATS), which consist of counters
+    that are summed and maximums that are kept when the reports of the workers are merged, and {value: count}
+    dicts that are merged. Subclasses list their fields in counters, maximums and histograms, and implement
+    to_dict() (for the web UI) and to_string() (for the console).
+    RequestStats辅助统计的基类: 由合并worker报告时相加的计数器、取最大值的最大值和合并的{值: 数量}字典组成。
+    """
+
+    counters = ()
+    maximums = ()
+    histograms = ()
 
-        if len(self.response_times_cache) > cache_size:
-            # only keep the latest 20 response_times dicts
-            for i in range(len(self.response_times_cache) - cache_size):
-                self.response_times_cache.popitem(last=False)
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for name in self.counters + self.maximums:
+            setattr(self, name, 0)
+        for name in self.histograms:
+            setattr(self, name, {})
+
+    @property
+    def is_empty(self):
+        """
+        True if nothing has been logged since the last reset
+        """
+        return not any(getattr(self, name) for name in self.counters)
+
+    def extend(self, other):
+        for name in self.counters:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in self.maximums:
+            setattr(self, name, max(getattr(self, name), getattr(other, name)))
+        for name in self.histograms:
+            values = getattr(self, name)
+            for value, count in getattr(other, name).items():
+                values[value] = values.get(value, 0) + count
+
+    def serialize(self):
+        return dict((name, getattr(self, name)) for name in self.counters + self.maximums + self.histograms)
+
+    @classmethod
+    def unserialize(cls, data):
+        obj = cls()
+        for name in cls.counters + cls.maximums:
+            setattr(obj, name, data[name])
+        for name in cls.histograms:
+            # msgpack turns the int keys into ints again, but JSON would make them strings
+            setattr(obj, name, dict((int(value), count) for value, count in data[name].items()))
+        return obj
+
+    def to_dict(self):
+        raise NotImplementedError()
+
+    def to_string(self):
+        raise NotImplementedError()
+
+
+class ArrivalStats(CounterStats):
+    """
+    Statistics of the task executions issued by an open model (arrival rate) test: how many arrivals
+    were scheduled, started and dropped, how many of them started late, and the queueing delay from the
+    scheduled arrival time until the task actually started.
+    开放模型(到达率)测试的统计: 计划、开始和丢弃的到达数，延迟开始的数量，以及从计划到达时间到任务实际开始的排队延迟。
+    """
+
+    # arrivals can start or be dropped from the queue while none are scheduled (e.g. after the arrival rate
+    # was set to 0), so is_empty checks all the counters
+    counters = ("num_scheduled", "num_started", "num_late", "num_dropped", "total_queue_delay")
+    maximums = ("max_queue_delay",)
+    # A {queue_delay: count} dict of the queueing delays (in milliseconds, rounded like response times)
+    histograms = ("queue_delays",)
+
+    def log_scheduled(self):
+        self.num_scheduled += 1
+
+    def log_started(self, queue_delay, late):
+        """
+        :param queue_delay: Milliseconds from the scheduled arrival time until the task started
+        :param late: Whether the start was late (the delay exceeded the scheduler's late threshold)
+        """
+        self.num_started += 1
+        if late:
+            self.num_late += 1
+        self.total_queue_delay += queue_delay
+        self.max_queue_delay = max(self.max_queue_delay, queue_delay)
+        rounded = round_response_time(queue_delay)
+        self.queue_delays[rounded] = self.queue_delays.get(rounded, 0) + 1
+
+    def log_dropped(self):
+        self.num_dropped += 1
+
+    @property
+    def avg_queue_delay(self):
+        return self.total_queue_delay / self.num_started if self.num_started else 0
+
+    def get_queue_delay_percentile(self, percent):
+        """
+        Get the queueing delay that a certain percentage (0.0 - 1.0) of the started arrivals waited at most
+        """
+        return calculate_response_time_percentile(self.queue_delays, self.num_started, percent)
+
+    def to_dict(self):
+        return {
+            "num_scheduled": self.num_scheduled,
+            "num_started": self.num_started,
+            "num_late": self.num_late,
+            "num_dropped": self.num_dropped,
+            "avg_queue_delay": self.avg_queue_delay,
+            "queue_delay_percentile_95": self.get_queue_delay_percentile(0.95),
+            "max_queue_delay": self.max_queue_delay,
+        }
+
+    def to_string(self):
+        return (
+            "Arrivals: %d scheduled, %d started (%d late), %d dropped. Queueing delay avg %d ms, "
+            "95%%ile %d ms, max %d ms"
+            % (
+                self.num_scheduled,
+                self.num_started,
+                self.num_late,
+                self.num_dropped,
+                self.avg_queue_delay,
+                self.get_queue_delay_percentile(0.95),
+                self.max_queue_delay,
+            )
+        )
 
 
 class StatsError(object):
@@ -726,6 +1241,9 @@ def median_from_dict(total, count):
     count is a dict {response_time: count}
     total是所有请求时间的数量的合计
     """
+    if isinstance(count, ResponseTimeHistogram):
+        return count.median(total)
+
     pos = (total - 1) / 2
     for k in sorted(count.keys()):
         if pos < count[k]:
@@ -733,20 +1251,183 @@ def median_from_dict(total, count):
         pos -= count[k]
 
 
-def setup_distributed_stats_event_listeners(events, stats): # 设置分布式统计事件侦听器
+class ConnectionPoolStats(CounterStats):
+    """
+    Statistics of the connection pools that FastHttpUsers share when their connection_pool_size is set:
+    how many requests reused an idle connection (hits), had to open a new one (misses), and had to wait for
+    a connection because the pool was at its size limit (waits), and for how long.
+    FastHttpUser设置connection_pool_size时共享的连接池的统计: 复用空闲连接(命中)、新建连接(未命中)、
+    因连接池已满而等待连接的请求数，以及等待时间。
+    """
+
+    counters = ("num_hits", "num_misses", "num_waits", "total_wait_time")
+    maximums = ("max_wait_time",)
+
+    @property
+    def num_requests(self):
+        return self.num_hits + self.num_misses
+
+    def log(self, hit, wait_time=None):
+        """
+        :param hit: Whether an idle connection was reused
+        :param wait_time: Milliseconds spent waiting for a connection, if the pool was at its size limit
+        """
+        if hit:
+            self.num_hits += 1
+        else:
+            self.num_misses += 1
+        if wait_time is not None:
+            self.num_waits += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    @property
+    def hit_ratio(self):
+        return self.num_hits / self.num_requests if self.num_requests else 0
+
+    @property
+    def avg_wait_time(self):
+        return self.total_wait_time / self.num_waits if self.num_waits else 0
+
+    def to_dict(self):
+        return {
+            "num_hits": self.num_hits,
+            "num_misses": self.num_misses,
+            "hit_ratio": self.hit_ratio,
+            "num_waits": self.num_waits,
+            "avg_wait_time": self.avg_wait_time,
+            "max_wait_time": self.max_wait_time,
+        }
+
+    def to_string(self):
+        return "Connection pool: %d hits, %d misses (%.1f%% hits), %d waits. Wait time avg %d ms, max %d ms" % (
+            self.num_hits,
+            self.num_misses,
+            self.hit_ratio * 100,
+            self.num_waits,
+            self.avg_wait_time,
+            self.max_wait_time,
+        )
+
+
+class DNSStats(CounterStats):
+    """
+    Statistics of the lookups of the :class:`CachingResolver <locust.dns.CachingResolver>`: how many were
+    answered from the cache (hits, of which negative hits are cached failures), how many were looked up
+    (misses, of which failures didn't resolve) and how long that took, and how many hosts were overridden.
+    CachingResolver查询的统计: 从缓存中返回的数量(命中，其中否定命中为缓存的失败)、实际查询的数量(未命中，其中失败为未能解析)
+    及其耗时，以及被覆盖的主机数。
+    """
+
+    counters = ("num_hits", "num_negative_hits", "num_misses", "num_failures", "num_overrides", "total_lookup_time")
+    maximums = ("max_lookup_time",)
+
+    @property
+    def num_requests(self):
+        return self.num_hits + self.num_misses + self.num_overrides
+
+    def log_hit(self, negative):
+        self.num_hits += 1
+        if negative:
+            self.num_negative_hits += 1
+
+    def log_miss(self, lookup_time, failed):
+        """
+        :param lookup_time: Milliseconds the lookup took
+        :param failed: Whether the name didn't resolve
+        """
+        self.num_misses += 1
+        if failed:
+            self.num_failures += 1
+        self.total_lookup_time += lookup_time
+        self.max_lookup_time = max(self.max_lookup_time, lookup_time)
+
+    def log_override(self):
+        self.num_overrides += 1
+
+    @property
+    def hit_ratio(self):
+        lookups = self.num_hits + self.num_misses
+        return self.num_hits / lookups if lookups else 0
+
+    @property
+    def avg_lookup_time(self):
+        return self.total_lookup_time / self.num_misses if self.num_misses else 0
+
+    def to_dict(self):
+        return {
+            "num_hits": self.num_hits,
+            "num_negative_hits": self.num_negative_hits,
+            "num_misses": self.num_misses,
+            "num_failures": self.num_failures,
+            "num_overrides": self.num_overrides,
+            "hit_ratio": self.hit_ratio,
+            "avg_lookup_time": self.avg_lookup_time,
+            "max_lookup_time": self.max_lookup_time,
+        }
+
+    def to_string(self):
+        return (
+            "DNS: %d hits (%d negative), %d lookups (%d failed), %d overridden (%.1f%% hits). "
+            "Lookup time avg %d ms, max %d ms"
+            % (
+                self.num_hits,
+                self.num_negative_hits,
+                self.num_misses,
+                self.num_failures,
+                self.num_overrides,
+                self.hit_ratio * 100,
+                self.avg_lookup_time,
+                self.max_lookup_time,
+            )
+        )
+
+
+AUX_STATS = {"arrivals": ArrivalStats, "connection_pool": ConnectionPoolStats, "dns": DNSStats}
+"""
+The auxiliary stats of RequestStats: attribute name (which is also their key in the reports from the workers
+and in /stats/requests) -> CounterStats subclass. They are reset, reported and printed along with the stats.
+RequestStats的辅助统计: 属性名(也是worker报告和/stats/requests中的键) -> CounterStats子类
+"""
+
+
+def setup_distributed_stats_event_listeners(events, stats, aggregator=None): # 设置分布式统计事件侦听器
+    """
+    :param aggregator: Optional :class:`StatsAggregator <locust.aggregation.StatsAggregator>`. If set, worker reports
+                       are queued in it and merged into the stats when it's flushed, instead of right away.
+    """
     def on_report_to_master(client_id, data):
-        data["stats"] = stats.serialize_stats()
-        data["stats_total"] = stats.total.get_stripped_report()
+        # only entries that have been touched since the last report are sent, packed into lists
+        # 只发送自上次报告以来有变化的条目，并打包成列表
+        data["stats_version"] = STATS_REPORT_VERSION
+        data["stats"] = stats.pack_stats()
+        data["stats_total"] = stats.total.pack()
+        stats.total.reset()
         data["errors"] = stats.serialize_errors()
         stats.errors = {}
+        for name, aux_stats in stats.aux_stats():
+            if not aux_stats.is_empty:
+                data[name] = aux_stats.serialize()
+                aux_stats.reset()
 
     def on_worker_report(client_id, data):
+        for name, aux_stats in stats.aux_stats():
+            if name in data:
+                aux_stats.extend(AUX_STATS[name].unserialize(data[name]))
+        if aggregator is not None:
+            aggregator.add(data)
+            return
+
+        # reports from older workers don't have a stats_version and contain serialized dicts
+        # 来自旧版本worker的报告没有stats_version，包含的是序列化的字典
+        if data.get("stats_version", 1) >= 2:
+            load_entry = StatsEntry.unpack
+        else:
+            load_entry = StatsEntry.unserialize
+
         for stats_data in data["stats"]:
-            entry = StatsEntry.unserialize(stats_data)
-            request_key = (entry.name, entry.method)
-            if not request_key in stats.entries:
-                stats.entries[request_key] = StatsEntry(stats, entry.name, entry.method, use_response_times_cache=True)
-            stats.entries[request_key].extend(entry)
+            entry = load_entry(stats_data)
+            stats.get(entry.name, entry.method).extend(entry)
 
         for error_key, error in data["errors"].items():
             if error_key not in stats.errors:
@@ -754,7 +1435,7 @@ def setup_distributed_stats_event_listeners(events, stats): # 设置分布式统
             else:
                 stats.errors[error_key].occurrences += error["occurrences"]
 
-        stats.total.extend(StatsEntry.unserialize(data["stats_total"]))
+        stats.total.extend(load_entry(data["stats_total"]))
 
     events.report_to_master.add_listener(on_report_to_master)
     events.worker_report.add_listener(on_worker_report)
@@ -771,6 +1452,9 @@ def print_stats(stats, current=True):
         console_logger.info(r.to_string(current=current))
     console_logger.info("-" * (80 + STATS_NAME_WIDTH))
     console_logger.info(stats.total.to_string(current=current))
+    for _, aux_stats in stats.aux_stats():
+        if not aux_stats.is_empty:
+            console_logger.info(" " + aux_stats.to_string())
     console_logger.info("")
 
 
@@ -833,18 +1517,31 @@ def stats_history(runner):
         stats = runner.stats
         if not stats.total.use_response_times_cache:
             break
-        r = {
-            "time": datetime.datetime.now().strftime("%H:%M:%S"),
-            "current_rps": stats.total.current_rps or 0,
-            "current_fail_per_sec": stats.total.current_fail_per_sec or 0,
-            "response_time_percentile_95": stats.total.get_current_response_time_percentile(0.95) or 0,
-            "response_time_percentile_50": stats.total.get_current_response_time_percentile(0.5) or 0,
-            "user_count": runner.user_count or 0,
-        }
-        stats.history.append(r)
+        r = history_point(stats.total)
+        r["user_count"] = runner.user_count or 0
+        entry_points = None
+        if stats.history.per_entry:
+            entry_points = {key: history_point(entry) for key, entry in stats.entries.items()}
+        stats.history.append(r, entry_points)
         gevent.sleep(HISTORY_STATS_INTERVAL_SEC)
 
 
+def history_point(stats_entry):
+    """
+    Return the current rps, failures/s and response time percentiles of a StatsEntry as a history point
+    以历史点的形式返回StatsEntry当前的rps、每秒失败数和响应时间百分位数
+    """
+    now = time.time()
+    return {
+        "time": datetime.datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+        "timestamp": now,
+        "current_rps": stats_entry.current_rps or 0,
+        "current_fail_per_sec": stats_entry.current_fail_per_sec or 0,
+        "response_time_percentile_95": stats_entry.get_current_response_time_percentile(0.95) or 0,
+        "response_time_percentile_50": stats_entry.get_current_response_time_percentile(0.5) or 0,
+    }
+
+
 class StatsCSV:
     """Write statistics to csv_writer stream. 将统计信息写入csv_writer流。"""
 
@@ -868,6 +1565,8 @@ class StatsCSV:
             "Requests/s",
             "Failures/s",
         ] + get_readable_percentiles(self.percentiles_to_report)
+        if self.environment.http_phase_timings:
+            self.requests_csv_columns += ["Median %s Time" % PHASE_LABELS[phase] for phase in PHASES]
 
         self.failures_columns = [
             "Method",
@@ -883,6 +1582,11 @@ class StatsCSV:
             else self.percentiles_na
         )
 
+    def _phase_time_fields(self, stats_entry):
+        if not self.environment.http_phase_timings:
+            return []
+        return [int(stats_entry.get_phase_time_percentile(phase, 0.5)) for phase in PHASES]
+
     def requests_csv(self, csv_writer):
         """Write requests csv with header and data rows."""
         csv_writer.writerow(self.requests_csv_columns)
@@ -908,6 +1612,7 @@ class StatsCSV:
                         stats_entry.total_fail_per_sec,
                     ],
                     self._percentile_fields(stats_entry),
+                    self._phase_time_fields(stats_entry),
                 )
             )
 
@@ -930,17 +1635,36 @@ class StatsCSV:
 class StatsCSVFileWriter(StatsCSV):
     """Write statistics to to CSV files 将统计信息写入CSV文件"""
 
-    def __init__(self, environment, percentiles_to_report, base_filepath, full_history=False):
+    def __init__(
+        self,
+        environment,
+        percentiles_to_report,
+        base_filepath,
+        full_history=False,
+        incremental=False,
+        history_format="csv",
+    ):
+        """
+        :param full_history: Whether to write a history row for every stats entry, and not just the total
+        :param incremental: If set, _stats.csv and _failures.csv are only written once, when close_files() is
+                            called, and history rows are only written for entries that have changed since the
+                            last interval, instead of rewriting everything every CSV_STATS_INTERVAL_SEC.
+        增量模式:如果设置，_stats.csv和_failures.csv只在调用close_files()时写入一次，历史行只写入自上个间隔以来有变化的条目。
+        :param history_format: "csv", or "ndjson.gz" to write the history as gzip compressed newline delimited JSON
+        """
         super().__init__(environment, percentiles_to_report)
+        if history_format not in HISTORY_FORMATS:
+            raise ValueError("Unknown history format %r, expected one of %s" % (history_format, HISTORY_FORMATS))
         self.base_filepath = base_filepath
         self.full_history = full_history
+        self.incremental = incremental
+        self.history_format = history_format
+        self._last_counts = {}
+        self._closed = False
 
         self.requests_csv_filehandle = open(self.base_filepath + "_stats.csv", "w")
         self.requests_csv_writer = csv.writer(self.requests_csv_filehandle)
 
-        self.stats_history_csv_filehandle = open(self.stats_history_file_name(), "w")
-        self.stats_history_csv_writer = csv.writer(self.stats_history_csv_filehandle)
-
         self.failures_csv_filehandle = open(self.base_filepath + "_failures.csv", "w")
         self.failures_csv_writer = csv.writer(self.failures_csv_filehandle)
         self.failures_csv_data_start = 0
@@ -962,18 +1686,39 @@ class StatsCSVFileWriter(StatsCSV):
             "Total Average Content Size",
         ]
 
+        if history_format == "ndjson.gz":
+            self.stats_history_csv_filehandle = gzip.open(self.stats_history_file_name(), "wt")
+            self.stats_history_csv_writer = NDJSONWriter(
+                self.stats_history_csv_filehandle, self.stats_history_csv_columns
+            )
+        else:
+            self.stats_history_csv_filehandle = open(self.stats_history_file_name(), "w")
+            self.stats_history_csv_writer = csv.writer(self.stats_history_csv_filehandle)
+
     def __call__(self):
         self.stats_writer()
 
     def stats_writer(self):
         """Writes all the csv files for the locust run."""
 
+        if self.history_format == "csv":
+            self.stats_history_csv_writer.writerow(self.stats_history_csv_columns)
+
+        if self.incremental:
+            # _stats.csv and _failures.csv are written by close_files()
+            last_flush_time = 0
+            while True:
+                now = time.time()
+                self._stats_history_data_rows(self.stats_history_csv_writer, now, only_changed=True)
+                if now - last_flush_time > CSV_STATS_FLUSH_INTERVAL_SEC:
+                    self.stats_history_flush()
+                    last_flush_time = now
+                gevent.sleep(CSV_STATS_INTERVAL_SEC)
+
         # Write header row for all files and save posistion for non-append files
         self.requests_csv_writer.writerow(self.requests_csv_columns)
         requests_csv_data_start = self.requests_csv_filehandle.tell()
 
-        self.stats_history_csv_writer.writerow(self.stats_history_csv_columns)
-
         self.failures_csv_writer.writerow(self.failures_columns)
         self.failures_csv_data_start = self.failures_csv_filehandle.tell()
 
@@ -1000,12 +1745,15 @@ class StatsCSVFileWriter(StatsCSV):
 
             gevent.sleep(CSV_STATS_INTERVAL_SEC)
 
-    def _stats_history_data_rows(self, csv_writer, now):
+    def _stats_history_data_rows(self, csv_writer, now, only_changed=False):
         """
         Write CSV rows with the *current* stats. By default only includes the
         Aggregated stats entry, but if self.full_history is set to True, a row for each entry will
         will be included.
 
+        If only_changed is set, entries that haven't logged any requests or failures since the
+        previous call are skipped.
+
         Note that this method differs from the other methods as it appends time-stamped data to the file, whereas the other methods overwrites the data.
         """
 
@@ -1016,6 +1764,12 @@ class StatsCSVFileWriter(StatsCSV):
             stats_entries = sort_stats(stats.entries)
 
         for stats_entry in chain(stats_entries, [stats.total]):
+            if only_changed:
+                key = (stats_entry.name, stats_entry.method)
+                counts = (stats_entry.num_requests, stats_entry.num_failures)
+                if self._last_counts.get(key) == counts:
+                    continue
+                self._last_counts[key] = counts
             csv_writer.writerow(
                 chain(
                     (
@@ -1048,10 +1802,44 @@ class StatsCSVFileWriter(StatsCSV):
     def failures_flush(self):
         self.failures_csv_filehandle.flush()
 
+    def write_summary(self):
+        """
+        Write the final _stats.csv and _failures.csv files (used in incremental mode)
+        写入最终的_stats.csv和_failures.csv文件(在增量模式中使用)
+        """
+        self.requests_csv_filehandle.seek(0)
+        self.requests_csv(self.requests_csv_writer)
+        self.requests_csv_filehandle.truncate()
+        self.failures_csv_filehandle.seek(0)
+        self.failures_csv(self.failures_csv_writer)
+        self.failures_csv_filehandle.truncate()
+
     def close_files(self):
+        if self._closed:
+            return
+        if self.incremental:
+            self.write_summary()
+        self._closed = True
         self.requests_csv_filehandle.close()
         self.stats_history_csv_filehandle.close()
         self.failures_csv_filehandle.close()
 
     def stats_history_file_name(self):
+        if self.history_format == "ndjson.gz":
+            return self.base_filepath + "_stats_history.ndjson.gz"
         return self.base_filepath + "_stats_history.csv"
+
+
+class NDJSONWriter:
+    """
+    csv.writer() look-alike that writes each row as a JSON object (keyed by *columns*) on its own line
+    类似csv.writer()，将每一行以JSON对象(以columns为键)写成单独的一行
+    """
+
+    def __init__(self, filehandle, columns):
+        self.filehandle = filehandle
+        self.columns = columns
+
+    def writerow(self, row):
+        self.filehandle.write(json.dumps(dict(zip(self.columns, row))))
+        self.filehandle.write("\n")
@@ -0,0 +1,83 @@
+"""
+Benchmark for merging worker stats reports on the master.
+
+Simulates N workers each reporting M endpoints and prints the master CPU time spent per
+report when merging the reports one by one (the default) and in batches with StatsAggregator.
+
+    python -m locust.test.benchmark_aggregation --workers 200 --endpoints 1000
+"""
+import argparse
+import random
+import time
+
+from locust.aggregation import StatsAggregator, numpy
+from locust.event import Events
+from locust.stats import RequestStats, setup_distributed_stats_event_listeners
+
+
+def make_reports(num_workers, num_endpoints, requests_per_endpoint, histogram_precision):
+    reports = []
+    for _ in range(num_workers):
+        events = Events()
+        stats = RequestStats(use_response_times_cache=False, histogram_precision=histogram_precision)
+        setup_distributed_stats_event_listeners(events, stats)
+        for endpoint in range(num_endpoints):
+            for _ in range(requests_per_endpoint):
+                stats.log_request("GET", "/endpoint/%i" % endpoint, random.lognormvariate(4, 1), 1000)
+        data = {}
+        events.report_to_master.fire(client_id="worker", data=data)
+        reports.append(data)
+    return reports
+
+
+def run(name, reports, merge, rounds):
+    cpu_times = []
+    for _ in range(rounds):
+        start = time.process_time()
+        merge(reports)
+        cpu_times.append(time.process_time() - start)
+    best = min(cpu_times)
+    print("%-28s %10.3f ms/report %10.1f ms/round" % (name, best / len(reports) * 1000, best * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--endpoints", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint per report")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--histogram-precision", type=int, default=None)
+    options = parser.parse_args()
+
+    reports = make_reports(options.workers, options.endpoints, options.requests, options.histogram_precision)
+    print(
+        "%i workers x %i endpoints, %i requests per endpoint per report"
+        % (options.workers, options.endpoints, options.requests)
+    )
+
+    def one_by_one(reports):
+        events = Events()
+        stats = RequestStats(histogram_precision=options.histogram_precision)
+        setup_distributed_stats_event_listeners(events, stats)
+        for data in reports:
+            events.worker_report.fire(client_id="worker", data=data)
+
+    def batched(use_numpy):
+        def merge(reports):
+            aggregator = StatsAggregator(RequestStats(histogram_precision=options.histogram_precision), use_numpy)
+            for data in reports:
+                aggregator.add(data)
+            aggregator.flush()
+
+        return merge
+
+    run("one by one", reports, one_by_one, options.rounds)
+    run("batched (python)", reports, batched(False), options.rounds)
+    if numpy is not None:
+        run("batched (numpy)", reports, batched(True), options.rounds)
+    else:
+        print("NumPy is not installed, skipping the NumPy benchmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark for the memory and throughput per user of AsyncUser, HttpUser and FastHttpUser.
+
+For each user class (in a process of its own, so that the memory of one doesn't hide the other):
+
+* spawns --users idle users that only wait (with their client, but no connection), and prints the
+  memory (RSS) per user
+* runs --active users that make requests without waiting against a minimal HTTP server on localhost
+  for --duration seconds, and prints the requests per second
+
+The AsyncUser uses a minimal keep-alive HTTP client built on asyncio streams, since locust doesn't come
+with an asyncio based HTTP client.
+
+    python -m locust.test.benchmark_async_users --users 20000 --active 50 --duration 5
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+import gevent
+import psutil
+from gevent.server import StreamServer
+
+from locust import AsyncUser, HttpUser, constant, task
+from locust.contrib.fasthttp import FastHttpUser
+from locust.env import Environment
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\nok"
+
+
+def handle(sock, address):
+    # answers every GET request on the connection with the same response
+    buffer = b""
+    while True:
+        try:
+            data = sock.recv(65536)
+        except ConnectionError:
+            # the users are stopped without closing their connections
+            return
+        if not data:
+            return
+        buffer += data
+        while b"\r\n\r\n" in buffer:
+            _, _, buffer = buffer.partition(b"\r\n\r\n")
+            sock.sendall(RESPONSE)
+
+
+class HttpBenchUser(HttpUser):
+    idle = False
+
+    @task
+    def get(self):
+        if not self.idle:
+            self.client.get("/")
+
+
+class FastHttpBenchUser(FastHttpUser):
+    idle = False
+
+    @task
+    def get(self):
+        if not self.idle:
+            self.client.get("/")
+
+
+class AsyncBenchUser(AsyncUser):
+    idle = False
+    reader = writer = None
+
+    async def on_stop(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    @task
+    async def get(self):
+        if self.idle:
+            return
+        start_time = time.time()
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(b"GET / HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+        await self.reader.readexactly(length)
+        self.environment.events.request_success.fire(
+            request_type="GET",
+            name="/",
+            response_time=(time.time() - start_time) * 1000,
+            response_length=length,
+        )
+
+
+USER_CLASSES = {"AsyncUser": AsyncBenchUser, "HttpUser": HttpBenchUser, "FastHttpUser": FastHttpBenchUser}
+
+
+def run(name, options):
+    server = StreamServer(("127.0.0.1", 0), handle)
+    server.start()
+    user_class = USER_CLASSES[name]
+    user_class.host = "http://127.0.0.1:%i" % server.server_port
+    user_class.port = server.server_port
+    process = psutil.Process()
+
+    # idle users
+    user_class.idle = True
+    user_class.wait_time = constant(3600)
+    environment = Environment(user_classes=[user_class], stop_timeout=None)
+    runner = environment.create_local_runner()
+    gevent.sleep(0.1)
+    rss = process.memory_info().rss
+    runner.spawn_users(options.users, options.users * 1000)
+    # let every user run its first task and start waiting
+    gevent.sleep(1)
+    memory = (process.memory_info().rss - rss) / options.users
+    runner.stop_users(runner.user_count)
+    runner.quit()
+
+    # active users
+    user_class.idle = False
+    user_class.wait_time = constant(0)
+    environment = Environment(user_classes=[user_class], stop_timeout=None)
+    runner = environment.create_local_runner()
+    runner.spawn_users(options.active, options.active * 1000)
+    gevent.sleep(1)
+    environment.stats.reset_all()
+    gevent.sleep(options.duration)
+    requests = environment.stats.total.num_requests
+    runner.stop_users(runner.user_count)
+    runner.quit()
+    server.stop()
+
+    print(
+        "%-13s %8.0f bytes/idle user %10.0f requests/s (%i users)"
+        % (name, memory, requests / options.duration, options.active)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="Number of idle users")
+    parser.add_argument("--active", type=int, default=50, help="Number of users making requests")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds to make requests for")
+    parser.add_argument("--only", choices=sorted(USER_CLASSES), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.only:
+        run(options.only, options)
+        return
+    for name in USER_CLASSES:
+        subprocess.check_call([sys.executable, "-m", __spec__.name, "--only", name] + sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark for decoding JSON response bodies.
+
+Decodes a small login response and a product search response with --products products with every JSON
+decoder that is installed, and then calls json() --calls times on each of --responses responses (like a
+locustfile that checks the code of a response and then reads a few fields from it), with and without the
+responses caching the decoded body.
+
+    python -m locust.test.benchmark_json --products 200 --responses 2000 --calls 4
+"""
+import argparse
+import json
+import random
+import time
+
+from requests import Response
+
+from locust.clients import LocustResponse
+from locust.util import json_decoder
+
+
+def login_payload():
+    return {
+        "code": 200,
+        "msg": "success",
+        "data": {
+            "access_token": "%032x" % random.getrandbits(128),
+            "userId": 12345,
+            "cardNo": "6222020200112233",
+            "username": "store-01",
+        },
+    }
+
+
+def search_payload(products):
+    return {
+        "code": 200,
+        "msg": "success",
+        "data": {
+            "total": products,
+            "pageNum": 1,
+            "list": [
+                {
+                    "id": i,
+                    "name": "Product %i 商品" % i,
+                    "price": round(random.uniform(1, 500), 2),
+                    "stock": random.randint(0, 1000),
+                    "tags": ["tag%i" % random.randint(0, 50) for _ in range(5)],
+                    "specs": {"color": "red", "size": random.choice(["S", "M", "L"]), "weight": random.random()},
+                    "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 3,
+                }
+                for i in range(products)
+            ],
+        },
+    }
+
+
+def response(cls, body):
+    r = cls()
+    r._content = body
+    r.status_code = 200
+    r.encoding = "utf-8"
+    return r
+
+
+def bench(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200, help="Number of products in the search response")
+    parser.add_argument("--responses", type=int, default=2000, help="Number of responses to decode")
+    parser.add_argument("--calls", type=int, default=4, help="Number of json() calls per response")
+    options = parser.parse_args()
+
+    payloads = {
+        "login": json.dumps(login_payload()).encode(),
+        "search": json.dumps(search_payload(options.products), ensure_ascii=False).encode(),
+    }
+    for name, body in payloads.items():
+        print("%s response: %i bytes" % (name, len(body)))
+        for decoder in json_decoder.DECODERS:
+            json_decoder.use_decoder(decoder)
+            elapsed = bench(lambda: json_decoder.loads(body), options.responses)
+            print("  %-6s %8.1f us/decode" % (decoder, elapsed / options.responses * 1e6))
+
+    json_decoder.use_decoder()
+    body = payloads["search"]
+    print(
+        "search response, %i json() calls per response (%s decoder for the cached responses):"
+        % (options.calls, json_decoder.decoder_name)
+    )
+    for label, cls in (("requests Response", Response), ("LocustResponse", LocustResponse)):
+        responses = [response(cls, body) for _ in range(options.responses)]
+
+        def decode_all():
+            for r in responses:
+                for _ in range(options.calls):
+                    r.json()
+
+        elapsed = bench(decode_all, 1)
+        print("  %-18s %8.1f us/response" % (label, elapsed / options.responses * 1e6))
+
+
+if __name__ == "__main__":
+    main()
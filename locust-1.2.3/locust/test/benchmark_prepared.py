@@ -0,0 +1,102 @@
+"""
+Benchmark for prepared FastHttpSession requests.
+
+Sends --requests order POSTs with a JSON body, built with FastHttpSession.request(json=...) and with a
+request prepared with FastHttpSession.prepare(), first with the network part stubbed out (to measure
+what it costs to build the requests) and then to a minimal HTTP server on localhost.
+
+    python -m locust.test.benchmark_prepared --requests 20000
+"""
+import argparse
+import time
+
+import gevent
+from gevent.server import StreamServer
+
+from locust.contrib.fasthttp import FastHttpSession
+from locust.env import Environment
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 11\r\n\r\n{\"code\":0}\n"
+
+
+def handle(sock, address):
+    # answers every request on the connection with the same response, without parsing more than needed
+    buffer = b""
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return
+        buffer += data
+        while b"\r\n\r\n" in buffer:
+            head, _, rest = buffer.partition(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            while len(rest) < length:
+                rest += sock.recv(65536)
+            buffer = rest[length:]
+            sock.sendall(RESPONSE)
+
+
+class StubResponse(object):
+    headers = {"content-length": "11"}
+    content = b'{"code":0}\n'
+    error = None
+
+    def raise_for_status(self):
+        pass
+
+
+def order(i):
+    return {"cartId": "cart-%i" % i, "sku": "SKU-%05i" % (i % 1000), "quantity": i % 5 + 1, "storeId": 42}
+
+
+def run(session, requests, prepared):
+    start = time.perf_counter()
+    if prepared:
+        post = session.prepare(
+            "POST",
+            "/api/orders",
+            body_template='{"cartId": "$cartId", "sku": "$sku", "quantity": $quantity, "storeId": $storeId}',
+        )
+        for i in range(requests):
+            post.send(**order(i))
+    else:
+        for i in range(requests):
+            session.post("/api/orders", json=order(i))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="Number of requests per run")
+    options = parser.parse_args()
+
+    server = StreamServer(("127.0.0.1", 0), handle)
+    server.start()
+    environment = Environment()
+    base_url = "http://127.0.0.1:%i" % server.server_port
+    try:
+        for network in (False, True):
+            for prepared in (False, True):
+                session = FastHttpSession(environment, base_url)
+                if not network:
+                    session._send_request_safe_mode = lambda method, url, **kwargs: StubResponse()
+                elapsed = run(session, options.requests, prepared)
+                print(
+                    "%-7s %-9s %8.2f s %8.1f us/request"
+                    % (
+                        "network" if network else "stub",
+                        "prepared" if prepared else "request",
+                        elapsed,
+                        elapsed / options.requests * 1e6,
+                    )
+                )
+                gevent.sleep(0)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
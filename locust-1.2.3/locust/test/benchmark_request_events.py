@@ -0,0 +1,106 @@
+"""
+Benchmark for the per request event dispatch overhead.
+
+Runs FastHttpUsers against a local web server (in a separate process) for a few seconds, first with
+request events dispatched one by one (the default) and then in batches, and prints the number of
+requests per second of CPU time used by the Locust process. With --dispatch-only no HTTP requests are
+made, and only the cost of firing the request events and logging them in the stats is measured.
+
+    python -m locust.test.benchmark_request_events --users 50 --duration 5 --batch-size 100
+    python -m locust.test.benchmark_request_events --dispatch-only
+"""
+import argparse
+import multiprocessing
+import time
+
+import gevent
+
+from locust import constant, task
+from locust.contrib.fasthttp import FastHttpUser
+from locust.env import Environment
+
+
+def serve(port):
+    from gevent.pywsgi import WSGIServer
+
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "2")])
+        return [b"ok"]
+
+    WSGIServer(("127.0.0.1", port), app, log=None).serve_forever()
+
+
+def run(name, port, users, duration, batch_size, listeners):
+    class BenchmarkUser(FastHttpUser):
+        host = "http://127.0.0.1:%i" % port
+        wait_time = constant(0)
+
+        @task
+        def index(self):
+            self.client.get("/")
+
+    environment = Environment(user_classes=[BenchmarkUser], request_batch_size=batch_size)
+    for _ in range(listeners):
+        environment.events.request_success.add_listener(lambda **kwargs: None)
+    runner = environment.create_local_runner()
+    runner.start(users, spawn_rate=users, wait=True)
+    gevent.sleep(0.5)
+    runner.stats.reset_all()
+
+    start_cpu = time.process_time()
+    start = time.time()
+    gevent.sleep(duration)
+    runner.environment.request_batcher and runner.environment.request_batcher.flush()
+    cpu = time.process_time() - start_cpu
+    elapsed = time.time() - start
+    num_requests = runner.stats.num_requests
+    runner.quit()
+    print(
+        "%-12s %10.0f req/s %10.0f req/s per CPU second"
+        % (name, num_requests / elapsed, num_requests / cpu if cpu else 0)
+    )
+
+
+def run_dispatch_only(name, batch_size, listeners, count=200000):
+    environment = Environment(request_batch_size=batch_size)
+    for _ in range(listeners):
+        environment.events.request_success.add_listener(lambda **kwargs: None)
+    runner = environment.create_local_runner()
+    fire = environment.events.request_success.fire
+    start_cpu = time.process_time()
+    for i in range(count):
+        fire(request_type="GET", name="/endpoint/%i" % (i % 20), response_time=i % 1000, response_length=100)
+    environment.request_batcher and environment.request_batcher.flush()
+    cpu = time.process_time() - start_cpu
+    assert runner.stats.num_requests == count
+    runner.quit()
+    print("%-12s %10.0f events per CPU second" % (name, count / cpu))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--listeners", type=int, default=0, help="Extra no-op request_success listeners")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dispatch-only", action="store_true", help="Only measure the event dispatch")
+    options = parser.parse_args()
+
+    if options.dispatch_only:
+        run_dispatch_only("unbatched", 0, options.listeners)
+        run_dispatch_only("batched", options.batch_size, options.listeners)
+        return
+
+    server = multiprocessing.Process(target=serve, args=(options.port,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    try:
+        run("unbatched", options.port, options.users, options.duration, 0, options.listeners)
+        run("batched", options.port, options.users, options.duration, options.batch_size, options.listeners)
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
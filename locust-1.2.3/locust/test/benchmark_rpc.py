@@ -0,0 +1,85 @@
+"""
+Benchmark for master <-> worker messaging over zmq on localhost.
+
+Sends --messages small heartbeat messages and --reports big stats reports from a worker's rpc Client to
+a master's rpc Server (and the same number of small messages back), with batching and compression turned
+on and off, and prints the throughput of each combination.
+
+    python -m locust.test.benchmark_rpc --messages 100000 --reports 1000
+"""
+import argparse
+import time
+
+import gevent
+
+from locust.rpc import Message, zmqrpc
+from locust.stats import RequestStats
+
+
+def stats_report(entries):
+    stats = RequestStats()
+    for i in range(entries):
+        for response_time in (12, 45, 120, 450, 1200):
+            stats.log_request("GET", "/api/endpoint/%i" % i, response_time, 1024)
+    data = {"stats": stats.pack_stats(), "stats_total": stats.total.pack(), "errors": {}, "user_count": 100}
+    return data
+
+
+def run(messages, reports, report_data, batch, compression):
+    server = zmqrpc.Server("127.0.0.1", 0, batch=batch, compression=compression)
+    client = zmqrpc.Client("127.0.0.1", server.port, "worker", batch=batch, compression=compression)
+    heartbeat = {"state": "running", "current_cpu_usage": 42.0}
+    # let the two sides hear from each other first, so that compression is negotiated
+    client.send(Message("client_ready", None, "worker"))
+    server.recv_from_client()
+    server.send_to_client(Message("ack", None, "worker"))
+    client.recv()
+
+    def receive():
+        for _ in range(messages + reports):
+            server.recv_from_client()
+
+    def reply():
+        for _ in range(messages):
+            client.recv()
+
+    start = time.perf_counter()
+    receiver = gevent.spawn(receive)
+    replier = gevent.spawn(reply)
+    for i in range(messages):
+        client.send(Message("heartbeat", heartbeat, "worker"))
+        server.send_to_client(Message("rate_limit", heartbeat, "worker"))
+        if i % 100 == 0:
+            # yield to the hub now and then, like the runners' greenlets do
+            gevent.sleep(0)
+    for _ in range(reports):
+        client.send(Message("stats", report_data, "worker"))
+        gevent.sleep(0)
+    gevent.joinall([receiver, replier])
+    elapsed = time.perf_counter() - start
+    client.close()
+    server.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000, help="Number of small messages each way")
+    parser.add_argument("--reports", type=int, default=1000, help="Number of stats reports")
+    parser.add_argument("--entries", type=int, default=200, help="Number of stats entries per report")
+    options = parser.parse_args()
+
+    report_data = stats_report(options.entries)
+    print("stats report: %i bytes serialized" % len(Message("stats", report_data, "worker").serialize()))
+    for batch in (False, True):
+        for compression in (False, True):
+            elapsed = run(options.messages, options.reports, report_data, batch, compression)
+            total = options.messages * 2 + options.reports
+            print(
+                "batch=%-5s compression=%-5s %8.2f s %10.0f messages/s"
+                % (batch, compression, elapsed, total / elapsed)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for spawning and stopping large numbers of users.
+
+Ramps a LocalRunner up to --users idle users, shrinks it by --stop users and then stops the rest,
+and prints the wall clock time of each step. The users only sleep, so the time is spent in the
+runner's bookkeeping (and in creating and killing the greenlets).
+
+    python -m locust.test.benchmark_spawn --users 100000 --stop 30000
+"""
+import argparse
+import time
+
+import gevent
+
+from locust import User, constant, task
+from locust.env import Environment
+
+
+class IdleUser(User):
+    wait_time = constant(3600)
+
+    @task
+    def idle(self):
+        pass
+
+
+class OtherIdleUser(IdleUser):
+    weight = 3
+
+
+def timed(name, func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print("%-30s %8.2f s" % (name, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--stop", type=int, default=30000, help="Number of users to stop in the shrink step")
+    options = parser.parse_args()
+
+    environment = Environment(user_classes=[IdleUser, OtherIdleUser], stop_timeout=None)
+    runner = environment.create_local_runner()
+    # a spawn rate this high means that the runner never sleeps (apart from yielding to the hub)
+    spawn_rate = options.users * 1000
+
+    timed("spawn %i users" % options.users, runner.spawn_users, options.users, spawn_rate)
+    gevent.sleep(0)
+    assert runner.user_count == options.users, runner.user_count
+    timed("stop %i users" % options.stop, runner.stop_users, options.stop)
+    assert runner.user_count == options.users - options.stop, runner.user_count
+    timed("spawn %i users" % options.stop, runner.spawn_users, options.stop, spawn_rate)
+    gevent.sleep(0)
+    timed("stop all %i users" % runner.user_count, runner.stop_users, runner.user_count)
+    assert runner.user_count == 0, runner.user_count
+    runner.quit()
+
+
+if __name__ == "__main__":
+    main()
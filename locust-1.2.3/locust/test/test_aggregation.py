@@ -0,0 +1,158 @@
+import unittest
+
+import mock
+from gevent import sleep
+
+import locust
+from locust import aggregation
+from locust.aggregation import StatsAggregator
+from locust.env import Environment
+from locust.rpc import Message
+from locust.stats import RequestStats, StatsEntry, setup_distributed_stats_event_listeners
+from locust.event import Events
+
+from .testcases import LocustTestCase
+from .test_runners import mocked_rpc
+
+
+def make_report(requests, errors=(), old_format=False):
+    """Build a worker report from a list of (method, name, response_time) tuples"""
+    events = Events()
+    stats = RequestStats(use_response_times_cache=False)
+    setup_distributed_stats_event_listeners(events, stats)
+    for method, name, response_time in requests:
+        stats.log_request(method, name, response_time, 10)
+    for method, name, error in errors:
+        stats.log_error(method, name, error)
+    if old_format:
+        data = {
+            "stats": stats.serialize_stats(),
+            "stats_total": stats.total.get_stripped_report(),
+            "errors": stats.serialize_errors(),
+        }
+    else:
+        data = {}
+        events.report_to_master.fire(client_id="worker", data=data)
+    # send it through msgpack, like a real report
+    return Message.unserialize(Message("stats", data, "worker").serialize()).data
+
+
+def merge_one_by_one(reports, histogram_precision=None):
+    events = Events()
+    stats = RequestStats(histogram_precision=histogram_precision)
+    setup_distributed_stats_event_listeners(events, stats)
+    for data in reports:
+        events.worker_report.fire(client_id="worker", data=data)
+    return stats
+
+
+class TestStatsAggregator(unittest.TestCase):
+    def setUp(self):
+        self.reports = [
+            make_report([("GET", "/a", 12), ("GET", "/a", 147), ("POST", "/b", 3432)], [("GET", "/a", "oops")]),
+            make_report([("GET", "/a", 13), ("GET", "/c", None), ("GET", "/c", 58760)], [("GET", "/a", "oops")]),
+            make_report([("POST", "/b", 99), ("GET", "/a", 147)], old_format=True),
+        ]
+
+    def assert_same_stats(self, expected, actual):
+        self.assertEqual(set(expected.entries), set(actual.entries))
+        for key, entry in list(expected.entries.items()) + [(None, expected.total)]:
+            other = actual.entries[key] if key else actual.total
+            for attribute in [
+                "num_requests",
+                "num_none_requests",
+                "num_failures",
+                "total_response_time",
+                "max_response_time",
+                "min_response_time",
+                "total_content_length",
+                "num_reqs_per_sec",
+                "num_fail_per_sec",
+                "last_request_timestamp",
+                "start_time",
+            ]:
+                self.assertEqual(getattr(entry, attribute), getattr(other, attribute), attribute)
+            self.assertEqual(dict(entry.response_times), dict(other.response_times))
+            self.assertEqual(entry.response_times_cache.get(999), other.response_times_cache.get(999))
+        self.assertEqual(
+            {k: e.occurrences for k, e in expected.errors.items()}, {k: e.occurrences for k, e in actual.errors.items()}
+        )
+
+    def _test_flush(self, use_numpy, histogram_precision=None):
+        with mock.patch("time.time", return_value=999):
+            expected = merge_one_by_one(self.reports, histogram_precision)
+            stats = RequestStats(histogram_precision=histogram_precision)
+            aggregator = StatsAggregator(stats, use_numpy=use_numpy)
+            for data in self.reports:
+                aggregator.add(data)
+            self.assertEqual(0, stats.num_requests)
+            self.assertEqual(3, aggregator.flush())
+            self.assertEqual(0, aggregator.flush())
+        self.assert_same_stats(expected, stats)
+
+    def test_flush_without_numpy(self):
+        self._test_flush(use_numpy=False)
+
+    def test_flush_without_numpy_with_histogram(self):
+        self._test_flush(use_numpy=False, histogram_precision=2)
+
+    @unittest.skipIf(aggregation.numpy is None, "NumPy is not installed")
+    def test_flush_with_numpy(self):
+        self._test_flush(use_numpy=True)
+
+    @unittest.skipIf(aggregation.numpy is None, "NumPy is not installed")
+    def test_flush_with_numpy_with_histogram(self):
+        self._test_flush(use_numpy=True, histogram_precision=2)
+
+    def _test_flush_phase_times(self, use_numpy):
+        reports = []
+        for ttfb in (12, 147):
+            events = Events()
+            stats = RequestStats(use_response_times_cache=False)
+            setup_distributed_stats_event_listeners(events, stats)
+            stats.log_request("GET", "/a", 20, 10, phase_times={"ttfb": ttfb, "download": 3})
+            stats.log_request("GET", "/b", 20, 10)
+            data = {}
+            events.report_to_master.fire(client_id="worker", data=data)
+            reports.append(Message.unserialize(Message("stats", data, "worker").serialize()).data)
+
+        stats = RequestStats()
+        aggregator = StatsAggregator(stats, use_numpy=use_numpy)
+        for data in reports:
+            aggregator.add(data)
+        aggregator.flush()
+        self.assertEqual({"ttfb": {12: 1, 150: 1}, "download": {3: 2}}, stats.get("/a", "GET").phase_times)
+        self.assertEqual({}, stats.get("/b", "GET").phase_times)
+        self.assertEqual(stats.get("/a", "GET").phase_times, stats.total.phase_times)
+
+    def test_flush_phase_times_without_numpy(self):
+        self._test_flush_phase_times(use_numpy=False)
+
+    @unittest.skipIf(aggregation.numpy is None, "NumPy is not installed")
+    def test_flush_phase_times_with_numpy(self):
+        self._test_flush_phase_times(use_numpy=True)
+
+    @unittest.skipIf(aggregation.numpy is None, "NumPy is not installed")
+    def test_intern(self):
+        aggregator = StatsAggregator(RequestStats())
+        self.assertEqual(0, aggregator.intern("/a", "GET"))
+        self.assertEqual(1, aggregator.intern("/a", "POST"))
+        self.assertEqual(0, aggregator.intern("/a", "GET"))
+        self.assertEqual(("/a", "POST"), aggregator.keys[1])
+
+
+class TestMasterRunnerAggregation(LocustTestCase):
+    def test_reports_are_merged_in_batches(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            environment = Environment(events=locust.events, catch_exceptions=False)
+            master = environment.create_master_runner("*", 5557, aggregation_interval=0.1)
+            server.mocked_send(Message("client_ready", None, "fake_client"))
+            data = make_report([("GET", "/a", 100), ("GET", "/a", 200)])
+            data["user_count"] = 1
+            server.mocked_send(Message("stats", data, "fake_client"))
+            self.assertEqual(0, master.stats.num_requests)
+            self.assertEqual(1, master.clients["fake_client"].user_count)
+            sleep(0.2)
+            self.assertEqual(2, master.stats.num_requests)
+            self.assertEqual(2, master.stats.get("/a", "GET").num_requests)
+            master.quit()
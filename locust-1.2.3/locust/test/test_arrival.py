@@ -0,0 +1,162 @@
+import gevent
+
+from locust import User, constant, task
+from locust.arrival import ArrivalRateScheduler
+from locust.env import Environment
+from locust.stats import ArrivalStats
+
+from .testcases import LocustTestCase
+
+
+class TestArrivalStats(LocustTestCase):
+    def test_log(self):
+        s = ArrivalStats()
+        for i in range(10):
+            s.log_scheduled()
+        for delay in (1, 2, 3, 4, 150):
+            s.log_started(delay, delay > 100)
+        s.log_dropped()
+        self.assertEqual(10, s.num_scheduled)
+        self.assertEqual(5, s.num_started)
+        self.assertEqual(1, s.num_late)
+        self.assertEqual(1, s.num_dropped)
+        self.assertEqual(32, s.avg_queue_delay)
+        self.assertEqual(150, s.max_queue_delay)
+        self.assertEqual(150, s.get_queue_delay_percentile(0.95))
+        self.assertIn("1 dropped", s.to_string())
+
+    def test_constant_arrival_rate(self):
+        started = []
+
+        class MyUser(User):
+            wait_time = constant(100)
+
+            def on_start(self):
+                started.append(self)
+
+            @task
+            def t(self):
+                pass
+
+        scheduler = ArrivalRateScheduler(self.environment, [MyUser], pool_size=5, arrival_rate=100)
+        scheduler.start()
+        gevent.sleep(0.5)
+        scheduler.stop()
+        arrivals = self.environment.stats.arrivals
+        self.assertTrue(40 <= arrivals.num_started <= 55, arrivals.num_started)
+        self.assertEqual(0, arrivals.num_dropped)
+        # the task takes no time, so one user handles every arrival
+        self.assertEqual(1, len(started))
+        self.assertEqual(0, scheduler.user_count)
+
+    def test_arrivals_independent_of_response_time(self):
+        running = []
+        max_running = []
+
+        class SlowUser(User):
+            wait_time = constant(100)
+
+            @task
+            def t(self):
+                running.append(1)
+                max_running.append(len(running))
+                gevent.sleep(0.1)
+                running.pop()
+
+        scheduler = ArrivalRateScheduler(self.environment, [SlowUser], pool_size=20, arrival_rate=50)
+        scheduler.start()
+        gevent.sleep(0.5)
+        scheduler.stop()
+        arrivals = self.environment.stats.arrivals
+        # a closed model with 5 users would only get through ~25 tasks
+        self.assertGreaterEqual(arrivals.num_started, 20)
+        self.assertGreaterEqual(max(max_running), 4)
+        self.assertEqual(0, arrivals.num_late)
+
+    def test_queue_and_drop(self):
+        class SlowUser(User):
+            wait_time = constant(100)
+
+            @task
+            def t(self):
+                gevent.sleep(0.2)
+
+        scheduler = ArrivalRateScheduler(
+            self.environment, [SlowUser], pool_size=1, arrival_rate=20, max_queue_time=0.1, late_threshold=0.01
+        )
+        scheduler.start()
+        gevent.sleep(0.6)
+        scheduler.stop()
+        arrivals = self.environment.stats.arrivals
+        self.assertEqual(1, scheduler.pools[0].size)
+        self.assertGreater(arrivals.num_dropped, 0)
+        self.assertGreater(arrivals.num_late, 0)
+        self.assertGreater(arrivals.max_queue_delay, 10)
+        self.assertLessEqual(arrivals.num_started + arrivals.num_dropped, arrivals.num_scheduled)
+
+    def test_ramp(self):
+        class MyUser(User):
+            wait_time = constant(100)
+
+            @task
+            def t(self):
+                pass
+
+        scheduler = ArrivalRateScheduler(self.environment, [MyUser], pool_size=1, arrival_rate=100, ramp_time=1)
+        self.assertAlmostEqual(0, scheduler.current_rate(), delta=1)
+        scheduler.start()
+        gevent.sleep(0.5)
+        self.assertAlmostEqual(50, scheduler.current_rate(), delta=5)
+        scheduler.stop()
+        # about half of what the full rate would have given
+        self.assertTrue(8 <= self.environment.stats.arrivals.num_started <= 18)
+
+    def test_uncaught_error_retires_user(self):
+        class FailingUser(User):
+            wait_time = constant(100)
+
+            @task
+            def t(self):
+                raise ValueError("failing task")
+
+        # catch_exceptions is off in these tests, so the errors end the users
+        scheduler = ArrivalRateScheduler(self.environment, [FailingUser], pool_size=2, arrival_rate=50)
+        scheduler.start()
+        gevent.sleep(0.3)
+        scheduler.stop()
+        pool = scheduler.pools[0]
+        self.assertGreater(self.environment.stats.arrivals.num_started, 5)
+        # every arrival got a user, so the failed users didn't stay in the pool
+        self.assertEqual(0, len(pool.queue))
+        self.assertEqual(0, len(pool.users))
+
+    def test_invalid_distribution(self):
+        self.assertRaises(ValueError, ArrivalRateScheduler, self.environment, [User], 1, 1, distribution="bursty")
+
+
+class TestArrivalRateRunner(LocustTestCase):
+    def test_local_runner(self):
+        stopped = []
+
+        class MyUser(User):
+            wait_time = constant(100)
+
+            def on_stop(self):
+                stopped.append(self)
+
+            @task
+            def t(self):
+                pass
+
+        environment = Environment(user_classes=[MyUser], arrival_rate=50, arrival_distribution="poisson")
+        runner = environment.create_local_runner()
+        runner.start(3, 1)
+        gevent.sleep(0.5)
+        self.assertEqual("running", runner.state)
+        self.assertEqual(3, runner.target_user_count)
+        self.assertGreater(environment.stats.arrivals.num_started, 5)
+        runner.stop()
+        self.assertIsNone(runner.arrival_scheduler)
+        self.assertEqual(0, runner.user_count)
+        self.assertTrue(stopped)
+        runner.quit()
@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+import gevent
+from gevent.pool import Group
+
+from locust import AsyncTaskSet, AsyncUser, TaskSet, User, constant, task
+from locust.exception import StopUser
+from locust.runners import LocalRunner
+from .testcases import LocustTestCase, WebserverTestCase
+
+
+class TestAsyncUser(LocustTestCase):
+    def test_tasks_and_on_start_on_stop(self):
+        calls = []
+
+        class MyUser(AsyncUser):
+            wait_time = constant(0)
+
+            async def on_start(self):
+                calls.append("on_start")
+
+            @task
+            async def t(self):
+                await asyncio.sleep(0)
+                calls.append("t")
+                if calls.count("t") == 3:
+                    raise StopUser()
+
+            async def on_stop(self):
+                calls.append("on_stop")
+
+        group = Group()
+        MyUser(self.environment).start(group)
+        self.assertTrue(group.join(timeout=1))
+        self.assertEqual(["on_start", "t", "t", "t", "on_stop"], calls)
+
+    def test_task_set(self):
+        calls = []
+
+        class Tasks(AsyncTaskSet):
+            async def on_start(self):
+                calls.append("on_start")
+                if calls.count("on_start") == 2:
+                    raise StopUser()
+
+            @task
+            async def t(self):
+                calls.append("t")
+                self.interrupt()
+
+            async def on_stop(self):
+                calls.append("on_stop")
+
+        class MyUser(AsyncUser):
+            wait_time = constant(0)
+            tasks = [Tasks]
+
+            async def on_stop(self):
+                calls.append("user on_stop")
+
+        group = Group()
+        MyUser(self.environment).start(group)
+        self.assertTrue(group.join(timeout=1))
+        self.assertEqual(["on_start", "t", "on_stop", "on_start", "user on_stop"], calls)
+
+    def test_sync_task(self):
+        calls = []
+
+        class MyUser(AsyncUser):
+            wait_time = constant(0)
+
+            @task
+            def t(self):
+                calls.append("t")
+                raise StopUser()
+
+        group = Group()
+        MyUser(self.environment).start(group)
+        self.assertTrue(group.join(timeout=1))
+        self.assertEqual(["t"], calls)
+
+    def test_nested_task_set_must_be_async(self):
+        class Tasks(TaskSet):
+            @task
+            def t(self):
+                pass
+
+        class MyUser(AsyncUser):
+            wait_time = constant(0)
+            tasks = [Tasks]
+
+        group = Group()
+        user = MyUser(self.environment)
+        user.start(group)
+        self.assertTrue(group.join(timeout=1))
+        self.assertIn("must be an AsyncTaskSet", str(user._greenlet.exception))
+
+    def test_stop(self):
+        calls = []
+
+        class MyUser(AsyncUser):
+            wait_time = constant(10)
+
+            @task
+            async def t(self):
+                calls.append("t")
+
+            async def on_stop(self):
+                calls.append("on_stop")
+
+        group = Group()
+        user = MyUser(self.environment)
+        user.start(group)
+        gevent.sleep(0.05)
+        self.assertEqual(1, len(group))
+        # the user is waiting, so it's stopped right away
+        self.assertTrue(user.stop(force=False))
+        self.assertEqual(0, len(group))
+        self.assertEqual(["t", "on_stop"], calls)
+
+    def test_stop_gracefully(self):
+        calls = []
+
+        class MyUser(AsyncUser):
+            wait_time = constant(0)
+
+            @task
+            async def t(self):
+                calls.append("t")
+                await asyncio.sleep(0.2)
+                calls.append("t done")
+
+            async def on_stop(self):
+                calls.append("on_stop")
+
+        group = Group()
+        user = MyUser(self.environment)
+        user.start(group)
+        gevent.sleep(0.05)
+        self.assertFalse(user.stop(force=False))
+        self.assertTrue(group.join(timeout=1))
+        self.assertEqual(["t", "t done", "on_stop"], calls)
+
+    def test_gevent_runs_while_users_wait(self):
+        class MyUser(AsyncUser):
+            wait_time = constant(0.01)
+
+            @task
+            async def t(self):
+                pass
+
+        group = Group()
+        for _ in range(10):
+            MyUser(self.environment).start(group)
+        start = time.time()
+        gevent.sleep(0.1)
+        self.assertLess(time.time() - start, 0.2)
+        group.kill(block=True, timeout=1)
+        self.assertEqual(0, len(group))
+
+
+class TestAsyncUserRunner(WebserverTestCase):
+    def test_spawn_and_stop_with_greenlet_users(self):
+        class MyAsyncUser(AsyncUser):
+            wait_time = constant(0.05)
+
+            @task
+            async def t(self):
+                start_time = time.time()
+                reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+                writer.write(b"GET /ultra_fast HTTP/1.0\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+                self.environment.events.request_success.fire(
+                    request_type="GET",
+                    name="/ultra_fast",
+                    response_time=(time.time() - start_time) * 1000,
+                    response_length=len(response),
+                )
+
+        class MyUser(User):
+            wait_time = constant(0.05)
+
+            @task
+            def t(self):
+                pass
+
+        MyAsyncUser.port = self.port
+        self.environment.user_classes = [MyAsyncUser, MyUser]
+        runner = LocalRunner(self.environment)
+        runner.start(10, 100, wait=False)
+        gevent.sleep(0.5)
+        self.assertEqual(10, runner.user_count)
+        self.assertEqual(5, len([u for u in runner.user_greenlets if isinstance(u.args[0], MyAsyncUser)]))
+        self.assertLess(0, self.environment.stats.get("/ultra_fast", "GET").num_requests)
+        self.assertEqual(0, self.environment.stats.total.num_failures)
+
+        runner.start(2, 100, wait=False)
+        gevent.sleep(0.2)
+        self.assertEqual(2, runner.user_count)
+        runner.quit()
+        self.assertEqual(0, runner.user_count)
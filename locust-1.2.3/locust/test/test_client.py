@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 from requests.exceptions import InvalidSchema, InvalidURL, MissingSchema, RequestException
 
 
@@ -22,6 +25,46 @@ class TestHttpSession(WebserverTestCase):
         r = s.get("/ultra_fast")
         self.assertEqual(200, r.status_code)
 
+    def test_json(self):
+        s = self.get_client()
+        r = s.get("/json")
+        data = r.json()
+        self.assertEqual(200, data["code"])
+        # decoded once, later calls return the same object
+        self.assertIs(data, r.json())
+        with s.get("/json", catch_response=True) as r:
+            self.assertEqual("product", r.json()["data"]["list"][0]["name"])
+
+    def test_phase_timings(self):
+        s = HttpSession(
+            base_url="http://127.0.0.1:%i" % self.port,
+            request_success=self.environment.events.request_success,
+            request_failure=self.environment.events.request_failure,
+            phase_timings=True,
+        )
+        s.get("/ultra_fast")
+        s.get("/ultra_fast")
+        phase_times = self.runner.stats.get("/ultra_fast", "GET").phase_times
+        # the second request reuses the connection
+        self.assertEqual(1, sum(phase_times["dns"].values()))
+        self.assertEqual(1, sum(phase_times["connect"].values()))
+        self.assertEqual(2, sum(phase_times["ttfb"].values()))
+        self.assertEqual(2, sum(phase_times["download"].values()))
+
+        # sessions without phase_timings don't report any
+        self.get_client().get("/fast")
+        self.assertEqual({}, self.runner.stats.get("/fast", "GET").phase_times)
+
+    def test_phase_timings_not_installed_on_import(self):
+        # the HTTP libraries are only instrumented once phase timings are enabled
+        code = (
+            "import socket, urllib3.util.connection as c, locust.clients, locust.contrib.fasthttp; "
+            "assert c.socket is socket and not hasattr(c.create_connection, 'timed_phase'); "
+            "locust.env.Environment(http_phase_timings=True); "
+            "assert c.socket is not socket and c.create_connection.timed_phase == 'connect'"
+        )
+        subprocess.check_call([sys.executable, "-c", code])
+
     def test_connection_error(self):
         s = self.get_client(base_url="http://localhost:1")
         r = s.get("/", timeout=0.1)
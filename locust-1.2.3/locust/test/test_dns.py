@@ -0,0 +1,127 @@
+import socket
+import time
+import unittest
+
+import gevent
+
+from locust.clients import HttpSession
+from locust.contrib.fasthttp import FastHttpSession
+from locust.dns import CachingResolver, parse_dns_override
+from locust.env import Environment
+from locust.stats import DNSStats
+from .testcases import WebserverTestCase
+
+
+class FakeResolver(object):
+    """
+    Stands in for a DNS server: resolves the names in *hosts*, and fails for any other name
+    """
+
+    def __init__(self, hosts, delay=0):
+        self.hosts = hosts
+        self.delay = delay
+        self.lookups = []
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        self.lookups.append(host)
+        gevent.sleep(self.delay)
+        if host not in self.hosts:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (self.hosts[host], port))]
+
+    def gethostbyname(self, host):
+        return self.hosts[host]
+
+
+class TestCachingResolver(unittest.TestCase):
+    def setUp(self):
+        self.stats = DNSStats()
+        self.fake = FakeResolver({"example.com": "10.0.0.1"})
+
+    def test_cache(self):
+        resolver = CachingResolver(self.stats, ttl=0.1, resolver=self.fake)
+        for _ in range(3):
+            self.assertEqual(("10.0.0.1", 80), resolver.getaddrinfo("example.com", 80)[0][4])
+        self.assertEqual(["example.com"], self.fake.lookups)
+        # other ports etc. are looked up separately
+        resolver.getaddrinfo("example.com", 443)
+        self.assertEqual(2, len(self.fake.lookups))
+        self.assertEqual(2, self.stats.num_hits)
+        self.assertEqual(2, self.stats.num_misses)
+        time.sleep(0.15)
+        resolver.getaddrinfo("example.com", 80)
+        self.assertEqual(3, len(self.fake.lookups))
+
+    def test_negative_cache(self):
+        resolver = CachingResolver(self.stats, ttl=10, negative_ttl=0.1, resolver=self.fake)
+        for _ in range(3):
+            self.assertRaises(socket.gaierror, resolver.getaddrinfo, "missing.example.com", 80)
+        self.assertEqual(1, len(self.fake.lookups))
+        self.assertEqual(2, self.stats.num_negative_hits)
+        self.assertEqual(1, self.stats.num_failures)
+        time.sleep(0.15)
+        self.assertRaises(socket.gaierror, resolver.getaddrinfo, "missing.example.com", 80)
+        self.assertEqual(2, len(self.fake.lookups))
+
+    def test_concurrent_lookups(self):
+        self.fake.delay = 0.05
+        resolver = CachingResolver(self.stats, ttl=10, resolver=self.fake)
+        lookups = [gevent.spawn(resolver.getaddrinfo, "example.com", 80) for _ in range(5)]
+        gevent.joinall(lookups, raise_error=True)
+        self.assertEqual(["example.com"], self.fake.lookups)
+        self.assertEqual(1, len(set(tuple(g.value) for g in lookups)))
+
+    def test_overrides(self):
+        resolver = CachingResolver(self.stats, overrides={"api.example.com": "127.0.0.1"})
+        self.assertEqual(("127.0.0.1", 80), resolver.getaddrinfo("api.example.com", 80, socket.AF_INET)[0][4])
+        self.assertEqual(1, self.stats.num_overrides)
+
+    def test_passes_on_other_methods(self):
+        resolver = CachingResolver(self.stats, resolver=self.fake)
+        self.assertEqual("10.0.0.1", resolver.gethostbyname("example.com"))
+
+    def test_install(self):
+        resolver = CachingResolver(self.stats, ttl=10, resolver=self.fake)
+        resolver.install()
+        try:
+            self.assertEqual(("10.0.0.1", 80), socket.getaddrinfo("example.com", 80)[0][4])
+            self.assertEqual(["example.com"], self.fake.lookups)
+        finally:
+            resolver.uninstall()
+        self.assertIsNot(resolver, gevent.get_hub().resolver)
+
+    def test_parse_dns_override(self):
+        self.assertEqual(("api.example.com", "10.0.0.1"), parse_dns_override("api.example.com = 10.0.0.1"))
+        self.assertRaises(ValueError, parse_dns_override, "api.example.com")
+
+
+class TestCachingResolverWithWebserver(WebserverTestCase):
+    def setUp(self):
+        super().setUp()
+        self.environment = Environment(dns_ttl=10, dns_overrides={"locust.test": "127.0.0.1"})
+        self.runner = self.environment.create_local_runner()
+
+    def tearDown(self):
+        self.runner.quit()
+        self.environment.dns_resolver.uninstall()
+        super().tearDown()
+
+    def test_http_session(self):
+        s = HttpSession(
+            base_url="http://locust.test:%i" % self.port,
+            request_success=self.environment.events.request_success,
+            request_failure=self.environment.events.request_failure,
+        )
+        self.assertEqual(200, s.get("/ultra_fast").status_code)
+        self.assertEqual(1, self.environment.stats.dns.num_overrides)
+
+    def test_fast_http_session(self):
+        s = FastHttpSession(self.environment, "http://locust.test:%i" % self.port)
+        self.assertEqual(200, s.get("/ultra_fast").status_code)
+        self.assertEqual(1, self.environment.stats.dns.num_overrides)
+        s = FastHttpSession(self.environment, "http://localhost:%i" % self.port)
+        s.get("/ultra_fast")
+        s = FastHttpSession(self.environment, "http://localhost:%i" % self.port)
+        s.get("/ultra_fast")
+        self.assertEqual(1, self.environment.stats.dns.num_misses)
+        self.assertEqual(1, self.environment.stats.dns.num_hits)
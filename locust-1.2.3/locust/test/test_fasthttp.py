@@ -1,12 +1,13 @@
 import socket
 import gevent
+import gevent.pywsgi
 from tempfile import NamedTemporaryFile
 
 from locust.user import task, TaskSet
 from locust.contrib.fasthttp import FastHttpSession, FastHttpUser
 from locust.exception import CatchResponseError, InterruptTaskSet, ResponseError
 from locust.main import is_user_class
-from .testcases import WebserverTestCase, LocustTestCase
+from .testcases import WebserverTestCase, LocustTestCase, app
 from .util import create_tls_cert
 
 
@@ -28,6 +29,40 @@ class TestFastHttpSession(WebserverTestCase):
         self.assertTrue(isinstance(r.error, ConnectionRefusedError))
         self.assertTrue(isinstance(next(iter(self.runner.stats.errors.values())).error, ConnectionRefusedError))
 
+    def test_phase_timings(self):
+        self.environment.http_phase_timings = True
+        s = FastHttpSession(self.environment, "http://127.0.0.1:%i" % self.port)
+        s.get("/ultra_fast")
+        s.get("/ultra_fast")
+        phase_times = self.runner.stats.get("/ultra_fast", "GET").phase_times
+        # the second request reuses the connection
+        self.assertEqual(1, sum(phase_times["dns"].values()))
+        self.assertEqual(1, sum(phase_times["connect"].values()))
+        self.assertNotIn("tls", phase_times)
+        self.assertEqual(2, sum(phase_times["ttfb"].values()))
+        self.assertEqual(2, sum(phase_times["download"].values()))
+        self.assertEqual(phase_times, self.runner.stats.total.phase_times)
+
+    def test_phase_timings_tls(self):
+        self.environment.http_phase_timings = True
+        tls_cert, tls_key = create_tls_cert("127.0.0.1")
+        with NamedTemporaryFile() as cert_file, NamedTemporaryFile() as key_file:
+            cert_file.write(tls_cert)
+            cert_file.flush()
+            key_file.write(tls_key)
+            key_file.flush()
+            server = gevent.pywsgi.WSGIServer(
+                ("127.0.0.1", 0), app, log=None, certfile=cert_file.name, keyfile=key_file.name
+            )
+            server.start()
+            try:
+                s = FastHttpSession(self.environment, "https://127.0.0.1:%i" % server.server_port, insecure=True)
+                s.get("/ultra_fast")
+            finally:
+                server.stop()
+        phase_times = self.runner.stats.get("/ultra_fast", "GET").phase_times
+        self.assertEqual(["connect", "dns", "download", "tls", "ttfb"], sorted(phase_times))
+
     def test_404(self):
         s = FastHttpSession(self.environment, "http://127.0.0.1:%i" % self.port)
         r = s.get("/does_not_exist")
@@ -85,6 +120,57 @@ class TestFastHttpSession(WebserverTestCase):
         r = s.get("/get_cookie?name=testcookie")
         self.assertEqual("1337", r.content.decode())
 
+    def test_json(self):
+        s = self.get_client()
+        r = s.get("/json")
+        data = r.json()
+        self.assertEqual(200, data["code"])
+        # decoded once, later calls return the same object
+        self.assertIs(data, r.json())
+        with s.get("/json", catch_response=True) as r:
+            self.assertEqual("product", r.json()["data"]["list"][0]["name"])
+
+    def test_prepared_request(self):
+        s = self.get_client()
+        order = s.prepare(
+            "POST",
+            "/echo/orders/$cart?ref=${ref}",
+            body_template='{"sku": "$sku", "quantity": $quantity, "price": "$$5"}',
+        )
+        for i in range(3):
+            r = order.send(cart="c%i" % i, ref="x", sku="A-ö", quantity=i)
+            self.assertEqual(200, r.status_code)
+            echoed = r.json()
+            self.assertEqual("orders/c%i" % i, echoed["path"])
+            self.assertEqual({"ref": "x"}, echoed["args"])
+            self.assertEqual("application/json", echoed["content_type"])
+            self.assertEqual('{"sku": "A-ö", "quantity": %i, "price": "$5"}' % i, echoed["body"])
+        stats = self.runner.stats.get("/echo/orders/$cart?ref=${ref}", "POST")
+        self.assertEqual(3, stats.num_requests)
+        self.assertEqual(0, stats.num_failures)
+
+        with order(name="order", cart="c", ref="y", sku="B", quantity=1, catch_response=True) as r:
+            r.failure("nope")
+        self.assertEqual(1, self.runner.stats.get("order", "POST").num_failures)
+
+    def test_prepared_request_errors(self):
+        s = self.get_client()
+        self.assertRaises(ValueError, s.prepare, "POST", "/post", body_template="price: $5")
+        static = s.prepare("GET", "/ultra_fast")
+        self.assertEqual("This is an ultra fast response", static.send().text)
+        with self.assertRaises(KeyError):
+            s.prepare("POST", "/echo/$id").send()
+
+    def test_prepared_request_reserved_names(self):
+        s = self.get_client()
+        with self.assertRaises(ValueError) as cm:
+            s.prepare("POST", "/post", body_template='{"name": "$name"}')
+        self.assertIn("name", str(cm.exception))
+        self.assertRaises(ValueError, s.prepare, "GET", "/echo/${stream}")
+        self.assertRaises(ValueError, s.prepare, "GET", "/echo/$allow_redirects")
+        # $$ is an escaped $, not a variable
+        s.prepare("POST", "/post", body_template='{"name": "$$name"}')
+
     def test_head(self):
         s = FastHttpSession(self.environment, "http://127.0.0.1:%i" % self.port)
         r = s.head("/request_method")
@@ -410,6 +496,27 @@ class TestFastHttpUserClass(WebserverTestCase):
         self.assertEqual(401, locust.client.get("/basic_auth").status_code)
         self.assertEqual(401, unauthorized.client.get("/basic_auth").status_code)
 
+    def test_shared_connection_pool(self):
+        class MyUser(FastHttpUser):
+            host = "http://127.0.0.1:%i" % self.port
+            connection_pool_size = 2
+
+        users = [MyUser(self.environment) for _ in range(5)]
+        self.assertIs(users[0].client.client.clientpool, users[4].client.client.clientpool)
+        gevent.joinall([gevent.spawn(user.client.get, "/slow?delay=0.1") for user in users])
+        pool_stats = self.environment.stats.connection_pool
+        self.assertEqual(5, pool_stats.num_requests)
+        self.assertEqual(2, pool_stats.num_misses)
+        self.assertEqual(3, pool_stats.num_hits)
+        self.assertEqual(3, pool_stats.num_waits)
+        self.assertGreaterEqual(pool_stats.max_wait_time, 90)
+        self.assertEqual(5, self.runner.stats.get("/slow?delay=0.1", "GET").num_requests)
+
+        # the cookies aren't shared
+        users[0].client.post("/set_cookie?name=testcookie&value=1337")
+        self.assertEqual("1337", users[0].client.get("/get_cookie?name=testcookie").text)
+        self.assertEqual("", users[1].client.get("/get_cookie?name=testcookie").text)
+
 
 class TestFastHttpCatchResponse(WebserverTestCase):
     def setUp(self):
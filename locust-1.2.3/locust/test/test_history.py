@@ -0,0 +1,61 @@
+import unittest
+
+from locust.history import StatsHistory, TimeSeries, downsample
+
+
+def point(i, value):
+    return {"time": str(i), "timestamp": i, "current_rps": value}
+
+
+class TestTimeSeries(unittest.TestCase):
+    def test_downsample(self):
+        result = downsample([point(0, 1), point(1, 5), point(2, 3)])
+        self.assertEqual("0", result["time"])
+        self.assertEqual(3, result["samples"])
+        self.assertEqual(3, result["current_rps"])
+        self.assertEqual(1, result["min"]["current_rps"])
+        self.assertEqual(5, result["max"]["current_rps"])
+
+        # downsampling downsampled points weights by the number of samples and keeps min/max
+        result = downsample([result, point(3, 7)])
+        self.assertEqual(4, result["samples"])
+        self.assertEqual(4, result["current_rps"])
+        self.assertEqual(1, result["min"]["current_rps"])
+        self.assertEqual(7, result["max"]["current_rps"])
+
+    def test_bounded_size(self):
+        series = TimeSeries(tiers=((1, 4), (2, 4), (4, 2)))
+        for i in range(100):
+            series.append(point(i, i))
+        self.assertLessEqual(len(series), 10)
+        points = list(series)
+        self.assertEqual(99, points[-1]["current_rps"])
+        # oldest first
+        timestamps = [p["timestamp"] for p in points]
+        self.assertEqual(sorted(timestamps), timestamps)
+        self.assertEqual(4, points[0]["samples"])
+        self.assertEqual(points[-1], series[-1])
+
+    def test_full_resolution_until_capacity(self):
+        series = TimeSeries()
+        for i in range(10):
+            series.append(point(i, i))
+        self.assertEqual([point(i, i) for i in range(10)], list(series))
+
+    def test_invalid_tiers(self):
+        self.assertRaises(ValueError, TimeSeries, ((2, 10), (3, 10)))
+
+    def test_per_entry(self):
+        history = StatsHistory(per_entry=True)
+        history.append(point(0, 2), {("/", "GET"): point(0, 1)})
+        history.append(point(1, 4), {("/", "GET"): point(1, 3), ("/a", "GET"): point(1, 1)})
+        self.assertEqual(2, len(history))
+        self.assertEqual(2, len(history.entries[("/", "GET")]))
+        self.assertEqual(1, len(history.entries[("/a", "GET")]))
+        history.clear()
+        self.assertEqual(0, len(history))
+        self.assertEqual({}, history.entries)
+
+        history = StatsHistory()
+        history.append(point(0, 2), {("/", "GET"): point(0, 1)})
+        self.assertEqual({}, history.entries)
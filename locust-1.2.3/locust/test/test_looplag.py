@@ -0,0 +1,91 @@
+import unittest
+from timeit import default_timer
+
+import gevent
+
+from locust import User, constant, task
+from locust.env import Environment
+from locust.looplag import LoopLagMonitor, runnable_greenlets
+from locust.runners import LocalRunner
+
+
+def busy(seconds):
+    # blocks the event loop, unlike (the monkey patched) time.sleep()
+    end = default_timer() + seconds
+    while default_timer() < end:
+        pass
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+    def setUp(self):
+        self.monitor = LoopLagMonitor(interval=0.02, window=0.2)
+        self.greenlet = gevent.spawn(self.monitor.run)
+
+    def tearDown(self):
+        self.greenlet.kill()
+
+    def test_idle_loop(self):
+        gevent.sleep(0.5)
+        self.assertLess(self.monitor.lag, 10)
+        self.assertEqual(0, self.monitor.stats_hook_usage)
+
+    def test_blocked_loop(self):
+        def block():
+            while True:
+                busy(0.05)
+                gevent.sleep(0)
+
+        blocker = gevent.spawn(block)
+        gevent.sleep(0.5)
+        blocker.kill()
+        self.assertGreater(self.monitor.lag, 10)
+        self.assertGreaterEqual(self.monitor.max_lag, self.monitor.lag)
+        self.assertGreaterEqual(self.monitor.peak_lag, self.monitor.max_lag)
+        snapshot = self.monitor.snapshot()
+        self.assertEqual(self.monitor.lag, snapshot["lag"])
+        self.assertEqual(self.monitor.peak_lag, snapshot["peak_lag"])
+
+    def test_stats_hook_usage(self):
+        def hook():
+            while True:
+                start = default_timer()
+                busy(0.01)
+                self.monitor.track_hook(start)
+                gevent.sleep(0.01)
+
+        hooker = gevent.spawn(hook)
+        gevent.sleep(0.5)
+        hooker.kill()
+        self.assertAlmostEqual(50, self.monitor.stats_hook_usage, delta=25)
+
+    def test_runnable_greenlets(self):
+        greenlets = [gevent.spawn(gevent.sleep, 0) for _ in range(10)]
+        self.assertGreaterEqual(runnable_greenlets(), 10)
+        gevent.joinall(greenlets)
+
+    def test_wait_for_lag_below(self):
+        self.monitor.lag = 500
+        self.assertFalse(self.monitor.wait_for_lag_below(100, timeout=0.1))
+        self.assertTrue(self.monitor.wait_for_lag_below(1000))
+
+
+class TestLoopLagThrottle(unittest.TestCase):
+    def test_spawning_paused_by_loop_lag(self):
+        class MyUser(User):
+            wait_time = constant(1)
+
+            @task
+            def my_task(self):
+                pass
+
+        environment = Environment(user_classes=[MyUser], max_loop_lag=50)
+        runner = LocalRunner(environment)
+        runner.loop_monitor.lag = 200
+        runner.start(5, 100, wait=False)
+        gevent.sleep(0.1)
+        # the first user is spawned, and then spawning waits for the lag to go down
+        self.assertEqual(1, runner.user_count)
+        runner.loop_monitor.lag = 0
+        gevent.sleep(1.2)
+        self.assertEqual(5, runner.user_count)
+        runner.quit()
@@ -24,6 +24,26 @@ class TestParser(unittest.TestCase):
         opts = self.parser.parse_args(args)
         self.assertEqual(opts.reset_stats, True)
 
+    def test_histogram_precision(self):
+        opts = self.parser.parse_args(["--histogram-precision", "3"])
+        self.assertEqual(3, opts.histogram_precision)
+
+    def test_name_templating(self):
+        opts = self.parser.parse_args(
+            [
+                "--templatize-names",
+                "--name-template-rule",
+                "/a/=>/b/",
+                "--name-template-rule",
+                "x=>y",
+                "--max-stats-entries",
+                "100",
+            ]
+        )
+        self.assertTrue(opts.templatize_names)
+        self.assertEqual(["/a/=>/b/", "x=>y"], opts.name_template_rule)
+        self.assertEqual(100, opts.max_stats_entries)
+
     def test_skip_log_setup(self):
         args = ["--skip-log-setup"]
         opts = self.parser.parse_args(args)
@@ -174,3 +194,19 @@ class TestArgumentParser(LocustTestCase):
                         "--csv-full-history",
                     ]
                 )
+
+    def test_csv_incremental_requires_csv(self):
+        with mock.patch("sys.stderr", new=StringIO()):
+            with self.assertRaises(SystemExit):
+                parse_options(
+                    args=[
+                        "-f",
+                        "locustfile.py",
+                        "--csv-incremental",
+                    ]
+                )
+        opts = parse_options(
+            args=["-f", "locustfile.py", "--csv", "test", "--csv-incremental", "--csv-history-format", "ndjson.gz"]
+        )
+        self.assertTrue(opts.csv_incremental)
+        self.assertEqual("ndjson.gz", opts.csv_history_format)
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+import gevent
+
+from locust import User, constant, task
+from locust.env import Environment
+from locust.processes import WorkerProcesses
+
+from .testcases import LocustTestCase
+
+
+class MyUser(User):
+    wait_time = constant(0.1)
+
+    @task
+    def t(self):
+        pass
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires os.fork()")
+class TestWorkerProcesses(LocustTestCase):
+    def test_invalid_count(self):
+        self.assertRaises(ValueError, WorkerProcesses, 0)
+
+    def test_fork_workers(self):
+        processes = WorkerProcesses(2, cpu_affinity=True)
+        self.assertTrue(processes.endpoint.startswith("ipc://"))
+        if processes.fork():
+            # worker process
+            code = 1
+            try:
+                environment = Environment(user_classes=[MyUser])
+                runner = environment.create_worker_runner(processes.endpoint, 0)
+                processes.watch_master(runner.quit)
+                runner.greenlet.join(timeout=10)
+                code = 0
+            finally:
+                os._exit(code)
+
+        self.assertEqual(2, len(processes.pids))
+        environment = Environment(user_classes=[MyUser])
+        master = environment.create_master_runner(processes.endpoint, 0)
+        try:
+            for _ in range(50):
+                if len(master.clients.ready) == 2:
+                    break
+                gevent.sleep(0.1)
+            self.assertEqual(2, len(master.clients.ready))
+            master.start(4, 100)
+            for _ in range(50):
+                if master.user_count == 4:
+                    break
+                gevent.sleep(0.1)
+            self.assertEqual(4, master.user_count)
+        finally:
+            master.quit()
+            processes.stop(timeout=5)
+        self.assertEqual([], processes.pids)
+        self.assertFalse(os.path.exists(processes.directory))
@@ -0,0 +1,90 @@
+import time
+import unittest
+
+import gevent
+
+from locust.ratelimit import LEASE_INTERVAL, RateLimiter, RateLimiters, parse_rate_limit
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_local_rate(self):
+        limiter = RateLimiter("api", 100, burst=1)
+        start = time.perf_counter()
+        for _ in range(21):
+            self.assertTrue(limiter.acquire())
+        elapsed = time.perf_counter() - start
+        self.assertAlmostEqual(0.2, elapsed, delta=0.05)
+        self.assertEqual(21, limiter.consumed)
+
+    def test_non_blocking_and_timeout(self):
+        limiter = RateLimiter("api", 1, burst=1)
+        self.assertTrue(limiter.acquire(block=False))
+        self.assertFalse(limiter.acquire(block=False))
+        start = time.perf_counter()
+        self.assertFalse(limiter.acquire(timeout=0.05))
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_leased(self):
+        limiters = RateLimiters()
+        limiters.set_limit("api", 10)
+        limiters.use_leases()
+        self.assertFalse(limiters.acquire("api", block=False))
+
+        acquired = []
+        waiter = gevent.spawn(lambda: acquired.append(limiters.acquire("api", 2)))
+        gevent.sleep(0)
+        self.assertEqual(2, limiters["api"].waiting)
+        limiters.receive_lease({"leases": {"api": [3, 10, 5]}, "interval": LEASE_INTERVAL})
+        waiter.join(timeout=1)
+        self.assertEqual([True], acquired)
+
+        # unused tokens go back to the master, together with the demand
+        report = limiters.receive_lease({"leases": {"api": [4, 10, 5]}, "interval": LEASE_INTERVAL})
+        self.assertEqual({"api": (1, 2)}, report)
+        self.assertEqual(4, limiters["api"].tokens)
+
+    def test_limit_only_set_on_master(self):
+        limiters = RateLimiters()
+        limiters.use_leases()
+        limiters.receive_lease({"leases": {"api": [3, 10, 5]}, "interval": LEASE_INTERVAL})
+        self.assertIn("api", limiters)
+        self.assertTrue(limiters.acquire("api", 3, block=False))
+
+
+class TestRateLimitersLeasing(unittest.TestCase):
+    def test_lease_by_demand(self):
+        limiters = RateLimiters()
+        limiters.set_limit("api", 100)
+        leases = limiters.lease(["a", "b"])
+        # no demand reported yet, so the budget is split evenly
+        self.assertEqual(25, leases["a"]["leases"]["api"][0])
+        self.assertEqual(25, leases["b"]["leases"]["api"][0])
+
+        limiters.receive_report("a", {"api": [0, 49]})
+        limiters.receive_report("b", {"api": [25, 0]})
+        leases = limiters.lease(["a", "b"])
+        # b's unused tokens are leased out again, mostly to a which needs them
+        self.assertEqual(75, sum(lease["leases"]["api"][0] for lease in leases.values()))
+        self.assertEqual(74, leases["a"]["leases"]["api"][0])
+        self.assertEqual(1, leases["b"]["leases"]["api"][0])
+
+        # but no more than the burst is carried over
+        limiters.receive_report("b", {"api": [500, 0]})
+        leases = limiters.lease(["a", "b"])
+        self.assertEqual(100, sum(lease["leases"]["api"][0] for lease in leases.values()))
+
+    def test_total_never_exceeds_rate(self):
+        limiters = RateLimiters()
+        limiters.set_limit("api", 7, burst=1)
+        total = 0
+        for _ in range(100):
+            leases = limiters.lease(["a", "b", "c"])
+            total += sum(lease["leases"]["api"][0] for lease in leases.values())
+        self.assertLessEqual(total, 7 * LEASE_INTERVAL * 100)
+        self.assertGreaterEqual(total, 7 * LEASE_INTERVAL * 100 - 1)
+
+    def test_parse_rate_limit(self):
+        self.assertEqual(("api", 10.0, None), parse_rate_limit("api=10"))
+        self.assertEqual(("a=b", 2.5, 5.0), parse_rate_limit("a=b=2.5:5"))
+        self.assertRaises(ValueError, parse_rate_limit, "api")
+        self.assertRaises(ValueError, parse_rate_limit, "api=fast")
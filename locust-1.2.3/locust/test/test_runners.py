@@ -7,7 +7,7 @@ from gevent.queue import Queue
 import greenlet
 
 import locust
-from locust import runners, between, constant, LoadTestShape
+from locust import runners, stats, between, constant, LoadTestShape
 from locust.main import create_environment
 from locust.user import User, TaskSet, task
 from locust.env import Environment
@@ -57,6 +57,9 @@ def mocked_rpc():
         def send_to_client(self, message):
             self.outbox.append((message.node_id, message))
 
+        def flush(self):
+            pass
+
         def recv_from_client(self):
             results = self.queue.get()
             msg = Message.unserialize(results)
@@ -196,6 +199,35 @@ class TestLocustRunner(LocustTestCase):
         self.assertTrue(g2.dead)
         self.assertTrue(triggered[0])
 
+    def test_stop_users_by_class(self):
+        class L1(User):
+            wait_time = constant(1)
+            weight = 1
+
+            @task
+            def t(self):
+                pass
+
+        class L2(L1):
+            weight = 3
+
+        runner = Environment(user_classes=[L1, L2]).create_local_runner()
+        runner.spawn_users(8, spawn_rate=100, wait=False)
+        self.assertEqual({L1: 2, L2: 6}, runner.user_registry.counts())
+        runner.stop_users(4)
+        self.assertEqual(4, runner.user_count)
+        self.assertEqual({L1: 1, L2: 3}, runner.user_registry.counts())
+        self.assertEqual(set(g.args[0] for g in runner.user_greenlets), set(runner.user_registry))
+
+        # users that stop by themselves are removed from the registry
+        user = next(iter(runner.user_registry))
+        user._group.killone(user._greenlet)
+        sleep(0)
+        self.assertEqual(3, len(runner.user_registry))
+        runner.quit()
+        self.assertEqual(0, runner.user_count)
+        self.assertEqual(0, len(runner.user_registry))
+
     def test_start_event(self):
         class MyUser(User):
             wait_time = constant(1)
@@ -440,6 +472,47 @@ class TestLocustRunner(LocustTestCase):
         user_count = len(runner.user_greenlets)
         self.assertTrue(user_count == 2, "User count has not decreased correctly to 2, it is : %i" % user_count)
 
+    def test_batched_request_events(self):
+        environment = Environment(request_batch_size=10, request_batch_interval=60)
+        runner = environment.create_local_runner()
+        per_request = []
+        batches = []
+        environment.events.request_success.add_listener(lambda name, **kw: per_request.append(name))
+        environment.events.request_batch.add_listener(lambda requests: batches.append(len(requests)))
+
+        for i in range(5):
+            environment.events.request_success.fire(request_type="GET", name="/", response_time=i, response_length=1)
+        environment.events.request_failure.fire(
+            request_type="GET", name="/", response_time=10, response_length=0, exception=HeyAnException("oops")
+        )
+        # nothing is dispatched until the batch is full or flushed
+        self.assertEqual(0, runner.stats.num_requests)
+        self.assertEqual([], per_request)
+
+        for i in range(4):
+            environment.events.request_success.fire(request_type="GET", name="/a", response_time=i, response_length=1)
+        self.assertEqual([10], batches)
+        self.assertEqual(10, runner.stats.num_requests)
+        self.assertEqual(1, runner.stats.num_failures)
+        self.assertEqual(1, len(runner.stats.errors))
+        self.assertEqual(4, runner.stats.get("/a", "GET").num_requests)
+        self.assertEqual(["/"] * 5 + ["/a"] * 4, per_request)
+
+        # stopping the runner dispatches what's left in the buffer
+        environment.events.request_success.fire(request_type="GET", name="/", response_time=1, response_length=1)
+        runner.quit()
+        self.assertEqual(11, runner.stats.num_requests)
+        self.assertEqual([10, 1], batches)
+
+    def test_batched_request_events_are_flushed_periodically(self):
+        environment = Environment(request_batch_size=1000, request_batch_interval=0.05)
+        runner = environment.create_local_runner()
+        environment.events.request_success.fire(request_type="GET", name="/", response_time=1, response_length=1)
+        self.assertEqual(0, runner.stats.num_requests)
+        sleep(0.1)
+        self.assertEqual(1, runner.stats.num_requests)
+        runner.quit()
+
 
 class TestMasterWorkerRunners(LocustTestCase):
     def test_distributed_integration_run(self):
@@ -460,7 +533,9 @@ class TestMasterWorkerRunners(LocustTestCase):
                     response_length=666,
                 )
 
-        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3):
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ):
             # start a Master runner
             master_env = Environment(user_classes=[TestUser])
             master = master_env.create_master_runner("*", 0)
@@ -494,6 +569,145 @@ class TestMasterWorkerRunners(LocustTestCase):
             "For some reason the master node's stats has not come in",
         )
 
+    def test_rebalance_integration(self):
+        """
+        The master returns to running after rebalancing the users when a worker joins and when one goes missing
+        """
+
+        class TestUser(User):
+            wait_time = constant(0.1)
+
+            @task
+            def t(self):
+                pass
+
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ), mock.patch("locust.runners.HEARTBEAT_INTERVAL", new=0.1):
+            master_env = Environment(user_classes=[TestUser])
+            master = master_env.create_master_runner("*", 0)
+            first = Environment(user_classes=[TestUser]).create_worker_runner("127.0.0.1", master.server.port)
+            sleep(0.2)
+            master.start(4, spawn_rate=1000)
+            sleep(0.5)
+            self.assertEqual(STATE_RUNNING, master.state)
+            self.assertEqual(4, first.user_count)
+
+            # a newcomer joins, and the first worker shrinks
+            second = Environment(user_classes=[TestUser]).create_worker_runner("127.0.0.1", master.server.port)
+            sleep(0.5)
+            self.assertEqual(2, first.user_count)
+            self.assertEqual(2, second.user_count)
+            self.assertEqual(STATE_RUNNING, master.state)
+            self.assertEqual(2, len(master.clients.running))
+            self.assertFalse(master.rebalancing)
+
+            # the second worker goes missing (stops sending heartbeats), and the first one takes over its users
+            second.greenlet.kill(block=True)
+            second.stop()
+            sleep(1)
+            self.assertEqual(1, len(master.clients.missing))
+            self.assertEqual(4, first.user_count)
+            self.assertEqual(STATE_RUNNING, master.state)
+            self.assertFalse(master.rebalancing)
+
+            master.quit()
+            first.quit()
+
+    def test_rebalance_by_cpu_integration(self):
+        """
+        The master keeps rebalancing by CPU usage during a test, since it returns to running after each round
+        """
+
+        class TestUser(User):
+            wait_time = constant(0.1)
+
+            @task
+            def t(self):
+                pass
+
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ), mock.patch("locust.runners.HEARTBEAT_INTERVAL", new=0.1):
+            master_env = Environment(user_classes=[TestUser])
+            master = master_env.create_master_runner("*", 0)
+            first = Environment(user_classes=[TestUser]).create_worker_runner("127.0.0.1", master.server.port)
+            second = Environment(user_classes=[TestUser]).create_worker_runner("127.0.0.1", master.server.port)
+            sleep(0.2)
+            master.start(100, spawn_rate=10000)
+            sleep(0.5)
+            self.assertEqual(50, first.user_count)
+
+            for (first_cpu, second_cpu), expected in (((90, 30), (25, 75)), ((30, 90), (50, 50))):
+                first.current_cpu_usage = first_cpu
+                second.current_cpu_usage = second_cpu
+                sleep(0.3)
+                self.assertTrue(master.rebalance_by_cpu())
+                sleep(0.5)
+                self.assertEqual(expected, (first.user_count, second.user_count))
+                self.assertEqual(STATE_RUNNING, master.state)
+                self.assertFalse(master.rebalancing)
+
+            master.quit()
+            first.quit()
+            second.quit()
+
+    def test_relay_integration_run(self):
+        """
+        Full integration test with a MasterRunner, two RelayRunners and two WorkerRunners behind each relay
+        """
+
+        class TestUser(User):
+            wait_time = constant(0.1)
+
+            @task
+            def incr_stats(l):
+                l.environment.events.request_success.fire(
+                    request_type="GET",
+                    name="/",
+                    response_time=1337,
+                    response_length=666,
+                )
+
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ):
+            master_env = Environment(user_classes=[TestUser])
+            master = master_env.create_master_runner("*", 0)
+            relays = []
+            workers = []
+            for i in range(2):
+                relay_env = Environment(user_classes=[TestUser])
+                relay = relay_env.create_relay_runner(
+                    "127.0.0.1", master.server.port, relay_bind_port=0, report_interval=0.2
+                )
+                relays.append(relay)
+                for j in range(2):
+                    worker_env = Environment(user_classes=[TestUser])
+                    workers.append(worker_env.create_worker_runner("127.0.0.1", relay.server.port))
+
+            sleep(0.2)
+            self.assertEqual(4, len(master.clients.ready))
+            master.start(8, spawn_rate=1000)
+            sleep(0.2)
+            for worker in workers:
+                self.assertEqual(2, worker.user_count)
+            sleep(1)
+            # the relays only send one report each per interval, with the user counts and heartbeats
+            self.assertEqual(8, master.user_count)
+            self.assertEqual(4, len(master.clients.running))
+            for relay in relays:
+                self.assertEqual(4, relay.user_count)
+            self.assertGreater(master_env.stats.total.num_requests, 20)
+            self.assertEqual(0, len(master.clients.missing))
+
+            master.quit()
+            sleep(0.2)
+            for worker in workers:
+                self.assertEqual(0, worker.user_count)
+            for relay in relays:
+                self.assertEqual(0, len(relay.greenlet))
+
     def test_distributed_shape(self):
         """
         Full integration test that starts both a MasterRunner and three WorkerRunner instances
@@ -519,7 +733,9 @@ class TestMasterWorkerRunners(LocustTestCase):
                 else:
                     return None
 
-        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3):
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ):
             master_env = Environment(user_classes=[TestUser], shape_class=TestShape())
             master_env.shape_class.reset_time()
             master = master_env.create_master_runner("*", 0)
@@ -572,7 +788,9 @@ class TestMasterWorkerRunners(LocustTestCase):
                 else:
                     return None
 
-        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3):
+        with mock.patch("locust.runners.WORKER_REPORT_INTERVAL", new=0.3), mock.patch(
+            "locust.runners.MIN_REPORT_INTERVAL", new=0.3
+        ):
             master_env = Environment(user_classes=[TestUser], shape_class=TestShape())
             master_env.shape_class.reset_time()
             master = master_env.create_master_runner("*", 0)
@@ -676,6 +894,48 @@ class TestMasterRunner(LocustTestCase):
             self.assertEqual(0, s2.median_response_time)
             self.assertEqual(0, s2.avg_response_time)
 
+    def test_worker_stats_report_only_contains_touched_entries(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "fake_client"))
+
+            master.stats.get("/idle", "GET")
+            master.stats.get("/busy", "GET").log(100, 23455)
+            master.stats.get("/busy", "GET").log(800, 23455)
+
+            data = {"user_count": 1}
+            self.environment.events.report_to_master.fire(client_id="fake_client", data=data)
+            self.assertEqual(stats.STATS_REPORT_VERSION, data["stats_version"])
+            self.assertEqual(["/busy"], [entry[0] for entry in data["stats"]])
+            master.stats.clear_all()
+
+            server.mocked_send(Message("stats", data, "fake_client"))
+            s = master.stats.get("/busy", "GET")
+            self.assertEqual(2, s.num_requests)
+            self.assertEqual(800, s.max_response_time)
+
+    def test_worker_stats_report_from_old_worker(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "fake_client"))
+            old_stats = RequestStats()
+            old_stats.log_request("GET", "/1", 100, 3546)
+            old_stats.log_request("GET", "/1", 800, 56743)
+            server.mocked_send(
+                Message(
+                    "stats",
+                    {
+                        "stats": old_stats.serialize_stats(),
+                        "stats_total": old_stats.total.get_stripped_report(),
+                        "errors": old_stats.serialize_errors(),
+                        "user_count": 1,
+                    },
+                    "fake_client",
+                )
+            )
+            self.assertEqual(2, master.stats.get("/1", "GET").num_requests)
+            self.assertEqual(2, master.stats.total.num_requests)
+
     def test_master_marks_downed_workers_as_missing(self):
         with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
             master = self.get_runner()
@@ -726,6 +986,20 @@ class TestMasterRunner(LocustTestCase):
             self.assertEqual(2, len(master.clients.missing))
             self.assertEqual(STATE_STOPPED, master.state, "All workers went missing but test didn't stop.")
 
+    def test_worker_loop_lag(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "fake_client"))
+            loop_lag = {"lag": 12.5, "max_lag": 40.0, "peak_lag": 80.0, "runnable": 3.0, "stats_hook_usage": 1.5}
+            server.mocked_send(
+                Message(
+                    "heartbeat",
+                    {"state": STATE_RUNNING, "current_cpu_usage": 50, "loop_lag": loop_lag},
+                    "fake_client",
+                )
+            )
+            self.assertEqual(loop_lag, master.clients["fake_client"].loop_lag)
+
     def test_master_total_stats(self):
         with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
             master = self.get_runner()
@@ -902,6 +1176,51 @@ class TestMasterRunner(LocustTestCase):
             self.assertEqual(50, msg.data["num_users"])
             self.assertEqual(10, msg.data["spawn_rate"])
 
+    @mock.patch("locust.runners.HEARTBEAT_INTERVAL", new=0.1)
+    def test_rebalance_locust_users_on_worker_missing(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            spawning_complete = []
+            self.environment.events.spawning_complete.add_listener(lambda user_count: spawning_complete.append(1))
+            for i in range(3):
+                server.mocked_send(Message("client_ready", None, "fake_client%i" % i))
+            master.start(9, 3)
+            for i in range(3):
+                server.mocked_send(Message("spawning", None, "fake_client%i" % i))
+            for i in range(3):
+                server.mocked_send(Message("spawning_complete", {"count": 3}, "fake_client%i" % i))
+            self.assertEqual(STATE_RUNNING, master.state)
+            self.assertEqual(1, len(spawning_complete))
+            server.outbox.clear()
+
+            # fake_client2 stops sending heartbeats
+            for _ in range(6):
+                for i in range(2):
+                    server.mocked_send(
+                        Message("heartbeat", {"state": STATE_RUNNING, "current_cpu_usage": 50}, "fake_client%i" % i)
+                    )
+                sleep(0.1)
+            self.assertEqual(1, len(master.clients.missing))
+            # only the remaining workers get new spawn jobs, for the missing worker's share
+            self.assertEqual(
+                {"fake_client0": 5, "fake_client1": 4},
+                dict((client_id, msg.data["num_users"]) for client_id, msg in server.outbox),
+            )
+            for i in range(2):
+                server.mocked_send(Message("spawning", None, "fake_client%i" % i))
+            for i, count in enumerate((5, 4)):
+                server.mocked_send(Message("spawning_complete", {"count": count}, "fake_client%i" % i))
+            self.assertEqual(STATE_RUNNING, master.state)
+            self.assertEqual(1, len(spawning_complete))
+            server.outbox.clear()
+
+            # when it's back, it gets its share again
+            server.mocked_send(Message("heartbeat", {"state": STATE_RUNNING, "current_cpu_usage": 50}, "fake_client2"))
+            self.assertEqual(
+                {"fake_client0": 3, "fake_client1": 3, "fake_client2": 3},
+                dict((client_id, msg.data["num_users"]) for client_id, msg in server.outbox),
+            )
+
     def test_sends_spawn_data_to_ready_running_spawning_workers(self):
         """Sends spawn job to running, ready, or spawning workers"""
         with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
@@ -1055,6 +1374,168 @@ class TestMasterRunner(LocustTestCase):
 
             self.assertEqual(2, num_users, "Total number of locusts that would have been spawned is not 2")
 
+    def test_spawn_weighted_by_worker_capacity(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", {"capacity": 1}, "small"))
+            server.mocked_send(Message("client_ready", {"capacity": 3}, "big"))
+            server.mocked_send(Message("client_ready", None, "old"))
+
+            master.start(11, 10)
+            self.assertEqual(3, len(server.outbox))
+            data = dict((client_id, msg.data) for client_id, msg in server.outbox)
+            self.assertEqual(11, sum(d["num_users"] for d in data.values()))
+            self.assertEqual(2, data["small"]["num_users"])
+            self.assertEqual(7, data["big"]["num_users"])
+            self.assertEqual(2, data["old"]["num_users"])
+            self.assertAlmostEqual(2.0, data["small"]["spawn_rate"])
+            self.assertAlmostEqual(6.0, data["big"]["spawn_rate"])
+
+    def test_adaptive_report_interval(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            for i in range(100):
+                server.mocked_send(Message("client_ready", None, "worker%i" % i))
+            # 100 workers at 50 reports per second
+            self.assertEqual(2.0, master.report_interval())
+            master.report_ingest_time = 0.001
+            self.assertEqual(2.0, master.report_interval())
+            master.report_ingest_time = 0.01
+            # the master would spend 20% of its time on 20 reports per second
+            self.assertAlmostEqual(5.0, master.report_interval())
+
+            master.start(100, 100)
+            spawns = [msg for _, msg in server.outbox if msg.type == "spawn"]
+            self.assertEqual(100, len(spawns))
+            self.assertTrue(all(msg.data["report_interval"] == 5.0 for msg in spawns))
+
+            # the ingest time going down isn't pushed unless the change is big enough
+            master.report_ingest_time = 0.009
+            server.outbox.clear()
+            master.update_report_interval()
+            self.assertEqual(0, len(server.outbox))
+            master.report_ingest_time = 0.001
+            master.update_report_interval()
+            self.assertEqual(100, len(server.outbox))
+            self.assertEqual({"interval": 2.0}, server.outbox[0][1].data)
+
+    def test_adaptive_report_interval_with_relay(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            for i in range(200):
+                server.mocked_send(Message("client_ready", None, "worker%i" % i))
+            self.assertEqual(4.0, master.report_interval())
+            # half of the workers are behind a relay, which sends one report for all of them
+            data = {"user_count": 0}
+            self.environment.events.report_to_master.fire(client_id="relay", data=data)
+            data["relayed"] = dict(("worker%i" % i, {"user_count": 0}) for i in range(100, 200))
+            server.mocked_send(Message("stats", data, "relay"))
+            self.assertEqual(2.02, master.report_interval())
+
+    def test_adaptive_report_interval_lower_bound(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "worker"))
+            self.assertEqual(1.0, master.report_interval())
+            with mock.patch("locust.runners.MIN_REPORT_INTERVAL", new=0.3):
+                self.assertEqual(0.3, master.report_interval())
+
+    def test_spawn_arrival_rate(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            self.environment.arrival_rate = 30
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", {"capacity": 1}, "small"))
+            server.mocked_send(Message("client_ready", {"capacity": 2}, "big"))
+
+            master.start(6, 6)
+            data = dict((client_id, msg.data) for client_id, msg in server.outbox)
+            self.assertAlmostEqual(10, data["small"]["arrival_rate"])
+            self.assertAlmostEqual(20, data["big"]["arrival_rate"])
+            self.assertEqual(2, data["small"]["num_users"])
+            self.assertEqual(4, data["big"]["num_users"])
+            # the workers run their arrivals the way the master was told to
+            self.assertEqual("constant", data["small"]["arrival_distribution"])
+            self.assertEqual(0, data["small"]["arrival_ramp_time"])
+            self.assertEqual(1.0, data["small"]["arrival_max_queue_time"])
+
+    def test_shape_back_to_closed_model(self):
+        class MyUser(User):
+            wait_time = constant(0)
+
+            @task
+            def my_task(self):
+                pass
+
+        class TestShape(LoadTestShape):
+            state = (2, 2, 10)
+
+            def tick(self):
+                return self.state
+
+        self.environment.user_classes = [MyUser]
+        self.environment.shape_class = TestShape()
+
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "fake_client"))
+
+            master.start_shape()
+            sleep(0.5)
+            self.assertEqual(10, server.outbox[-1][1].data["arrival_rate"])
+
+            # a 2-tuple switches the test back to a closed model
+            self.environment.shape_class.state = (3, 2)
+            sleep(1.2)
+            self.assertIsNone(master.arrival_rate)
+            self.assertEqual(3, server.outbox[-1][1].data["num_users"])
+            self.assertNotIn("arrival_rate", server.outbox[-1][1].data)
+            master.quit()
+
+    @mock.patch("locust.runners.LEASE_INTERVAL", new=0.05)
+    def test_rate_limit_leases(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            self.environment.rate_limiters.set_limit("api", 100)
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "fake_client1"))
+            server.mocked_send(Message("client_ready", None, "fake_client2"))
+            sleep(0.1)
+            # no leases until the test is started
+            self.assertEqual(0, len(server.outbox))
+            master.start(2, 2)
+            server.outbox.clear()
+            sleep(0.08)
+            leases = [(client_id, msg.data) for client_id, msg in server.outbox if msg.type == "rate_limit"]
+            self.assertEqual(["fake_client1", "fake_client2"], sorted(client_id for client_id, _ in leases[:2]))
+            self.assertEqual(50, sum(data["leases"]["api"][0] for _, data in leases[:2]))
+
+            server.mocked_send(Message("rate_limit_report", {"api": [25, 0]}, "fake_client2"))
+            self.assertEqual(25, self.environment.rate_limiters._master_tokens["api"])
+
+    def test_rebalance_by_cpu(self):
+        with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
+            master = self.get_runner()
+            server.mocked_send(Message("client_ready", None, "busy"))
+            server.mocked_send(Message("client_ready", None, "idle"))
+            master.start(100, 100)
+            server.outbox.clear()
+            for client in master.clients.values():
+                client.state = STATE_RUNNING
+                client.user_count = 50
+            master.state = STATE_RUNNING
+
+            master.clients["busy"].cpu_usage = 90
+            master.clients["idle"].cpu_usage = 80
+            # the difference in CPU usage is too small
+            self.assertFalse(master.rebalance_by_cpu())
+            self.assertEqual(0, len(server.outbox))
+
+            master.clients["idle"].cpu_usage = 30
+            self.assertTrue(master.rebalance_by_cpu())
+            data = dict((client_id, msg.data) for client_id, msg in server.outbox)
+            self.assertEqual(100, data["busy"]["num_users"] + data["idle"]["num_users"])
+            self.assertEqual(25, data["busy"]["num_users"])
+            self.assertEqual(75, data["idle"]["num_users"])
+
     def test_custom_shape_scale_up(self):
         class MyUser(User):
             wait_time = constant(0)
@@ -1336,6 +1817,67 @@ class TestWorkerRunner(LocustTestCase):
             # make sure the test_start was never fired on the worker
             self.assertFalse(test_start_run[0])
 
+    def test_worker_rate_limit_lease(self):
+        with mock.patch("locust.rpc.rpc.Client", mocked_rpc()) as client:
+            environment = Environment()
+            environment.rate_limiters.set_limit("api", 10)
+            worker = self.get_runner(environment=environment, user_classes=[])
+            self.assertFalse(environment.rate_limiters.acquire("api", block=False))
+            client.mocked_send(Message("rate_limit", {"leases": {"api": [3, 10, 5]}, "interval": 0.5}, "dummy"))
+            self.assertTrue(environment.rate_limiters.acquire("api", 2, block=False))
+            client.mocked_send(Message("rate_limit", {"leases": {"api": [3, 10, 5]}, "interval": 0.5}, "dummy"))
+            reports = [m for m in client.outbox if m.type == "rate_limit_report"]
+            self.assertEqual(2, len(reports))
+            self.assertEqual({"api": (1, 2)}, reports[1].data)
+            worker.quit()
+
+    def test_worker_spawn_arrival_rate(self):
+        with mock.patch("locust.rpc.rpc.Client", mocked_rpc()) as client:
+            environment = Environment()
+            worker = self.get_runner(environment=environment, user_classes=[])
+            with mock.patch.object(worker, "start_arrivals") as start_arrivals:
+                client.mocked_send(
+                    Message(
+                        "spawn",
+                        {
+                            "spawn_rate": 1,
+                            "num_users": 2,
+                            "host": "",
+                            "stop_timeout": None,
+                            "arrival_rate": 5,
+                            "arrival_distribution": "poisson",
+                            "arrival_ramp_time": 10,
+                            "arrival_max_queue_time": 0.5,
+                        },
+                        "dummy_client_id",
+                    )
+                )
+                worker.spawning_greenlet.join()
+                start_arrivals.assert_called_once_with(2, 5)
+            self.assertEqual("poisson", environment.arrival_distribution)
+            self.assertEqual(10, environment.arrival_ramp_time)
+            self.assertEqual(0.5, environment.arrival_max_queue_time)
+            worker.quit()
+
+    def test_worker_report_interval(self):
+        with mock.patch("locust.rpc.rpc.Client", mocked_rpc()) as client:
+            worker = self.get_runner(environment=Environment(), user_classes=[])
+            self.assertEqual(3.0, worker.report_interval)
+            client.mocked_send(Message("report_interval", {"interval": 7.5}, "dummy"))
+            self.assertEqual(7.5, worker.report_interval)
+            worker.quit()
+
+    def test_worker_heartbeat_loop_lag(self):
+        with mock.patch("locust.runners.HEARTBEAT_INTERVAL", new=0.01):
+            with mock.patch("locust.rpc.rpc.Client", mocked_rpc()) as client:
+                worker = self.get_runner(environment=Environment(), user_classes=[])
+                worker.loop_monitor.lag = 25.0
+                sleep(0.05)
+                heartbeats = [msg for msg in client.outbox if msg.type == "heartbeat"]
+                self.assertTrue(heartbeats)
+                self.assertEqual(25.0, heartbeats[-1].data["loop_lag"]["lag"])
+                worker.quit()
+
     def test_worker_without_stop_timeout(self):
         class MyTestUser(User):
             _test_state = 0
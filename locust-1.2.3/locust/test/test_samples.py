@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from locust import samples
+from locust.env import Environment
+from locust.samples import RECORD, HEADER_SIZE, SampleReader, SampleRecorder
+
+
+class TestSamples(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.directory, "samples")
+        self.environment = Environment()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, segment_size=samples.DEFAULT_SEGMENT_SIZE, max_segments=None):
+        recorder = SampleRecorder(self.environment, self.prefix, segment_size=segment_size, max_segments=max_segments)
+        events = self.environment.events
+        for i in range(1, 101):
+            events.request_success.fire(request_type="GET", name="/a", response_time=i, response_length=10)
+        events.request_success.fire(request_type="GET", name="/async", response_time=None, response_length=0)
+        events.request_failure.fire(
+            request_type="POST", name="/b", response_time=1000, response_length=0, exception=Exception()
+        )
+        return recorder
+
+    def _test_reader(self):
+        self.record()
+        self.environment.events.quitting.fire(environment=self.environment)
+        reader = SampleReader(self.prefix)
+        self.assertEqual({("GET", "/a"), ("GET", "/async"), ("POST", "/b")}, reader.names)
+        self.assertEqual(101, len(reader.response_times()))
+        self.assertEqual(100, len(reader.response_times(failures=False)))
+        self.assertEqual([1000], list(reader.response_times(method="POST")))
+        self.assertEqual([50, 95, 100], reader.percentiles([0.5, 0.95, 1.0], name="/a"))
+        self.assertEqual([0], reader.percentiles([0.5], name="/missing"))
+
+        start_time, counts = reader.heatmap(interval=3600, response_time_buckets=(10, 100), name="/a")
+        self.assertEqual(1, len(counts))
+        self.assertEqual([10, 90, 0], counts[0])
+
+    def test_reader(self):
+        self._test_reader()
+
+    def test_reader_without_numpy(self):
+        with mock.patch("locust.samples.numpy", None):
+            self._test_reader()
+
+    def test_rotation(self):
+        recorder = self.record(segment_size=HEADER_SIZE + 10 * RECORD.size, max_segments=3)
+        recorder.close()
+        # 102 samples in segments of 10, of which only the last 3 segments (10 + 10 + 2 samples) are kept
+        self.assertEqual(3, len([f for f in os.listdir(self.directory) if f.endswith(".samples")]))
+        self.assertEqual(2, recorder.count)
+        # one of the 22 samples has no response time
+        self.assertEqual(21, len(SampleReader(self.prefix).response_times()))
+        # samples logged after close() are ignored
+        self.environment.events.request_success.fire(request_type="GET", name="/a", response_time=1, response_length=1)
+        self.assertEqual(2, recorder.count)
@@ -1,4 +1,6 @@
 import csv
+import gzip
+import io
 import time
 import unittest
 import re
@@ -10,12 +12,17 @@ import mock
 import locust
 from locust import HttpUser, TaskSet, task, User, constant
 from locust.env import Environment
+from locust.event import Events
 from locust.rpc.protocol import Message
-from locust.stats import CachedResponseTimes, RequestStats, StatsEntry, diff_response_time_dicts, PERCENTILES_TO_REPORT
-from locust.stats import StatsCSVFileWriter
+from locust.stats import RequestStats, StatsEntry, diff_response_time_dicts, PERCENTILES_TO_REPORT
+from locust.stats import ResponseTimesWindow, CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW
+from locust.stats import StatsCSV, StatsCSVFileWriter, ConnectionPoolStats
+from locust.stats import AUX_STATS, setup_distributed_stats_event_listeners
+from locust.histogram import ResponseTimeHistogram, round_response_time
 from locust.stats import stats_history
 from locust.test.testcases import LocustTestCase
 from locust.user.inspectuser import get_task_ratio_dict
+from locust.util.name_template import NameTemplater, parse_rule
 
 from .testcases import WebserverTestCase
 from .test_runners import mocked_rpc
@@ -179,6 +186,47 @@ class TestRequestStats(unittest.TestCase):
         self.assertEqual(s.median_response_time, 38)
         self.assertEqual(s.avg_response_time, 43.2)
 
+    def test_pack_unpack(self):
+        s1 = StatsEntry(self.stats, "pack me!", "GET")
+        s1.log(12, 10)
+        s1.log(147, 20)
+        s1.log(None, 5)
+        s1.log_error("Dummy exception")
+        s1.num_reqs_per_sec = {100: 2, 102: 1}
+        s1.num_fail_per_sec = {101: 1}
+
+        packed = s1.pack()
+        self.assertEqual([100, 2, 0, 1], packed[12])
+        s2 = StatsEntry.unpack(Message.unserialize(Message("stats", packed, "node").serialize()).data)
+        serialized = s1.serialize()
+        for key, value in s2.serialize().items():
+            self.assertEqual(serialized[key], value, key)
+
+    def test_phase_times(self):
+        self.stats.log_request("GET", "/", 20, 10, phase_times={"dns": 1.2, "connect": 2, "ttfb": 12, "download": 3})
+        self.stats.log_request("GET", "/", 30, 10, phase_times={"ttfb": 14, "download": 147})
+        self.stats.log_request("GET", "/", 30, 10)
+        s = self.stats.get("/", "GET")
+        self.assertEqual({1: 1}, s.phase_times["dns"])
+        self.assertEqual({3: 1, 150: 1}, s.phase_times["download"])
+        self.assertEqual(12, s.get_phase_time_percentile("ttfb", 0.4))
+        self.assertEqual(14, s.get_phase_time_percentile("ttfb", 1.0))
+        self.assertEqual(0, s.get_phase_time_percentile("tls", 0.5))
+        self.assertEqual(s.phase_times, self.stats.total.phase_times)
+
+        packed = s.pack()
+        self.assertEqual(15, len(packed))
+        s2 = StatsEntry.unpack(Message.unserialize(Message("stats", packed, "node").serialize()).data)
+        self.assertEqual(s.phase_times, s2.phase_times)
+        self.assertEqual(s.phase_times, StatsEntry.unserialize(s.serialize()).phase_times)
+
+        s2.extend(s)
+        self.assertEqual({3: 2, 150: 2}, s2.phase_times["download"])
+        s.reset()
+        self.assertEqual({}, s.phase_times)
+        self.assertEqual(14, len(s.pack()))
+        self.assertNotIn("phase_times", s.serialize())
+
     def test_aggregation_with_rounding(self):
         s1 = StatsEntry(self.stats, "round me!", "GET")
         s1.log(122, 0)  # (rounded 120) min
@@ -302,6 +350,103 @@ class TestRequestStats(unittest.TestCase):
 
         self.assertEqual(20, u1.median_response_time)
 
+    def test_connection_pool_stats(self):
+        s = ConnectionPoolStats()
+        s.log(False)
+        s.log(True)
+        s.log(True, wait_time=30)
+        s.log(True, wait_time=10)
+        self.assertEqual(4, s.num_requests)
+        self.assertEqual(0.75, s.hit_ratio)
+        self.assertEqual(2, s.num_waits)
+        self.assertEqual(20, s.avg_wait_time)
+
+    def test_aux_stats_reported_to_master(self):
+        worker_events, master_events = Events(), Events()
+        worker_stats, master_stats = RequestStats(), RequestStats()
+        setup_distributed_stats_event_listeners(worker_events, worker_stats)
+        setup_distributed_stats_event_listeners(master_events, master_stats)
+        # queued arrivals can start or be dropped while none are scheduled (after the rate went down to 0)
+        worker_stats.arrivals.log_started(150, True)
+        worker_stats.arrivals.log_dropped()
+        worker_stats.connection_pool.log(True, wait_time=30)
+        worker_stats.dns.log_miss(5, False)
+        master_stats.connection_pool.log(False, wait_time=50)
+        expected = dict((name, aux_stats.serialize()) for name, aux_stats in worker_stats.aux_stats())
+
+        for _ in range(2):
+            data = {}
+            worker_events.report_to_master.fire(client_id="worker", data=data)
+            data = Message.unserialize(Message("stats", data, "worker").serialize()).data
+            master_events.worker_report.fire(client_id="worker", data=data)
+        # the second report has nothing to add
+        self.assertFalse(set(AUX_STATS) & set(data))
+
+        for name, aux_stats in worker_stats.aux_stats():
+            self.assertTrue(aux_stats.is_empty)
+        self.assertEqual(expected["arrivals"], master_stats.arrivals.serialize())
+        self.assertEqual({150: 1}, master_stats.arrivals.queue_delays)
+        self.assertEqual(expected["dns"], master_stats.dns.serialize())
+        self.assertEqual(2, master_stats.connection_pool.num_requests)
+        self.assertEqual(2, master_stats.connection_pool.num_waits)
+        self.assertEqual(50, master_stats.connection_pool.max_wait_time)
+
+
+class TestNameTemplating(unittest.TestCase):
+    def test_templater(self):
+        templater = NameTemplater()
+        self.assertEqual("/order/{id}", templater("/order/1234"))
+        self.assertEqual("/order/{id}/items", templater("/order/1234/items?page=2#top"))
+        self.assertEqual("/user/{uuid}", templater("/user/0f8fad5b-d9cb-469f-a165-70867728950e"))
+        self.assertEqual("/file/{hash}", templater("/file/aaf4c61ddcc5e8a2dabede0f3b482cd9aea9434d"))
+        self.assertEqual("/price/{id}", templater("/price/-12.50"))
+        self.assertEqual("/v2/orders/", templater("/v2/orders/"))
+        self.assertEqual("http://host/{id}", templater("http://host/1"))
+        self.assertEqual("search 1234", templater("search 1234"))
+
+    def test_templater_rules(self):
+        templater = NameTemplater(rules=[parse_rule(r"/user/\w+/=>/user/{name}/")], strip_query_string=False)
+        self.assertEqual("/user/{name}/{id}?a=1", templater("/user/bob/12?a=1"))
+        self.assertRaises(ValueError, parse_rule, "no separator")
+
+    def test_templated_entries(self):
+        stats = RequestStats(name_templater=NameTemplater())
+        stats.log_request("GET", "/order/1?a=1", 10, 0)
+        stats.log_request("GET", "/order/2?a=2", 20, 0)
+        stats.log_error("GET", "/order/3", Exception("oops"))
+        self.assertEqual([("/order/{id}", "GET")], list(stats.entries))
+        self.assertEqual(2, stats.get("/order/{id}", "GET").num_requests)
+        self.assertEqual(1, stats.get("/order/4", "GET").num_failures)
+        self.assertEqual(["/order/{id}"], [e.name for e in stats.errors.values()])
+
+    def test_max_entries(self):
+        stats = RequestStats(max_entries=2)
+        for i in range(5):
+            stats.log_request("GET", "/%i" % i, 10, 0)
+        stats.log_request("POST", "/0", 10, 0)
+        self.assertEqual(
+            [("/0", "GET"), ("/1", "GET"), ("Other", "GET"), ("Other", "POST")], sorted(stats.entries)
+        )
+        self.assertEqual(3, stats.get("/4", "GET").num_requests)
+        self.assertEqual(1, stats.get("/1", "GET").num_requests)
+
+    def test_master_applies_templating_to_worker_reports(self):
+        worker_stats = RequestStats(use_response_times_cache=False)
+        worker_events = locust.events.__class__()
+        master_stats = RequestStats(name_templater=NameTemplater(), max_entries=1)
+        master_events = locust.events.__class__()
+        locust.stats.setup_distributed_stats_event_listeners(worker_events, worker_stats)
+        locust.stats.setup_distributed_stats_event_listeners(master_events, master_stats)
+        worker_stats.log_request("GET", "/a/1", 10, 0)
+        worker_stats.log_request("GET", "/a/2", 10, 0)
+        worker_stats.log_request("GET", "/b", 10, 0)
+        data = {}
+        worker_events.report_to_master.fire(client_id="worker", data=data)
+        master_events.worker_report.fire(client_id="worker", data=data)
+        self.assertEqual(
+            {("/a/{id}", "GET"): 2, ("Other", "GET"): 1}, {k: e.num_requests for k, e in master_stats.entries.items()}
+        )
+
 
 class TestStatsPrinting(LocustTestCase):
     def test_print_percentile_stats(self):
@@ -350,6 +495,18 @@ class TestCsvStats(LocustTestCase):
         self.assertTrue(os.path.exists(self.STATS_HISTORY_FILENAME))
         self.assertTrue(os.path.exists(self.STATS_FAILURES_FILENAME))
 
+    def test_requests_csv_phase_timings(self):
+        self.environment.http_phase_timings = True
+        self.runner.stats.log_request("GET", "/", 20, 10, phase_times={"connect": 2, "ttfb": 12, "download": 6})
+        data = io.StringIO()
+        StatsCSV(self.environment, PERCENTILES_TO_REPORT).requests_csv(csv.writer(data))
+        rows = list(csv.DictReader(io.StringIO(data.getvalue())))
+        self.assertEqual("/", rows[0]["Name"])
+        self.assertEqual("0", rows[0]["Median DNS Time"])
+        self.assertEqual("2", rows[0]["Median Connect Time"])
+        self.assertEqual("12", rows[0]["Median TTFB Time"])
+        self.assertEqual("6", rows[1]["Median Download Time"])
+
     @mock.patch("locust.stats.CSV_STATS_INTERVAL_SEC", new=_TEST_CSV_STATS_INTERVAL_SEC)
     def test_csv_stats_writer(self):
         _write_csv_files(self.environment, self.STATS_BASE_NAME)
@@ -391,6 +548,65 @@ class TestCsvStats(LocustTestCase):
         self.assertEqual("/", rows[2]["Name"])
         self.assertEqual("Aggregated", rows[3]["Name"])
 
+    @mock.patch("locust.stats.CSV_STATS_INTERVAL_SEC", new=_TEST_CSV_STATS_INTERVAL_SEC)
+    def test_csv_stats_writer_incremental(self):
+        stats_writer = StatsCSVFileWriter(
+            self.environment, PERCENTILES_TO_REPORT, self.STATS_BASE_NAME, full_history=True, incremental=True
+        )
+        self.runner.stats.log_request("GET", "/", 10, content_length=666)
+        self.runner.stats.log_request("GET", "/other", 10, content_length=666)
+        greenlet = gevent.spawn(stats_writer)
+        gevent.sleep(_TEST_CSV_STATS_INTERVAL_WAIT_SEC)
+        self.runner.stats.log_request("GET", "/", 10, content_length=666)
+        self.runner.stats.log_error("GET", "/", Exception("oops"))
+        gevent.sleep(_TEST_CSV_STATS_INTERVAL_SEC)
+        gevent.kill(greenlet)
+
+        # the summary files are only written when the writer is closed
+        with open(self.STATS_FILENAME) as f:
+            self.assertEqual("", f.read())
+        stats_writer.close_files()
+        stats_writer.close_files()
+
+        with open(self.STATS_HISTORY_FILENAME) as f:
+            rows = list(csv.DictReader(f))
+        # the first interval has a row for every entry, after that only for the ones that changed
+        self.assertEqual(["/", "/other", "Aggregated", "/", "Aggregated"], [r["Name"] for r in rows])
+        with open(self.STATS_FILENAME) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(["/", "/other", "Aggregated"], [r["Name"] for r in rows])
+        self.assertEqual("2", rows[0]["Request Count"])
+        with open(self.STATS_FAILURES_FILENAME) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(1, len(rows))
+
+    def test_csv_stats_writer_ndjson_history(self):
+        history_file_name = "{}_stats_history.ndjson.gz".format(self.STATS_BASE_NAME)
+        stats_writer = StatsCSVFileWriter(
+            self.environment, PERCENTILES_TO_REPORT, self.STATS_BASE_NAME, full_history=True, history_format="ndjson.gz"
+        )
+        self.assertEqual(history_file_name, stats_writer.stats_history_file_name())
+        self.runner.stats.log_request("GET", "/", 10, content_length=666)
+        greenlet = gevent.spawn(stats_writer)
+        gevent.sleep(0.1)
+        gevent.kill(greenlet)
+        stats_writer.close_files()
+        try:
+            with gzip.open(history_file_name, "rt") as f:
+                rows = [json.loads(line) for line in f]
+        finally:
+            self.remove_file_if_exists(history_file_name)
+        self.assertEqual(["/", "Aggregated"], [r["Name"] for r in rows])
+        self.assertEqual(1, rows[0]["Total Request Count"])
+        self.assertRaises(
+            ValueError,
+            StatsCSVFileWriter,
+            self.environment,
+            PERCENTILES_TO_REPORT,
+            self.STATS_BASE_NAME,
+            history_format="xml",
+        )
+
     def test_csv_stats_on_master_from_aggregated_stats(self):
         # Failing test for: https://github.com/locustio/locust/issues/1315
         with mock.patch("locust.rpc.rpc.Server", mocked_rpc()) as server:
@@ -512,19 +728,13 @@ class TestStatsEntryResponseTimesCache(unittest.TestCase):
 
     def test_response_times_cached(self):
         s = StatsEntry(self.stats, "/", "GET", use_response_times_cache=True)
-        self.assertEqual(1, len(s.response_times_cache))
+        self.assertIsInstance(s.response_times_cache, ResponseTimesWindow)
         s.log(11, 1337)
-        self.assertEqual(1, len(s.response_times_cache))
-        s.last_request_timestamp -= 1
+        t = int(s.last_request_timestamp)
+        self.assertEqual(({11: 1}, 1), s.response_times_cache.get(t))
         s.log(666, 1337)
-        self.assertEqual(2, len(s.response_times_cache))
-        self.assertEqual(
-            CachedResponseTimes(
-                response_times={11: 1},
-                num_requests=1,
-            ),
-            s.response_times_cache[int(s.last_request_timestamp) - 1],
-        )
+        s.log(None, 1337)
+        self.assertEqual(({11: 1, 670: 1}, 3), s.response_times_cache.get(t))
 
     def test_response_times_not_cached_if_not_enabled(self):
         s = StatsEntry(self.stats, "/", "GET")
@@ -534,37 +744,44 @@ class TestStatsEntryResponseTimesCache(unittest.TestCase):
         s.log(666, 1337)
         self.assertEqual(None, s.response_times_cache)
 
-    def test_latest_total_response_times_pruned(self):
-        """
-        Check that RequestStats.latest_total_response_times are pruned when exceeding 20 entries
-        """
-        s = StatsEntry(self.stats, "/", "GET", use_response_times_cache=True)
+    def test_response_times_window_slides(self):
+        window = ResponseTimesWindow()
         t = int(time.time())
-        for i in reversed(range(2, 30)):
-            s.response_times_cache[t - i] = CachedResponseTimes(response_times={}, num_requests=0)
-        self.assertEqual(29, len(s.response_times_cache))
-        s.log(17, 1337)
-        s.last_request_timestamp -= 1
-        s.log(1, 1)
-        self.assertEqual(20, len(s.response_times_cache))
-        self.assertEqual(
-            CachedResponseTimes(response_times={17: 1}, num_requests=1),
-            s.response_times_cache.popitem(last=True)[1],
-        )
+        for i in range(30):
+            window.add(t + i, i)
+        # only the last CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW seconds are kept
+        response_times, num_requests = window.get(t + 29)
+        self.assertEqual(CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW, num_requests)
+        self.assertEqual({i: 1 for i in range(30 - CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW, 30)}, response_times)
+        self.assertEqual(window.size, len(window.response_times))
+        # seconds that have already been overwritten are ignored
+        window.add(t, 1000)
+        self.assertEqual(({}, 0), window.get(t))
+
+    def test_response_times_window_with_histogram(self):
+        s = StatsEntry(self.stats, "/", "GET", use_response_times_cache=True, histogram_precision=2)
+        for i in range(100):
+            s.log(i, 0)
+        other = StatsEntry(self.stats, "/", "GET")
+        other.log(3432, 0)
+        s.extend(other)
+        response_times, num_requests = s.response_times_cache.get(int(time.time()))
+        self.assertEqual(101, num_requests)
+        self.assertEqual(1, response_times[3400])
+        self.assertEqual(95, s.get_current_response_time_percentile(0.95))
+        self.assertEqual(3400, s.get_current_response_time_percentile(1.0))
 
     def test_get_current_response_time_percentile(self):
         s = StatsEntry(self.stats, "/", "GET", use_response_times_cache=True)
         t = int(time.time())
-        s.response_times_cache[t - 10] = CachedResponseTimes(
-            response_times={i: 1 for i in range(100)}, num_requests=200
-        )
-        s.response_times_cache[t - 10].response_times[1] = 201
-
-        s.response_times = {i: 2 for i in range(100)}
-        s.response_times[1] = 202
-        s.num_requests = 300
+        # requests that are older than the window
+        s.response_times_cache.merge(t - CURRENT_RESPONSE_TIME_PERCENTILE_WINDOW, {i: 1 for i in range(100)}, 100)
+        # requests within the window
+        s.response_times_cache.merge(t - 9, {i: 1 for i in range(50)}, 50)
+        s.response_times_cache.merge(t, {i: 1 for i in range(50, 100)}, 50)
 
         self.assertEqual(95, s.get_current_response_time_percentile(0.95))
+        self.assertEqual(50, s.get_current_response_time_percentile(0.5))
 
     def test_diff_response_times_dicts(self):
         self.assertEqual(
@@ -604,6 +821,71 @@ class TestStatsEntryResponseTimesCache(unittest.TestCase):
         )
 
 
+class TestResponseTimeHistogram(unittest.TestCase):
+    def test_rounding_matches_dict_rounding(self):
+        h = ResponseTimeHistogram()
+        for rt, rounded in [(7, 7), (99.4, 99), (147, 150), (995, 1000), (3432, 3400), (58760, 59000)]:
+            self.assertEqual(rounded, round_response_time(rt))
+            self.assertEqual(rounded, h.bucket_values[h.index_of(rt)])
+
+    def test_highest_trackable_value(self):
+        h = ResponseTimeHistogram(highest_trackable_value=10000)
+        h.add(123456)
+        self.assertEqual([99000], list(h.keys()))
+
+    def test_behaves_like_dict(self):
+        h = ResponseTimeHistogram()
+        self.assertFalse(h)
+        h.add(11)
+        h.add(147, 2)
+        self.assertTrue(h)
+        self.assertEqual({11: 1, 150: 2}, h)
+        self.assertEqual({11: 1, 150: 2}, h.to_dict())
+        self.assertEqual(2, len(h))
+        self.assertEqual(0, h.get(12, 0))
+
+    def test_merge(self):
+        h1 = ResponseTimeHistogram.from_dict({10: 1, 100: 2})
+        h2 = ResponseTimeHistogram.from_dict({100: 1, 2000: 3})
+        h1.merge(h2)
+        self.assertEqual({10: 1, 100: 3, 2000: 3}, h1)
+        self.assertEqual(7, h1.total_count)
+        h1.merge({10: 4})
+        self.assertEqual(5, h1[10])
+
+    def test_subtract(self):
+        h1 = ResponseTimeHistogram.from_dict({10: 3, 100: 2})
+        h2 = ResponseTimeHistogram.from_dict({10: 1})
+        self.assertEqual({10: 2, 100: 2}, h1.subtract(h2))
+
+    def test_percentile_and_median_same_as_dict(self):
+        hist_entry = StatsEntry(RequestStats(), "/", "GET", histogram_precision=2)
+        dict_entry = StatsEntry(RequestStats(), "/", "GET")
+        for rt in [1, 7, 45, 135, 44, 375, 601, 35, 79, 3432, 58760, 999, 12]:
+            hist_entry.log(rt, 0)
+            dict_entry.log(rt, 0)
+        for percent in PERCENTILES_TO_REPORT + [0.1, 0.3]:
+            self.assertEqual(
+                dict_entry.get_response_time_percentile(percent), hist_entry.get_response_time_percentile(percent)
+            )
+        self.assertEqual(dict_entry.median_response_time, hist_entry.median_response_time)
+
+    def test_stats_entry_serialize_and_extend(self):
+        stats = RequestStats(histogram_precision=2)
+        s1 = stats.get("/", "GET")
+        s1.log(12, 0)
+        s1.log(147, 0)
+        data = s1.serialize()
+        self.assertEqual({12: 1, 150: 1}, data["response_times"])
+
+        total = StatsEntry(stats, "Aggregated", None, histogram_precision=2)
+        total.extend(StatsEntry.unserialize(data))
+        total.extend(s1)
+        self.assertIsInstance(total.response_times, ResponseTimeHistogram)
+        self.assertEqual({12: 2, 150: 2}, total.response_times)
+        self.assertEqual(4, total.num_requests)
+
+
 class TestStatsEntry(unittest.TestCase):
     def parse_string_output(self, text):
         tokenlist = re.split(r"[\s\(\)%|]+", text.strip())
@@ -1,6 +1,7 @@
 import unittest
 from locust.util.timespan import parse_timespan
 from locust.util.rounding import proper_round
+from locust.util import json_decoder
 
 
 class TestParseTimespan(unittest.TestCase):
@@ -30,3 +31,23 @@ class TestRounding(unittest.TestCase):
         self.assertEqual(4, proper_round(3.5))
         self.assertEqual(5, proper_round(4.5))
         self.assertEqual(6, proper_round(5.5))
+
+
+class TestJsonDecoder(unittest.TestCase):
+    def tearDown(self):
+        json_decoder.use_decoder()
+
+    def test_decoders(self):
+        for name in json_decoder.DECODERS:
+            json_decoder.use_decoder(name)
+            self.assertEqual(name, json_decoder.decoder_name)
+            self.assertEqual({"a": [1, 2.5, "ö"]}, json_decoder.loads('{"a": [1, 2.5, "ö"]}'.encode()))
+            self.assertEqual({"a": "ö"}, json_decoder.loads('{"a": "ö"}'.encode("latin-1"), "ISO-8859-1"))
+            # rejected by the fast decoders, but not by the json module
+            self.assertEqual([2 ** 70], json_decoder.loads(b"[1180591620717411303424]"))
+            with self.assertRaises(ValueError):
+                json_decoder.loads(b"{not json")
+
+    def test_unavailable_decoder(self):
+        with self.assertRaises(ValueError):
+            json_decoder.use_decoder("simdjson")
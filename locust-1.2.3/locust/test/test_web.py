@@ -317,6 +317,18 @@ class TestWebUI(LocustTestCase, _HeaderCheckMixin):
         self.assertEqual(200, response.status_code)
         self.assertIn("Step Load Mode", response.text)
 
+    def test_stats_history(self):
+        self.stats.history.per_entry = True
+        point = {"time": "10:00:00", "timestamp": 1600000000, "current_rps": 5}
+        self.stats.history.append(point, {("/test", "GET"): dict(point, current_rps=2)})
+        r = requests.get("http://127.0.0.1:%i/stats/history" % self.web_port)
+        self.assertEqual(200, r.status_code)
+        data = r.json()
+        self.assertEqual([point], data["total"])
+        self.assertEqual(
+            [{"name": "/test", "method": "GET", "history": [dict(point, current_rps=2)]}], data["entries"]
+        )
+
     def test_report_page(self):
         self.stats.log_request("GET", "/test", 120, 5612)
         r = requests.get("http://127.0.0.1:%i/stats/report" % self.web_port)
@@ -1,7 +1,8 @@
 import unittest
 from time import sleep
+from unittest import mock
 import zmq
-from locust.rpc import zmqrpc, Message
+from locust.rpc import zmqrpc, protocol, Message
 from locust.test.testcases import LocustTestCase
 from locust.exception import RPCError
 
@@ -53,3 +54,87 @@ class ZMQRPC_tests(LocustTestCase):
         server.close()
         with self.assertRaises(RPCError):
             server.send_to_client(Message("test", "message", "identity"))
+
+    def test_batched_messages(self):
+        for i in range(3):
+            self.client.send(Message("test", i, "identity"))
+        self.assertEqual(3, len(self.client._outbox[None]))
+        for i in range(3):
+            addr, msg = self.server.recv_from_client()
+            self.assertEqual("identity", addr)
+            self.assertEqual(i, msg.data)
+        # the client's frames announce the codecs it accepts
+        self.assertEqual(self.client.framer.accepted, self.server.peer_codecs["identity"])
+
+    def test_compressed_messages(self):
+        self.client.send(Message("test", "hello", "identity"))
+        self.server.recv_from_client()
+        data = {"stats": ["/some/url/%i" % (i % 10) for i in range(1000)]}
+        self.server.send_to_client(Message("stats", data, "identity"))
+        self.server.flush()
+        msg = self.client.recv()
+        self.assertEqual(data, msg.data)
+
+    def test_urgent_messages_sent_right_away(self):
+        self.client.send(Message("test", "queued", "identity"))
+        self.client.send(Message("heartbeat", "urgent", "identity"))
+        self.assertEqual({}, self.client._outbox)
+        self.assertIsNone(self.client._flusher)
+        self.assertEqual("queued", self.server.recv_from_client()[1].data)
+        self.assertEqual("urgent", self.server.recv_from_client()[1].data)
+
+    def test_send_errors(self):
+        with mock.patch.object(self.client, "_send_frame", side_effect=RPCError("broken")):
+            # an urgent message raises the error to the sender
+            with self.assertRaises(RPCError):
+                self.client.send(Message("heartbeat", None, "identity"))
+            # a failure in the background is raised by the next send
+            self.client.send(Message("test", None, "identity"))
+            sleep(0.01)
+            with self.assertRaises(RPCError):
+                self.client.send(Message("test", None, "identity"))
+
+    def test_unbatched_messages_to_older_versions(self):
+        server = zmqrpc.Server("127.0.0.1", 0, batch=False)
+        client = zmq.Context().socket(zmq.DEALER)
+        client.setsockopt(zmq.IDENTITY, b"old")
+        client.connect("tcp://127.0.0.1:%i" % server.port)
+        try:
+            client.send(Message("client_ready", None, "old").serialize())
+            addr, msg = server.recv_from_client()
+            self.assertEqual("old", addr)
+            self.assertNotIn("old", server.peer_codecs)
+            server.send_to_client(Message("spawn", {"num_users": 1}, "old"))
+            self.assertEqual({"num_users": 1}, Message.unserialize(client.recv()).data)
+        finally:
+            client.close()
+            server.close()
+
+
+class FramerTests(unittest.TestCase):
+    def test_frame_round_trip(self):
+        framer = protocol.Framer()
+        packed = [framer.pack(Message("stats", {"n": i, "name": "x" * 100}, "node")) for i in range(20)]
+        frame = framer.frame(packed, framer.accepted)
+        self.assertNotEqual(protocol.CODEC_NONE, frame[1])
+        self.assertLess(len(frame), sum(len(p) for p in packed))
+        messages, accepted = protocol.Framer().unframe(frame)
+        self.assertEqual(framer.accepted, accepted)
+        self.assertEqual(list(range(20)), [m.data["n"] for m in messages])
+
+    def test_no_compression_unless_accepted(self):
+        framer = protocol.Framer()
+        packed = [framer.pack(Message("stats", "x" * 2000, "node"))]
+        self.assertEqual(protocol.CODEC_NONE, framer.frame(packed, 0)[1])
+        self.assertEqual(protocol.CODEC_NONE, protocol.Framer(compression=False).frame(packed, framer.accepted)[1])
+
+    def test_plain_message(self):
+        messages, accepted = protocol.Framer().unframe(Message("test", "message", "node").serialize())
+        self.assertIsNone(accepted)
+        self.assertEqual("message", messages[0].data)
+
+    def test_truncated_frame(self):
+        framer = protocol.Framer()
+        frame = framer.frame([framer.pack(Message("test", "message", "node"))])
+        self.assertRaises(ValueError, framer.unframe, frame[:-3])
+        self.assertEqual("message", framer.unframe(frame)[0][0].data)
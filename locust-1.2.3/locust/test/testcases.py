@@ -140,6 +140,21 @@ def get_cookie():
     return make_response(request.cookies.get(request.args.get("name"), ""))
 
 
+@app.route("/echo/<path:path>", methods=["POST", "PUT"])
+def echo(path):
+    return {
+        "path": path,
+        "args": request.args,
+        "content_type": request.headers.get("Content-Type"),
+        "body": request.get_data(as_text=True),
+    }
+
+
+@app.route("/json")
+def json_response():
+    return {"code": 200, "data": {"list": [{"id": 1, "name": "product"}]}}
+
+
 class LocustTestCase(unittest.TestCase):
     """
     Test case class that restores locust.events.EventHook listeners on tearDown, so that it is
@@ -169,7 +184,7 @@ class LocustTestCase(unittest.TestCase):
         self._logger_class = MockedLoggingHandler()
         self._logger_class.setLevel(logging.INFO)
         self._root_log_handlers = [h for h in logging.root.handlers]
-        [logging.root.removeHandler(h) for h in logging.root.handlers]
+        [logging.root.removeHandler(h) for h in self._root_log_handlers]
         logging.root.addHandler(self._logger_class)
         logging.root.setLevel(logging.INFO)
         self.mocked_log = MockedLoggingHandler
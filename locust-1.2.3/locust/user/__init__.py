@@ -1,2 +1,3 @@
 from .task import task, tag, TaskSet
 from .users import HttpUser, User
+from .async_user import AsyncTaskSet, AsyncUser
@@ -0,0 +1,385 @@
+import asyncio
+import inspect
+import logging
+import random
+import traceback
+
+import gevent
+from gevent import GreenletExit
+from gevent.event import Event
+
+from locust.exception import InterruptTaskSet, LocustError, RescheduleTask, RescheduleTaskImmediately, StopUser
+from .task import LOCUST_STATE_RUNNING, LOCUST_STATE_WAITING, LOCUST_STATE_STOPPING, TaskSet
+from .users import User
+
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_greenlet = None
+
+
+def get_event_loop():
+    """
+    Return the asyncio event loop that runs the AsyncUsers of this process, starting it if needed.
+    返回运行本进程AsyncUser的asyncio事件循环，如有需要则启动它。
+
+    The loop runs in a greenlet of its own, next to the gevent users. Since the selectors module is
+    monkey patched by gevent, it yields to the gevent hub whenever it waits for I/O or timers, so asyncio
+    and gevent code share the same thread. Only one asyncio loop can run per thread, so don't call
+    asyncio.run() etc. in a process that runs AsyncUsers.
+    该循环在自己的greenlet中运行，与gevent用户并存。由于selectors模块被gevent打了补丁，它在等待I/O或定时器时会让出给gevent hub，
+    因此asyncio和gevent代码共享同一个线程。每个线程只能运行一个asyncio循环，所以不要在运行AsyncUser的进程中调用asyncio.run()等。
+    """
+    global _loop, _loop_greenlet
+    if _loop_greenlet is None or _loop_greenlet.dead:
+        _loop = asyncio.new_event_loop()
+        _loop_greenlet = gevent.spawn(_run_loop, _loop)
+    return _loop
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def _wakeup(loop):
+    # makes the loop pick up tasks created (or cancelled) from outside of it while it waits in select()
+    # 使循环在select()中等待时也能处理从外部创建(或取消)的任务
+    loop.call_soon_threadsafe(_noop)
+
+
+def _noop():
+    pass
+
+
+class AsyncUserGreenlet(object):
+    """
+    Stands in for the greenlet of an :py:class:`AsyncUser <locust.AsyncUser>`, so that the runner can spawn,
+    count, link, stop and kill AsyncUsers in its greenlet Group like any other user. It wraps the asyncio
+    task that runs the user, and costs a few hundred bytes instead of a greenlet with a stack of its own.
+    代替AsyncUser的greenlet，使runner能像其他用户一样在其greenlet组中生成、计数、链接、停止和杀死AsyncUser。
+    它封装运行该用户的asyncio任务，只占几百字节，而不是一个拥有自己栈的greenlet。
+
+    Callbacks added with link() or rawlink() are called by the gevent hub once the task is done.
+    """
+
+    __slots__ = ("args", "name", "value", "exception", "_loop", "_task", "_links", "_done")
+
+    def __init__(self, user):
+        self.args = (user,)
+        self.name = None
+        self.value = None
+        self.exception = None
+        self._loop = None
+        self._task = None
+        self._links = None
+        self._done = False
+
+    def start(self):
+        loop = self._loop = get_event_loop()
+        self._task = loop.create_task(self.args[0].run())
+        self._task.add_done_callback(self._on_done)
+        # Task.get_name() was added in Python 3.8
+        # Task.get_name()在Python 3.8中才加入
+        self.name = getattr(self._task, "get_name", lambda: "Task-%x" % id(self._task))()
+        _wakeup(loop)
+
+    def _on_done(self, task):
+        self._done = True
+        if not task.cancelled():
+            self.exception = task.exception()
+            if self.exception is None:
+                self.value = task.result()
+            else:
+                gevent.get_hub().print_exception(
+                    self, type(self.exception), self.exception, self.exception.__traceback__
+                )
+        if self._links:
+            run_callback = gevent.get_hub().loop.run_callback
+            for callback in self._links:
+                run_callback(callback, self)
+            self._links = None
+
+    @property
+    def dead(self):
+        return self._done
+
+    def ready(self):
+        return self._done
+
+    def successful(self):
+        return self._done and self.exception is None
+
+    def rawlink(self, callback):
+        if self._done:
+            gevent.get_hub().loop.run_callback(callback, self)
+        else:
+            if self._links is None:
+                self._links = []
+            self._links.append(callback)
+
+    link = rawlink
+
+    def unlink(self, callback):
+        if self._links and callback in self._links:
+            self._links.remove(callback)
+
+    def kill(self, exception=GreenletExit, block=True, timeout=None):
+        """
+        Cancel the task of the user, which raises CancelledError where it's waiting (and makes it run its
+        on_stop methods), like killing a greenlet raises GreenletExit.
+        取消用户的任务，在其等待处抛出CancelledError(并使其执行on_stop方法)，就像杀死greenlet会抛出GreenletExit一样。
+        """
+        if self._done:
+            return
+        # the loop is kept from start(), since Task.get_loop() needs Python 3.7
+        # 循环在start()中保存下来，因为Task.get_loop()需要Python 3.7
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        if block:
+            self.join(timeout)
+
+    def join(self, timeout=None):
+        if self._done:
+            return
+        done = Event()
+        callback = lambda _: done.set()
+        self.rawlink(callback)
+        try:
+            done.wait(timeout)
+        finally:
+            self.unlink(callback)
+
+    def __repr__(self):
+        return "<%s %s for %r>" % (type(self).__name__, self.name, self.args[0])
+
+
+class AsyncTaskSet(TaskSet):
+    """
+    A TaskSet for :py:class:`AsyncUser <locust.AsyncUser>`, whose tasks, on_start and on_stop methods are
+    coroutines (declared with async def). It's used in the same way as :py:class:`TaskSet <locust.TaskSet>`,
+    but it waits with asyncio.sleep(), and nested TaskSets must be AsyncTaskSets too.
+    用于AsyncUser的TaskSet，其任务、on_start和on_stop方法都是协程(用async def声明)。用法与TaskSet相同，
+    但使用asyncio.sleep()等待，且嵌套的TaskSet也必须是AsyncTaskSet。
+
+    Tasks run on the asyncio loop of the process, so they must not block: use asyncio based clients,
+    and not HttpSession or gevent.sleep().
+    任务在进程的asyncio循环中运行，所以不能阻塞：使用基于asyncio的客户端，不要使用HttpSession或gevent.sleep()。
+    """
+
+    async def on_start(self):
+        """
+        Called when a User starts executing this TaskSet
+        """
+        pass
+
+    async def on_stop(self):
+        """
+        Called when a User stops executing this TaskSet. E.g. when TaskSet.interrupt() is called
+        or when the User is killed
+        """
+        pass
+
+    async def run(self):
+        try:
+            await self.on_start()
+        except InterruptTaskSet as e:
+            if e.reschedule:
+                raise RescheduleTaskImmediately(e.reschedule).with_traceback(e.__traceback__)
+            else:
+                raise RescheduleTask(e.reschedule).with_traceback(e.__traceback__)
+
+        while True:
+            try:
+                if not self._task_queue:
+                    self.schedule_task(self.get_next_task())
+
+                try:
+                    if self.user._state == LOCUST_STATE_STOPPING:
+                        raise StopUser()
+                    await self.execute_next_task()
+                except RescheduleTaskImmediately:
+                    pass
+                except RescheduleTask:
+                    await self.wait()
+                else:
+                    await self.wait()
+            except InterruptTaskSet as e:
+                await self.on_stop()
+                if e.reschedule:
+                    raise RescheduleTaskImmediately(e.reschedule) from e
+                else:
+                    raise RescheduleTask(e.reschedule) from e
+            except (StopUser, asyncio.CancelledError):
+                await self.on_stop()
+                raise
+            except Exception as e:
+                self.user.environment.events.user_error.fire(user_instance=self, exception=e, tb=e.__traceback__)
+                if self.user.environment.catch_exceptions:
+                    logger.error("%s\n%s", e, traceback.format_exc())
+                    await self.wait()
+                else:
+                    raise
+
+    async def execute_next_task(self):
+        await self.execute_task(self._task_queue.pop(0))
+
+    async def execute_task(self, task):
+        if hasattr(task, "__self__") and task.__self__ == self:
+            # task is a bound method on self
+            # 任务是自我约束的方法
+            result = task()
+        elif hasattr(task, "tasks") and issubclass(task, TaskSet):
+            # task is another (nested) TaskSet class
+            # task是另一个(嵌套的)TaskSet类
+            result = _nested_task_set(task, self).run()
+        else:
+            # task is a function
+            result = task(self)
+        if inspect.isawaitable(result):
+            await result
+
+    async def wait(self):
+        """
+        Make the running user sleep for a duration defined by the wait_time function, see
+        :py:meth:`TaskSet.wait() <locust.TaskSet.wait>`.
+        """
+        if self.user._state == LOCUST_STATE_STOPPING:
+            raise StopUser()
+        self.user._state = LOCUST_STATE_WAITING
+        await self._sleep(self.wait_time())
+        if self.user._state == LOCUST_STATE_STOPPING:
+            raise StopUser()
+        self.user._state = LOCUST_STATE_RUNNING
+
+    async def _sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+def _nested_task_set(task_set_class, parent):
+    if not issubclass(task_set_class, AsyncTaskSet):
+        raise LocustError(
+            "%s is nested in an AsyncUser, so it must be an AsyncTaskSet, not a TaskSet" % task_set_class.__name__
+        )
+    return task_set_class(parent)
+
+
+class AsyncDefaultTaskSet(AsyncTaskSet):
+    """
+    Default root AsyncTaskSet that executes tasks in AsyncUser.tasks.
+    执行AsyncUser.tasks中任务的默认根AsyncTaskSet。
+    """
+
+    def get_next_task(self):
+        if not self.user.tasks:
+            raise Exception("No tasks defined. use the @task decorator or set the tasks property of the User")
+        return random.choice(self.user.tasks)
+
+    async def execute_task(self, task):
+        if hasattr(task, "tasks") and issubclass(task, TaskSet):
+            # task is  (nested) TaskSet class
+            # task是(嵌套的)TaskSet类
+            result = _nested_task_set(task, self.user).run()
+        else:
+            # task is a function
+            # Task是一个函数
+            result = task(self.user)
+        if inspect.isawaitable(result):
+            await result
+
+
+class AsyncUser(User):
+    """
+    A User whose tasks are coroutines (declared with async def), that run on an asyncio event loop instead of
+    in a greenlet of their own. A user that waits costs much less memory than a greenlet based User, so a
+    single worker can keep many more (mostly idle) users, e.g. for tests of long polling or websocket servers.
+    任务为协程(用async def声明)的用户，在asyncio事件循环中运行，而不是在自己的greenlet中运行。等待中的用户占用的内存远少于
+    基于greenlet的User，因此单个worker可以保持更多(大多空闲的)用户，例如用于测试长轮询或websocket服务器。
+
+    It's spawned, stopped and counted by the runner like any other user, and it can be mixed with greenlet
+    based users in the same test. Its on_start and on_stop methods are coroutines too, tasks can be
+    AsyncTaskSets, and wait_time works as usual.
+    它和其他用户一样由runner生成、停止和计数，并可以在同一测试中与基于greenlet的用户混合使用。
+
+    This class doesn't come with a client, since every client must be asyncio based: fire the
+    :py:attr:`request_success <locust.event.Events.request_success>` and
+    :py:attr:`request_failure <locust.event.Events.request_failure>` events for the requests that are made,
+    like for other non-HTTP users (see :ref:`testing-other-systems`), and they are counted in the statistics.
+    此类不带客户端，因为客户端必须基于asyncio：为发出的请求触发request_success和request_failure事件，它们会计入统计数据。
+
+    Example::
+
+        class QuoteUser(AsyncUser):
+            wait_time = between(1, 5)
+
+            @task
+            async def quote(self):
+                start_time = time.time()
+                reader, writer = await asyncio.open_connection("quotes.example.com", 17)
+                quote = await reader.read()
+                writer.close()
+                self.environment.events.request_success.fire(
+                    request_type="QOTD",
+                    name="quote",
+                    response_time=(time.time() - start_time) * 1000,
+                    response_length=len(quote),
+                )
+    """
+
+    abstract = True
+    """
+    If abstract is True, the class is meant to be subclassed, and users will not choose this locust during a test
+    如果abstract为True，则该类将被子类化，用户将不会在测试期间选择这个“蝗虫”
+    """
+
+    _greenlet: AsyncUserGreenlet = None
+
+    async def on_start(self):
+        """
+        Called when a User starts running.
+        当用户开始运行时调用。
+        """
+        pass
+
+    async def on_stop(self):
+        """
+        Called when a User stops running (is killed)
+        当用户停止运行(被杀死)时调用
+        """
+        pass
+
+    async def run(self):
+        self._state = LOCUST_STATE_RUNNING
+        self._taskset_instance = AsyncDefaultTaskSet(self)
+        try:
+            # run the on_start method, if it has one
+            # 运行on_start方法(如果有的话)
+            await self.on_start()
+
+            await self._taskset_instance.run()
+        except (asyncio.CancelledError, StopUser):
+            # run the on_stop method, if it has one
+            # 运行on_stop方法，如果它有的话
+            await self.on_stop()
+
+    async def wait(self):
+        """
+        Make the running user sleep for a duration defined by the User.wait_time function, see
+        :py:meth:`User.wait() <locust.User.wait>`.
+        """
+        await self._taskset_instance.wait()
+
+    def start(self, group):
+        """
+        Start an asyncio task that runs this User instance, and track it in *group*.
+        启动运行此User实例的asyncio任务，并在group中跟踪它。
+
+        :param group: Group instance where the user will be tracked.
+        :type gevent_group: gevent.pool.Group
+        :returns: The :py:class:`AsyncUserGreenlet` that stands in for the greenlet of the user.
+        """
+        self._greenlet = AsyncUserGreenlet(self)
+        group.add(self._greenlet)
+        self._greenlet.start()
+        self._group = group
+        return self._greenlet
@@ -268,6 +268,7 @@ class HttpUser(User):
             base_url=self.host,
             request_success=self.environment.events.request_success,
             request_failure=self.environment.events.request_failure,
+            phase_timings=self.environment.http_phase_timings,
         )
         session.trust_env = False
         self.client = session
@@ -0,0 +1,66 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+DECODERS = {"json": json.loads}
+"""
+The JSON decoders that are available (their loads functions), by name. The json module is always available,
+orjson and ujson if those packages are installed.
+可用的JSON解码器(loads函数)，按名称索引。json模块始终可用，orjson和ujson在安装了对应包时可用。
+"""
+if ujson is not None:
+    DECODERS["ujson"] = ujson.loads
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+
+DECODER_PREFERENCE = ("orjson", "ujson", "json")  # the decoder "auto" picks: the fastest one that is available
+
+decoder_name = "json"
+_loads = json.loads
+
+
+def use_decoder(name="auto"):
+    """
+    Select the decoder that response bodies are decoded with by :func:`loads`: "json", "orjson", "ujson", or
+    "auto" for the fastest one that is installed.
+    选择loads()解码响应体所用的解码器: "json"、"orjson"、"ujson"，或"auto"(已安装的最快的解码器)。
+    """
+    global decoder_name, _loads
+    if name == "auto":
+        name = next(name for name in DECODER_PREFERENCE if name in DECODERS)
+    if name not in DECODERS:
+        raise ValueError("JSON decoder %s isn't available (is the %s package installed?)" % (name, name))
+    decoder_name = name
+    _loads = DECODERS[name]
+
+
+def loads(content, encoding=None):
+    """
+    Decode a JSON response body with the selected decoder. *content* is passed on as bytes when *encoding*
+    is a UTF encoding (or isn't known, since JSON is UTF-8 by default), which saves decoding it to a string
+    first, and is decoded with *encoding* otherwise.
+    用选择的解码器解码JSON响应体。encoding为UTF编码(或未知)时直接传入bytes，否则先用encoding解码为字符串。
+    """
+    if isinstance(content, bytes) and encoding is not None and not encoding.lower().startswith("utf"):
+        content = str(content, encoding, errors="replace")
+    try:
+        return _loads(content)
+    except (ValueError, UnicodeDecodeError):
+        if _loads is json.loads:
+            raise
+        # let the json module raise the error (a JSONDecodeError, like it would without a fast decoder), and
+        # decode what the fast decoders reject but it doesn't, such as NaN or UTF-16 without an encoding
+        # 让json模块抛出错误(和不使用快速解码器时一样)，并解码快速解码器拒绝而json模块接受的内容
+        return json.loads(content)
+
+
+use_decoder()
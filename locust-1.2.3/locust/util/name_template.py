@@ -0,0 +1,67 @@
+import functools
+import re
+
+
+UUID_RE = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+HEX_RE = re.compile(r"^(?=.*\d)[0-9a-fA-F]{16,}$")
+
+
+def parse_rule(rule):
+    """
+    Parse a "PATTERN=>REPLACEMENT" string (as used by the --name-template-rule option) into a
+    (pattern, replacement) tuple
+    将"PATTERN=>REPLACEMENT"字符串解析为(pattern, replacement)元组
+    """
+    pattern, separator, replacement = rule.rpartition("=>")
+    if not separator:
+        raise ValueError("Invalid name template rule %r, expected PATTERN=>REPLACEMENT" % rule)
+    return pattern, replacement
+
+
+class NameTemplater(object):
+    """
+    Collapses high cardinality request names (e.g. /order/1234?token=abc) into templates
+    (/order/{id}), so that requests to the same endpoint end up in the same stats entry.
+    将高基数的请求名称(例如 /order/1234?token=abc)折叠成模板(/order/{id})，使同一个接口的请求进入同一个统计条目。
+
+    User supplied rules are applied first, in order, then the query string is stripped and path segments
+    that are numbers, UUIDs or long hex strings are replaced with {id}, {uuid} and {hash}.
+    首先按顺序应用用户提供的规则，然后去掉查询字符串，并将数字、UUID或长十六进制字符串的路径段替换为{id}、{uuid}和{hash}。
+    """
+
+    def __init__(self, rules=(), strip_query_string=True, collapse_ids=True, cache_size=10000):
+        """
+        :param rules: List of (pattern, replacement) tuples that are applied with re.sub()
+        :param strip_query_string: Whether to remove everything after "?" (and "#") from the name
+        :param collapse_ids: Whether to replace numeric, UUID and hex path segments with placeholders
+        :param cache_size: Number of raw names whose template is cached
+        """
+        self.rules = [(re.compile(pattern), replacement) for pattern, replacement in rules]
+        self.strip_query_string = strip_query_string
+        self.collapse_ids = collapse_ids
+        self.template = functools.lru_cache(maxsize=cache_size)(self._template)
+
+    def __call__(self, name):
+        return self.template(name)
+
+    def _template(self, name):
+        for pattern, replacement in self.rules:
+            name = pattern.sub(replacement, name)
+        path, separator, query = name.partition("?")
+        if self.strip_query_string:
+            path, separator, query = path.split("#", 1)[0], "", ""
+        if self.collapse_ids and "/" in path:
+            path = "/".join([self._template_segment(segment) for segment in path.split("/")])
+        return path + separator + query
+
+    def _template_segment(self, segment):
+        if not segment or segment[0] == "{":
+            return segment
+        if NUMBER_RE.match(segment):
+            return "{id}"
+        if UUID_RE.match(segment):
+            return "{uuid}"
+        if HEX_RE.match(segment):
+            return "{hash}"
+        return segment
@@ -0,0 +1,175 @@
+import functools
+import socket
+from timeit import default_timer
+
+from gevent.local import local
+
+
+PHASES = ("dns", "connect", "tls", "ttfb", "download")
+"""
+The phases of an HTTP request that are timed: name resolution, TCP connect, TLS handshake, time to first
+byte (from sending the request until the response headers are received) and downloading the body
+计时的HTTP请求阶段: 域名解析、TCP连接、TLS握手、首字节时间和下载响应体
+"""
+
+CONNECTION_PHASES = ("dns", "connect", "tls")
+
+_local = local()
+_installed = False
+
+
+def current_timer():
+    """
+    Return the PhaseTimer that is active in the current greenlet, or None
+    返回当前greenlet中活动的PhaseTimer，或None
+    """
+    return getattr(_local, "timer", None)
+
+
+class PhaseTimer(object):
+    """
+    Collects the time spent in each phase of the requests made by the current greenlet while it's
+    active (used as a context manager). The HTTP clients are instrumented with timed_phase(), which
+    does nothing unless a PhaseTimer is active, so the timings cost nothing when they're not enabled.
+    收集当前greenlet在其活动期间(作为上下文管理器使用)发出的请求在每个阶段所花费的时间。
+    """
+
+    def __init__(self):
+        self.phase_times = {}
+        self.start_time = None
+        self.headers_time = None
+        self._nested = 0
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = current_timer()
+        _local.timer = self
+        if self.start_time is None:
+            self.start_time = default_timer()
+        return self
+
+    def __exit__(self, *args):
+        _local.timer = self._previous
+
+    def add(self, phase, elapsed):
+        """
+        Add *elapsed* milliseconds to *phase*
+        """
+        self.phase_times[phase] = self.phase_times.get(phase, 0) + elapsed
+
+    def headers_received(self):
+        """
+        Mark the time the (last) response headers were received, which ends the ttfb phase
+        """
+        self.headers_time = default_timer()
+
+    def finish(self, end_time=None):
+        """
+        Return the {phase: milliseconds} dict of the request. Time to first byte is what's left of the time
+        from entering the timer until the headers were received when the connection phases are subtracted,
+        and the download phase is the time from then until *end_time* (a default_timer() value, if the body
+        was downloaded). Connection phases only show up if a new connection was made.
+        返回一个{阶段: 毫秒}字典。只有建立了新连接时才包含连接阶段。
+        """
+        phase_times = dict(self.phase_times)
+        if self.headers_time is not None:
+            connection_time = sum(phase_times.get(phase, 0) for phase in CONNECTION_PHASES)
+            phase_times["ttfb"] = max(0, (self.headers_time - self.start_time) * 1000 - connection_time)
+            if end_time is not None:
+                phase_times["download"] = max(0, (end_time - self.headers_time) * 1000)
+        return phase_times
+
+
+def timed_phase(phase, func):
+    """
+    Wrap *func* so that the time spent in it is added to *phase* of the active PhaseTimer. Time spent in
+    other timed phases while *func* runs (e.g. the TCP connect inside a TLS connect) is only counted once,
+    for the innermost phase.
+    包装func，使其花费的时间计入活动PhaseTimer的phase阶段。嵌套阶段的时间只计入最内层的阶段。
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        timer = current_timer()
+        if timer is None:
+            return func(*args, **kwargs)
+        outer_nested = timer._nested
+        timer._nested = 0
+        start = default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = (default_timer() - start) * 1000
+            timer.add(phase, elapsed - timer._nested)
+            timer._nested = outer_nested + elapsed
+
+    wrapper.timed_phase = phase
+    return wrapper
+
+
+def instrument(obj, attribute, phase):
+    """
+    Replace *obj.attribute* with a timed_phase() wrapper of itself, unless it has been wrapped already
+    用timed_phase()包装obj.attribute(如果尚未包装)
+    """
+    func = getattr(obj, attribute, None)
+    if func is None or getattr(func, "timed_phase", None) is not None:
+        return
+    setattr(obj, attribute, timed_phase(phase, func))
+
+
+def phase_times_kwargs(request_meta):
+    """
+    Extra request event arguments with the per phase timings of the request, if they were recorded
+    """
+    if "phase_times" in request_meta:
+        return {"phase_times": request_meta["phase_times"]}
+    return {}
+
+
+class _TimedResolverSocketModule(object):
+    """
+    Stands in for the socket module in urllib3.util.connection, so that the getaddrinfo() call in
+    create_connection() is timed as the dns phase
+    替代urllib3.util.connection中的socket模块，使create_connection()中的getaddrinfo()调用被计为dns阶段
+    """
+
+    def _getaddrinfo(*args, **kwargs):
+        # looked up on every call, since gevent may monkey patch it after this module is imported
+        return socket.getaddrinfo(*args, **kwargs)
+
+    getaddrinfo = staticmethod(timed_phase("dns", _getaddrinfo))
+
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+
+def install():
+    """
+    Instrument the DNS lookup, TCP connect and TLS handshake of new connections of HttpSession (urllib3)
+    and FastHttpSession (geventhttpclient), so that they're timed when a PhaseTimer is active. Only done
+    once per process, when phase timings are enabled, so that the HTTP libraries are left alone otherwise.
+    对HttpSession(urllib3)和FastHttpSession(geventhttpclient)新连接的DNS查询、TCP连接和TLS握手进行插桩，
+    仅在启用阶段计时时执行一次，否则不改动HTTP库。
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from urllib3 import connection as urllib3_connection
+    from urllib3.util import connection as urllib3_util_connection
+    from geventhttpclient import connectionpool
+
+    if urllib3_util_connection.socket is socket:
+        urllib3_util_connection.socket = _TimedResolverSocketModule()
+    instrument(urllib3_util_connection, "create_connection", "connect")
+    # the TLS wrapping function was renamed in urllib3 2
+    instrument(urllib3_connection, "_ssl_wrap_socket_and_match_hostname", "tls")
+    instrument(urllib3_connection, "ssl_wrap_socket", "tls")
+
+    # the TLS connect calls the TCP connect, which is subtracted from it
+    instrument(connectionpool.ConnectionPool, "_resolve", "dns")
+    instrument(connectionpool.ConnectionPool, "_connect_socket", "connect")
+    if hasattr(connectionpool, "SSLConnectionPool"):
+        instrument(connectionpool.SSLConnectionPool, "_connect_socket", "tls")
@@ -1,2 +1,24 @@
+import math
+
+
 def proper_round(val, digits=0):
     return round(val + 10 ** (-len(str(val)) - 1), digits)
+
+
+def distribute(amount, weights):
+    """
+    Split the integer *amount* into a list of parts proportional to *weights*, using the largest
+    remainder method. Ties go to the earlier weights, so equal weights give an even split where
+    the first ones get the remainder.
+    按权重比例将整数amount拆分(最大余数法)，相同权重时余数分给前面的部分
+    """
+    weight_sum = float(sum(weights))
+    if not weight_sum:
+        weights = [1] * len(weights)
+        weight_sum = float(len(weights))
+    exact = [amount * weight / weight_sum for weight in weights]
+    parts = [math.floor(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - parts[i], reverse=True)
+    for i in by_remainder[: amount - sum(parts)]:
+        parts[i] += 1
+    return parts
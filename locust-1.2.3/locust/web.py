@@ -21,8 +21,9 @@ from .runners import MasterRunner
 from .log import greenlet_exception_logger
 from .stats import sort_stats
 from . import stats as stats_module
-from .stats import StatsCSV
+from .stats import PHASE_LABELS, StatsCSV
 from .util.cache import memoize
+from .util.phase_timer import PHASES
 from .util.rounding import proper_round
 from .util.timespan import parse_timespan
 
@@ -152,6 +153,9 @@ class WebUI:
                 is_step_load=environment.step_load,
                 is_shape=environment.shape_class,
                 stats_history_enabled=options and options.stats_history_enabled,
+                phase_labels=[(phase, PHASE_LABELS[phase]) for phase in PHASES]
+                if environment.http_phase_timings
+                else [],
             )
 
         @app.route("/swarm", methods=["POST"])
@@ -193,6 +197,27 @@ class WebUI:
             environment.runner.exceptions = {}
             return "ok"
 
+        def worker_stats():
+            # the state, load and event loop metrics of the workers (see LoopLagMonitor), when running distributed
+            # 分布式运行时各worker的状态、负载和事件循环指标
+            workers = []
+            for worker in environment.runner.clients.values():
+                loop_lag = worker.loop_lag
+                workers.append(
+                    {
+                        "id": worker.id,
+                        "state": worker.state,
+                        "user_count": worker.user_count,
+                        "cpu_usage": worker.cpu_usage,
+                        "loop_lag": round(loop_lag.get("lag", 0), 1),
+                        "max_loop_lag": round(loop_lag.get("max_lag", 0), 1),
+                        "peak_loop_lag": round(loop_lag.get("peak_lag", 0), 1),
+                        "runnable_greenlets": round(loop_lag.get("runnable", 0), 1),
+                        "stats_hook_usage": round(loop_lag.get("stats_hook_usage", 0), 1),
+                    }
+                )
+            return workers
+
         @app.route("/stats/report")
         @self.auth_required_if_enabled
         def stats_report():
@@ -222,6 +247,7 @@ class WebUI:
                 exceptions_statistics.append(exc)
 
             history = stats.history
+            workers = worker_stats() if isinstance(environment.runner, MasterRunner) else []
 
             static_js = ""
             js_files = ["jquery-1.11.3.min.js", "echarts.common.min.js", "vintage.js", "chart.js"]
@@ -240,6 +266,7 @@ class WebUI:
                 requests_statistics=requests_statistics,
                 failures_statistics=failures_statistics,
                 exceptions_statistics=exceptions_statistics,
+                workers=workers,
                 start_time=start_time,
                 end_time=end_time,
                 host=host,
@@ -287,7 +314,11 @@ class WebUI:
         @self.auth_required_if_enabled
         def request_stats_full_history_csv():
             options = self.environment.parsed_options
-            if options and options.stats_history_enabled:
+            if (
+                options
+                and options.stats_history_enabled
+                and getattr(self.stats_csv_writer, "history_format", "csv") == "csv"
+            ):
                 return send_file(
                     os.path.abspath(self.stats_csv_writer.stats_history_file_name()),
                     mimetype="text/csv",
@@ -301,6 +332,25 @@ class WebUI:
 
             return make_response("Error: Server was not started with option to generate full history.", 404)
 
+        @app.route("/stats/history")
+        @self.auth_required_if_enabled
+        def stats_history():
+            """
+            The (downsampled) history of the current stats of the total, and of every endpoint if the history
+            is kept per endpoint (see --history-per-endpoint)
+            总计的(降采样的)当前统计历史，以及按端点保存历史时每个端点的历史
+            """
+            history = environment.runner.stats.history
+            return jsonify(
+                {
+                    "total": list(history),
+                    "entries": [
+                        {"name": name, "method": method, "history": list(series)}
+                        for (name, method), series in history.entries.items()
+                    ],
+                }
+            )
+
         @app.route("/stats/failures/csv")
         @self.auth_required_if_enabled
         def failures_stats_csv():
@@ -333,6 +383,9 @@ class WebUI:
                         "avg_content_length": s.avg_content_length,
                     }
                 )
+                if environment.http_phase_timings:
+                    for phase in PHASES:
+                        stats[-1]["median_%s_time" % phase] = s.get_phase_time_percentile(phase, 0.5)
 
             errors = []
             for e in environment.runner.errors.values():
@@ -357,20 +410,13 @@ class WebUI:
                     "current_response_time_percentile_50"
                 ] = environment.runner.stats.total.get_current_response_time_percentile(0.5)
 
+            for name, aux_stats in environment.runner.stats.aux_stats():
+                if not aux_stats.is_empty:
+                    report[name] = aux_stats.to_dict()
+
             is_distributed = isinstance(environment.runner, MasterRunner)
             if is_distributed:
-                workers = []
-                for worker in environment.runner.clients.values():
-                    workers.append(
-                        {
-                            "id": worker.id,
-                            "state": worker.state,
-                            "user_count": worker.user_count,
-                            "cpu_usage": worker.cpu_usage,
-                        }
-                    )
-
-                report["workers"] = workers
+                report["workers"] = worker_stats()
 
             report["state"] = environment.runner.state
             report["user_count"] = environment.runner.user_count